@@ -0,0 +1,474 @@
+#!/usr/bin/env python3
+"""
+Benchmark the monitoring script against local stand-ins.
+
+Runs HealthMonitor and MultiEndpointMonitor against a local HTTPS server with
+a self-signed certificate and a fake EC2 API (see local_standins.py), and
+measures how they scale:
+
+    throughput   probes per second and mean probe latency as the endpoint count grows
+    detection    seconds from an endpoint going down to remediation being triggered
+    remediation  wall time and EC2 API calls to restart fleets of growing size
+    discovery    wall time of a cold fleet-wide discovery as the number of regions grows,
+                 next to describing the same regions one after another
+    startup      wall time of a one-shot ``monitor.py --once`` check in a fresh interpreter,
+                 next to the same check with boto3 imported and clients created up front
+    logging      time a probe thread spends logging a healthy-probe line through the log
+                 pipeline, with and without sampling, next to synchronous handlers, with a
+                 console that is slow to take each line
+
+Every scenario also records the process RSS. Results are saved as JSON and can
+be compared with an earlier run to catch regressions.
+
+Usage:
+    python benchmark_monitor.py --output results.json
+    python benchmark_monitor.py --endpoints 1,10,100 --mode slow --compare baseline.json
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import logging
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional
+
+import urllib3
+
+from clients import ClientPool, Location
+from inventory import InstanceInventory
+from local_standins import FakeEC2Client, StandInServer
+from logpipeline import DEFAULT_LOG_FORMAT, LogConfig, LogPipeline
+from monitor import Endpoint, HealthMonitor, MultiEndpointMonitor
+
+
+# Metrics where a larger value is an improvement; every other metric is better smaller
+HIGHER_IS_BETTER = {'probes_per_sec'}
+
+# Metrics that describe a run rather than its performance
+INFORMATIONAL = {'probes', 'trials', 'instances', 'eager_once_sec', 'sequential_sec', 'lines', 'sync_log_line_us'}
+
+MONITOR_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'monitor.py')
+
+# Runs monitor.py after the AWS setup it did at startup before boto3 was deferred
+EAGER_STARTUP = (
+    "import boto3, os, runpy, sys\n"
+    "for service in ('ec2', 'elbv2', 'ssm'):\n"
+    "    boto3.client(service, region_name='us-east-1')\n"
+    "sys.argv = sys.argv[1:]\n"
+    "sys.path.insert(0, os.path.dirname(sys.argv[0]))\n"
+    "runpy.run_path(sys.argv[0], run_name='__main__')\n"
+)
+
+
+def current_rss_mb() -> float:
+    """Return the resident set size of this process in MiB."""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return pages * resource.getpagesize() / (1024 * 1024)
+    except (OSError, IndexError, ValueError):
+        # Peak RSS is the best that is available outside Linux (KiB on Linux, bytes on macOS)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _create_monitor(ec2_client: FakeEC2Client, factory, *args, **kwargs):
+    """Build a monitor whose AWS clients are the fake EC2 API."""
+    monitor = factory(*args, **kwargs)
+    monitor.ec2_client = monitor.elbv2_client = monitor.ssm_client = ec2_client
+    return monitor
+
+
+def _total_probes(monitor: HealthMonitor) -> int:
+    return int(sum(monitor.metrics.probes._values.values()))
+
+
+def benchmark_throughput(server: StandInServer, endpoint_count: int, duration: float,
+                         probe_interval: float, timeout: float, max_in_flight: int) -> Dict:
+    """Probe many endpoints as fast as the schedule allows and count completed probes."""
+    endpoints = [
+        Endpoint(f"{server.url}endpoint-{index}", interval=probe_interval, timeout=timeout)
+        for index in range(endpoint_count)
+    ]
+    monitor = _create_monitor(
+        FakeEC2Client(0), MultiEndpointMonitor, endpoints, max_in_flight=max_in_flight,
+        jitter=0, max_interval=probe_interval
+    )
+    # Failures are expected in flaky mode; they must not turn into restarts here
+    monitor.start_remediation = lambda source=None: True
+
+    async def run_for():
+        task = asyncio.ensure_future(monitor._run_async())
+        await asyncio.sleep(duration)
+        monitor._request_stop()
+        await task
+
+    started = time.perf_counter()
+    asyncio.run(run_for())
+    elapsed = time.perf_counter() - started
+    monitor.probe_session.close()
+
+    probes = _total_probes(monitor)
+    latency = monitor.metrics.probe_duration_seconds
+    total_latency = sum(state['sum'] for state in latency._values.values())
+    return {
+        'probes': probes,
+        'probes_per_sec': probes / elapsed,
+        'mean_probe_ms': total_latency / probes * 1000 if probes else 0.0,
+        'rss_mb': current_rss_mb(),
+    }
+
+
+def benchmark_detection(server: StandInServer, interval: float, timeout: float, trials: int) -> Dict:
+    """Measure the time from an endpoint going down until remediation is triggered."""
+    latencies = []
+    for _ in range(trials):
+        server.mode = 'healthy'
+        monitor = _create_monitor(FakeEC2Client(0), HealthMonitor, server.url, interval, timeout=timeout)
+        triggered = threading.Event()
+
+        def start_remediation(source=None):
+            triggered.set()
+            return True
+
+        monitor.start_remediation = start_remediation
+        thread = threading.Thread(target=monitor.run, name='detection', daemon=True)
+        thread.start()
+
+        # Let the monitor settle into its healthy schedule first
+        while _total_probes(monitor) < 2:
+            time.sleep(0.01)
+        time.sleep(interval / 2)
+
+        server.mode = 'down'
+        went_down = time.perf_counter()
+        if triggered.wait(timeout=interval * 10 + timeout * 2):
+            latencies.append(time.perf_counter() - went_down)
+        monitor.running = False
+        thread.join(timeout=interval * 3)
+
+    server.mode = 'healthy'
+    if not latencies:
+        raise RuntimeError("Remediation was never triggered")
+    return {
+        'trials': len(latencies),
+        'mean_detection_sec': sum(latencies) / len(latencies),
+        'max_detection_sec': max(latencies),
+        'rss_mb': current_rss_mb(),
+    }
+
+
+def benchmark_remediation(server: StandInServer, instance_count: int, transition_delay: float,
+                          api_latency: float) -> Dict:
+    """Measure a full rolling restart of a fleet on the fake EC2 API, until every instance serves again.
+
+    Every fake instance has the stand-in's address, so the readiness checks
+    after each batch are answered by the stand-in.
+    """
+    ec2_client = FakeEC2Client(instance_count, transition_delay=transition_delay, api_latency=api_latency,
+                               private_ip='127.0.0.1')
+    monitor = _create_monitor(ec2_client, HealthMonitor, server.url, 10)
+
+    started = time.perf_counter()
+    monitor.restart_web_servers()
+    elapsed = time.perf_counter() - started
+    monitor.probe_session.close()
+
+    restarted = int(monitor.metrics.restarts.value(result='success'))
+    if restarted != instance_count:
+        raise RuntimeError(f"Only {restarted} of {instance_count} instances restarted")
+    return {
+        'remediation_sec': elapsed,
+        'api_calls': len(ec2_client.calls),
+        'rss_mb': current_rss_mb(),
+    }
+
+
+def benchmark_discovery(region_count: int, instances_per_region: int, api_latency: float) -> Dict:
+    """Measure a cold discovery of the web servers in every region, each region on its own fake EC2 API."""
+    fleets = {
+        f'region-{index}': FakeEC2Client(instances_per_region, api_latency=api_latency,
+                                         id_offset=index * instances_per_region)
+        for index in range(region_count)
+    }
+    pool = ClientPool(lambda service, region_name=None, **credentials: fleets[region_name])
+    monitor = HealthMonitor('https://127.0.0.1/', 10, client_pool=pool,
+                            locations=[Location(region) for region in fleets])
+
+    started = time.perf_counter()
+    instances = monitor.get_web_server_instances()
+    elapsed = time.perf_counter() - started
+    monitor.probe_session.close()
+    if len(instances) != region_count * instances_per_region:
+        raise RuntimeError(f"Discovered {len(instances)} of {region_count * instances_per_region} instances")
+
+    # The same describes, one region after another
+    started = time.perf_counter()
+    for fleet in fleets.values():
+        InstanceInventory(fleet).refresh()
+    sequential = time.perf_counter() - started
+    return {
+        'instances': len(instances),
+        'discovery_sec': elapsed,
+        'sequential_sec': sequential,
+        'rss_mb': current_rss_mb(),
+    }
+
+
+def _time_process(command: List[str], cwd: str) -> float:
+    """Run a command to completion and return its wall time."""
+    started = time.perf_counter()
+    completed = subprocess.run(command, cwd=cwd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    elapsed = time.perf_counter() - started
+    if completed.returncode != 0:
+        raise RuntimeError(f"{' '.join(command[-3:])} exited with status {completed.returncode}")
+    return elapsed
+
+
+def benchmark_startup(server: StandInServer, trials: int) -> Dict:
+    """Measure a one-shot --once check of a healthy endpoint, from process start to exit."""
+    once_command = [MONITOR_SCRIPT, '--once', server.url]
+    once, eager = [], []
+    # monitor.log is written to the working directory
+    with tempfile.TemporaryDirectory() as directory:
+        for _ in range(trials):
+            once.append(_time_process([sys.executable] + once_command, directory))
+            eager.append(_time_process([sys.executable, '-c', EAGER_STARTUP] + once_command, directory))
+    return {
+        'trials': trials,
+        'once_sec': statistics.median(once),
+        'eager_once_sec': statistics.median(eager),
+        'rss_mb': current_rss_mb(),
+    }
+
+
+def _time_log_lines(logger: logging.Logger, lines: int, eager: bool = False) -> float:
+    """Log healthy-probe lines as the monitor does and return the microseconds spent per line."""
+    url = 'https://127.0.0.1/'
+    started = time.perf_counter()
+    for index in range(lines):
+        fields = {'endpoint': url, 'status': 200, 'latency': 0.01, 'sample': f"healthy:{url}"}
+        if eager:
+            logger.info(f"✓ Endpoint healthy ({url}) - Status: 200, expected content confirmed after {index} bytes "
+                        f"(connection reused)")
+        else:
+            logger.info("✓ Endpoint healthy (%s) - Status: %s, expected content confirmed after %d bytes (%s)",
+                        url, 200, index, 'connection reused', extra=fields)
+    return (time.perf_counter() - started) / lines * 1e6
+
+
+class _SlowConsole(io.TextIOBase):
+    """Console that takes a fixed time per line, like a slow terminal or a log shipper pushing back."""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+
+    def write(self, text: str) -> int:
+        time.sleep(self.delay)
+        return len(text)
+
+
+def benchmark_logging(lines: int, write_delay: float) -> Dict:
+    """Measure the time logging takes on the probe thread when each console write takes write_delay seconds."""
+    console = _SlowConsole(write_delay)
+    with tempfile.TemporaryDirectory() as directory:
+        # Before the pipeline: f-strings and synchronous console and file handlers
+        logger = logging.getLogger('benchmark.sync')
+        logger.propagate = False
+        logger.setLevel(logging.INFO)
+        handlers = [logging.StreamHandler(console), logging.FileHandler(os.path.join(directory, 'sync.log'))]
+        for handler in handlers:
+            handler.setFormatter(logging.Formatter(DEFAULT_LOG_FORMAT))
+            logger.addHandler(handler)
+        sync = _time_log_lines(logger, lines, eager=True)
+        for handler in handlers:
+            logger.removeHandler(handler)
+            handler.close()
+
+        results = {}
+        for name, sample_rate in (('log_line_us', 1), ('sampled_log_line_us', 10)):
+            logger = logging.getLogger(f'benchmark.{name}')
+            logger.propagate = False
+            pipeline = LogPipeline(LogConfig(path=os.path.join(directory, f'{name}.log'), sample_rate=sample_rate),
+                                   stream=console)
+            pipeline.start(logger)
+            results[name] = _time_log_lines(logger, lines)
+            pipeline.stop()
+    return {
+        'lines': lines,
+        'log_line_us': results['log_line_us'],
+        'sampled_log_line_us': results['sampled_log_line_us'],
+        'sync_log_line_us': sync,
+        'rss_mb': current_rss_mb(),
+    }
+
+
+def _entry_key(entry: Dict) -> str:
+    params = ','.join(f"{key}={value}" for key, value in sorted(entry['params'].items()))
+    return f"{entry['scenario']}[{params}]"
+
+
+def compare_results(baseline: Dict, current: Dict, tolerance: float) -> List[str]:
+    """Return a description of every metric that regressed by more than ``tolerance``.
+
+    Args:
+        baseline: Results of an earlier run
+        current: Results of this run
+        tolerance: Allowed relative change in the bad direction (0.2 = 20%)
+    """
+    previous = {_entry_key(entry): entry['metrics'] for entry in baseline['results']}
+    regressions = []
+    for entry in current['results']:
+        key = _entry_key(entry)
+        if key not in previous:
+            continue
+        for name, value in entry['metrics'].items():
+            old = previous[key].get(name)
+            if name in INFORMATIONAL or not old:
+                continue
+            change = (value - old) / old
+            if name in HIGHER_IS_BETTER:
+                change = -change
+            if change > tolerance:
+                regressions.append(f"{key} {name}: {old:.4g} -> {value:.4g} ({change:+.0%} worse)")
+    return regressions
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(item) for item in value.split(',') if item]
+
+
+def main():
+    """Run the selected benchmarks, save the results and compare them with a baseline."""
+    parser = argparse.ArgumentParser(description="Benchmark the health monitor against local stand-ins")
+    parser.add_argument('--scenarios', default='throughput,detection,remediation,discovery,startup,logging',
+                        help='Comma-separated scenarios to run (default: all)')
+    parser.add_argument('--endpoints', type=_int_list, default=[1, 10, 50],
+                        help='Endpoint counts for the throughput scenario (default: 1,10,50)')
+    parser.add_argument('--instances', type=_int_list, default=[2, 10, 50],
+                        help='Fleet sizes for the remediation scenario (default: 2,10,50)')
+    parser.add_argument('--regions', type=_int_list, default=[1, 4, 8],
+                        help='Region counts for the discovery scenario (default: 1,4,8)')
+    parser.add_argument('--instances-per-region', type=int, default=50,
+                        help='Fake instances in each region of the discovery scenario (default: 50)')
+    parser.add_argument('--discovery-latency', type=float, default=0.1,
+                        help='Seconds added to every fake EC2 call in the discovery scenario, '
+                             'as for a distant region (default: 0.1)')
+    parser.add_argument('--mode', choices=('healthy', 'slow', 'flaky'), default='healthy',
+                        help='Stand-in server behaviour during the throughput scenario (default: healthy)')
+    parser.add_argument('--duration', type=float, default=5.0,
+                        help='Seconds each throughput run lasts (default: 5)')
+    parser.add_argument('--probe-interval', type=float, default=0.1,
+                        help='Seconds between probes of each endpoint in the throughput scenario (default: 0.1)')
+    parser.add_argument('--max-in-flight', type=int, default=20,
+                        help='Maximum concurrent probes in the throughput scenario (default: 20)')
+    parser.add_argument('--detection-interval', type=float, default=2.0,
+                        help='Check interval in the detection scenario (default: 2)')
+    parser.add_argument('--trials', type=int, default=3,
+                        help='Detection and startup measurements to take (default: 3)')
+    parser.add_argument('--timeout', type=float, default=5.0,
+                        help='Probe timeout in seconds (default: 5)')
+    parser.add_argument('--transition-delay', type=float, default=0.2,
+                        help='Seconds a fake instance takes to stop or start (default: 0.2)')
+    parser.add_argument('--api-latency', type=float, default=0.01,
+                        help='Seconds added to every fake EC2 call (default: 0.01)')
+    parser.add_argument('--log-lines', type=int, default=2000,
+                        help='Healthy-probe lines logged by the logging scenario (default: 2000)')
+    parser.add_argument('--log-write-delay', type=float, default=0.0002,
+                        help='Seconds the console takes per line in the logging scenario (default: 0.0002)')
+    parser.add_argument('--no-tls', action='store_true', help='Serve plain HTTP instead of HTTPS')
+    parser.add_argument('--output', metavar='FILE', help='Save the results as JSON')
+    parser.add_argument('--compare', metavar='FILE', help='Fail if results regressed against this earlier run')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='Allowed relative regression when comparing (default: 0.2)')
+    parser.add_argument('--verbose', action='store_true', help='Show the monitor log')
+    args = parser.parse_args()
+
+    # The monitor only configures logging if nothing else has
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.CRITICAL,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[logging.StreamHandler(sys.stderr)]
+    )
+
+    # The stand-in's certificate is self-signed, as it is in the demo environment
+    urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+    scenarios = set(args.scenarios.split(','))
+    results = []
+
+    def record(scenario: str, params: Dict, metrics: Dict):
+        results.append({'scenario': scenario, 'params': params, 'metrics': metrics})
+        summary = ', '.join(f"{name}={value:.4g}" for name, value in metrics.items())
+        print(f"{scenario:<12} {json.dumps(params):<40} {summary}")
+
+    server: Optional[StandInServer] = None
+    if scenarios & {'throughput', 'detection', 'remediation', 'startup'}:
+        server = StandInServer(tls=not args.no_tls, body_size=4096, seed=1)
+    try:
+        if 'throughput' in scenarios:
+            server.mode = args.mode
+            for count in args.endpoints:
+                record('throughput', {'endpoints': count, 'mode': args.mode}, benchmark_throughput(
+                    server, count, args.duration, args.probe_interval, args.timeout, args.max_in_flight
+                ))
+        if 'detection' in scenarios:
+            record('detection', {'interval': args.detection_interval}, benchmark_detection(
+                server, args.detection_interval, args.timeout, args.trials
+            ))
+        if 'remediation' in scenarios:
+            server.mode = 'healthy'
+            for count in args.instances:
+                record('remediation', {'instances': count}, benchmark_remediation(
+                    server, count, args.transition_delay, args.api_latency
+                ))
+        if 'discovery' in scenarios:
+            for count in args.regions:
+                record('discovery', {'regions': count}, benchmark_discovery(
+                    count, args.instances_per_region, args.discovery_latency
+                ))
+        if 'startup' in scenarios:
+            server.mode = 'healthy'
+            record('startup', {'tls': not args.no_tls}, benchmark_startup(server, args.trials))
+        if 'logging' in scenarios:
+            record('logging', {'write_delay': args.log_write_delay}, benchmark_logging(
+                args.log_lines, args.log_write_delay
+            ))
+    finally:
+        if server is not None:
+            server.stop()
+
+    report = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results saved to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare_results(baseline, report, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regression(s) against {args.compare}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print(f"No regressions against {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
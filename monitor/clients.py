@@ -0,0 +1,151 @@
+"""
+AWS client pool for the monitoring script.
+
+Web servers can live in several regions and accounts. Each place the monitor
+looks for them is a Location: a region, reached either with the monitor's own
+credentials or through an IAM role assumed in another account. The ClientPool
+hands out one boto3 client per (role, region, service), assuming each role
+once and assuming it again shortly before its temporary credentials expire.
+"""
+
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+
+DEFAULT_ROLE_SESSION_NAME = 'health-monitor'
+
+# Lifetime requested for assumed-role credentials (the STS default)
+DEFAULT_SESSION_DURATION = 3600
+
+# Credentials are renewed this many seconds before they expire, so no call is made with credentials about to lapse
+DEFAULT_REFRESH_MARGIN = 300.0
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Location:
+    """A region, in the monitor's own account or in the account of an assumed role."""
+    region: str
+    role_arn: Optional[str] = None
+
+    @property
+    def account(self) -> Optional[str]:
+        """Return the account ID of the assumed role, or None for the monitor's own account."""
+        if not self.role_arn:
+            return None
+        parts = self.role_arn.split(':')
+        return parts[4] if len(parts) > 5 else None
+
+    def __str__(self) -> str:
+        return f"{self.account or self.role_arn}/{self.region}" if self.role_arn else self.region
+
+
+def parse_locations(regions: Iterable[str], role_arns: Iterable[str] = ()) -> List[Location]:
+    """Return a location for every region in every account.
+
+    Args:
+        regions: Regions to monitor
+        role_arns: Roles to assume, one per account; none means the monitor's own account
+    """
+    regions = [region.strip() for region in regions if region.strip()]
+    if not regions:
+        raise ValueError("at least one region is required")
+    role_arns = list(role_arns) or [None]
+    for role_arn in role_arns:
+        if role_arn is not None and not role_arn.startswith('arn:'):
+            raise ValueError(f"role must be given as an ARN, got {role_arn!r}")
+    return [Location(region, role_arn) for role_arn in role_arns for region in dict.fromkeys(regions)]
+
+
+class ClientPool:
+    """Cache boto3 clients per location and service, with assumed-role credentials renewed before they expire."""
+
+    def __init__(self, client_factory: Callable[..., object], role_session_name: str = DEFAULT_ROLE_SESSION_NAME,
+                 session_duration: int = DEFAULT_SESSION_DURATION, refresh_margin: float = DEFAULT_REFRESH_MARGIN,
+                 clock: Callable[[], float] = time.time):
+        """Initialize the pool.
+
+        Args:
+            client_factory: Creates a client, called like boto3.client(service, region_name=..., **credentials)
+            role_session_name: Session name recorded in CloudTrail for assumed roles (default: health-monitor)
+            session_duration: Seconds assumed-role credentials are requested for (default: 3600)
+            refresh_margin: Seconds before expiry at which a role is assumed again (default: 300)
+            clock: Wall-clock time source, for tests
+        """
+        if refresh_margin >= session_duration:
+            raise ValueError("refresh_margin must be shorter than session_duration")
+        self.client_factory = client_factory
+        self.role_session_name = role_session_name
+        self.session_duration = session_duration
+        self.refresh_margin = refresh_margin
+        self.clock = clock
+
+        self._clients: Dict[Tuple[Optional[str], str, str], object] = {}
+        # Assumed-role credentials and the wall-clock time they expire at
+        self._credentials: Dict[str, Tuple[Dict[str, str], float]] = {}
+        self._lock = threading.Lock()
+        self._role_locks: Dict[Optional[str], threading.Lock] = {}
+        # boto3's default session is not safe to create clients from concurrently
+        self._factory_lock = threading.Lock()
+
+    def _role_lock(self, role_arn: Optional[str]) -> threading.Lock:
+        # One lock per role, so a slow STS call for one account does not hold up the others
+        with self._lock:
+            return self._role_locks.setdefault(role_arn, threading.Lock())
+
+    def _create(self, service: str, region: str, **credentials):
+        with self._factory_lock:
+            return self.client_factory(service, region_name=region, **credentials)
+
+    def _assume_role(self, location: Location) -> Dict[str, str]:
+        """Assume a location's role unless its cached credentials are still good, and return them."""
+        cached = self._credentials.get(location.role_arn)
+        if cached is not None and cached[1] - self.clock() > self.refresh_margin:
+            return cached[0]
+
+        sts = self._create('sts', location.region)
+        response = sts.assume_role(
+            RoleArn=location.role_arn,
+            RoleSessionName=self.role_session_name,
+            DurationSeconds=self.session_duration
+        )
+        credentials = response['Credentials']
+        expiration = credentials['Expiration']
+        expires_at = expiration.timestamp() if hasattr(expiration, 'timestamp') else float(expiration)
+        self._credentials[location.role_arn] = ({
+            'aws_access_key_id': credentials['AccessKeyId'],
+            'aws_secret_access_key': credentials['SecretAccessKey'],
+            'aws_session_token': credentials['SessionToken'],
+        }, expires_at)
+        # Clients still holding the old credentials must not be handed out again
+        with self._lock:
+            for key in [key for key in self._clients if key[0] == location.role_arn]:
+                del self._clients[key]
+        logger.info(f"Assumed role {location.role_arn}; credentials expire in {expires_at - self.clock():.0f} seconds")
+        return self._credentials[location.role_arn][0]
+
+    def client(self, service: str, location: Location):
+        """Return the client for a service in a location, creating it, or renewing its credentials, as needed.
+
+        Raises:
+            Exception: Whatever STS or boto3 raised if the role cannot be assumed or the client created
+        """
+        key = (location.role_arn, location.region, service)
+        with self._role_lock(location.role_arn):
+            credentials = self._assume_role(location) if location.role_arn else {}
+            with self._lock:
+                client = self._clients.get(key)
+            if client is None:
+                client = self._create(service, location.region, **credentials)
+                with self._lock:
+                    self._clients[key] = client
+            return client
+
+    def put(self, service: str, location: Location, client):
+        """Use a ready-made client for a service in a location."""
+        with self._lock:
+            self._clients[(location.role_arn, location.region, service)] = client
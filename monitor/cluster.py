@@ -0,0 +1,411 @@
+"""
+Clustered operation for the monitoring script.
+
+Several monitor processes can share the work of watching a set of endpoints.
+Each node heartbeats a membership lease in a shared coordination backend;
+endpoints are sharded across the live nodes with consistent hashing, so a
+node joining or leaving only moves the endpoints next to it on the ring.
+Remediation is guarded by leases as well: one cluster-wide lease so only one
+node runs a rolling restart at a time, and one lease per instance so an
+instance is never restarted by two nodes at once. The heartbeat renews these
+while they are held, so they outlive a slow remediation but expire soon after
+the node holding them dies.
+
+Leases live in a pluggable backend:
+
+    file:///path/to/dir            JSON files guarded by flock (one host, for testing)
+    sqlite:///path/to/leases.db    A SQLite table (one host, for testing)
+    s3://bucket/prefix             S3 objects written with conditional puts
+
+Lease expiry uses wall-clock time, so nodes sharing a backend need
+NTP-synchronized clocks.
+"""
+
+import bisect
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from urllib.parse import quote, unquote, urlsplit
+
+
+DEFAULT_LEASE_TTL = 30.0
+
+# Renewed by every heartbeat while held, so this only bounds how long a dead node blocks remediation
+DEFAULT_REMEDIATION_LEASE_TTL = 120.0
+
+DEFAULT_RING_REPLICAS = 64
+
+MEMBER_PREFIX = 'members/'
+INSTANCE_PREFIX = 'instances/'
+REMEDIATION_LEASE = 'remediation'
+
+logger = logging.getLogger(__name__)
+
+
+class LeaseBackend:
+    """Storage for named, expiring leases shared by the nodes of a cluster."""
+
+    def acquire(self, name: str, owner: str, ttl: float) -> bool:
+        """Take or renew a lease.
+
+        Succeeds if the lease is free, expired or already held by ``owner``.
+
+        Returns:
+            True if ``owner`` now holds the lease for ``ttl`` seconds, False otherwise
+        """
+        raise NotImplementedError
+
+    def release(self, name: str, owner: str):
+        """Give up a lease if ``owner`` holds it."""
+        raise NotImplementedError
+
+    def holders(self, prefix: str) -> Dict[str, str]:
+        """Return the owners of the unexpired leases whose names start with ``prefix``."""
+        raise NotImplementedError
+
+
+def _lease_available(current: Optional[Dict], owner: str, now: float) -> bool:
+    return current is None or current['owner'] == owner or current['expires'] <= now
+
+
+class FileLeaseBackend(LeaseBackend):
+    """Leases stored as JSON files in a directory, serialized with flock."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._lock_path = os.path.join(directory, '.lock')
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, quote(name, safe='') + '.json')
+
+    def _locked(self):
+        handle = open(self._lock_path, 'a')
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        return handle
+
+    def _read(self, path: str) -> Optional[Dict]:
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def acquire(self, name: str, owner: str, ttl: float) -> bool:
+        with self._locked():
+            path = self._path(name)
+            now = time.time()
+            if not _lease_available(self._read(path), owner, now):
+                return False
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            with open(temp_path, 'w') as f:
+                json.dump({'owner': owner, 'expires': now + ttl}, f)
+            os.replace(temp_path, path)
+            return True
+
+    def release(self, name: str, owner: str):
+        with self._locked():
+            path = self._path(name)
+            current = self._read(path)
+            if current is not None and current['owner'] == owner:
+                os.remove(path)
+
+    def holders(self, prefix: str) -> Dict[str, str]:
+        now = time.time()
+        result = {}
+        with self._locked():
+            for filename in os.listdir(self.directory):
+                if not filename.endswith('.json'):
+                    continue
+                name = unquote(filename[:-len('.json')])
+                if not name.startswith(prefix):
+                    continue
+                current = self._read(os.path.join(self.directory, filename))
+                if current is not None and current['expires'] > now:
+                    result[name] = current['owner']
+        return result
+
+
+class SQLiteLeaseBackend(LeaseBackend):
+    """Leases stored in a SQLite table, serialized with immediate transactions."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with self._connect() as connection:
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS leases (name TEXT PRIMARY KEY, owner TEXT NOT NULL, expires REAL NOT NULL)'
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        # A connection per call keeps the backend usable from any thread
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def acquire(self, name: str, owner: str, ttl: float) -> bool:
+        connection = self._connect()
+        try:
+            connection.execute('BEGIN IMMEDIATE')
+            row = connection.execute('SELECT owner, expires FROM leases WHERE name = ?', (name,)).fetchone()
+            now = time.time()
+            current = {'owner': row[0], 'expires': row[1]} if row else None
+            if not _lease_available(current, owner, now):
+                connection.execute('ROLLBACK')
+                return False
+            connection.execute('INSERT OR REPLACE INTO leases VALUES (?, ?, ?)', (name, owner, now + ttl))
+            connection.execute('COMMIT')
+            return True
+        finally:
+            connection.close()
+
+    def release(self, name: str, owner: str):
+        connection = self._connect()
+        try:
+            connection.execute('DELETE FROM leases WHERE name = ? AND owner = ?', (name, owner))
+        finally:
+            connection.close()
+
+    def holders(self, prefix: str) -> Dict[str, str]:
+        connection = self._connect()
+        try:
+            rows = connection.execute(
+                'SELECT name, owner FROM leases WHERE substr(name, 1, ?) = ? AND expires > ?',
+                (len(prefix), prefix, time.time())
+            ).fetchall()
+        finally:
+            connection.close()
+        return dict(rows)
+
+
+class S3LeaseBackend(LeaseBackend):
+    """Leases stored as S3 objects, taken over with conditional writes.
+
+    A free lease is created with ``If-None-Match: *`` and an expired or own
+    lease is overwritten with ``If-Match: <ETag>``, so when two nodes race for
+    the same lease S3 accepts exactly one write.
+    """
+
+    # Returned when a conditional write loses a race
+    CONFLICT_CODES = ('PreconditionFailed', 'ConditionalRequestConflict', '412', '409')
+
+    def __init__(self, s3_client, bucket: str, prefix: str = 'monitor-leases/'):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.prefix = prefix
+
+    def _get(self, name: str) -> Tuple[Optional[Dict], Optional[str]]:
+        try:
+            response = self.s3_client.get_object(Bucket=self.bucket, Key=self.prefix + name)
+        except self.s3_client.exceptions.NoSuchKey:
+            return None, None
+        return json.loads(response['Body'].read()), response['ETag']
+
+    def _is_conflict(self, error: Exception) -> bool:
+        code = getattr(error, 'response', {}).get('Error', {}).get('Code')
+        return code in self.CONFLICT_CODES
+
+    def acquire(self, name: str, owner: str, ttl: float) -> bool:
+        current, etag = self._get(name)
+        now = time.time()
+        if not _lease_available(current, owner, now):
+            return False
+
+        condition = {'IfMatch': etag} if etag else {'IfNoneMatch': '*'}
+        try:
+            self.s3_client.put_object(
+                Bucket=self.bucket,
+                Key=self.prefix + name,
+                Body=json.dumps({'owner': owner, 'expires': now + ttl}).encode('utf-8'),
+                ContentType='application/json',
+                **condition
+            )
+        except self.s3_client.exceptions.ClientError as e:
+            if self._is_conflict(e):
+                return False
+            raise
+        return True
+
+    def release(self, name: str, owner: str):
+        current, etag = self._get(name)
+        if current is None or current['owner'] != owner:
+            return
+        try:
+            self.s3_client.delete_object(Bucket=self.bucket, Key=self.prefix + name, IfMatch=etag)
+        except self.s3_client.exceptions.ClientError as e:
+            if not self._is_conflict(e):
+                raise
+
+    def holders(self, prefix: str) -> Dict[str, str]:
+        now = time.time()
+        result = {}
+        paginator = self.s3_client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix + prefix):
+            for item in page.get('Contents', []):
+                name = item['Key'][len(self.prefix):]
+                current, _ = self._get(name)
+                if current is not None and current['expires'] > now:
+                    result[name] = current['owner']
+        return result
+
+
+def create_lease_backend(url: str, region: Optional[str] = None) -> LeaseBackend:
+    """Create a lease backend from a file://, sqlite:// or s3:// URL."""
+    parts = urlsplit(url)
+    if parts.scheme == 'file':
+        return FileLeaseBackend(parts.netloc + parts.path)
+    if parts.scheme == 'sqlite':
+        return SQLiteLeaseBackend(parts.netloc + parts.path)
+    if parts.scheme == 's3':
+        if not parts.netloc:
+            raise ValueError(f"S3 lease backend URL needs a bucket: {url}")
+        import boto3
+        prefix = parts.path.lstrip('/')
+        if prefix and not prefix.endswith('/'):
+            prefix += '/'
+        return S3LeaseBackend(boto3.client('s3', region_name=region), parts.netloc, prefix or 'monitor-leases/')
+    raise ValueError(f"Unsupported lease backend URL: {url} (use file://, sqlite:// or s3://)")
+
+
+def _ring_hash(key: str) -> int:
+    return int.from_bytes(hashlib.md5(key.encode('utf-8'), usedforsecurity=False).digest()[:8], 'big')
+
+
+class HashRing:
+    """Consistent hash ring mapping keys to nodes."""
+
+    def __init__(self, nodes: Iterable[str] = (), replicas: int = DEFAULT_RING_REPLICAS):
+        """Build the ring.
+
+        Args:
+            nodes: Node identifiers
+            replicas: Points per node on the ring; more points spread keys more evenly (default: 64)
+        """
+        self.replicas = replicas
+        self.nodes = frozenset(nodes)
+        points = sorted(
+            (_ring_hash(f"{node}#{replica}"), node)
+            for node in self.nodes for replica in range(replicas)
+        )
+        self._hashes = [point for point, _ in points]
+        self._owners = [node for _, node in points]
+
+    def node_for(self, key: str) -> Optional[str]:
+        """Return the node responsible for a key, or None if the ring is empty."""
+        if not self._hashes:
+            return None
+        index = bisect.bisect(self._hashes, _ring_hash(key)) % len(self._hashes)
+        return self._owners[index]
+
+
+class ClusterCoordinator:
+    """Membership, endpoint sharding and remediation leases for one monitor node."""
+
+    def __init__(self, backend: LeaseBackend, node_id: Optional[str] = None,
+                 lease_ttl: float = DEFAULT_LEASE_TTL,
+                 remediation_ttl: float = DEFAULT_REMEDIATION_LEASE_TTL):
+        """Initialize the coordinator.
+
+        Args:
+            backend: Shared lease storage
+            node_id: Unique name of this node (default: <hostname>-<pid>)
+            lease_ttl: Seconds a node stays a member without heartbeating (default: 30)
+            remediation_ttl: Seconds a remediation or instance lease outlives the last heartbeat (default: 120)
+        """
+        self.backend = backend
+        self.node_id = node_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.lease_ttl = lease_ttl
+        self.remediation_ttl = remediation_ttl
+        self.ring = HashRing([self.node_id])
+        # Remediation and instance leases held, renewed by the heartbeat
+        self._held: Set[str] = set()
+        self._held_guard = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def members(self) -> List[str]:
+        return sorted(self.ring.nodes)
+
+    def heartbeat(self):
+        """Renew this node's membership and held leases, and rebuild the ring from the live members."""
+        self.backend.acquire(MEMBER_PREFIX + self.node_id, self.node_id, self.lease_ttl)
+        self._renew_held()
+        members = set(self.backend.holders(MEMBER_PREFIX).values())
+        members.add(self.node_id)
+        if members != self.ring.nodes:
+            logger.info(f"Cluster membership changed: {', '.join(sorted(members))}")
+            self.ring = HashRing(members)
+
+    def _renew_held(self):
+        # Under the guard, so a lease released meanwhile is not taken again
+        with self._held_guard:
+            for name in sorted(self._held):
+                if not self.backend.acquire(name, self.node_id, self.remediation_ttl):
+                    logger.warning(f"Lost lease {name} to another monitor node")
+                    self._held.discard(name)
+
+    def _acquire_held(self, name: str) -> bool:
+        with self._held_guard:
+            acquired = self.backend.acquire(name, self.node_id, self.remediation_ttl)
+            if acquired:
+                self._held.add(name)
+            return acquired
+
+    def _release_held(self, name: str):
+        with self._held_guard:
+            self._held.discard(name)
+            self.backend.release(name, self.node_id)
+
+    def _heartbeat_loop(self):
+        while not self._stop.wait(self.lease_ttl / 3):
+            try:
+                self.heartbeat()
+            except Exception as e:
+                # Keep the last known ring; peers take over our endpoints if this persists
+                logger.error(f"Cluster heartbeat failed: {str(e)}")
+
+    def start(self):
+        """Join the cluster and keep heartbeating from a background thread."""
+        self.heartbeat()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._heartbeat_loop, name='cluster-heartbeat', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop heartbeating and leave the cluster so peers take over at once."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        try:
+            self.backend.release(MEMBER_PREFIX + self.node_id, self.node_id)
+        except Exception as e:
+            logger.error(f"Failed to leave the cluster: {str(e)}")
+
+    def owns(self, key: str) -> bool:
+        """Return True if this node is responsible for an endpoint."""
+        return self.ring.node_for(key) == self.node_id
+
+    def acquire_remediation(self) -> bool:
+        """Take the cluster-wide lease that allows running a rolling restart."""
+        return self._acquire_held(REMEDIATION_LEASE)
+
+    def release_remediation(self):
+        self._release_held(REMEDIATION_LEASE)
+
+    def claim_instances(self, instance_ids: Iterable[str]) -> List[str]:
+        """Lease instances for restarting.
+
+        Returns:
+            The instances this node may restart; the others are held by another node
+        """
+        return [instance_id for instance_id in instance_ids if self._acquire_held(INSTANCE_PREFIX + instance_id)]
+
+    def release_instances(self, instance_ids: Iterable[str]):
+        for instance_id in instance_ids:
+            self._release_held(INSTANCE_PREFIX + instance_id)
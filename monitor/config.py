@@ -0,0 +1,238 @@
+"""
+Config-file loader for the monitoring script.
+
+A config file declares any number of checks, each with its own URL, expected
+content, instance tag selector, failure threshold, interval and timeout, so
+one process can monitor all of them. It is written in YAML, TOML or Python:
+
+YAML (``.yaml``/``.yml``, needs PyYAML) or TOML (``.toml``)::
+
+    defaults:            # applied to every check
+      interval: 10
+      tag: {Role: web-server}
+    monitor:             # monitor-wide options, named like the command line flags
+      remediation_scope: targets
+      max_in_flight: 50
+      failure_threshold: 3
+    checks:
+      - url: https://demo-lb.example.com
+        expect: Deployed via SSM Document
+      - name: api
+        url: https://api.example.com/health
+        expect_regex: '"status":\\s*"ok"'
+        failure_threshold: 3
+        tag: Role=api-server
+
+Python (``.py``): the module defines ``CHECKS``, and optionally ``DEFAULTS``
+and ``MONITOR``, with the same structure.
+
+The monitor options that are also check settings (CHECK_OPTIONS, such as
+``interval`` or ``expect``) apply to every check over ``defaults``, and
+the matching command line flags over both; a check's own settings always win.
+"""
+
+import importlib.util
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from content import ContentMatcher, DEFAULT_MARKER, DEFAULT_MAX_BODY_BYTES
+
+
+DEFAULT_CHECK_INTERVAL = 10
+DEFAULT_CHECK_TIMEOUT = 30
+DEFAULT_TAG = ('Role', 'web-server')
+
+CHECK_KEYS = ('name', 'url', 'interval', 'timeout', 'failure_threshold', 'expect', 'expect_regex',
+              'max_body_bytes', 'tag')
+CONFIG_KEYS = ('defaults', 'monitor', 'checks')
+
+# Monitor options, and command line flags, that also set every check's default
+CHECK_OPTIONS = ('interval', 'timeout', 'failure_threshold', 'expect', 'expect_regex', 'max_body_bytes')
+
+
+class ConfigError(ValueError):
+    """Raised when a config file cannot be read or is invalid."""
+
+
+@dataclass
+class CheckConfig:
+    """One check declared in a config file."""
+    name: str
+    url: str
+    interval: float = DEFAULT_CHECK_INTERVAL
+    timeout: float = DEFAULT_CHECK_TIMEOUT
+    # Unset unless given, so the health policy's threshold applies
+    failure_threshold: Optional[int] = None
+    content_matcher: ContentMatcher = field(default_factory=ContentMatcher)
+    tag_key: str = DEFAULT_TAG[0]
+    tag_value: str = DEFAULT_TAG[1]
+
+
+@dataclass
+class MonitorConfig:
+    """The checks and monitor-wide options loaded from a config file."""
+    path: str
+    checks: List[CheckConfig]
+    options: Dict[str, Any] = field(default_factory=dict)
+
+
+def _read_yaml(path: str) -> Any:
+    try:
+        import yaml
+    except ImportError:
+        raise ConfigError("YAML config files need PyYAML (pip install pyyaml)")
+    with open(path, encoding='utf-8') as f:
+        try:
+            return yaml.safe_load(f)
+        except yaml.YAMLError as e:
+            raise ConfigError(f"{path}: {e}")
+
+
+def _read_toml(path: str) -> Any:
+    try:
+        import tomllib
+    except ImportError:
+        try:
+            import tomli as tomllib
+        except ImportError:
+            raise ConfigError("TOML config files need Python 3.11+ or tomli (pip install tomli)")
+    with open(path, 'rb') as f:
+        try:
+            return tomllib.load(f)
+        except tomllib.TOMLDecodeError as e:
+            raise ConfigError(f"{path}: {e}")
+
+
+def _read_python(path: str) -> Any:
+    # A fresh module every time, so a reload sees the edited file
+    spec = importlib.util.spec_from_file_location('monitor_config', path)
+    module = importlib.util.module_from_spec(spec)
+    try:
+        spec.loader.exec_module(module)
+    except Exception as e:
+        raise ConfigError(f"{path}: {type(e).__name__}: {e}")
+    if not hasattr(module, 'CHECKS'):
+        raise ConfigError(f"{path}: a Python config must define CHECKS")
+    return {
+        'defaults': getattr(module, 'DEFAULTS', {}),
+        'monitor': getattr(module, 'MONITOR', {}),
+        'checks': module.CHECKS,
+    }
+
+
+READERS = {
+    '.yaml': _read_yaml,
+    '.yml': _read_yaml,
+    '.toml': _read_toml,
+    '.py': _read_python,
+}
+
+
+def _as_list(value: Any, key: str) -> List[str]:
+    if isinstance(value, str):
+        return [value]
+    if isinstance(value, (list, tuple)) and all(isinstance(item, str) for item in value):
+        return list(value)
+    raise ConfigError(f"'{key}' must be a string or a list of strings")
+
+
+def _parse_tag(value: Any) -> tuple:
+    """Parse a tag selector given as {Key: Value} or "Key=Value"."""
+    if isinstance(value, dict) and len(value) == 1:
+        key, tag_value = next(iter(value.items()))
+        return str(key), str(tag_value)
+    if isinstance(value, str) and '=' in value:
+        key, tag_value = value.split('=', 1)
+        return key.strip(), tag_value.strip()
+    raise ConfigError(f"'tag' must be a single Key: Value mapping or a \"Key=Value\" string, got {value!r}")
+
+
+def _build_check(entry: Any, defaults: Dict[str, Any], index: int) -> CheckConfig:
+    if isinstance(entry, str):
+        entry = {'url': entry}
+    if not isinstance(entry, dict):
+        raise ConfigError(f"check {index + 1} must be a URL or a mapping")
+    settings = {**defaults, **entry}
+    unknown = sorted(set(settings) - set(CHECK_KEYS))
+    if unknown:
+        raise ConfigError(f"check {index + 1}: unknown key(s) {', '.join(unknown)}")
+
+    url = settings.get('url')
+    if not isinstance(url, str) or not url.startswith(('http://', 'https://')):
+        raise ConfigError(f"check {index + 1}: 'url' must start with http:// or https://")
+    name = str(settings.get('name', url))
+
+    try:
+        markers = _as_list(settings['expect'], 'expect') if 'expect' in settings else []
+        patterns = _as_list(settings['expect_regex'], 'expect_regex') if 'expect_regex' in settings else []
+        # As on the command line, the default marker only applies when no expected content is given
+        if not markers and not patterns:
+            markers = [DEFAULT_MARKER]
+        matcher = ContentMatcher(
+            markers, patterns=patterns, max_bytes=int(settings.get('max_body_bytes', DEFAULT_MAX_BODY_BYTES))
+        )
+        interval = float(settings.get('interval', DEFAULT_CHECK_INTERVAL))
+        timeout = float(settings.get('timeout', DEFAULT_CHECK_TIMEOUT))
+        failure_threshold = int(settings['failure_threshold']) if 'failure_threshold' in settings else None
+    except (TypeError, ValueError, re.error) as e:
+        raise ConfigError(f"check {name}: {e}")
+    if interval <= 0 or timeout <= 0:
+        raise ConfigError(f"check {name}: 'interval' and 'timeout' must be positive")
+    if failure_threshold is not None and failure_threshold < 1:
+        raise ConfigError(f"check {name}: 'failure_threshold' must be at least 1")
+
+    tag_key, tag_value = _parse_tag(settings['tag']) if 'tag' in settings else DEFAULT_TAG
+    return CheckConfig(
+        name=name, url=url, interval=interval, timeout=timeout, failure_threshold=failure_threshold,
+        content_matcher=matcher, tag_key=tag_key, tag_value=tag_value
+    )
+
+
+def load_config(path: str, overrides: Optional[Dict[str, Any]] = None) -> MonitorConfig:
+    """Load and validate a config file.
+
+    Args:
+        path: The config file
+        overrides: Check settings given as command line flags, applied to every check over the file's own
+            defaults and monitor options
+
+    Raises:
+        ConfigError: If the file cannot be read or declares invalid checks
+    """
+    extension = os.path.splitext(path)[1].lower()
+    reader = READERS.get(extension)
+    if reader is None:
+        raise ConfigError(f"{path}: unsupported config format; use {', '.join(sorted(READERS))}")
+    try:
+        data = reader(path)
+    except OSError as e:
+        raise ConfigError(f"{path}: {e.strerror}")
+
+    if not isinstance(data, dict):
+        raise ConfigError(f"{path}: expected a mapping with a 'checks' list")
+    unknown = sorted(set(data) - set(CONFIG_KEYS))
+    if unknown:
+        raise ConfigError(f"{path}: unknown section(s) {', '.join(unknown)}")
+    defaults = data.get('defaults') or {}
+    options = data.get('monitor') or {}
+    entries = data.get('checks') or []
+    if not isinstance(defaults, dict) or not isinstance(options, dict):
+        raise ConfigError(f"{path}: 'defaults' and 'monitor' must be mappings")
+    if not isinstance(entries, (list, tuple)) or not entries:
+        raise ConfigError(f"{path}: 'checks' must be a non-empty list")
+
+    defaults = {**defaults, **{key: options[key] for key in CHECK_OPTIONS if key in options}, **(overrides or {})}
+    checks = [_build_check(entry, defaults, index) for index, entry in enumerate(entries)]
+    names = [check.name for check in checks]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ConfigError(f"{path}: duplicate check name(s) {', '.join(duplicates)}")
+    # Probe state, metrics, inventory and cluster ownership are all kept per URL
+    urls = [check.url for check in checks]
+    duplicates = sorted({url for url in urls if urls.count(url) > 1})
+    if duplicates:
+        raise ConfigError(f"{path}: more than one check of {', '.join(duplicates)}")
+    return MonitorConfig(path=path, checks=checks, options=dict(options))
+
@@ -20,16 +20,51 @@ AWS_CONFIG = {
 MONITORING_CONFIG = {
     "timeout": 30,  # HTTP request timeout in seconds
     "check_interval": 10,  # Default check interval
-    "max_restart_attempts": 3,  # Maximum restart attempts per cycle
-    "restart_cooldown": 300,  # Seconds to wait before allowing another restart
+    "max_restart_attempts": 3,  # Restarts allowed per instance per hour (--max-restart-attempts)
+    "restart_cooldown": 300,  # Seconds after a remediation before another may start (--restart-cooldown)
+    "max_restarts_per_hour": 20,  # Instance restarts allowed per hour across the fleet (--max-restarts-per-hour)
+    "breaker_threshold": 3,  # Consecutive failed restarts that pause remediation (--breaker-threshold)
+    "breaker_reset": 1800,  # Seconds remediation stays paused before a trial restart (--breaker-reset)
+    "remediation_steps": "restart-nginx,rerun-document,reboot,stop-start",  # Cheapest first (--remediation-steps)
+    "step_timeout": 180,  # Seconds a step gets to fix an instance before escalating (--step-timeout)
+    "failure_ratio": 0.3,  # Remediate once 30% of the last window probes failed (--failure-ratio)
+    "window": 20,  # Recent probes considered by the failure ratio and latency SLO (--window)
+    "latency_slo": 2.0,  # Remediate once p95 latency over the window exceeds this many seconds (--latency-slo)
+    "deep_probe_concurrency": 20,  # Web servers probed directly at once with --deep-probe (--deep-probe-concurrency)
+    "dns_cache_ttl": 60,  # Seconds resolved addresses are cached when DNS gives no TTL (--dns-cache-ttl)
 }
 
+# Config-file mode: python monitor.py --config config_example.py
+# The monitor reads CHECKS, DEFAULTS and MONITOR; kill -HUP <pid> reloads CHECKS.
+DEFAULTS = {
+    "interval": BASIC_EXAMPLES["custom_interval"],
+    "timeout": MONITORING_CONFIG["timeout"],
+    "failure_threshold": AWS_CONFIG["consecutive_failure_threshold"],
+    "tag": {AWS_CONFIG["target_tag_key"]: AWS_CONFIG["target_tag_value"]},
+}
+
+# Monitor-wide options, named like the command line flags (which override them)
+MONITOR = {
+    key: MONITORING_CONFIG[key]
+    for key in ("max_restart_attempts", "restart_cooldown", "max_restarts_per_hour",
+                "breaker_threshold", "breaker_reset", "remediation_steps", "step_timeout",
+                "failure_ratio", "window", "latency_slo")
+}
+
+CHECKS = [
+    {"name": "demo-https", "url": BASIC_EXAMPLES["https_endpoint"], "expect": "Deployed via SSM Document"},
+    {"name": "demo-http", "url": BASIC_EXAMPLES["http_endpoint"], "interval": 60, "failure_threshold": 3},
+]
+
 # Logging configuration
 LOGGING_CONFIG = {
     "level": "INFO",  # DEBUG, INFO, WARNING, ERROR
-    "log_file": "monitor.log",
+    "log_file": "monitor.log",  # Written by a background thread (--log-file)
     "console_output": True,
-    "log_format": "%(asctime)s - %(levelname)s - %(message)s"
+    "log_format": "%(asctime)s - %(levelname)s - %(message)s",  # Or one JSON object per line with --log-format json
+    "log_max_bytes": 10 * 1024 * 1024,  # Rotate at this size (--log-max-bytes), or on a schedule (--log-rotate-when)
+    "log_backups": 5,  # Rotated files kept (--log-backups)
+    "log_sample": 1,  # Log every Nth healthy probe per endpoint (--log-sample)
 }
 
 # Example usage patterns:
@@ -49,5 +84,32 @@ LOGGING_CONFIG = {
 # 5. Run with debug logging
 # Set logging level to DEBUG in monitor.py for detailed output
 
-# 6. Test with integration test
+# 6. Monitor every check declared in this file from one process
+# python monitor.py --config config_example.py
+
+# 7. Test with integration test
 # python test_monitor.py --integration
+
+# 8. Monitor web servers in two regions of another account
+# python monitor.py https://app.example.com --regions us-east-1,eu-west-1 --assume-role arn:aws:iam::111111111111:role/health-monitor
+
+# 9. One-shot check for cron or a liveness hook (exit status 0 if healthy, 1 if not)
+# python monitor.py --once https://demo-lb-123456789.us-east-2.elb.amazonaws.com
+
+# 10. Remediate endpoints that flap or slow down, not only ones that fail twice in a row
+# python monitor.py https://your-endpoint.com --failure-ratio 0.3 --window 30 --latency-slo 0.8
+
+# 11. JSON-lines logs rotated at midnight, with one in ten healthy probes logged
+# python monitor.py https://your-endpoint.com --log-format json --log-rotate-when midnight --log-sample 10
+
+# 12. Probe every web server directly each round and restart only the failing ones
+# python monitor.py https://your-endpoint.com --deep-probe --remediation-scope targets
+
+# 13. Probe every ALB node (one or more per availability zone) each round
+# python monitor.py https://demo-lb-123456789.us-east-2.elb.amazonaws.com --node-probe
+
+# 14. Check the page, a static asset and an API route over one HTTP/2 connection (pip install 'httpx[http2]')
+# python monitor.py https://your-endpoint.com --path '/=Deployed via SSM Document' --path /static/app.css --path '/api/health="ok"'
+
+# 15. Replace instances that a reboot did not fix, launching each replacement before terminating the failed one
+# python monitor.py https://your-endpoint.com --target-group-arn arn:aws:elasticloadbalancing:us-east-2:123456789012:targetgroup/web/0123456789abcdef --remediation-steps rerun-document,reboot,replace
@@ -0,0 +1,136 @@
+"""
+Streaming content validation for health probes.
+
+Instead of downloading and decoding a whole response body, the matcher reads
+it chunk by chunk, checks every expected marker and pattern in a single pass,
+stops as soon as all of them have been found and gives up once a byte limit
+has been read.
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import Iterable, List, Pattern, Sequence, Set, Union
+
+
+DEFAULT_MARKER = "Deployed via SSM Document"
+DEFAULT_MAX_BODY_BYTES = 1024 * 1024
+DEFAULT_CHUNK_SIZE = 16 * 1024
+
+# Bytes of earlier data kept for regexes, so matches spanning chunk boundaries are found
+DEFAULT_REGEX_WINDOW = 4096
+
+
+@dataclass
+class MatchResult:
+    """Outcome of matching a response body."""
+    matched: bool
+    missing: List[str] = field(default_factory=list)
+    bytes_read: int = 0
+    truncated: bool = False
+
+
+class ContentMatcher:
+    """Match literal markers and regexes against a streamed body in one pass.
+
+    Every marker and pattern must be found for the body to match. Literal
+    markers are matched exactly across chunk boundaries; a regex match is
+    found across a boundary as long as it is no longer than ``regex_window``
+    bytes.
+    """
+
+    def __init__(self, markers: Sequence[str] = (DEFAULT_MARKER,),
+                 patterns: Sequence[Union[str, Pattern]] = (),
+                 max_bytes: int = DEFAULT_MAX_BODY_BYTES,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 regex_window: int = DEFAULT_REGEX_WINDOW):
+        """Initialize the matcher.
+
+        Args:
+            markers: Literal strings the body must contain (UTF-8 encoded)
+            patterns: Regexes the body must match, as strings or compiled bytes patterns
+            max_bytes: Stop reading and fail after this many bytes (default: 1 MiB)
+            chunk_size: Bytes requested per read (default: 16 KiB)
+            regex_window: Bytes of earlier data kept for regex matching (default: 4096)
+        """
+        if not markers and not patterns:
+            raise ValueError("At least one marker or pattern is required")
+        if max_bytes < 1:
+            raise ValueError("max_bytes must be at least 1")
+
+        self.markers = [marker.encode('utf-8') for marker in markers]
+        self.patterns = [
+            pattern if isinstance(pattern, re.Pattern) else re.compile(pattern.encode('utf-8'))
+            for pattern in patterns
+        ]
+        for pattern in self.patterns:
+            if not isinstance(pattern.pattern, bytes):
+                raise ValueError(f"Compiled patterns must be bytes patterns: {pattern.pattern!r}")
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size
+        self.regex_window = regex_window
+
+        # Literal markers only need enough overlap to span one boundary
+        self._marker_overlap = max((len(marker) for marker in self.markers), default=1) - 1
+
+    def describe(self) -> str:
+        """Describe what the matcher looks for, for log messages."""
+        names = [repr(marker.decode('utf-8')) for marker in self.markers]
+        names += [f"/{pattern.pattern.decode('utf-8', errors='replace')}/" for pattern in self.patterns]
+        return ', '.join(names)
+
+    def match_stream(self, chunks: Iterable[bytes]) -> MatchResult:
+        """Match a body delivered as an iterable of byte chunks.
+
+        Reading stops as soon as everything has been found, or once
+        ``max_bytes`` have been read.
+        """
+        pending_markers: Set[int] = set(range(len(self.markers)))
+        pending_patterns: Set[int] = set(range(len(self.patterns)))
+        tail = b''
+        bytes_read = 0
+
+        for chunk in chunks:
+            if not chunk:
+                continue
+            # Never look at (or count) more than the limit
+            chunk = chunk[:self.max_bytes - bytes_read]
+            bytes_read += len(chunk)
+            data = tail + chunk
+
+            for index in list(pending_markers):
+                if self.markers[index] in data:
+                    pending_markers.discard(index)
+            for index in list(pending_patterns):
+                if self.patterns[index].search(data):
+                    pending_patterns.discard(index)
+
+            if not pending_markers and not pending_patterns:
+                return MatchResult(matched=True, bytes_read=bytes_read)
+            if bytes_read >= self.max_bytes:
+                return MatchResult(
+                    matched=False,
+                    missing=self._missing(pending_markers, pending_patterns),
+                    bytes_read=bytes_read,
+                    truncated=True
+                )
+
+            overlap = max(
+                self._marker_overlap if pending_markers else 0,
+                self.regex_window if pending_patterns else 0
+            )
+            tail = data[-overlap:] if overlap else b''
+
+        return MatchResult(
+            matched=False,
+            missing=self._missing(pending_markers, pending_patterns),
+            bytes_read=bytes_read
+        )
+
+    def match_text(self, text: str) -> MatchResult:
+        """Match an already-decoded body."""
+        return self.match_stream([text.encode('utf-8')])
+
+    def _missing(self, markers: Set[int], patterns: Set[int]) -> List[str]:
+        missing = [self.markers[index].decode('utf-8') for index in sorted(markers)]
+        missing += [self.patterns[index].pattern.decode('utf-8', errors='replace') for index in sorted(patterns)]
+        return missing
@@ -0,0 +1,182 @@
+"""
+DNS resolution cache for the monitoring script.
+
+Without a cache every new probe connection resolves the endpoint's name
+again. ``DNSCache`` keeps the addresses of each name for as long as their
+DNS records allow: the record TTL when dnspython is installed, and
+``default_ttl`` when names are resolved through the system resolver, which
+does not report TTLs. Concurrent lookups of the same name share one query.
+
+The ALB's DNS name resolves to one or more addresses per availability zone;
+``resolve`` returns all of them, so each ALB node can be probed on its own.
+``rotate`` returns them starting from the next one in turn, so new
+connections spread across the nodes and can fail over to the others.
+"""
+
+import ipaddress
+import socket
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+# ALB DNS records are published with a 60 second TTL
+DEFAULT_DNS_TTL = 60.0
+
+# Floor applied to record TTLs, so a name about to expire is not re-queried on every probe
+MIN_DNS_TTL = 1.0
+
+
+def is_ip_address(host: str) -> bool:
+    """Return whether a host is an IP address literal rather than a name."""
+    try:
+        ipaddress.ip_address(host.strip('[]'))
+    except ValueError:
+        return False
+    return True
+
+
+class _Lookup:
+    """A resolution in progress, waited on by every thread that needs the same name."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.addresses: Optional[List[str]] = None
+        self.error: Optional[Exception] = None
+
+
+class DNSCache:
+    """Addresses of host names, kept until their DNS records expire."""
+
+    def __init__(self, default_ttl: float = DEFAULT_DNS_TTL, max_ttl: Optional[float] = None,
+                 use_dnspython: bool = True, clock: Callable[[], float] = time.monotonic):
+        """Initialize the cache.
+
+        Args:
+            default_ttl: Seconds addresses are kept when the resolver gives no TTL (default: 60)
+            max_ttl: Longest time addresses are kept, whatever their TTL (default: no limit)
+            use_dnspython: Query DNS with dnspython, when installed, to honor record TTLs (default: True)
+            clock: Monotonic clock, replaceable in tests
+        """
+        if default_ttl <= 0:
+            raise ValueError("DNS cache TTL must be positive")
+        self.default_ttl = default_ttl
+        self.max_ttl = max_ttl
+        self.clock = clock
+        self._resolver = self._create_resolver() if use_dnspython else None
+        self._entries: Dict[str, Tuple[List[str], float]] = {}
+        self._lookups: Dict[str, _Lookup] = {}
+        # How many times each name's addresses were rotated
+        self._turns: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0}
+
+    @staticmethod
+    def _create_resolver():
+        try:
+            import dns.resolver
+        except ImportError:
+            return None
+        try:
+            return dns.resolver.Resolver()
+        except Exception:
+            # No usable resolv.conf; the system resolver still works
+            return None
+
+    def resolve(self, host: str) -> List[str]:
+        """Return the addresses of a host name, from the cache while they are fresh.
+
+        Raises:
+            socket.gaierror: If the name does not resolve
+        """
+        if is_ip_address(host):
+            return [host.strip('[]')]
+        key = host.lower()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > self.clock():
+                self.stats['hits'] += 1
+                return list(entry[0])
+            self.stats['misses'] += 1
+            lookup = self._lookups.get(key)
+            owner = lookup is None
+            if owner:
+                lookup = self._lookups[key] = _Lookup()
+
+        if not owner:
+            lookup.done.wait()
+            if lookup.error is not None:
+                raise lookup.error
+            return list(lookup.addresses)
+
+        try:
+            addresses, ttl = self._query(host)
+            if self.max_ttl is not None:
+                ttl = min(ttl, self.max_ttl)
+            with self._lock:
+                self._entries[key] = (addresses, self.clock() + max(ttl, MIN_DNS_TTL))
+            lookup.addresses = addresses
+            return list(addresses)
+        except Exception as e:
+            # Failures are not cached, so the next probe asks again
+            lookup.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._lookups[key]
+            lookup.done.set()
+
+    def rotate(self, host: str) -> List[str]:
+        """Return the addresses of a host name, starting from the one after the last call's first.
+
+        Raises:
+            socket.gaierror: If the name does not resolve
+        """
+        addresses = self.resolve(host)
+        if len(addresses) < 2:
+            return addresses
+        with self._lock:
+            turn = self._turns.get(host.lower(), 0)
+            self._turns[host.lower()] = turn + 1
+        start = turn % len(addresses)
+        return addresses[start:] + addresses[:start]
+
+    def _query(self, host: str) -> Tuple[List[str], float]:
+        """Resolve a name, returning its addresses and how long they may be kept."""
+        if self._resolver is not None:
+            result = self._query_dnspython(host)
+            if result is not None:
+                return result
+        try:
+            infos = socket.getaddrinfo(host, None, 0, socket.SOCK_STREAM)
+        except UnicodeError as e:
+            raise socket.gaierror(str(e))
+        addresses = list(dict.fromkeys(info[4][0] for info in infos))
+        return addresses, self.default_ttl
+
+    def _query_dnspython(self, host: str) -> Optional[Tuple[List[str], float]]:
+        """Query A and AAAA records, or return None to fall back to the system resolver."""
+        import dns.exception
+
+        addresses: List[str] = []
+        ttls: List[float] = []
+        for record_type in ('A', 'AAAA'):
+            try:
+                answer = self._resolver.resolve(host, record_type, search=True)
+            except dns.exception.DNSException:
+                continue
+            addresses.extend(record.address for record in answer)
+            ttls.append(answer.rrset.ttl)
+        if not addresses:
+            # Names only in /etc/hosts, or a resolver dnspython cannot reach
+            return None
+        return list(dict.fromkeys(addresses)), min(ttls)
+
+    def invalidate(self, host: str):
+        """Forget a name's addresses, as after connecting to one of them failed."""
+        with self._lock:
+            self._entries.pop(host.lower(), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,307 @@
+"""
+Health evaluation for the monitoring script.
+
+An evaluator turns the stream of probe outcomes of one endpoint into the
+decision to remediate it. Every evaluator is updated incrementally, in
+constant time per probe whatever its window size, so thousands of endpoints
+stay cheap to evaluate:
+
+- ConsecutiveFailures: the last N probes all failed (the default, N=2)
+- FailureRatio: at least a fraction of the last W probes failed, which also
+  catches an endpoint flapping between healthy and failed
+- LatencySLO: a latency percentile over the last W probes exceeds an SLO
+- EWMALatency: the exponentially weighted moving average latency exceeds a
+  threshold
+
+A HealthPolicy describes which of them apply and creates one evaluator per
+endpoint. Subclass HealthPolicy and override ``create`` to plug in another.
+"""
+
+import math
+from dataclasses import dataclass
+from typing import List, Optional, Sequence
+
+
+DEFAULT_FAILURE_THRESHOLD = 2
+DEFAULT_WINDOW = 20
+DEFAULT_LATENCY_PERCENTILE = 0.95
+DEFAULT_EWMA_ALPHA = 0.2
+
+
+class RingWindow:
+    """The most recent ``size`` values, overwriting the oldest in constant time."""
+
+    __slots__ = ('size', 'count', '_values', '_next')
+
+    def __init__(self, size: int):
+        if size < 1:
+            raise ValueError("window size must be at least 1")
+        self.size = size
+        self.count = 0
+        self._values: List = [None] * size
+        self._next = 0
+
+    def push(self, value):
+        """Add a value and return the one it pushed out of a full window, or None."""
+        evicted = self._values[self._next] if self.count == self.size else None
+        self._values[self._next] = value
+        self._next = (self._next + 1) % self.size
+        if self.count < self.size:
+            self.count += 1
+        return evicted
+
+    def values(self) -> List:
+        """Return the values in the window, oldest first."""
+        if self.count < self.size:
+            return self._values[:self.count]
+        return self._values[self._next:] + self._values[:self._next]
+
+    def clear(self):
+        self._values = [None] * self.size
+        self.count = 0
+        self._next = 0
+
+
+class HealthEvaluator:
+    """Decide from an endpoint's probe outcomes, one at a time, whether it needs remediation."""
+
+    def observe(self, healthy: bool, latency: Optional[float] = None) -> Optional[str]:
+        """Record one probe.
+
+        Args:
+            healthy: Whether the probe passed
+            latency: Seconds the probe took, if known
+
+        Returns:
+            Why the endpoint needs remediation, or None if it does not
+        """
+        raise NotImplementedError
+
+    def reset(self):
+        """Forget every probe, as after remediation was triggered."""
+        raise NotImplementedError
+
+    def restore(self, failures: int):
+        """Replay failed probes recorded before a restart, without acting on them."""
+        for _ in range(failures):
+            self.observe(False)
+
+    def describe(self) -> str:
+        """Return a one-line summary for logging."""
+        raise NotImplementedError
+
+
+class ConsecutiveFailures(HealthEvaluator):
+    """Remediate once ``threshold`` probes in a row have failed."""
+
+    def __init__(self, threshold: int = DEFAULT_FAILURE_THRESHOLD):
+        if threshold < 1:
+            raise ValueError("failure threshold must be at least 1")
+        self.threshold = threshold
+        self.failures = 0
+
+    def observe(self, healthy: bool, latency: Optional[float] = None) -> Optional[str]:
+        if healthy:
+            self.failures = 0
+            return None
+        self.failures += 1
+        if self.failures >= self.threshold:
+            return f"{self.failures} consecutive failures"
+        return None
+
+    def reset(self):
+        self.failures = 0
+
+    def describe(self) -> str:
+        return f"{self.threshold} consecutive failures"
+
+
+class FailureRatio(HealthEvaluator):
+    """Remediate once at least ``ratio`` of the last ``window`` probes have failed."""
+
+    def __init__(self, ratio: float, window: int = DEFAULT_WINDOW, min_samples: Optional[int] = None):
+        """Initialize the evaluator.
+
+        Args:
+            ratio: Fraction of failed probes that calls for remediation, above 0 and at most 1
+            window: Number of recent probes considered (default: 20)
+            min_samples: Probes needed before deciding (default: half the window)
+        """
+        if not 0 < ratio <= 1:
+            raise ValueError("failure ratio must be above 0 and at most 1")
+        self.ratio = ratio
+        self.min_samples = min(window, min_samples or max(1, window // 2))
+        self._window = RingWindow(window)
+        self.failures = 0
+
+    def observe(self, healthy: bool, latency: Optional[float] = None) -> Optional[str]:
+        evicted = self._window.push(healthy)
+        if evicted is False:
+            self.failures -= 1
+        if not healthy:
+            self.failures += 1
+        count = self._window.count
+        if count >= self.min_samples and self.failures >= self.ratio * count:
+            return f"{self.failures} of the last {count} probes failed"
+        return None
+
+    def reset(self):
+        self._window.clear()
+        self.failures = 0
+
+    def describe(self) -> str:
+        return f"{self.ratio:.0%} of the last {self._window.size} probes failed"
+
+
+class LatencySLO(HealthEvaluator):
+    """Remediate once a latency percentile over the last ``window`` probes exceeds ``slo`` seconds.
+
+    The percentile (nearest rank) of n latencies exceeds the SLO exactly when
+    more than ``n - ceil(percentile * n)`` of them do, so only the count of slow
+    probes has to be kept up to date; the percentile itself is computed only
+    to report a breach.
+    """
+
+    def __init__(self, slo: float, percentile: float = DEFAULT_LATENCY_PERCENTILE, window: int = DEFAULT_WINDOW,
+                 min_samples: Optional[int] = None):
+        """Initialize the evaluator.
+
+        Args:
+            slo: Latency objective in seconds
+            percentile: Percentile held to the objective, between 0 and 1 (default: 0.95)
+            window: Number of recent probes considered (default: 20)
+            min_samples: Probes needed before deciding (default: half the window)
+        """
+        if slo <= 0:
+            raise ValueError("latency SLO must be positive")
+        if not 0 < percentile < 1:
+            raise ValueError("latency percentile must be between 0 and 1")
+        self.slo = slo
+        self.percentile = percentile
+        self.min_samples = min(window, min_samples or max(1, window // 2))
+        self._window = RingWindow(window)
+        self.slow = 0
+
+    def observe(self, healthy: bool, latency: Optional[float] = None) -> Optional[str]:
+        if latency is None:
+            return None
+        evicted = self._window.push(latency)
+        if evicted is not None and evicted > self.slo:
+            self.slow -= 1
+        if latency > self.slo:
+            self.slow += 1
+        count = self._window.count
+        if count >= self.min_samples and self.slow > count - math.ceil(self.percentile * count):
+            value = sorted(self._window.values())[math.ceil(self.percentile * count) - 1]
+            return (f"p{self.percentile * 100:g} latency {value:.3f}s over the last {count} probes "
+                    f"exceeds the {self.slo:g}s SLO")
+        return None
+
+    def reset(self):
+        self._window.clear()
+        self.slow = 0
+
+    def describe(self) -> str:
+        return f"p{self.percentile * 100:g} latency over the last {self._window.size} probes above {self.slo:g}s"
+
+
+class EWMALatency(HealthEvaluator):
+    """Remediate once the exponentially weighted moving average latency exceeds ``threshold`` seconds."""
+
+    def __init__(self, threshold: float, alpha: float = DEFAULT_EWMA_ALPHA, min_samples: int = 5):
+        """Initialize the evaluator.
+
+        Args:
+            threshold: Average latency in seconds that calls for remediation
+            alpha: Weight of the newest probe, between 0 and 1; higher reacts faster (default: 0.2)
+            min_samples: Probes needed before deciding (default: 5)
+        """
+        if threshold <= 0:
+            raise ValueError("EWMA latency threshold must be positive")
+        if not 0 < alpha <= 1:
+            raise ValueError("EWMA alpha must be above 0 and at most 1")
+        self.threshold = threshold
+        self.alpha = alpha
+        self.min_samples = max(1, min_samples)
+        self.average: Optional[float] = None
+        self.samples = 0
+
+    def observe(self, healthy: bool, latency: Optional[float] = None) -> Optional[str]:
+        if latency is None:
+            return None
+        if self.average is None:
+            self.average = latency
+        else:
+            self.average += self.alpha * (latency - self.average)
+        self.samples += 1
+        if self.samples >= self.min_samples and self.average > self.threshold:
+            return f"average latency {self.average:.3f}s exceeds {self.threshold:g}s"
+        return None
+
+    def reset(self):
+        self.average = None
+        self.samples = 0
+
+    def describe(self) -> str:
+        return f"average latency (alpha {self.alpha:g}) above {self.threshold:g}s"
+
+
+class CompositeEvaluator(HealthEvaluator):
+    """Remediate when any of several evaluators calls for it; all of them see every probe."""
+
+    def __init__(self, evaluators: Sequence[HealthEvaluator]):
+        if not evaluators:
+            raise ValueError("at least one evaluator is required")
+        self.evaluators = list(evaluators)
+
+    def observe(self, healthy: bool, latency: Optional[float] = None) -> Optional[str]:
+        reasons = [evaluator.observe(healthy, latency) for evaluator in self.evaluators]
+        return next((reason for reason in reasons if reason is not None), None)
+
+    def reset(self):
+        for evaluator in self.evaluators:
+            evaluator.reset()
+
+    def describe(self) -> str:
+        return ' or '.join(evaluator.describe() for evaluator in self.evaluators)
+
+
+@dataclass
+class HealthPolicy:
+    """Which evaluators decide that an endpoint needs remediation.
+
+    Failures are judged by a ratio over the window when ``failure_ratio`` is
+    set, and by consecutive failures otherwise. The latency checks are added
+    when their thresholds are set.
+    """
+    failure_threshold: int = DEFAULT_FAILURE_THRESHOLD
+    failure_ratio: Optional[float] = None
+    window: int = DEFAULT_WINDOW
+    latency_slo: Optional[float] = None
+    latency_percentile: float = DEFAULT_LATENCY_PERCENTILE
+    ewma_threshold: Optional[float] = None
+    ewma_alpha: float = DEFAULT_EWMA_ALPHA
+
+    def __post_init__(self):
+        # Build one evaluator up front so invalid settings are reported at startup
+        self.create()
+
+    def create(self, failure_threshold: Optional[int] = None) -> HealthEvaluator:
+        """Create the evaluator for one endpoint.
+
+        Args:
+            failure_threshold: The endpoint's own consecutive failure threshold (default: the policy's)
+        """
+        if self.failure_ratio is not None:
+            evaluators = [FailureRatio(self.failure_ratio, self.window)]
+        else:
+            evaluators = [ConsecutiveFailures(failure_threshold or self.failure_threshold)]
+        if self.latency_slo is not None:
+            evaluators.append(LatencySLO(self.latency_slo, self.latency_percentile, self.window))
+        if self.ewma_threshold is not None:
+            evaluators.append(EWMALatency(self.ewma_threshold, self.ewma_alpha))
+        return evaluators[0] if len(evaluators) == 1 else CompositeEvaluator(evaluators)
+
+    def describe(self) -> str:
+        """Return a one-line summary for logging."""
+        return self.create().describe()
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Replayable probe history for the monitoring script.
+
+Every probe outcome is appended as a fixed-size binary record to a
+memory-mapped ring buffer file, so the file never grows past its configured
+capacity. The monitor reloads its consecutive failure counts from the file at
+startup, and windowed latency percentiles can be queried without parsing logs.
+Records are written in time order, so time-bounded queries scan backwards
+from the newest record and stop at the first one that is too old.
+
+File layout (little-endian):
+    header: magic b'PHST', version (u16), record size (u16), capacity (u32),
+            records written (u64), padded to 64 bytes
+    records: capacity x (timestamp f64, endpoint CRC-32 u32, HTTP status u16,
+             latency in seconds f32, flags u8, padding u8)
+
+Usage:
+    python history.py <history_file> <endpoint_url> [--window SECONDS] [--periods N]
+"""
+
+import argparse
+import math
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence
+
+
+DEFAULT_HISTORY_CAPACITY = 100_000
+
+MAGIC = b'PHST'
+VERSION = 1
+HEADER = struct.Struct('<4sHHIQ')
+HEADER_SIZE = 64
+RECORD = struct.Struct('<dIHfBx')
+
+# Record flags
+FLAG_HEALTHY = 0x01
+FLAG_MATCHED = 0x02
+FLAG_REMEDIATION = 0x04  # Marker: remediation was triggered and the failure count reset
+
+DEFAULT_PERCENTILES = (50, 90, 95, 99)
+
+
+def endpoint_key(endpoint: str) -> int:
+    """Return the 32-bit key an endpoint is stored under."""
+    return zlib.crc32(endpoint.encode('utf-8'))
+
+
+class ProbeRecord(NamedTuple):
+    """One stored probe outcome."""
+    timestamp: float
+    endpoint_key: int
+    status: int
+    latency: float
+    healthy: bool
+    matched: bool
+    remediation: bool
+
+
+@dataclass
+class WindowStats:
+    """Latency and failure statistics for one time window."""
+    start: float
+    end: float
+    count: int
+    failures: int
+    percentiles: Dict[int, float]
+
+
+def _percentile(sorted_values: Sequence[float], percentile: float) -> float:
+    """Nearest-rank percentile of an already sorted sequence."""
+    if not sorted_values:
+        return math.nan
+    rank = max(1, math.ceil(percentile / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class ProbeHistory:
+    """Fixed-capacity, memory-mapped ring buffer of probe outcomes."""
+
+    def __init__(self, path: str, capacity: int = DEFAULT_HISTORY_CAPACITY):
+        """Open or create a history file.
+
+        An existing file keeps the capacity it was created with.
+
+        Args:
+            path: File to store the history in
+            capacity: Number of records kept before the oldest are overwritten (default: 100000)
+        """
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, 'a+b')
+        try:
+            self._file.seek(0, os.SEEK_END)
+            if self._file.tell() == 0:
+                self._initialize(capacity)
+            self._map = mmap.mmap(self._file.fileno(), 0)
+            magic, version, record_size, self.capacity, self._written = HEADER.unpack_from(self._map, 0)
+            if magic != MAGIC or version != VERSION or record_size != RECORD.size:
+                raise ValueError(f"{path} is not a version {VERSION} probe history file")
+            if len(self._map) < HEADER_SIZE + self.capacity * RECORD.size:
+                raise ValueError(f"{path} is truncated")
+        except Exception:
+            self._file.close()
+            raise
+
+    def _initialize(self, capacity: int):
+        self._file.write(HEADER.pack(MAGIC, VERSION, RECORD.size, capacity, 0).ljust(HEADER_SIZE, b'\0'))
+        self._file.truncate(HEADER_SIZE + capacity * RECORD.size)
+        self._file.flush()
+
+    def __len__(self) -> int:
+        return min(self._written, self.capacity)
+
+    def close(self):
+        """Flush and close the history file."""
+        with self._lock:
+            if not self._map.closed:
+                self._map.flush()
+                self._map.close()
+            self._file.close()
+
+    def append(self, endpoint: str, status: int, latency: float, healthy: bool, matched: bool,
+               remediation: bool = False, timestamp: Optional[float] = None):
+        """Append a probe outcome, overwriting the oldest record when full.
+
+        Args:
+            endpoint: URL that was probed
+            status: HTTP status code (0 if no response was received)
+            latency: Probe duration in seconds
+            healthy: Whether the probe passed
+            matched: Whether the expected content was found
+            remediation: Record a remediation marker instead of a probe
+            timestamp: Epoch seconds (default: now)
+        """
+        flags = (FLAG_HEALTHY if healthy else 0) | (FLAG_MATCHED if matched else 0) | \
+            (FLAG_REMEDIATION if remediation else 0)
+        with self._lock:
+            slot = self._written % self.capacity
+            RECORD.pack_into(
+                self._map, HEADER_SIZE + slot * RECORD.size,
+                timestamp if timestamp is not None else time.time(),
+                endpoint_key(endpoint), min(max(status, 0), 0xFFFF), latency, flags
+            )
+            # Publish the record only after it is fully written
+            self._written += 1
+            struct.pack_into('<Q', self._map, HEADER.size - 8, self._written)
+
+    def mark_remediation(self, endpoint: str, timestamp: Optional[float] = None):
+        """Record that remediation was triggered for an endpoint, resetting its failure count."""
+        self.append(endpoint, 0, 0.0, healthy=False, matched=False, remediation=True, timestamp=timestamp)
+
+    def _read(self, index: int) -> ProbeRecord:
+        timestamp, key, status, latency, flags = RECORD.unpack_from(
+            self._map, HEADER_SIZE + (index % self.capacity) * RECORD.size
+        )
+        return ProbeRecord(
+            timestamp, key, status, latency,
+            bool(flags & FLAG_HEALTHY), bool(flags & FLAG_MATCHED), bool(flags & FLAG_REMEDIATION)
+        )
+
+    def reverse_records(self, endpoint: Optional[str] = None) -> Iterator[ProbeRecord]:
+        """Yield stored records newest first, optionally for one endpoint only."""
+        key = endpoint_key(endpoint) if endpoint is not None else None
+        with self._lock:
+            newest = self._written
+        oldest = max(0, newest - self.capacity)
+        for index in range(newest - 1, oldest - 1, -1):
+            record = self._read(index)
+            if key is None or record.endpoint_key == key:
+                yield record
+
+    def records(self, endpoint: Optional[str] = None, since: Optional[float] = None) -> List[ProbeRecord]:
+        """Return stored records oldest first, optionally for one endpoint and after a time."""
+        result = []
+        for record in self.reverse_records(endpoint):
+            if since is not None and record.timestamp < since:
+                break
+            result.append(record)
+        result.reverse()
+        return result
+
+    def consecutive_failures(self, endpoint: str) -> int:
+        """Return the endpoint's failure count as of its latest record.
+
+        Counts failed probes back to the most recent healthy probe or
+        remediation marker, exactly as the monitor's own counter does.
+        """
+        failures = 0
+        for record in self.reverse_records(endpoint):
+            if record.healthy or record.remediation:
+                break
+            failures += 1
+        return failures
+
+    def query(self, endpoint: str, window: float, periods: int = 1,
+              percentiles: Sequence[int] = DEFAULT_PERCENTILES, now: Optional[float] = None) -> List[WindowStats]:
+        """Return latency percentiles and failure counts per time window.
+
+        Args:
+            endpoint: URL to query
+            window: Length of each window in seconds
+            periods: Number of consecutive windows ending now (default: 1)
+            percentiles: Percentiles to compute (default: 50, 90, 95, 99)
+            now: End of the last window in epoch seconds (default: now)
+
+        Returns:
+            One WindowStats per window, oldest first
+        """
+        end = now if now is not None else time.time()
+        start = end - window * periods
+        buckets: List[List[float]] = [[] for _ in range(periods)]
+        failures = [0] * periods
+
+        for record in self.reverse_records(endpoint):
+            if record.timestamp < start:
+                break
+            if record.remediation or record.timestamp >= end:
+                continue
+            period = min(int((record.timestamp - start) // window), periods - 1)
+            buckets[period].append(record.latency)
+            if not record.healthy:
+                failures[period] += 1
+
+        stats = []
+        for period, latencies in enumerate(buckets):
+            latencies.sort()
+            stats.append(WindowStats(
+                start=start + period * window,
+                end=start + (period + 1) * window,
+                count=len(latencies),
+                failures=failures[period],
+                percentiles={p: _percentile(latencies, p) for p in percentiles}
+            ))
+        return stats
+
+
+def main():
+    """Print windowed latency percentiles for an endpoint from a history file."""
+    parser = argparse.ArgumentParser(description="Query probe latency percentiles from a monitor history file")
+    parser.add_argument('history_file', help='History file written by monitor.py --history-file')
+    parser.add_argument('endpoint', help='Endpoint URL to query')
+    parser.add_argument('--window', type=float, default=300, help='Window length in seconds (default: 300)')
+    parser.add_argument('--periods', type=int, default=12, help='Number of windows ending now (default: 12)')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.history_file):
+        print(f"Error: {args.history_file} does not exist")
+        sys.exit(1)
+
+    history = ProbeHistory(args.history_file)
+    try:
+        print(f"{'window start':<20} {'probes':>7} {'failed':>7} " +
+              ' '.join(f"{'p' + str(p):>9}" for p in DEFAULT_PERCENTILES))
+        for stats in history.query(args.endpoint, args.window, args.periods):
+            started = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(stats.start))
+            values = ' '.join(
+                f"{'-':>9}" if math.isnan(value) else f"{value * 1000:>7.1f}ms"
+                for value in stats.percentiles.values()
+            )
+            print(f"{started:<20} {stats.count:>7} {stats.failures:>7} {values}")
+        print(f"Current consecutive failures: {history.consecutive_failures(args.endpoint)}")
+    finally:
+        history.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,365 @@
+"""
+Cached EC2 instance inventory for the monitoring script.
+
+Discovers instances carrying a tag (Role=web-server by default) with a fully
+paginated DescribeInstances call, then keeps the result for a TTL. Within the
+TTL, instance states are refreshed incrementally, either from
+DescribeInstanceStatus or from EventBridge "EC2 Instance State-change
+Notification" events appended to a local JSON-lines file, so remediation can
+start without a cold full describe.
+
+A FleetInventory merges the inventories of several regions or accounts,
+discovering all of them concurrently.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence
+
+
+DEFAULT_INVENTORY_TTL = 300
+
+# States reported to callers, matching the DescribeInstances filter
+ACTIVE_STATES = ('running', 'stopped', 'stopping')
+
+# States after which an instance can never come back
+EVICTED_STATES = ('shutting-down', 'terminated')
+
+# DescribeInstanceStatus accepts at most 100 instance IDs per call
+STATUS_BATCH_SIZE = 100
+
+STATE_CHANGE_DETAIL_TYPE = 'EC2 Instance State-change Notification'
+
+logger = logging.getLogger(__name__)
+
+
+def _parse_event_time(value: Optional[str]) -> float:
+    """Parse an EventBridge ISO-8601 timestamp into epoch seconds (0 if missing)."""
+    if not value:
+        return 0.0
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        return 0.0
+
+
+class InstanceInventory:
+    """TTL-cached inventory of tagged EC2 instances with incremental state refresh."""
+
+    def __init__(self, ec2_client, tag_key: str = 'Role', tag_value: str = 'web-server',
+                 ttl: float = DEFAULT_INVENTORY_TTL, events_file: Optional[str] = None, location=None):
+        """Initialize the inventory.
+
+        Args:
+            ec2_client: boto3 EC2 client used for discovery
+            tag_key: Tag key that selects instances (default: Role)
+            tag_value: Tag value that selects instances (default: web-server)
+            ttl: Seconds a full describe stays valid before it is repeated (default: 300)
+            events_file: Optional JSON-lines file of EventBridge state-change events to replay
+            location: Region and account the client reaches, recorded on every instance (default: none)
+        """
+        self.ec2_client = ec2_client
+        self.tag_key = tag_key
+        self.tag_value = tag_value
+        self.ttl = ttl
+        self.events_file = events_file
+        self.location = location
+
+        self._records: Dict[str, Dict] = {}
+        self._loaded_at: Optional[float] = None
+        self._populated = False
+        self._events_offset = 0
+        self._lock = threading.RLock()
+
+    def is_fresh(self) -> bool:
+        """Return True if the last full describe is still within the TTL."""
+        return self._loaded_at is not None and time.monotonic() - self._loaded_at < self.ttl
+
+    def invalidate(self):
+        """Force a full describe on the next lookup."""
+        with self._lock:
+            self._loaded_at = None
+
+    def instances(self, refresh_states: bool = False) -> List[Dict]:
+        """Return the tagged instances in an active state.
+
+        A full describe runs only when the cache is cold or past its TTL.
+        Otherwise any new state-change events are replayed and, if requested,
+        states are refreshed with DescribeInstanceStatus.
+
+        Args:
+            refresh_states: Refresh instance states before returning a warm cache
+
+        Returns:
+            List of instance dictionaries with relevant information
+        """
+        with self._lock:
+            if not self.is_fresh():
+                try:
+                    self.refresh()
+                except Exception as e:
+                    if not self._populated:
+                        raise
+                    logger.warning(f"Inventory refresh failed, serving cached instances: {str(e)}")
+            else:
+                self.replay_events()
+                if refresh_states:
+                    try:
+                        self.refresh_states()
+                    except Exception as e:
+                        logger.warning(f"Incremental state refresh failed, falling back to a full describe: {str(e)}")
+                        self.refresh()
+
+            return [record for record in self._records.values() if record['state'] in ACTIVE_STATES]
+
+    def refresh(self):
+        """Rebuild the inventory from a fully paginated DescribeInstances call."""
+        records = {}
+        kwargs = {
+            'Filters': [
+                {
+                    'Name': f'tag:{self.tag_key}',
+                    'Values': [self.tag_value]
+                },
+                {
+                    'Name': 'instance-state-name',
+                    'Values': list(ACTIVE_STATES)
+                }
+            ]
+        }
+        # Events written before the describe starts are reflected in it; later ones may not be
+        events_offset = self._events_file_size()
+
+        while True:
+            response = self.ec2_client.describe_instances(**kwargs)
+            for reservation in response['Reservations']:
+                for instance in reservation['Instances']:
+                    record = self._build_record(instance)
+                    records[record['instance_id']] = record
+
+            next_token = response.get('NextToken')
+            if not next_token:
+                break
+            kwargs['NextToken'] = next_token
+
+        with self._lock:
+            self._records = records
+            self._loaded_at = time.monotonic()
+            self._populated = True
+            self._events_offset = events_offset
+        where = f" in {self.location}" if self.location is not None else ''
+        logger.info(f"Inventory refreshed: {len(records)} instance(s) with {self.tag_key}={self.tag_value}{where}")
+        # Apply the events that arrived while describing
+        self.replay_events()
+
+    def _build_record(self, instance: Dict) -> Dict:
+        """Build a compact instance record from a DescribeInstances entry."""
+        return {
+            'instance_id': instance['InstanceId'],
+            'location': self.location,
+            'state': instance['State']['Name'],
+            'launch_time': instance.get('LaunchTime'),
+            'private_ip': instance.get('PrivateIpAddress'),
+            'public_ip': instance.get('PublicIpAddress'),
+            'tags': {tag['Key']: tag['Value'] for tag in instance.get('Tags', [])},
+            'state_time': 0.0,
+            # Launch configuration, from which a replacement can be launched
+            'image_id': instance.get('ImageId'),
+            'instance_type': instance.get('InstanceType'),
+            'subnet_id': instance.get('SubnetId'),
+            'security_group_ids': [group['GroupId'] for group in instance.get('SecurityGroups', [])],
+            'iam_instance_profile': instance.get('IamInstanceProfile', {}).get('Arn'),
+            'key_name': instance.get('KeyName'),
+        }
+
+    def _set_state(self, instance_id: str, state: str, state_time: float = 0.0) -> bool:
+        """Apply a state change to a cached record, evicting instances that are gone.
+
+        Records are replaced rather than mutated so lists already handed out
+        to callers never change underneath them.
+
+        Returns:
+            True if the inventory changed, False otherwise
+        """
+        record = self._records.get(instance_id)
+        if record is None:
+            # Unknown instances may not carry the tag; the next full describe picks them up if they do
+            return False
+        if state_time and state_time < record['state_time']:
+            return False  # Out-of-order event
+
+        if state in EVICTED_STATES:
+            del self._records[instance_id]
+            logger.info(f"Inventory evicted instance {instance_id} ({state})")
+            return True
+        if state != record['state']:
+            self._records[instance_id] = dict(record, state=state, state_time=state_time or record['state_time'])
+            return True
+        return False
+
+    def refresh_states(self) -> int:
+        """Refresh cached instance states with DescribeInstanceStatus.
+
+        Returns:
+            Number of records that changed
+        """
+        with self._lock:
+            instance_ids = list(self._records)
+
+        seen = set()
+        changed = 0
+        for start in range(0, len(instance_ids), STATUS_BATCH_SIZE):
+            kwargs = {
+                'InstanceIds': instance_ids[start:start + STATUS_BATCH_SIZE],
+                'IncludeAllInstances': True
+            }
+            while True:
+                response = self.ec2_client.describe_instance_status(**kwargs)
+                with self._lock:
+                    for status in response['InstanceStatuses']:
+                        seen.add(status['InstanceId'])
+                        if self._set_state(status['InstanceId'], status['InstanceState']['Name']):
+                            changed += 1
+
+                next_token = response.get('NextToken')
+                if not next_token:
+                    break
+                kwargs['NextToken'] = next_token
+
+        # Instances EC2 no longer reports on are gone
+        with self._lock:
+            for instance_id in set(instance_ids) - seen:
+                if self._set_state(instance_id, 'terminated'):
+                    changed += 1
+        return changed
+
+    def apply_event(self, event: Dict) -> bool:
+        """Apply one EventBridge EC2 state-change event.
+
+        Returns:
+            True if the inventory changed, False otherwise
+        """
+        if event.get('detail-type') != STATE_CHANGE_DETAIL_TYPE:
+            return False
+        detail = event.get('detail') or {}
+        instance_id = detail.get('instance-id')
+        state = detail.get('state')
+        if not instance_id or not state:
+            return False
+        with self._lock:
+            return self._set_state(instance_id, state, _parse_event_time(event.get('time')))
+
+    def apply_events(self, events: Iterable[Dict]) -> int:
+        """Apply a sequence of EventBridge EC2 state-change events.
+
+        Returns:
+            Number of events that changed the inventory
+        """
+        return sum(1 for event in events if self.apply_event(event))
+
+    def _events_file_size(self) -> int:
+        if not self.events_file:
+            return 0
+        try:
+            return os.path.getsize(self.events_file)
+        except OSError:
+            return 0
+
+    def replay_events(self) -> int:
+        """Apply events appended to the events file since the last replay.
+
+        Returns:
+            Number of events that changed the inventory
+        """
+        if not self.events_file:
+            return 0
+
+        try:
+            with open(self.events_file, 'rb') as f:
+                if self._events_file_size() < self._events_offset:
+                    self._events_offset = 0  # File was truncated or rotated
+                f.seek(self._events_offset)
+                lines = []
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        break  # Partially written line; pick it up next time
+                    lines.append(line.decode('utf-8', errors='replace'))
+                    self._events_offset += len(line)
+        except OSError as e:
+            logger.warning(f"Could not read instance events from {self.events_file}: {str(e)}")
+            return 0
+
+        events = []
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                events.append(json.loads(line))
+            except json.JSONDecodeError:
+                logger.warning(f"Skipping malformed instance event: {line[:100]}")
+        return self.apply_events(events)
+
+
+class FleetInventory:
+    """Inventories of several regions or accounts, discovered concurrently and merged into one.
+
+    A lookup takes about as long as the slowest region rather than the sum of
+    all of them. A region that cannot be reached is logged and left out, so
+    the others can still be remediated; only if every region fails does the
+    lookup raise.
+    """
+
+    def __init__(self, inventories: Sequence[InstanceInventory]):
+        if not inventories:
+            raise ValueError("at least one inventory is required")
+        self.inventories = list(inventories)
+        first = self.inventories[0]
+        self.tag_key = first.tag_key
+        self.tag_value = first.tag_value
+        self.ttl = first.ttl
+        self.events_file = first.events_file
+
+    def is_fresh(self) -> bool:
+        return all(inventory.is_fresh() for inventory in self.inventories)
+
+    def invalidate(self):
+        for inventory in self.inventories:
+            inventory.invalidate()
+
+    def instances(self, refresh_states: bool = False) -> List[Dict]:
+        """Return the tagged instances in an active state across every region.
+
+        Args:
+            refresh_states: Refresh instance states before returning a warm cache
+        """
+        with ThreadPoolExecutor(max_workers=len(self.inventories), thread_name_prefix='discovery') as executor:
+            futures = [executor.submit(inventory.instances, refresh_states) for inventory in self.inventories]
+
+        merged = []
+        errors = []
+        for inventory, future in zip(self.inventories, futures):
+            try:
+                merged.extend(future.result())
+            except Exception as e:
+                logger.error(f"Instance discovery failed in {inventory.location}: {str(e)}")
+                errors.append(e)
+        if len(errors) == len(self.inventories):
+            raise errors[0]
+        return merged
+
+    def apply_event(self, event: Dict) -> bool:
+        """Apply one EventBridge EC2 state-change event to the inventory holding its instance."""
+        return any(inventory.apply_event(event) for inventory in self.inventories)
+
+    def apply_events(self, events: Iterable[Dict]) -> int:
+        return sum(1 for event in events if self.apply_event(event))
+
+    def replay_events(self) -> int:
+        # Each inventory only applies the events for its own instances
+        return sum(inventory.replay_events() for inventory in self.inventories)
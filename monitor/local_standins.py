@@ -0,0 +1,568 @@
+"""
+Local stand-ins for the services the monitoring script talks to.
+
+``StandInServer`` is an HTTP(S) server on 127.0.0.1 that plays the web
+servers behind the ALB: healthy, down, serving the wrong page, dripping its
+body slowly or failing a fraction of requests. Its mode can be switched while
+it runs. ``H2StandInServer`` serves fixed pages per path over HTTP/2 only,
+counting connections and concurrent streams. ``FakeEC2Client`` implements
+the EC2 calls the monitor makes against an in-memory fleet whose instances
+change state after a configurable delay, and ``FakeELBv2Client`` a target
+group whose targets pass health checks and drain after a delay.
+
+They are used by benchmark_monitor.py and the tests; nothing here touches AWS.
+"""
+
+import http.server
+import os
+import random
+import shutil
+import socket
+import ssl
+import subprocess
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+from content import DEFAULT_MARKER
+
+
+SERVER_MODES = ('healthy', 'down', 'wrong-content', 'slow', 'flaky')
+
+HEALTHY_PAGE = f"<html><body><h1>Welcome to nginx!</h1><p>{DEFAULT_MARKER}</p></body></html>"
+WRONG_PAGE = "<html><body><h1>Welcome to nginx!</h1><p>This is a basic installation.</p></body></html>"
+
+# EC2 pages DescribeInstances results at up to 1000 instances
+DESCRIBE_PAGE_SIZE = 1000
+
+
+def generate_self_signed_cert(directory: str, common_name: str = 'localhost') -> Tuple[str, str]:
+    """Create a throwaway self-signed certificate with the openssl CLI.
+
+    Args:
+        directory: Directory to write cert.pem and key.pem into
+        common_name: Certificate subject and subjectAltName DNS name
+
+    Returns:
+        Paths of the certificate and private key
+    """
+    if shutil.which('openssl') is None:
+        raise RuntimeError("The openssl command is required to generate a self-signed certificate")
+
+    cert_file = os.path.join(directory, 'cert.pem')
+    key_file = os.path.join(directory, 'key.pem')
+    subprocess.run(
+        [
+            'openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+            '-keyout', key_file, '-out', cert_file, '-subj', f'/CN={common_name}',
+            '-addext', f'subjectAltName=DNS:{common_name},IP:127.0.0.1'
+        ],
+        check=True, capture_output=True
+    )
+    return cert_file, key_file
+
+
+class _StandInHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Keep connections alive like nginx does
+    server: '_StandInHTTPServer'
+
+    def do_GET(self):
+        stand_in = self.server.stand_in
+        stand_in.count_request()
+        mode = stand_in.mode
+
+        if mode == 'down' or (mode == 'flaky' and stand_in.should_fail()):
+            self._send(503, b'Service Unavailable')
+        elif mode == 'wrong-content':
+            self._send(200, stand_in.wrong_body)
+        elif mode == 'slow':
+            self._send(200, stand_in.body, drip=True)
+        else:
+            self._send(200, stand_in.body)
+
+    def _send(self, status: int, body: bytes, drip: bool = False):
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/html')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if not drip:
+            self.wfile.write(body)
+            return
+        stand_in = self.server.stand_in
+        for start in range(0, len(body), stand_in.drip_bytes):
+            self.wfile.write(body[start:start + stand_in.drip_bytes])
+            self.wfile.flush()
+            time.sleep(stand_in.drip_delay)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _StandInHTTPServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+    stand_in: 'StandInServer' = None
+
+
+class StandInServer:
+    """A local web server standing in for the instances behind the ALB."""
+
+    def __init__(self, mode: str = 'healthy', tls: bool = True, body_size: int = 0,
+                 drip_bytes: int = 64, drip_delay: float = 0.05, failure_rate: float = 0.5,
+                 seed: Optional[int] = None):
+        """Start the server on a free port of 127.0.0.1.
+
+        Args:
+            mode: One of SERVER_MODES (default: 'healthy')
+            tls: Serve HTTPS with a freshly generated self-signed certificate (default: True)
+            body_size: Pad pages to at least this many bytes, with the marker at the end
+            drip_bytes: Bytes written per step in 'slow' mode (default: 64)
+            drip_delay: Seconds between steps in 'slow' mode (default: 0.05)
+            failure_rate: Fraction of requests answered with 503 in 'flaky' mode (default: 0.5)
+            seed: Seed for the 'flaky' mode random generator
+        """
+        self.mode = mode
+        self.drip_bytes = drip_bytes
+        self.drip_delay = drip_delay
+        self.failure_rate = failure_rate
+        self.body = self._pad(HEALTHY_PAGE, body_size)
+        self.wrong_body = self._pad(WRONG_PAGE, body_size)
+        self.requests = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._cert_dir: Optional[str] = None
+
+        self.httpd = _StandInHTTPServer(('127.0.0.1', 0), _StandInHandler)
+        self.httpd.stand_in = self
+        if tls:
+            self._cert_dir = tempfile.mkdtemp(prefix='standin-')
+            cert_file, key_file = generate_self_signed_cert(self._cert_dir)
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(cert_file, key_file)
+            self.httpd.socket = context.wrap_socket(self.httpd.socket, server_side=True)
+
+        self.url = f"{'https' if tls else 'http'}://127.0.0.1:{self.httpd.server_port}/"
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='stand-in', daemon=True)
+        self._thread.start()
+
+    @property
+    def mode(self) -> str:
+        return self._mode
+
+    @mode.setter
+    def mode(self, mode: str):
+        if mode not in SERVER_MODES:
+            raise ValueError(f"mode must be one of {SERVER_MODES}")
+        self._mode = mode
+
+    @staticmethod
+    def _pad(page: str, size: int) -> bytes:
+        body = page.encode('utf-8')
+        if len(body) >= size:
+            return body
+        # Keep the marker after the padding so matching has to read the whole page
+        head, _, tail = page.partition('<p>')
+        return (head + '<!--' + 'x' * (size - len(body) - 7) + '-->' + '<p>' + tail).encode('utf-8')
+
+    def count_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def should_fail(self) -> bool:
+        with self._lock:
+            return self._rng.random() < self.failure_rate
+
+    def stop(self):
+        """Stop serving and remove the generated certificate."""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._cert_dir:
+            shutil.rmtree(self._cert_dir, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+class H2StandInServer:
+    """An HTTPS server on 127.0.0.1 that only speaks HTTP/2, serving a fixed page per path.
+
+    Needs the h2 package. Each response is sent ``delay`` seconds after its
+    request arrives, from a thread of its own, so streams of one connection
+    are answered concurrently and ``max_concurrent_streams`` shows how many
+    were in flight at once.
+    """
+
+    def __init__(self, pages: Dict[str, Tuple[int, bytes]], delay: float = 0.0):
+        """Start the server on a free port of 127.0.0.1.
+
+        Args:
+            pages: Status and body served for each path; other paths get a 404
+            delay: Seconds before each response is sent (default: 0)
+        """
+        import h2.config
+        import h2.connection
+        import h2.events
+        self._h2 = h2
+
+        self.pages = pages
+        self.delay = delay
+        self.connections = 0
+        self.requests = 0
+        self.authorities: List[str] = []
+        self.max_concurrent_streams = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._running = True
+
+        self._cert_dir = tempfile.mkdtemp(prefix='standin-h2-')
+        cert_file, key_file = generate_self_signed_cert(self._cert_dir)
+        self._context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        self._context.load_cert_chain(cert_file, key_file)
+        self._context.set_alpn_protocols(['h2'])
+
+        self._listener = socket.create_server(('127.0.0.1', 0))
+        self.url = f"https://127.0.0.1:{self._listener.getsockname()[1]}/"
+        self._thread = threading.Thread(target=self._accept, name='stand-in-h2', daemon=True)
+        self._thread.start()
+
+    def _accept(self):
+        while self._running:
+            try:
+                sock, _ = self._listener.accept()
+            except OSError:
+                return
+            with self._lock:
+                self.connections += 1
+            threading.Thread(target=self._serve, args=(sock,), daemon=True).start()
+
+    def _serve(self, raw_sock: socket.socket):
+        h2 = self._h2
+        try:
+            sock = self._context.wrap_socket(raw_sock, server_side=True)
+        except (OSError, ssl.SSLError):
+            raw_sock.close()
+            return
+        connection = h2.connection.H2Connection(h2.config.H2Configuration(client_side=False))
+        send_lock = threading.Lock()
+
+        def flush():
+            data = connection.data_to_send()
+            if data:
+                sock.sendall(data)
+
+        def respond(stream_id: int, path: str):
+            status, body = self.pages.get(path, (404, b'Not Found'))
+            time.sleep(self.delay)
+            with send_lock:
+                with self._lock:
+                    self._in_flight -= 1
+                try:
+                    connection.send_headers(stream_id, [(':status', str(status)), ('content-length', str(len(body)))])
+                    connection.send_data(stream_id, body, end_stream=True)
+                    flush()
+                except Exception:
+                    pass  # The client reset the stream or went away
+
+        with send_lock:
+            connection.initiate_connection()
+            flush()
+        try:
+            while self._running:
+                data = sock.recv(65535)
+                if not data:
+                    break
+                with send_lock:
+                    events = connection.receive_data(data)
+                    flush()
+                for event in events:
+                    if isinstance(event, h2.events.RequestReceived):
+                        headers = {name.decode() if isinstance(name, bytes) else name:
+                                   value.decode() if isinstance(value, bytes) else value
+                                   for name, value in event.headers}
+                        with self._lock:
+                            self.requests += 1
+                            self.authorities.append(headers.get(':authority'))
+                            self._in_flight += 1
+                            self.max_concurrent_streams = max(self.max_concurrent_streams, self._in_flight)
+                        threading.Thread(target=respond, args=(event.stream_id, headers[':path']), daemon=True).start()
+                    elif isinstance(event, h2.events.ConnectionTerminated):
+                        return
+        except (OSError, ssl.SSLError):
+            pass
+        finally:
+            sock.close()
+
+    def stop(self):
+        """Stop accepting connections and remove the generated certificate."""
+        self._running = False
+        self._listener.close()
+        shutil.rmtree(self._cert_dir, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+class _FakeWaiter:
+    """Poll the fake fleet until every instance reaches a state, ignoring EC2's 15 s delay."""
+
+    STATES = {'instance_stopped': 'stopped', 'instance_running': 'running'}
+
+    def __init__(self, ec2: 'FakeEC2Client', name: str):
+        if name not in self.STATES:
+            raise ValueError(f"Waiter {name} does not exist")
+        self.ec2 = ec2
+        self.state = self.STATES[name]
+
+    def wait(self, InstanceIds: List[str], WaiterConfig: Optional[Dict] = None):
+        max_attempts = (WaiterConfig or {}).get('MaxAttempts', 40)
+        deadline = time.monotonic() + max_attempts * self.ec2.poll_interval + self.ec2.transition_delay
+        while time.monotonic() < deadline:
+            if all(self.ec2.state_of(instance_id) == self.state for instance_id in InstanceIds):
+                return
+            time.sleep(self.ec2.poll_interval)
+        raise TimeoutError(f"Waiter for {self.state} timed out")
+
+
+class FakeEC2Client:
+    """In-memory EC2 fleet implementing the calls HealthMonitor makes.
+
+    Instances move from 'stopping' to 'stopped' and from 'pending' to
+    'running' ``transition_delay`` seconds after being stopped or started,
+    and launched instances start out 'pending' too. Terminated instances go
+    through 'shutting-down' to 'terminated'.
+    Every call is recorded in ``calls`` and can be slowed down by
+    ``api_latency`` seconds to model the round trip to AWS.
+    """
+
+    def __init__(self, instance_count: int = 2, transition_delay: float = 0.1,
+                 poll_interval: float = 0.01, api_latency: float = 0.0, role: str = 'web-server',
+                 id_offset: int = 0, private_ip: Optional[str] = None):
+        """Create a fleet of running instances.
+
+        Args:
+            instance_count: Number of tagged instances (default: 2)
+            transition_delay: Seconds a stop or start takes (default: 0.1)
+            poll_interval: Seconds between waiter polls (default: 0.01)
+            api_latency: Seconds added to every API call (default: 0)
+            role: Value of the Role tag (default: 'web-server')
+            id_offset: Number of the first instance ID, to keep the fleets of several fake regions apart (default: 0)
+            private_ip: Address of every instance, such as 127.0.0.1 to have a StandInServer answer their
+                direct probes (default: a distinct unreachable 10.0.x.x address each)
+        """
+        self.transition_delay = transition_delay
+        self.poll_interval = poll_interval
+        self.api_latency = api_latency
+        self.calls: List[str] = []
+        self._lock = threading.Lock()
+        self._instances: Dict[str, Dict] = {}
+        self._id_offset = id_offset
+        self._private_ip = private_ip
+        # RunInstances parameters of every launch
+        self.launches: List[Dict] = []
+        launch_time = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        for index in range(instance_count):
+            self._add_instance(index, 'running', launch_time, [
+                {'Key': 'Role', 'Value': role}, {'Key': 'Name', 'Value': f'web-{index}'}
+            ])
+
+    def _add_instance(self, index: int, state: str, launch_time: datetime, tags: List[Dict],
+                      **launch_config) -> Dict:
+        instance_id = f'i-{self._id_offset + index:017x}'
+        instance = {
+            'InstanceId': instance_id,
+            'State': {'Name': state},
+            'LaunchTime': launch_time,
+            'PrivateIpAddress': self._private_ip or f'10.0.{index // 250}.{index % 250 + 4}',
+            'ImageId': launch_config.get('ImageId', 'ami-0123456789abcdef0'),
+            'InstanceType': launch_config.get('InstanceType', 't3.micro'),
+            'SubnetId': launch_config.get('SubnetId', 'subnet-0123456789abcdef0'),
+            'SecurityGroups': [{'GroupId': group_id, 'GroupName': group_id}
+                               for group_id in launch_config.get('SecurityGroupIds', ['sg-0123456789abcdef0'])],
+            'IamInstanceProfile': launch_config.get(
+                'IamInstanceProfile', {'Arn': 'arn:aws:iam::123456789012:instance-profile/web-server'}
+            ),
+            'Tags': tags,
+            '_transition': None,
+        }
+        self._instances[instance_id] = instance
+        return instance
+
+    def _call(self, name: str):
+        with self._lock:
+            self.calls.append(name)
+        if self.api_latency:
+            time.sleep(self.api_latency)
+
+    def _settle(self, instance: Dict):
+        """Complete a pending state transition once its delay has passed."""
+        transition = instance['_transition']
+        if transition and time.monotonic() >= transition[1]:
+            instance['State'] = {'Name': transition[0]}
+            instance['_transition'] = None
+
+    def state_of(self, instance_id: str) -> str:
+        with self._lock:
+            instance = self._instances[instance_id]
+            self._settle(instance)
+            return instance['State']['Name']
+
+    def set_state(self, instance_id: str, state: str):
+        """Force an instance into a state, for example to simulate a stopped server."""
+        with self._lock:
+            self._instances[instance_id]['State'] = {'Name': state}
+            self._instances[instance_id]['_transition'] = None
+
+    def _matches(self, instance: Dict, filters: List[Dict]) -> bool:
+        for entry in filters:
+            name, values = entry['Name'], entry['Values']
+            if name == 'instance-state-name':
+                if instance['State']['Name'] not in values:
+                    return False
+            elif name.startswith('tag:'):
+                tags = {tag['Key']: tag['Value'] for tag in instance['Tags']}
+                if tags.get(name[4:]) not in values:
+                    return False
+        return True
+
+    def describe_instances(self, Filters: Optional[List[Dict]] = None, NextToken: Optional[str] = None,
+                           InstanceIds: Optional[List[str]] = None, **kwargs):
+        self._call('describe_instances')
+        with self._lock:
+            for instance in self._instances.values():
+                self._settle(instance)
+            matching = [
+                {key: value for key, value in instance.items() if not key.startswith('_')}
+                for instance in self._instances.values()
+                if self._matches(instance, Filters or []) and (InstanceIds is None or instance['InstanceId'] in InstanceIds)
+            ]
+        start = int(NextToken or 0)
+        page = matching[start:start + DESCRIBE_PAGE_SIZE]
+        response = {'Reservations': [{'Instances': [instance]} for instance in page]}
+        if start + DESCRIBE_PAGE_SIZE < len(matching):
+            response['NextToken'] = str(start + DESCRIBE_PAGE_SIZE)
+        return response
+
+    def describe_instance_status(self, InstanceIds: List[str], IncludeAllInstances: bool = False, **kwargs):
+        self._call('describe_instance_status')
+        statuses = []
+        with self._lock:
+            for instance_id in InstanceIds:
+                instance = self._instances.get(instance_id)
+                if instance is None:
+                    continue
+                self._settle(instance)
+                if IncludeAllInstances or instance['State']['Name'] == 'running':
+                    statuses.append({'InstanceId': instance_id, 'InstanceState': dict(instance['State'])})
+        return {'InstanceStatuses': statuses}
+
+    def _transition(self, instance_ids: List[str], intermediate: str, final: str):
+        done = time.monotonic() + self.transition_delay
+        with self._lock:
+            for instance_id in instance_ids:
+                instance = self._instances[instance_id]
+                instance['State'] = {'Name': intermediate}
+                instance['_transition'] = (final, done)
+
+    def stop_instances(self, InstanceIds: List[str], **kwargs):
+        self._call('stop_instances')
+        self._transition(InstanceIds, 'stopping', 'stopped')
+        return {'StoppingInstances': [{'InstanceId': instance_id} for instance_id in InstanceIds]}
+
+    def start_instances(self, InstanceIds: List[str], **kwargs):
+        self._call('start_instances')
+        self._transition(InstanceIds, 'pending', 'running')
+        return {'StartingInstances': [{'InstanceId': instance_id} for instance_id in InstanceIds]}
+
+    def run_instances(self, MinCount: int, MaxCount: int, TagSpecifications: Optional[List[Dict]] = None,
+                      **kwargs):
+        self._call('run_instances')
+        tags = [tag for spec in TagSpecifications or [] if spec['ResourceType'] == 'instance' for tag in spec['Tags']]
+        launched = []
+        with self._lock:
+            self.launches.append(dict(kwargs, MinCount=MinCount, MaxCount=MaxCount, TagSpecifications=TagSpecifications))
+            for _ in range(MaxCount):
+                instance = self._add_instance(len(self._instances), 'pending', datetime.now(timezone.utc), tags, **kwargs)
+                instance['_transition'] = ('running', time.monotonic() + self.transition_delay)
+                launched.append({'InstanceId': instance['InstanceId'], 'State': {'Name': 'pending'}})
+        return {'Instances': launched}
+
+    def terminate_instances(self, InstanceIds: List[str], **kwargs):
+        self._call('terminate_instances')
+        self._transition(InstanceIds, 'shutting-down', 'terminated')
+        return {'TerminatingInstances': [{'InstanceId': instance_id} for instance_id in InstanceIds]}
+
+    def get_waiter(self, name: str) -> _FakeWaiter:
+        self._call('get_waiter')
+        return _FakeWaiter(self, name)
+
+
+class FakeELBv2Client:
+    """In-memory ALB target group implementing the target calls the monitor makes.
+
+    Registered targets are 'initial' until ``health_delay`` seconds have
+    passed, then 'healthy', or 'unhealthy' if marked failing. Deregistered
+    targets are 'draining' for ``drain_delay`` seconds and then gone, which
+    DescribeTargetHealth reports as 'unused'.
+    """
+
+    def __init__(self, target_ids: Sequence[str] = (), health_delay: float = 0.05, drain_delay: float = 0.05):
+        """Create a target group.
+
+        Args:
+            target_ids: Instances registered and healthy from the start
+            health_delay: Seconds a registered target takes to pass its health checks (default: 0.05)
+            drain_delay: Seconds a deregistered target drains for (default: 0.05)
+        """
+        self.health_delay = health_delay
+        self.drain_delay = drain_delay
+        self.calls: List[str] = []
+        # Instances whose health checks fail
+        self.failing: Set[str] = set()
+        self._lock = threading.Lock()
+        # Target ID -> (state, time the state ends or None)
+        self._targets: Dict[str, Tuple[str, Optional[float]]] = {
+            target_id: ('healthy', None) for target_id in target_ids
+        }
+
+    def _state(self, target_id: str) -> str:
+        state, until = self._targets.get(target_id, ('unused', None))
+        if until is not None and time.monotonic() >= until:
+            if state == 'draining':
+                del self._targets[target_id]
+                return 'unused'
+            state = 'healthy'
+            self._targets[target_id] = (state, None)
+        if state == 'healthy' and target_id in self.failing:
+            return 'unhealthy'
+        return state
+
+    def register_targets(self, TargetGroupArn: str, Targets: List[Dict], **kwargs):
+        with self._lock:
+            self.calls.append('register_targets')
+            for target in Targets:
+                self._targets[target['Id']] = ('initial', time.monotonic() + self.health_delay)
+        return {}
+
+    def deregister_targets(self, TargetGroupArn: str, Targets: List[Dict], **kwargs):
+        with self._lock:
+            self.calls.append('deregister_targets')
+            for target in Targets:
+                if target['Id'] in self._targets:
+                    self._targets[target['Id']] = ('draining', time.monotonic() + self.drain_delay)
+        return {}
+
+    def describe_target_health(self, TargetGroupArn: str, Targets: Optional[List[Dict]] = None, **kwargs):
+        with self._lock:
+            self.calls.append('describe_target_health')
+            target_ids = [target['Id'] for target in Targets] if Targets else list(self._targets)
+            return {'TargetHealthDescriptions': [
+                {'Target': {'Id': target_id, 'Port': 443}, 'TargetHealth': {'State': self._state(target_id)}}
+                for target_id in target_ids
+            ]}
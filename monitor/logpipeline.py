@@ -0,0 +1,191 @@
+"""
+Logging pipeline for the monitoring script.
+
+Log records are put on a queue by the thread that logs them and written to
+the console and the log file by a background listener thread, so a slow disk
+never stalls a probe. Records logged with %-style arguments are only
+formatted by the listener. The log file rotates by size, or by time, and can
+be written as JSON lines carrying the structured fields a log call attaches
+through ``extra`` (endpoint, latency, status, instance IDs...).
+
+Repetitive records, like the line logged for every healthy probe, can be
+sampled: a record with a ``sample`` key in ``extra`` is one of a series, and
+only one in every ``sample_rate`` records of each series is written.
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import IO, Dict, List, Optional
+
+
+DEFAULT_LOG_FILE = 'monitor.log'
+DEFAULT_LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+DEFAULT_MAX_BYTES = 10 * 1024 * 1024
+DEFAULT_BACKUP_COUNT = 5
+LOG_FORMATS = ('text', 'json')
+
+# Record attributes written as fields of their own in JSON lines, when a log call sets them
+STRUCTURED_FIELDS = ('endpoint', 'latency', 'status', 'reason', 'instance_ids', 'sampled')
+
+# Argument types the listener can format later, since they cannot change after the log call
+_IMMUTABLE_ARGS = (str, int, float, bool, bytes, type(None))
+
+
+class JSONFormatter(logging.Formatter):
+    """Format each record as one JSON object on a line of its own."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for name in STRUCTURED_FIELDS:
+            value = getattr(record, name, None)
+            if value is not None:
+                entry[name] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class SamplingFilter(logging.Filter):
+    """Pass the first and then every ``rate``-th record of each series; records outside a series always pass."""
+
+    def __init__(self, rate: int):
+        super().__init__()
+        if rate < 1:
+            raise ValueError("sample rate must be at least 1")
+        self.rate = rate
+        self._counts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        key = getattr(record, 'sample', None)
+        if key is None or self.rate == 1:
+            return True
+        with self._lock:
+            count = self._counts.get(key, 0)
+            self._counts[key] = count + 1
+        if count % self.rate:
+            return False
+        # Each written record stands for this many
+        record.sampled = self.rate
+        return True
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """Queue records as they are, leaving their formatting to the listener thread."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        args = record.args
+        if args and not (isinstance(args, tuple) and all(isinstance(arg, _IMMUTABLE_ARGS) for arg in args)):
+            # A mutable argument could change before the listener gets to it
+            record.msg, record.args = record.getMessage(), None
+        return record
+
+
+@dataclass
+class LogConfig:
+    """Where and how the monitor logs."""
+    path: Optional[str] = DEFAULT_LOG_FILE
+    level: int = logging.INFO
+    format: str = 'text'
+    max_bytes: int = DEFAULT_MAX_BYTES
+    backup_count: int = DEFAULT_BACKUP_COUNT
+    # Rotate on a schedule ('midnight', 'H', 'W0'...) instead of by size
+    rotate_when: Optional[str] = None
+    sample_rate: int = 1
+
+    def __post_init__(self):
+        if self.format not in LOG_FORMATS:
+            raise ValueError(f"log format must be one of {LOG_FORMATS}")
+        if self.max_bytes < 0 or self.backup_count < 0:
+            raise ValueError("log max bytes and backup count must not be negative")
+        if self.sample_rate < 1:
+            raise ValueError("log sample rate must be at least 1")
+        if self.rotate_when is not None:
+            when = self.rotate_when.upper()
+            weekday = len(when) == 2 and when[0] == 'W' and when[1] in '0123456'
+            if when not in ('S', 'M', 'H', 'D', 'MIDNIGHT') and not weekday:
+                raise ValueError(f"invalid log rotation schedule {self.rotate_when!r}")
+
+
+class LogPipeline:
+    """Write log records from a queue on a background thread, with rotation and optional sampling."""
+
+    def __init__(self, config: Optional[LogConfig] = None, stream: Optional[IO] = None):
+        """Initialize the pipeline.
+
+        Args:
+            config: Where and how to log (default: LogConfig())
+            stream: Console stream (default: standard output)
+        """
+        self.config = config or LogConfig()
+        self.stream = stream
+        self.queue: queue.SimpleQueue = queue.SimpleQueue()
+        self.listener: Optional[logging.handlers.QueueListener] = None
+        self._handler: Optional[logging.Handler] = None
+        self._logger: Optional[logging.Logger] = None
+
+    def _create_handlers(self) -> List[logging.Handler]:
+        """Create the console and file handlers the listener writes to."""
+        config = self.config
+        formatter = JSONFormatter() if config.format == 'json' else logging.Formatter(DEFAULT_LOG_FORMAT)
+        handlers: List[logging.Handler] = [logging.StreamHandler(self.stream or sys.stdout)]
+        if config.path:
+            if config.rotate_when:
+                handlers.append(logging.handlers.TimedRotatingFileHandler(
+                    config.path, when=config.rotate_when, backupCount=config.backup_count, encoding='utf-8'
+                ))
+            else:
+                handlers.append(logging.handlers.RotatingFileHandler(
+                    config.path, maxBytes=config.max_bytes, backupCount=config.backup_count, encoding='utf-8'
+                ))
+        for handler in handlers:
+            handler.setFormatter(formatter)
+        return handlers
+
+    @property
+    def active(self) -> bool:
+        return self.listener is not None
+
+    def start(self, logger: Optional[logging.Logger] = None) -> bool:
+        """Route a logger (default: the root logger) through the pipeline, unless it already has handlers.
+
+        Returns:
+            True if the pipeline was attached, False if the logger was already configured
+        """
+        logger = logger or logging.getLogger()
+        if self.active or logger.handlers:
+            return False
+        self._handler = _DeferredQueueHandler(self.queue)
+        if self.config.sample_rate > 1:
+            self._handler.addFilter(SamplingFilter(self.config.sample_rate))
+        self.listener = logging.handlers.QueueListener(self.queue, *self._create_handlers(), respect_handler_level=True)
+        self.listener.start()
+        logger.addHandler(self._handler)
+        logger.setLevel(self.config.level)
+        self._logger = logger
+        # Records still queued at exit are written, even if stop() was never called
+        atexit.register(self.stop)
+        return True
+
+    def stop(self):
+        """Detach from the logger and write every queued record before returning."""
+        if self.listener is None:
+            return
+        self._logger.removeHandler(self._handler)
+        self.listener.stop()
+        for handler in self.listener.handlers:
+            handler.close()
+        self.listener = None
+        atexit.unregister(self.stop)
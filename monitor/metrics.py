@@ -0,0 +1,381 @@
+"""
+Prometheus metrics for the monitoring script.
+
+A small, dependency-free implementation of counters, gauges and histograms
+rendered in the Prometheus text exposition format, plus a background HTTP
+server that serves them on /metrics for scraping.
+"""
+
+import http.server
+import json
+import logging
+import math
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+
+# Probe phases, in the order they happen on a new connection
+PROBE_PHASES = ('dns', 'connect', 'tls', 'ttfb', 'body')
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# EC2 waiters poll every 15 seconds (5 while instances start) for up to 300 seconds
+WAITER_BUCKETS = (5.0, 10.0, 15.0, 30.0, 45.0, 60.0, 90.0, 120.0, 180.0, 300.0)
+
+# Remediation steps range from a few seconds of SSM command to a full stop/start
+STEP_BUCKETS = (5.0, 10.0, 20.0, 30.0, 60.0, 120.0, 180.0, 300.0, 600.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+logger = logging.getLogger(__name__)
+
+
+def _escape(value: str) -> str:
+    """Escape a label value for the text exposition format."""
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class _Metric:
+    """Base class for a metric family with a fixed set of label names."""
+
+    type_name = ''
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._values: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"{self.name} expects labels {self.label_names}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def _samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type_name}']
+        with self._lock:
+            lines.extend(self._samples())
+        return '\n'.join(lines)
+
+
+class Counter(_Metric):
+    """A monotonically increasing count."""
+
+    type_name = 'counter'
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self):
+        for key, value in self._values.items():
+            yield f'{self.name}_total{_format_labels(self.label_names, key)} {_format_value(value)}'
+
+
+class Gauge(_Metric):
+    """A value that can go up and down."""
+
+    type_name = 'gauge'
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def remove(self, **labels):
+        """Stop exporting the series with these labels."""
+        with self._lock:
+            self._values.pop(self._key(labels), None)
+
+    def _samples(self):
+        for key, value in self._values.items():
+            yield f'{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}'
+
+
+class Histogram(_Metric):
+    """Observations counted into cumulative buckets."""
+
+    type_name = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state['counts'][i] += 1
+                    break
+            state['sum'] += value
+
+    def count(self, **labels) -> int:
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            return sum(state['counts']) if state else 0
+
+    def _samples(self):
+        for key, state in self._values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, state['counts']):
+                cumulative += count
+                labels = _format_labels(self.label_names, key, ('le', _format_value(bound)))
+                yield f'{self.name}_bucket{labels} {cumulative}'
+            labels = _format_labels(self.label_names, key)
+            yield f'{self.name}_sum{labels} {_format_value(state["sum"])}'
+            yield f'{self.name}_count{labels} {cumulative}'
+
+
+class MetricsRegistry:
+    """A collection of metric families rendered together."""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return '\n'.join(metric.render() for metric in self._metrics) + '\n'
+
+
+class MonitorMetrics:
+    """The metric series exported by HealthMonitor."""
+
+    def __init__(self, registry: Optional[MetricsRegistry] = None):
+        self.registry = registry or MetricsRegistry()
+        self.probe_phase_seconds = self.registry.register(Histogram(
+            'monitor_probe_phase_seconds',
+            'Probe latency by phase (dns, connect and tls only on new connections).',
+            labels=('endpoint', 'phase')
+        ))
+        self.probe_duration_seconds = self.registry.register(Histogram(
+            'monitor_probe_duration_seconds',
+            'End-to-end probe latency.',
+            labels=('endpoint',)
+        ))
+        self.probes = self.registry.register(Counter(
+            'monitor_probes',
+            'Health probes by result.',
+            labels=('endpoint', 'result')
+        ))
+        self.consecutive_failures = self.registry.register(Gauge(
+            'monitor_consecutive_failures',
+            'Current consecutive failed probes.',
+            labels=('endpoint',)
+        ))
+        self.instance_healthy = self.registry.register(Gauge(
+            'monitor_instance_healthy',
+            'Whether each web server passed its last direct probe (1) or not (0).',
+            labels=('endpoint', 'instance')
+        ))
+        self.alb_node_healthy = self.registry.register(Gauge(
+            'monitor_alb_node_healthy',
+            'Whether each ALB node address passed its last direct probe (1) or not (0).',
+            labels=('endpoint', 'node')
+        ))
+        self.path_healthy = self.registry.register(Gauge(
+            'monitor_path_healthy',
+            'Whether each path checked over HTTP/2 passed its last probe (1) or not (0).',
+            labels=('endpoint', 'path')
+        ))
+        self.path_duration_seconds = self.registry.register(Histogram(
+            'monitor_path_duration_seconds',
+            'Latency of each path checked over HTTP/2.',
+            labels=('endpoint', 'path')
+        ))
+        self._matrix_series: Dict[tuple, set] = {}
+        self.restart_waiter_seconds = self.registry.register(Histogram(
+            'monitor_restart_waiter_seconds',
+            'Time spent in EC2 waiters while restarting instances.',
+            labels=('waiter',),
+            buckets=WAITER_BUCKETS
+        ))
+        self.restarts = self.registry.register(Counter(
+            'monitor_instance_restarts',
+            'Instance restarts by result.',
+            labels=('result',)
+        ))
+        self.replacements = self.registry.register(Counter(
+            'monitor_instance_replacements',
+            'Instances replaced by newly launched ones, by result.',
+            labels=('result',)
+        ))
+        self.remediation_step_seconds = self.registry.register(Histogram(
+            'monitor_remediation_step_seconds',
+            'Time taken by each remediation step, including waiting for recovery.',
+            labels=('step',),
+            buckets=STEP_BUCKETS
+        ))
+        self.time_to_healthy = self.registry.register(Histogram(
+            'monitor_instance_time_to_healthy_seconds',
+            'Time from the start of a remediation step until the instance served the expected content again.',
+            labels=('step',),
+            buckets=STEP_BUCKETS
+        ))
+        self.remediation_steps = self.registry.register(Counter(
+            'monitor_remediation_steps',
+            'Instances put through each remediation step, by whether they recovered.',
+            labels=('step', 'result')
+        ))
+        self.restarts_suppressed = self.registry.register(Counter(
+            'monitor_restarts_suppressed',
+            'Remediations and instance restarts held back by cooldowns, rate limits or the circuit breaker.',
+            labels=('scope',)
+        ))
+        self.restart_breaker_open = self.registry.register(Gauge(
+            'monitor_restart_breaker_open',
+            'Whether the restart circuit breaker is open (1) or not (0).'
+        ))
+        self.remediation_jobs = self.registry.register(Gauge(
+            'monitor_remediation_jobs',
+            'Remediation jobs currently queued or running.',
+            labels=('state',)
+        ))
+        self.remediation_jobs_finished = self.registry.register(Counter(
+            'monitor_remediation_jobs_finished',
+            'Finished remediation jobs by final state.',
+            labels=('state',)
+        ))
+
+    def observe_probe(self, endpoint: str, healthy: bool, duration: float, phases: Dict[str, float]):
+        """Record the outcome and timings of one probe."""
+        self.probes.inc(endpoint=endpoint, result='success' if healthy else 'failure')
+        self.probe_duration_seconds.observe(duration, endpoint=endpoint)
+        for phase in PROBE_PHASES:
+            if phase in phases:
+                self.probe_phase_seconds.observe(phases[phase], endpoint=endpoint, phase=phase)
+
+    def set_consecutive_failures(self, endpoint: str, failures: int):
+        self.consecutive_failures.set(failures, endpoint=endpoint)
+
+    def set_instance_health(self, endpoint: str, health: Dict[str, bool]):
+        """Record a round of direct instance probes, dropping instances that are gone."""
+        self._set_matrix(self.instance_healthy, 'instance', endpoint, health)
+
+    def set_node_health(self, endpoint: str, health: Dict[str, bool]):
+        """Record a round of ALB node probes, dropping addresses no longer resolved."""
+        self._set_matrix(self.alb_node_healthy, 'node', endpoint, health)
+
+    def observe_path(self, endpoint: str, path: str, healthy: bool, duration: float):
+        """Record the probe of one path of a multi-path round."""
+        self.path_healthy.set(1 if healthy else 0, endpoint=endpoint, path=path)
+        self.path_duration_seconds.observe(duration, endpoint=endpoint, path=path)
+
+    def _set_matrix(self, gauge: Gauge, label: str, endpoint: str, health: Dict[str, bool]):
+        key = (gauge.name, endpoint)
+        for member in self._matrix_series.get(key, set()) - set(health):
+            gauge.remove(endpoint=endpoint, **{label: member})
+        for member, healthy in health.items():
+            gauge.set(1 if healthy else 0, endpoint=endpoint, **{label: member})
+        self._matrix_series[key] = set(health)
+
+    def observe_waiter(self, waiter: str, duration: float):
+        self.restart_waiter_seconds.observe(duration, waiter=waiter)
+
+    def count_restarts(self, count: int, success: bool):
+        self.restarts.inc(count, result='success' if success else 'failure')
+
+    def observe_time_to_healthy(self, step: str, duration: float):
+        self.time_to_healthy.observe(duration, step=step)
+
+    def count_replacement(self, replaced: bool):
+        self.replacements.inc(result='success' if replaced else 'failure')
+
+    def observe_remediation_step(self, step: str, duration: float, recovered: int, failed: int):
+        """Record how long a remediation step took and how many instances it fixed."""
+        self.remediation_step_seconds.observe(duration, step=step)
+        if recovered:
+            self.remediation_steps.inc(recovered, step=step, result='recovered')
+        if failed:
+            self.remediation_steps.inc(failed, step=step, result='failed')
+
+    def count_suppressed(self, scope: str, count: int = 1):
+        self.restarts_suppressed.inc(count, scope=scope)
+
+    def set_breaker_open(self, is_open: bool):
+        self.restart_breaker_open.set(1 if is_open else 0)
+
+    def set_remediation_jobs(self, state: str, count: int):
+        self.remediation_jobs.set(count, state=state)
+
+    def count_finished_remediation_job(self, state: str):
+        self.remediation_jobs_finished.inc(state=state)
+
+
+class _MetricsHandler(http.server.BaseHTTPRequestHandler):
+    registry: MetricsRegistry = None
+    pages: Dict[str, Callable[[], object]] = {}
+
+    def do_GET(self):
+        path = self.path.split('?', 1)[0]
+        if path == '/metrics':
+            body = self.registry.render().encode('utf-8')
+            content_type = CONTENT_TYPE
+        elif path in self.pages:
+            body = json.dumps(self.pages[path](), indent=2).encode('utf-8')
+            content_type = 'application/json'
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Scrapes would otherwise flood the monitor log
+
+
+class MetricsServer:
+    """Serve a registry on http://<address>:<port>/metrics from a background thread.
+
+    ``pages`` maps further paths to callables whose results are served as JSON.
+    """
+
+    def __init__(self, registry: MetricsRegistry, port: int, address: str = '',
+                 pages: Optional[Dict[str, Callable[[], object]]] = None):
+        handler = type('MetricsHandler', (_MetricsHandler,), {'registry': registry, 'pages': dict(pages or {})})
+        self.httpd = http.server.ThreadingHTTPServer((address, port), handler)
+        self.httpd.daemon_threads = True
+        self.port = self.httpd.server_port
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='metrics', daemon=True)
+        self._thread.start()
+        logger.info(f"Serving metrics on port {self.port}")
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
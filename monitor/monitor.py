@@ -2,70 +2,709 @@
 AWS Infrastructure Monitoring Script
 
 This script monitors an endpoint and automatically restarts EC2 instances
-with the 'web-server' role tag if consecutive health checks fail.
+with the 'web-server' role tag if consecutive health checks fail, or, when
+configured, if too many probes over a rolling window fail or are too slow.
 
 The health check validates both HTTP status (200) and page content 
 (must contain "Deployed via SSM Document" string).
 
+When more than one endpoint is given, all of them are probed concurrently
+from a single process on an asyncio event loop, sharing one EC2 client.
+
+boto3 is only imported, and AWS clients only created, once they are first
+needed, so a one-shot ``--once`` check starts quickly and, unless it lists
+the instances to probe with ``--deep-probe``, never touches AWS.
+
 Usage:
-    python monitor.py <endpoint_url>
+    python monitor.py <endpoint_url> [<endpoint_url> ...]
+    python monitor.py --once <endpoint_url>    # exit 0 if healthy, 1 if not
 
 Example:
     python monitor.py https://example.com/health
 """
 
 import argparse
-import boto3
+import asyncio
+import importlib
 import logging
 import os
+import re
 import requests
 import signal
+import socket
+import ssl
 import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import Callable, List, Dict, Optional, Set
+from urllib.parse import urlsplit, urlunsplit
+
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from clients import ClientPool, Location, parse_locations
+from cluster import ClusterCoordinator, DEFAULT_LEASE_TTL, create_lease_backend
+from config import CHECK_OPTIONS, CheckConfig, ConfigError, load_config
+from content import ContentMatcher, DEFAULT_MARKER, DEFAULT_MAX_BODY_BYTES
+from dnscache import DEFAULT_DNS_TTL, DNSCache
+from evaluation import (
+    DEFAULT_EWMA_ALPHA, DEFAULT_FAILURE_THRESHOLD, DEFAULT_LATENCY_PERCENTILE, DEFAULT_WINDOW, HealthEvaluator,
+    HealthPolicy
+)
+from history import DEFAULT_HISTORY_CAPACITY, ProbeHistory
+from inventory import DEFAULT_INVENTORY_TTL, FleetInventory, InstanceInventory
+from logpipeline import (
+    DEFAULT_BACKUP_COUNT, DEFAULT_LOG_FILE, DEFAULT_MAX_BYTES, LOG_FORMATS, LogConfig, LogPipeline
+)
+from metrics import MetricsServer, MonitorMetrics
+from pathprobe import PathCheck, PathProber, PathResult, require_httpx
+from ratelimit import (
+    DEFAULT_BREAKER_RESET, DEFAULT_BREAKER_THRESHOLD, DEFAULT_MAX_RESTART_ATTEMPTS, DEFAULT_MAX_RESTARTS_PER_HOUR,
+    DEFAULT_RESTART_COOLDOWN, CircuitBreaker, RestartGuard
+)
+from remediation import ACTIVE_JOB_STATES, DEFAULT_REMEDIATION_WORKERS, RemediationJob, RemediationPool
+from replacement import InstanceReplacer, ReplacementResult
+from scheduler import DEFAULT_JITTER, ProbeScheduler
+from strategy import (
+    DEFAULT_ESCALATION_WINDOW, DEFAULT_REMEDIATION_STEPS, DEFAULT_SSM_DOCUMENT, DEFAULT_STEP_TIMEOUT,
+    NGINX_RESTART_COMMANDS, READINESS_BACKOFF, READINESS_FIRST_DELAY, SSM_DOCUMENT_PARAMETERS, SSM_FINAL_STATES,
+    RemediationLadder, classify_failure, parse_steps
+)
+
+
+DEFAULT_TIMEOUT = 30
+DEFAULT_MAX_IN_FLIGHT = 20
+DEFAULT_POOL_CONNECTIONS = 10
+
+# Connection pools kept for addresses probed directly (instances or ALB nodes), one per address
+DIRECT_PROBE_POOL_CONNECTIONS = 100
+
+# Rest of a partially read body that is drained, rather than dropping its kept-alive connection
+DEFAULT_DRAIN_LIMIT = 64 * 1024
+
+# Remediation scopes: restart every web server, or only the unhealthy targets
+REMEDIATION_SCOPES = ('fleet', 'targets')
+
+# ALB target health states that mean the target should be restarted
+UNHEALTHY_TARGET_STATES = ('unhealthy', 'unavailable')
+
+# Seconds between EC2 waiter polls, and how long a waiter waits in total. Started instances are polled
+# more often, since the readiness checks that follow cannot begin before they run
+WAITER_DELAYS = {'instance_stopped': 15, 'instance_running': 5}
+WAITER_TIMEOUT = 300
+
+# Per-thread record of how the most recent probe on this thread was connected
+_probe_local = threading.local()
+
+
+class _LazyModule:
+    """Stand-in for a module that is imported the first time one of its attributes is used.
+    
+    Attributes set on the stand-in (as ``unittest.mock.patch`` does) shadow the module's own.
+    """
+    
+    def __init__(self, name: str):
+        self.__dict__['_name'] = name
+    
+    def __getattr__(self, attribute):
+        return getattr(importlib.import_module(self._name), attribute)
+
+
+# Importing boto3 takes longer than a whole probe; only remediation and instance discovery need it
+boto3 = _LazyModule('boto3')
+
+
+class _DeferredClient:
+    """Forward attribute access to a client that is looked up, and created, on first use."""
+    
+    def __init__(self, resolve: Callable[[], object]):
+        self._resolve = resolve
+    
+    def __getattr__(self, attribute):
+        return getattr(self._resolve(), attribute)
+
+
+def _probe_phases() -> Dict[str, float]:
+    """Return the phase timings of the current probe on this thread."""
+    return _probe_local.__dict__.setdefault('phases', {})
+
+
+def _peer_address(sock: socket.socket) -> Optional[str]:
+    """Return the address a socket is connected to, or None if it is not connected."""
+    try:
+        return sock.getpeername()[0]
+    except (OSError, IndexError):
+        return None
+
+
+class _ResumingSSLContext(ssl.SSLContext):
+    """SSL context that resumes the last TLS session seen for each server name and address.
+    
+    urllib3 gives no way to pass a session into the handshake, so the context
+    looks the session up itself when a new connection is wrapped. Sessions are
+    kept per address as well as per name, since instances probed directly all
+    share the endpoint's server name but not its session cache.
+    """
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__()
+        self.sessions: Dict[tuple, ssl.SSLSession] = {}
+    
+    def remember(self, ssl_sock: ssl.SSLSocket):
+        """Cache a connection's TLS session for future connections to the same server."""
+        if ssl_sock.server_hostname and ssl_sock.session is not None:
+            self.sessions[(ssl_sock.server_hostname, _peer_address(ssl_sock))] = ssl_sock.session
+    
+    def forget(self, ssl_sock: ssl.SSLSocket):
+        """Drop the cached TLS session for a connection's server."""
+        self.sessions.pop((ssl_sock.server_hostname, _peer_address(ssl_sock)), None)
+    
+    def wrap_socket(self, sock, *args, server_hostname=None, session=None, **kwargs):
+        if session is None:
+            session = self.sessions.get((server_hostname, _peer_address(sock)))
+        ssl_sock = super().wrap_socket(sock, *args, server_hostname=server_hostname, session=session, **kwargs)
+        _probe_local.tls_resumed = ssl_sock.session_reused
+        self.remember(ssl_sock)
+        return ssl_sock
+
+
+class _TrackedConnectionMixin:
+    """Record on the calling thread how a request was connected and how long each phase took."""
+    
+    _fresh = False
+    _request_started = 0.0
+    
+    def _new_conn(self):
+        started = time.perf_counter()
+        dns_cache = getattr(_probe_local, 'dns_cache', None)
+        try:
+            if dns_cache is not None:
+                # Spread new connections across the name's addresses, such as the nodes of an ALB
+                addresses = dns_cache.rotate(self._dns_host)
+            else:
+                infos = socket.getaddrinfo(self._dns_host, self.port, 0, socket.SOCK_STREAM)
+                addresses = list(dict.fromkeys(info[4][0] for info in infos))
+        except socket.gaierror:
+            return super()._new_conn()  # Let urllib3 raise its own resolution error
+        resolved = time.perf_counter()
+        
+        # Connect to the addresses just resolved so DNS and TCP connect are timed separately
+        dns_host = self._dns_host
+        try:
+            for index, address in enumerate(addresses):
+                self._dns_host = address
+                try:
+                    sock = super()._new_conn()
+                    break
+                except Exception:
+                    if dns_cache is not None:
+                        # The address may be gone; look the name up again on the next connection
+                        dns_cache.invalidate(dns_host)
+                    if index == len(addresses) - 1:
+                        raise
+        finally:
+            self._dns_host = dns_host
+        
+        phases = _probe_phases()
+        phases['dns'] = resolved - started
+        phases['connect'] = time.perf_counter() - resolved
+        return sock
+    
+    def connect(self):
+        started = time.perf_counter()
+        super().connect()
+        self._fresh = True
+        
+        phases = _probe_phases()
+        if isinstance(self.sock, ssl.SSLSocket):
+            phases['tls'] = time.perf_counter() - started - phases.get('dns', 0.0) - phases.get('connect', 0.0)
+        # Plain HTTP connects inside request(), which must not count towards TTFB
+        self._request_started = time.perf_counter()
+    
+    def request(self, *args, **kwargs):
+        _probe_local.connection_reused = self.sock is not None and not self._fresh
+        # TLS 1.3 tickets arrive after the handshake, so refresh the cached session on reuse
+        if isinstance(self.sock, ssl.SSLSocket) and isinstance(self.sock.context, _ResumingSSLContext):
+            self.sock.context.remember(self.sock)
+        self._request_started = time.perf_counter()
+        try:
+            return super().request(*args, **kwargs)
+        finally:
+            # Plain HTTP connections connect lazily inside request()
+            self._fresh = False
+    
+    def getresponse(self, *args, **kwargs):
+        response = super().getresponse(*args, **kwargs)
+        _probe_phases()['ttfb'] = time.perf_counter() - self._request_started
+        return response
+
+
+class _TrackedHTTPConnection(_TrackedConnectionMixin, HTTPConnection):
+    pass
+
+
+class _TrackedHTTPSConnection(_TrackedConnectionMixin, HTTPSConnection):
+    pass
+
+
+class _TrackedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TrackedHTTPConnection
+
+
+class _TrackedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TrackedHTTPSConnection
+
+
+class _ProbeAdapter(HTTPAdapter):
+    """HTTP adapter whose pools use tracked connections and a TLS-resuming context.
+    
+    A request to an address with a Host header of another name is sent with
+    that name in TLS SNI as well, from a pool of its own.
+    """
+    
+    def __init__(self, ssl_context: ssl.SSLContext, **kwargs):
+        self.ssl_context = ssl_context
+        super().__init__(**kwargs)
+    
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs['ssl_context'] = self.ssl_context
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _TrackedHTTPConnectionPool,
+            'https': _TrackedHTTPSConnectionPool,
+        }
+    
+    def build_connection_pool_key_attributes(self, request, verify, cert=None):
+        host_params, pool_kwargs = super().build_connection_pool_key_attributes(request, verify, cert)
+        host = request.headers.get('Host')
+        if host and host_params['scheme'] == 'https':
+            # server_hostname is part of urllib3's pool key, so each name gets its own connections
+            pool_kwargs['server_hostname'] = urlsplit(f"//{host}").hostname
+        return host_params, pool_kwargs
+
+
+class ProbeSession:
+    """Persistent, pooled HTTP session shared by all health probes.
+    
+    Connections are kept alive between probes and TLS sessions are resumed
+    when a new connection has to be opened, so steady-state probes skip the
+    TCP and TLS handshakes. Connections that fail a probe are closed rather
+    than returned to the pool. With a DNS cache, host names are only resolved
+    again once their records expire.
+    """
+    
+    def __init__(self, pool_connections: int = DEFAULT_POOL_CONNECTIONS, pool_maxsize: int = DEFAULT_MAX_IN_FLIGHT,
+                 dns_cache: Optional[DNSCache] = None):
+        """Initialize the probe session.
+        
+        Args:
+            pool_connections: Number of per-host connection pools to keep (default: 10)
+            pool_maxsize: Maximum kept-alive connections per host (default: 20)
+            dns_cache: Cache resolving host names for new connections (default: resolve every time)
+        """
+        self.dns_cache = dns_cache
+        # Self-signed certificates are allowed for the demo, so verification is disabled
+        self.ssl_context = _ResumingSSLContext(ssl.PROTOCOL_TLS_CLIENT)
+        self.ssl_context.check_hostname = False
+        self.ssl_context.verify_mode = ssl.CERT_NONE
+        
+        self.session = requests.Session()
+        self.session.verify = False
+        adapter = _ProbeAdapter(
+            self.ssl_context,
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            max_retries=0
+        )
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        
+        self._lock = threading.Lock()
+        self.stats = {
+            'requests': 0,
+            'reused_connections': 0,
+            'new_connections': 0,
+            'tls_resumptions': 0,
+            'discarded_connections': 0,
+        }
+    
+    def get(self, url: str, timeout: float, host: Optional[str] = None) -> requests.Response:
+        """Issue a streaming GET over a pooled connection.
+        
+        The caller must close the returned response, or pass it to discard().
+        
+        Args:
+            url: URL to request
+            timeout: Request timeout in seconds
+            host: Host header and TLS server name, when the URL names an address rather than the host
+        """
+        _probe_local.__dict__.clear()
+        _probe_local.dns_cache = self.dns_cache
+        headers = {'headers': {'Host': host}} if host else {}
+        response = self.session.get(url, timeout=timeout, verify=False, stream=True, **headers)
+        
+        probe_stats = self.last_probe_stats()
+        with self._lock:
+            self.stats['requests'] += 1
+            if probe_stats['connection_reused']:
+                self.stats['reused_connections'] += 1
+            else:
+                self.stats['new_connections'] += 1
+            if probe_stats['tls_resumed']:
+                self.stats['tls_resumptions'] += 1
+        return response
+    
+    def last_probe_stats(self) -> Dict:
+        """Return connection stats and phase timings for the last request made on the calling thread."""
+        return {
+            'connection_reused': getattr(_probe_local, 'connection_reused', False),
+            'tls_resumed': getattr(_probe_local, 'tls_resumed', None),
+            'phases': dict(_probe_phases()),
+        }
+    
+    def release(self, response: requests.Response, drain_limit: int = DEFAULT_DRAIN_LIMIT):
+        """Finish with a response whose body may only have been partly read.
+        
+        If the unread remainder is small it is drained so the connection can
+        go back to the pool; otherwise closing the response drops the connection.
+        """
+        remaining = getattr(response.raw, 'length_remaining', None)
+        if isinstance(remaining, int) and 0 < remaining <= drain_limit:
+            response.raw.drain_conn()
+        response.close()
+    
+    def discard(self, response: requests.Response):
+        """Close the connection behind a failed response instead of returning it to the pool."""
+        connection = getattr(response.raw, 'connection', None)
+        if connection is not None:
+            if isinstance(connection.sock, ssl.SSLSocket):
+                # Don't resume a session from a connection we no longer trust
+                self.ssl_context.forget(connection.sock)
+            connection.close()
+            with self._lock:
+                self.stats['discarded_connections'] += 1
+        response.close()
+    
+    def close(self):
+        """Close all pooled connections."""
+        self.session.close()
+    
+    @staticmethod
+    def describe(probe_stats: Dict) -> str:
+        """Format per-probe connection stats for logging."""
+        description = 'connection reused' if probe_stats['connection_reused'] else 'new connection'
+        if probe_stats['tls_resumed'] is not None:
+            description += ', TLS resumed' if probe_stats['tls_resumed'] else ', full TLS handshake'
+        return description
+
+
+@dataclass
+class Endpoint:
+    """An endpoint probed by MultiEndpointMonitor, with its own schedule and failure state.
+    
+    Unset content matcher, failure threshold and tag selector fall back to the monitor's own.
+    """
+    url: str
+    interval: float = 10
+    timeout: float = DEFAULT_TIMEOUT
+    consecutive_failures: int = 0
+    name: Optional[str] = None
+    content_matcher: Optional[ContentMatcher] = None
+    failure_threshold: Optional[int] = None
+    tag_key: Optional[str] = None
+    tag_value: Optional[str] = None
+    # Cleared when a config reload removes the endpoint, which ends its probe loop
+    active: bool = True
+    
+    @classmethod
+    def from_check(cls, check: CheckConfig) -> 'Endpoint':
+        """Create an endpoint from a check declared in a config file."""
+        return cls(
+            check.url, interval=check.interval, timeout=check.timeout, name=check.name,
+            content_matcher=check.content_matcher, failure_threshold=check.failure_threshold,
+            tag_key=check.tag_key, tag_value=check.tag_value
+        )
+    
+    @property
+    def key(self) -> str:
+        """Identity of the endpoint across config reloads."""
+        return self.name or self.url
+    
+    def settings(self) -> tuple:
+        """Return the configured settings, for spotting changes on reload."""
+        matcher = (self.content_matcher.describe(), self.content_matcher.max_bytes) if self.content_matcher else None
+        return (self.url, self.interval, self.timeout, self.failure_threshold, self.tag_key, self.tag_value, matcher)
 
 
 class HealthMonitor:
     """Monitor endpoint health and manage EC2 instances for auto-remediation."""
     
-    def __init__(self, endpoint: str, check_interval: int = 10):
+    def __init__(self, endpoint: str, check_interval: int = 10, timeout: float = DEFAULT_TIMEOUT,
+                 restart_batch_size: Optional[int] = None, inventory_ttl: float = DEFAULT_INVENTORY_TTL,
+                 instance_events_file: Optional[str] = None, remediation_scope: str = 'fleet',
+                 target_group_arn: Optional[str] = None, content_matcher: Optional[ContentMatcher] = None,
+                 recheck_interval: Optional[float] = None, max_interval: Optional[float] = None,
+                 jitter: float = DEFAULT_JITTER, history_file: Optional[str] = None,
+                 history_size: int = DEFAULT_HISTORY_CAPACITY, cluster: Optional[ClusterCoordinator] = None,
+                 remediation_workers: int = DEFAULT_REMEDIATION_WORKERS,
+                 restart_guard: Optional[RestartGuard] = None,
+                 remediation_ladder: Optional[RemediationLadder] = None,
+                 locations: Optional[List[Location]] = None, client_pool: Optional[ClientPool] = None,
+                 health_policy: Optional[HealthPolicy] = None, log_config: Optional[LogConfig] = None,
+                 deep_probe: bool = False, deep_probe_concurrency: int = DEFAULT_MAX_IN_FLIGHT,
+                 node_probe: bool = False, dns_cache_ttl: float = DEFAULT_DNS_TTL,
+                 paths: Optional[List[PathCheck]] = None):
         """Initialize the health monitor.
         
         Args:
             endpoint: The URL endpoint to monitor
             check_interval: Seconds between health checks (default: 10)
+            timeout: HTTP request timeout in seconds (default: 30)
+            restart_batch_size: Instances restarted together per rolling batch (default: half the fleet)
+            inventory_ttl: Seconds the instance inventory is cached between full describes (default: 300)
+            instance_events_file: Optional JSON-lines file of EventBridge EC2 state-change events
+            remediation_scope: 'fleet' to restart every web server, 'targets' to restart only unhealthy ones
+            target_group_arn: ALB target group used to find unhealthy targets (default: probe instances directly)
+            content_matcher: Expected page content (default: the "Deployed via SSM Document" string)
+            recheck_interval: Seconds before re-checking after a failure (default: a quarter of the interval)
+            max_interval: Longest interval once the endpoint is stable (default: the interval, so no back-off)
+            jitter: Random spread applied to every interval, as a fraction of it (default: 0.1)
+            history_file: Optional file recording every probe outcome, used to restore failure counts on restart
+            history_size: Probe outcomes kept in the history file (default: 100000)
+            cluster: Optional coordinator sharding endpoints and remediation leases across monitor nodes
+            remediation_workers: Remediation jobs that may run at once (default: 2)
+            restart_guard: Cooldowns, rate limits and circuit breaker applied to restarts (default: RestartGuard())
+            remediation_ladder: Remediation steps tried from cheapest to most thorough (default: all but replace)
+            locations: Regions and accounts to discover and remediate web servers in (default: AWS_REGION)
+            client_pool: AWS clients per location, with assumed-role credentials (default: a pool using boto3)
+            health_policy: When probe outcomes call for remediation (default: two consecutive failures)
+            log_config: Log file, rotation, format and sampling (default: LogConfig(), text to monitor.log)
+            deep_probe: Probe every web server directly each round instead of the endpoint itself
+            deep_probe_concurrency: Instances, or ALB nodes, probed directly at once (default: 20)
+            node_probe: Probe every address the endpoint's name resolves to each round instead of one of them
+            dns_cache_ttl: Seconds resolved addresses are kept when DNS gives no TTL; 0 disables the cache (default: 60)
+            paths: Paths of each endpoint's host checked together over one HTTP/2 connection, instead of its URL
         """
+        if remediation_scope not in REMEDIATION_SCOPES:
+            raise ValueError(f"remediation_scope must be one of {REMEDIATION_SCOPES}")
+        if deep_probe_concurrency < 1:
+            raise ValueError("deep_probe_concurrency must be at least 1")
+        if deep_probe and node_probe:
+            raise ValueError("deep_probe and node_probe cannot be combined")
+        if dns_cache_ttl < 0:
+            raise ValueError("dns_cache_ttl must not be negative")
+        if paths and (deep_probe or node_probe):
+            raise ValueError("paths cannot be combined with deep_probe or node_probe")
+        if paths:
+            require_httpx()
+        if remediation_ladder is not None and 'replace' in remediation_ladder.steps and not target_group_arn:
+            raise ValueError("the replace remediation step needs target_group_arn")
+        
         self.endpoint = endpoint
         self.check_interval = check_interval
+        self.timeout = timeout
         self.consecutive_failures = 0
         self.running = True
+        self.restart_batch_size = restart_batch_size
+        self.remediation_scope = remediation_scope
+        self.target_group_arn = target_group_arn
+        self.content_matcher = content_matcher or ContentMatcher()
+        self.recheck_interval = recheck_interval
+        self.max_interval = max_interval
+        self.jitter = jitter
+        self.deep_probe = deep_probe
+        self.deep_probe_concurrency = deep_probe_concurrency
+        self.node_probe = node_probe
+        self.dns_cache = DNSCache(dns_cache_ttl) if dns_cache_ttl else None
+        self.probe_session = self._create_probe_session()
+        self.metrics = MonitorMetrics()
+        self.remediation = RemediationPool(
+            self._remediate, workers=remediation_workers, listener=self._remediation_job_changed
+        )
+        self.restart_guard = restart_guard or RestartGuard()
+        self.remediation_ladder = remediation_ladder or RemediationLadder()
+        # How each endpoint last failed, which decides the first remediation step
+        self.last_failure: Dict[str, str] = {}
+        # How long each endpoint's last probe took, fed to the health evaluators
+        self.last_latency: Dict[str, float] = {}
+        self.health_policy = health_policy or HealthPolicy()
+        self.evaluator = self.health_policy.create()
+        # Health of each instance, and each ALB node, behind each endpoint from the last round of direct probes
+        self.instance_health: Dict[str, Dict[str, bool]] = {}
+        self.node_health: Dict[str, Dict[str, bool]] = {}
+        self.paths = list(paths or [])
+        # Results of each endpoint's last round of path probes, by path
+        self.path_results: Dict[str, Dict[str, PathResult]] = {}
+        self._path_probers: Dict[str, PathProber] = {}
+        self._path_probers_lock = threading.Lock()
+        self._instance_probe_pool: Optional[ThreadPoolExecutor] = None
+        self._instance_probe_pool_lock = threading.Lock()
+        self._cluster_lease_users = 0
+        self._cluster_lease_guard = threading.Lock()
+        self.metrics_server: Optional[MetricsServer] = None
+        self.history = ProbeHistory(history_file, history_size) if history_file else None
+        self.cluster = cluster
+        self._owned_endpoints: Dict[str, bool] = {}
         
-        # AWS setup
-        self.region = os.environ.get('AWS_REGION', os.environ.get('AWS_DEFAULT_REGION', 'us-east-1'))
-        self.ec2_client = boto3.client('ec2', region_name=self.region)
+        # AWS setup; clients are created when first used, so a healthy endpoint never needs them
+        region = os.environ.get('AWS_REGION', os.environ.get('AWS_DEFAULT_REGION', 'us-east-1'))
+        self.locations = list(locations or [Location(region)])
+        self.region = self.locations[0].region
+        self.client_pool = client_pool or ClientPool(lambda service, **kwargs: boto3.client(service, **kwargs))
+        # Where each discovered instance lives, so remediation calls go to its region and account
+        self._instance_locations: Dict[str, Location] = {}
+        self.inventory = self._create_inventory('Role', 'web-server', inventory_ttl, instance_events_file)
         
         # Setup logging
+        self.log_pipeline = LogPipeline(log_config)
         self._setup_logging()
         
         # Setup signal handlers for graceful shutdown
         signal.signal(signal.SIGINT, self._signal_handler)
         signal.signal(signal.SIGTERM, self._signal_handler)
         
-        self.logger.info(f"Health monitor initialized for endpoint: {self.endpoint}")
+        self._log_configuration()
+        self._restore_failure_state()
+    
+    def _aws_client(self, service: str, location: Optional[Location] = None):
+        """Return the boto3 client for a service in a location (default: the first), creating it on first use."""
+        return self.client_pool.client(service, location or self.locations[0])
+    
+    @property
+    def ec2_client(self):
+        return self._aws_client('ec2')
+    
+    @ec2_client.setter
+    def ec2_client(self, client):
+        self.client_pool.put('ec2', self.locations[0], client)
+    
+    @property
+    def elbv2_client(self):
+        return self._aws_client('elbv2')
+    
+    @elbv2_client.setter
+    def elbv2_client(self, client):
+        self.client_pool.put('elbv2', self.locations[0], client)
+    
+    @property
+    def ssm_client(self):
+        return self._aws_client('ssm')
+    
+    @ssm_client.setter
+    def ssm_client(self, client):
+        self.client_pool.put('ssm', self.locations[0], client)
+    
+    def _create_inventory(self, tag_key: str, tag_value: str, ttl: float, events_file: Optional[str]):
+        """Create the inventory of instances carrying a tag, across every monitored location."""
+        inventories = [
+            InstanceInventory(
+                _DeferredClient(lambda location=location: self._aws_client('ec2', location)),
+                tag_key=tag_key, tag_value=tag_value, ttl=ttl, events_file=events_file, location=location
+            )
+            for location in self.locations
+        ]
+        return inventories[0] if len(inventories) == 1 else FleetInventory(inventories)
+    
+    def _group_by_location(self, instance_ids: List[str]) -> Dict[Location, List[str]]:
+        """Split instances by the region and account they live in, keeping their order."""
+        groups: Dict[Location, List[str]] = {}
+        for instance_id in instance_ids:
+            location = self._instance_locations.get(instance_id, self.locations[0])
+            groups.setdefault(location, []).append(instance_id)
+        return groups
+    
+    def start_metrics_server(self, port: int, address: str = '') -> MetricsServer:
+        """Serve Prometheus metrics on http://<address>:<port>/metrics.
+        
+        Args:
+            port: Port to listen on (0 picks a free port)
+            address: Address to bind (default: all interfaces)
+        """
+        self.metrics_server = MetricsServer(
+            self.metrics.registry, port, address, pages={'/remediation': self.remediation.status}
+        )
+        return self.metrics_server
+    
+    def _create_scheduler(self, interval: float) -> ProbeScheduler:
+        """Create the adaptive scheduler for an endpoint probed every ``interval`` seconds."""
+        return ProbeScheduler(
+            interval,
+            recheck_interval=self.recheck_interval,
+            max_interval=self.max_interval,
+            jitter=self.jitter
+        )
+    
+    @property
+    def _probes_directly(self) -> bool:
+        return self.deep_probe or self.node_probe
+    
+    def _create_probe_session(self) -> ProbeSession:
+        """Create the pooled HTTP session used for health probes."""
+        pools = 1 + (DIRECT_PROBE_POOL_CONNECTIONS if self._probes_directly else 0)
+        return ProbeSession(pool_connections=pools, dns_cache=self.dns_cache)
+    
+    def _log_configuration(self):
+        """Log the monitor configuration at startup."""
+        self._log_checks()
         self.logger.info(f"AWS Region: {self.region}")
-        self.logger.info(f"Check interval: {self.check_interval} seconds")
+        self.logger.info(f"Restart batch size: {self.restart_batch_size or 'half the fleet'}")
+        self.logger.info(f"Instance inventory TTL: {self.inventory.ttl} seconds")
+        self.logger.info(f"Instance locations: {', '.join(str(location) for location in self.locations)}")
+        self.logger.info(f"Remediation scope: {self.remediation_scope}")
+        if self.deep_probe:
+            self.logger.info(f"Deep probing: every web server directly, {self.deep_probe_concurrency} at a time")
+        if self.node_probe:
+            self.logger.info(f"Node probing: every ALB node directly, {self.deep_probe_concurrency} at a time")
+        if self.paths:
+            self.logger.info(f"Paths checked over one HTTP/2 connection: "
+                             f"{', '.join(check.path for check in self.paths)}")
+        self.logger.info(f"Restart limits: {self.restart_guard.describe()}")
+        self.logger.info(f"Remediation steps: {self.remediation_ladder.describe()}")
+        self.logger.info(f"Expected content: {self.content_matcher.describe()}")
+        self.logger.info(f"Remediate after: {self.health_policy.describe()}")
+        if self.history is not None:
+            self.logger.info(f"Probe history: {self.history.path} ({self.history.capacity} records)")
+        if self.cluster is not None:
+            self.logger.info(f"Cluster node: {self.cluster.node_id} (lease TTL: {self.cluster.lease_ttl}s)")
+    
+    def _log_checks(self):
+        """Log what is probed and how often."""
+        self.logger.info(f"Health monitor initialized for endpoint: {self.endpoint}")
+        scheduler = self._create_scheduler(self.check_interval)
+        backoff = f", up to {scheduler.max_interval}s while stable" if scheduler.max_interval > self.check_interval else ''
+        self.logger.info(f"Check interval: {self.check_interval} seconds "
+                         f"(re-check after failure: {scheduler.recheck_interval}s{backoff})")
+    
+    def _restore_failure_state(self):
+        """Resume the consecutive failure count recorded before the last restart."""
+        if self.history is None:
+            return
+        self.consecutive_failures = self.history.consecutive_failures(self.endpoint)
+        self.evaluator.restore(self.consecutive_failures)
+        self.metrics.set_consecutive_failures(self.endpoint, self.consecutive_failures)
+        if self.consecutive_failures:
+            self.logger.warning(f"Restored {self.consecutive_failures} consecutive failure(s) from probe history")
+    
+    def _owns_endpoint(self, endpoint: str) -> bool:
+        """Return True if this node should probe an endpoint, logging hand-overs between nodes."""
+        if self.cluster is None:
+            return True
+        owned = self.cluster.owns(endpoint)
+        if self._owned_endpoints.get(endpoint) != owned:
+            self._owned_endpoints[endpoint] = owned
+            if owned:
+                self.logger.info(f"Probing {endpoint} on this node")
+            else:
+                self.logger.info(f"Endpoint {endpoint} is probed by cluster node {self.cluster.ring.node_for(endpoint)}")
+        return owned
     
     def _setup_logging(self):
-        """Configure logging with timestamps and proper formatting."""
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(levelname)s - %(message)s',
-            handlers=[
-                logging.StreamHandler(sys.stdout),
-                logging.FileHandler('monitor.log')
-            ]
-        )
+        """Configure logging through a background queue, unless the application already configured it."""
+        self.log_pipeline.start()
         self.logger = logging.getLogger(__name__)
     
     def _signal_handler(self, signum, frame):
@@ -73,75 +712,440 @@ class HealthMonitor:
         self.logger.info(f"Received signal {signum}, shutting down gracefully...")
         self.running = False
     
-    def check_endpoint_health(self) -> bool:
+    def check_endpoint_health(self, endpoint: Optional[str] = None, timeout: Optional[float] = None,
+                              content_matcher: Optional[ContentMatcher] = None, host: Optional[str] = None,
+                              record: bool = True) -> bool:
         """Check if the endpoint is healthy.
         
+        Args:
+            endpoint: URL to probe (default: the monitor's own endpoint)
+            timeout: HTTP request timeout in seconds (default: the monitor's timeout)
+            content_matcher: Expected content (default: the one configured for the endpoint)
+            host: Host header and TLS server name, when the URL names an instance address (default: the URL's host)
+            record: Record the probe in the metrics and history; direct probes of addresses are
+                recorded as a round of their endpoint instead
+        
         Returns:
             True if endpoint responds successfully and contains expected content, False otherwise
         """
+        endpoint = endpoint or self.endpoint
+        timeout = timeout if timeout is not None else self.timeout
+        content_matcher = content_matcher or self._content_matcher_for(endpoint)
+        started = time.perf_counter()
+        healthy = False
+        matched = False
+        status = 0
+        error = None
+        phases = {}
         try:
-            response = requests.get(
-                self.endpoint,
-                timeout=30,
-                verify=False  # Allow self-signed certificates for demo
-            )
+            response = self.probe_session.get(endpoint, timeout, host=host)
+            status = response.status_code
+            probe_stats = self.probe_session.last_probe_stats()
+            phases = probe_stats['phases']
+            connection = ProbeSession.describe(probe_stats)
             
-            if response.status_code == 200:
-                # Check if the response contains the expected SSM deployment string
-                if "Deployed via SSM Document" in response.text:
-                    self.logger.info(f"✓ Endpoint healthy - Status: {response.status_code}, SSM deployment confirmed")
-                    return True
+            try:
+                if response.status_code == 200:
+                    # Stream the body until the expected content is found or the byte limit is hit
+                    body_started = time.perf_counter()
+                    result = content_matcher.match_stream(
+                        response.iter_content(chunk_size=content_matcher.chunk_size)
+                    )
+                    phases['body'] = time.perf_counter() - body_started
+                    matched = result.matched
+                    if result.matched:
+                        # One line per healthy probe: formatted off the probe thread, and sampled if configured
+                        self.logger.info(
+                            "✓ Endpoint healthy (%s) - Status: %s, expected content confirmed after %d bytes (%s)",
+                            endpoint, status, result.bytes_read, connection,
+                            extra=self._probe_log_fields(endpoint, status, started, sample=True)
+                        )
+                        healthy = True
+                    elif result.truncated:
+                        self.logger.warning(
+                            "✗ Endpoint unhealthy (%s) - Status: %s, but %s not found in the first %d bytes (%s)",
+                            endpoint, status, ', '.join(repr(m) for m in result.missing), result.bytes_read, connection,
+                            extra=self._probe_log_fields(endpoint, status, started)
+                        )
+                    else:
+                        self.logger.warning(
+                            "✗ Endpoint unhealthy (%s) - Status: %s, but missing %s (%s)",
+                            endpoint, status, ', '.join(repr(m) for m in result.missing), connection,
+                            extra=self._probe_log_fields(endpoint, status, started)
+                        )
+                    self.probe_session.release(response)
                 else:
-                    self.logger.warning(f"✗ Endpoint unhealthy - Status: {response.status_code}, but missing 'Deployed via SSM Document' string")
-                    return False
-            else:
-                self.logger.warning(f"✗ Endpoint unhealthy - Status: {response.status_code}")
-                return False
+                    # Drop the connection before the body is read so it is never reused
+                    self.probe_session.discard(response)
+                    self.logger.warning("✗ Endpoint unhealthy (%s) - Status: %s (%s)", endpoint, status, connection,
+                                        extra=self._probe_log_fields(endpoint, status, started))
+            finally:
+                response.close()
                 
         except requests.exceptions.RequestException as e:
-            self.logger.error(f"✗ Endpoint check failed: {str(e)}")
-            return False
+            # urllib3 closes connections that raise, so they never return to the pool
+            self.logger.error("✗ Endpoint check failed (%s): %s", endpoint, str(e),
+                              extra=self._probe_log_fields(endpoint, status, started))
+            error = e
+        
+        if healthy:
+            self.last_failure.pop(endpoint, None)
+        else:
+            self.last_failure[endpoint] = classify_failure(status, error)
+        duration = time.perf_counter() - started
+        self.last_latency[endpoint] = duration
+        if record:
+            self.metrics.observe_probe(endpoint, healthy, duration, phases)
+            if self.history is not None:
+                self.history.append(endpoint, status, duration, healthy=healthy, matched=matched)
+        return healthy
+    
+    @staticmethod
+    def _probe_log_fields(endpoint: str, status: int, started: float, sample: bool = False) -> Dict:
+        """Return the structured fields of a probe's log line.
+        
+        Args:
+            endpoint: The probed URL
+            status: HTTP status of the response, or 0 if there was none
+            started: perf_counter() time the probe started
+            sample: Whether the line is one of a repetitive series that may be sampled
+        """
+        fields = {'endpoint': endpoint, 'status': status, 'latency': round(time.perf_counter() - started, 6)}
+        if sample:
+            fields['sample'] = f"healthy:{endpoint}"
+        return fields
     
-    def get_web_server_instances(self) -> List[Dict]:
+    def _content_matcher_for(self, endpoint: Optional[str]) -> ContentMatcher:
+        """Return the expected content of a monitored endpoint."""
+        return self.content_matcher
+    
+    def _inventory_for(self, source: Optional[str]) -> InstanceInventory:
+        """Return the inventory of the instances serving a monitored endpoint."""
+        return self.inventory
+    
+    def get_web_server_instances(self, refresh_states: bool = False, source: Optional[str] = None) -> List[Dict]:
         """Get all EC2 instances with Role=web-server tag.
         
+        Instances come from the cached inventory; a full paginated describe
+        only runs when the cache is cold or past its TTL.
+        
+        Args:
+            refresh_states: Refresh instance states of a warm cache before returning
+            source: Monitored endpoint whose instances are wanted (default: the monitor's own)
+        
         Returns:
             List of instance dictionaries with relevant information
         """
         try:
-            response = self.ec2_client.describe_instances(
-                Filters=[
-                    {
-                        'Name': 'tag:Role',
-                        'Values': ['web-server']
-                    },
-                    {
-                        'Name': 'instance-state-name',
-                        'Values': ['running', 'stopped', 'stopping']
-                    }
-                ]
-            )
-            
-            instances = []
-            for reservation in response['Reservations']:
-                for instance in reservation['Instances']:
-                    # Extract relevant instance information
-                    instance_info = {
-                        'instance_id': instance['InstanceId'],
-                        'state': instance['State']['Name'],
-                        'launch_time': instance.get('LaunchTime'),
-                        'private_ip': instance.get('PrivateIpAddress'),
-                        'public_ip': instance.get('PublicIpAddress'),
-                        'tags': {tag['Key']: tag['Value'] for tag in instance.get('Tags', [])}
-                    }
-                    instances.append(instance_info)
-            
+            instances = self._inventory_for(source).instances(refresh_states=refresh_states)
+            for instance in instances:
+                if instance.get('location') is not None:
+                    self._instance_locations[instance['instance_id']] = instance['location']
             return instances
             
         except Exception as e:
             self.logger.error(f"Failed to get web server instances: {str(e)}")
             return []
     
+    def _instance_url(self, address: str, source: Optional[str] = None) -> str:
+        """Return the monitored URL with its host replaced by an instance address."""
+        parts = urlsplit(source or self.endpoint)
+        if ':' in address:
+            address = f"[{address}]"
+        netloc = f"{address}:{parts.port}" if parts.port else address
+        return urlunsplit((parts.scheme, netloc, parts.path, parts.query, parts.fragment))
+    
+    def _unhealthy_target_ids(self) -> Set[str]:
+        """Return the IDs of targets the ALB reports as unhealthy."""
+        response = self.elbv2_client.describe_target_health(TargetGroupArn=self.target_group_arn)
+        unhealthy = set()
+        for description in response['TargetHealthDescriptions']:
+            target_id = description['Target']['Id']
+            state = description['TargetHealth']['State']
+            if state in UNHEALTHY_TARGET_STATES:
+                reason = description['TargetHealth'].get('Reason', 'unknown')
+                self.logger.warning(f"Target {target_id} is {state} ({reason})")
+                unhealthy.add(target_id)
+        return unhealthy
+    
+    def _instance_probe_executor(self) -> ThreadPoolExecutor:
+        """Return the thread pool that bounds how many instances are probed directly at once."""
+        with self._instance_probe_pool_lock:
+            if self._instance_probe_pool is None:
+                self._instance_probe_pool = ThreadPoolExecutor(
+                    max_workers=self.deep_probe_concurrency, thread_name_prefix='instance-probe'
+                )
+            return self._instance_probe_pool
+    
+    def _probe_addresses(self, targets: Dict[str, str], endpoint: str,
+                         timeout: Optional[float] = None) -> Dict[str, Dict]:
+        """Probe URLs naming addresses concurrently, with the endpoint's host name and expected content.
+        
+        Args:
+            targets: URL to probe for each key
+            endpoint: Monitored endpoint whose host name and expected content are used
+            timeout: HTTP request timeout in seconds (default: the monitor's timeout)
+        
+        Returns:
+            The URL probed and the result ('healthy', 'latency', 'failure') for each key
+        """
+        host = urlsplit(endpoint).netloc
+        content_matcher = self._content_matcher_for(endpoint)
+        executor = self._instance_probe_executor()
+        futures = {
+            key: executor.submit(
+                self.check_endpoint_health, url, timeout=timeout, content_matcher=content_matcher, host=host,
+                record=False
+            )
+            for key, url in targets.items()
+        }
+        # Addresses come and go with the fleet, so nothing is kept under their URLs
+        return {
+            key: {
+                'url': targets[key],
+                'healthy': future.result(),
+                'latency': self.last_latency.pop(targets[key], None),
+                'failure': self.last_failure.pop(targets[key], None),
+            }
+            for key, future in futures.items()
+        }
+    
+    def probe_instances(self, instances: List[Dict], source: Optional[str] = None,
+                        timeout: Optional[float] = None) -> Dict[str, Dict]:
+        """Probe each running instance's own address concurrently.
+        
+        Requests go to the instance's private IP (or public IP if it has no
+        private one) on the endpoint's scheme, port and path, with the
+        endpoint's host name in the Host header and TLS SNI, so each instance
+        is asked exactly what the ALB would have forwarded to it.
+        
+        Args:
+            instances: Instances to probe; those not running or without an address are skipped
+            source: Monitored endpoint whose host, path and expected content are used (default: the monitor's own)
+            timeout: HTTP request timeout in seconds (default: the monitor's timeout)
+        
+        Returns:
+            The URL probed and the result ('healthy', 'latency', 'failure') for each instance ID
+        """
+        endpoint = source or self.endpoint
+        targets = {}
+        for instance in instances:
+            address = instance.get('private_ip') or instance.get('public_ip')
+            if instance['state'] == 'running' and address:
+                targets[instance['instance_id']] = self._instance_url(address, endpoint)
+        if not targets:
+            return {}
+        return self._probe_addresses(targets, endpoint, timeout)
+    
+    def _probe_instances_directly(self, instances: List[Dict], source: Optional[str] = None) -> Set[str]:
+        """Probe each running instance's own address concurrently and return the IDs that fail.
+        
+        Args:
+            instances: Instances to probe
+            source: Monitored endpoint whose path and expected content are used (default: the monitor's own)
+        """
+        results = self.probe_instances(instances, source)
+        return {instance_id for instance_id, result in results.items() if not result['healthy']}
+    
+    def _record_round(self, endpoint: str, results: Dict[str, Dict], kind: str, started: float) -> bool:
+        """Log and record a round of direct probes as one probe of the endpoint.
+        
+        Args:
+            endpoint: Monitored endpoint
+            results: Results of probe_instances() or probe_alb_nodes()
+            kind: What was probed, for logging ('instance', 'ALB node')
+            started: perf_counter() value when the round started
+        
+        Returns:
+            True if every probe of the round passed
+        """
+        unhealthy = sorted(key for key, result in results.items() if not result['healthy'])
+        healthy = not unhealthy
+        if healthy:
+            self.last_failure.pop(endpoint, None)
+            self.logger.info("✓ All %d %s(s) of %s healthy", len(results), kind, endpoint,
+                             extra={'endpoint': endpoint, 'sample': f"healthy:{endpoint}"})
+        else:
+            # The first step of a remediation follows how the probes failed
+            self.last_failure[endpoint] = results[unhealthy[0]]['failure']
+            extra = {'endpoint': endpoint}
+            if kind == 'instance':
+                extra['instance_ids'] = unhealthy
+            self.logger.warning(f"✗ {len(unhealthy)} of {len(results)} {kind}(s) of {endpoint} unhealthy: "
+                                f"{', '.join(unhealthy)}", extra=extra)
+        # The slowest probe stands for the round's latency
+        latencies = [result['latency'] for result in results.values() if result['latency'] is not None]
+        self.last_latency[endpoint] = max(latencies) if latencies else time.perf_counter() - started
+        duration = time.perf_counter() - started
+        self.metrics.observe_probe(endpoint, healthy, duration, {})
+        if self.history is not None:
+            self.history.append(endpoint, 200 if healthy else 0, duration, healthy=healthy, matched=healthy)
+        return healthy
+    
+    def deep_check(self, endpoint: Optional[str] = None, timeout: Optional[float] = None) -> bool:
+        """Probe every web server behind an endpoint directly, in one concurrent round.
+        
+        Probing through the ALB samples one target per probe, so a partly
+        failed fleet only shows as intermittent failures. Probing every
+        instance finds each unhealthy one in a single round. If no instance
+        can be probed directly, the endpoint itself is probed instead.
+        
+        Args:
+            endpoint: Monitored endpoint (default: the monitor's own)
+            timeout: HTTP request timeout in seconds (default: the monitor's timeout)
+        
+        Returns:
+            True if every instance is healthy
+        """
+        endpoint = endpoint or self.endpoint
+        started = time.perf_counter()
+        results = self.probe_instances(self.get_web_server_instances(source=endpoint), endpoint, timeout)
+        if not results:
+            self.logger.warning(f"No web server instance of {endpoint} can be probed directly - probing the endpoint")
+            return self.check_endpoint_health(endpoint, timeout)
+        
+        self.instance_health[endpoint] = {instance_id: result['healthy'] for instance_id, result in results.items()}
+        self.metrics.set_instance_health(endpoint, self.instance_health[endpoint])
+        return self._record_round(endpoint, results, 'instance', started)
+    
+    def probe_alb_nodes(self, endpoint: Optional[str] = None, timeout: Optional[float] = None) -> Dict[str, Dict]:
+        """Probe every address the endpoint's name resolves to concurrently.
+        
+        The ALB's name resolves to its nodes, one or more per availability
+        zone. Each is probed with the endpoint's host name in the Host header
+        and TLS SNI. Addresses come from the DNS cache, so they are only
+        looked up again once their records expire.
+        
+        Args:
+            endpoint: Monitored endpoint (default: the monitor's own)
+            timeout: HTTP request timeout in seconds (default: the monitor's timeout)
+        
+        Returns:
+            The URL probed and the result ('healthy', 'latency', 'failure') for each node address
+        
+        Raises:
+            socket.gaierror: If the endpoint's name does not resolve
+        """
+        endpoint = endpoint or self.endpoint
+        hostname = urlsplit(endpoint).hostname
+        addresses = self.dns_cache.resolve(hostname) if self.dns_cache else [
+            info[4][0] for info in socket.getaddrinfo(hostname, None, 0, socket.SOCK_STREAM)
+        ]
+        targets = {address: self._instance_url(address, endpoint) for address in addresses}
+        return self._probe_addresses(targets, endpoint, timeout)
+    
+    def node_check(self, endpoint: Optional[str] = None, timeout: Optional[float] = None) -> bool:
+        """Probe every ALB node behind an endpoint, in one concurrent round.
+        
+        A probe through the ALB's name reaches whichever node it resolves to,
+        so one failing node only shows as occasional failures. If the name
+        does not resolve, the endpoint is probed as usual so the failure is
+        reported the same way.
+        
+        Args:
+            endpoint: Monitored endpoint (default: the monitor's own)
+            timeout: HTTP request timeout in seconds (default: the monitor's timeout)
+        
+        Returns:
+            True if every node is healthy
+        """
+        endpoint = endpoint or self.endpoint
+        started = time.perf_counter()
+        try:
+            results = self.probe_alb_nodes(endpoint, timeout)
+        except OSError as e:
+            self.logger.warning(f"Could not resolve the ALB nodes of {endpoint}: {e} - probing the endpoint")
+            return self.check_endpoint_health(endpoint, timeout)
+        
+        self.node_health[endpoint] = {address: result['healthy'] for address, result in results.items()}
+        self.metrics.set_node_health(endpoint, self.node_health[endpoint])
+        return self._record_round(endpoint, results, 'ALB node', started)
+    
+    def _path_prober(self, endpoint: str, timeout: float) -> PathProber:
+        """Return the endpoint's path prober, holding its HTTP/2 connection between rounds."""
+        with self._path_probers_lock:
+            prober = self._path_probers.get(endpoint)
+            if prober is None:
+                prober = self._path_probers[endpoint] = PathProber(endpoint, self.paths, timeout)
+            return prober
+    
+    def path_check(self, endpoint: Optional[str] = None, timeout: Optional[float] = None) -> bool:
+        """Probe every configured path of an endpoint's host at once, as streams of one HTTP/2 connection.
+        
+        Args:
+            endpoint: Monitored endpoint whose scheme, host and port are probed (default: the monitor's own)
+            timeout: HTTP request timeout in seconds (default: the monitor's timeout)
+        
+        Returns:
+            True if every path is healthy
+        """
+        endpoint = endpoint or self.endpoint
+        timeout = timeout if timeout is not None else self.timeout
+        started = time.perf_counter()
+        round_result = self._path_prober(endpoint, timeout).probe()
+        self.path_results[endpoint] = round_result.results
+        
+        for result in round_result.results.values():
+            self.metrics.observe_path(endpoint, result.path, result.healthy, result.latency)
+            if result.healthy:
+                continue
+            if result.error:
+                detail = result.error
+            elif result.missing:
+                detail = f"Status: {result.status}, but missing {', '.join(repr(m) for m in result.missing)}"
+            else:
+                detail = f"Status: {result.status}"
+            self.logger.warning("✗ Path unhealthy (%s%s) - %s (%s)", endpoint.rstrip('/'), result.path, detail,
+                                result.http_version or 'no response',
+                                extra={'endpoint': endpoint, 'status': result.status,
+                                       'latency': round(result.latency, 6)})
+        self.logger.debug(f"Path round of {endpoint}: {len(round_result.results)} path(s), "
+                          f"{round_result.new_connections} new connection(s), "
+                          f"{round_result.tls_handshakes} TLS handshake(s)")
+        results = {
+            path: {'healthy': result.healthy, 'latency': result.latency, 'failure': result.failure}
+            for path, result in round_result.results.items()
+        }
+        return self._record_round(endpoint, results, 'path', started)
+    
+    def _round_probe(self) -> Callable[..., bool]:
+        """Return the check run each round: one probe, or a round of direct probes."""
+        if self.paths:
+            return self.path_check
+        if self.deep_probe:
+            return self.deep_check
+        if self.node_probe:
+            return self.node_check
+        return self.check_endpoint_health
+    
+    def get_unhealthy_instances(self, instances: List[Dict], source: Optional[str] = None) -> List[Dict]:
+        """Narrow a list of web servers down to the ones that need a restart.
+        
+        Unhealthy targets come from the ALB target group when one is
+        configured, otherwise from probing each instance directly. Stopped
+        instances always need a restart.
+        
+        Args:
+            instances: Web server instances, as returned by get_web_server_instances
+            source: Monitored endpoint the instances serve (default: the monitor's own)
+        
+        Returns:
+            The subset of instances to restart
+        """
+        unhealthy_ids = None
+        if self.target_group_arn:
+            try:
+                unhealthy_ids = self._unhealthy_target_ids()
+            except Exception as e:
+                self.logger.error(f"Failed to describe target health, probing instances directly: {str(e)}")
+        if unhealthy_ids is None:
+            unhealthy_ids = self._probe_instances_directly(instances, source)
+        
+        return [
+            instance for instance in instances
+            if instance['instance_id'] in unhealthy_ids or instance['state'] == 'stopped'
+        ]
+    
     def restart_instance(self, instance_id: str) -> bool:
         """Restart a specific EC2 instance.
         
@@ -151,94 +1155,592 @@ class HealthMonitor:
         Returns:
             True if restart was initiated successfully, False otherwise
         """
+        return self.restart_instances([instance_id])
+    
+    def restart_instances(self, instance_ids: List[str]) -> bool:
+        """Restart a batch of EC2 instances together.
+        
+        The whole batch is stopped with one API call, waited on with a single
+        multi-instance waiter, then started and waited on the same way.
+        
+        Args:
+            instance_ids: The EC2 instance IDs to restart
+            
+        Returns:
+            True if every instance in the batch restarted successfully, False otherwise
+        """
+        batch = ', '.join(instance_ids)
         try:
-            self.logger.info(f"Attempting to restart instance: {instance_id}")
+            self.logger.info(f"Attempting to restart instance(s): {batch}", extra={'instance_ids': instance_ids})
             
-            # Stop the instance first
-            self.ec2_client.stop_instances(InstanceIds=[instance_id])
-            self.logger.info(f"Stop command sent for instance: {instance_id}")
+            # Each region and account gets its own calls; they are all sent before waiting on any
+            groups = self._group_by_location(instance_ids)
             
-            # Wait for instance to stop
-            waiter = self.ec2_client.get_waiter('instance_stopped')
-            self.logger.info(f"Waiting for instance {instance_id} to stop...")
-            waiter.wait(
-                InstanceIds=[instance_id],
-                WaiterConfig={'Delay': 15, 'MaxAttempts': 20}
-            )
+            # Stop the instances first
+            for location, ids in groups.items():
+                self._aws_client('ec2', location).stop_instances(InstanceIds=ids)
+            self.logger.info(f"Stop command sent for instance(s): {batch}")
             
-            # Start the instance
-            self.ec2_client.start_instances(InstanceIds=[instance_id])
-            self.logger.info(f"Start command sent for instance: {instance_id}")
+            # Wait for the instances to stop
+            self.logger.info(f"Waiting for instance(s) {batch} to stop...")
+            for location, ids in groups.items():
+                self._wait_for_instances('instance_stopped', ids, location)
             
-            # Wait for instance to be running
-            waiter = self.ec2_client.get_waiter('instance_running')
-            self.logger.info(f"Waiting for instance {instance_id} to start...")
-            waiter.wait(
-                InstanceIds=[instance_id],
-                WaiterConfig={'Delay': 15, 'MaxAttempts': 20}
-            )
+            # Start the instances
+            for location, ids in groups.items():
+                self._aws_client('ec2', location).start_instances(InstanceIds=ids)
+            self.logger.info(f"Start command sent for instance(s): {batch}")
             
-            self.logger.info(f"✓ Instance {instance_id} restarted successfully")
+            # Wait for the instances to be running
+            self.logger.info(f"Waiting for instance(s) {batch} to start...")
+            for location, ids in groups.items():
+                self._wait_for_instances('instance_running', ids, location)
+            
+            self.logger.info(f"✓ Instance(s) {batch} restarted successfully", extra={'instance_ids': instance_ids})
+            self.metrics.count_restarts(len(instance_ids), success=True)
             return True
             
         except Exception as e:
-            self.logger.error(f"✗ Failed to restart instance {instance_id}: {str(e)}")
+            self.logger.error(f"✗ Failed to restart instance(s) {batch}: {str(e)}", extra={'instance_ids': instance_ids})
+            self.metrics.count_restarts(len(instance_ids), success=False)
             return False
     
-    def restart_web_servers(self):
-        """Restart all web server instances."""
-        instances = self.get_web_server_instances()
-        
-        if not instances:
-            self.logger.warning("No web server instances found with Role=web-server tag")
-            return
+    def remediate_instances(self, instance_ids: List[str], failure_kind: Optional[str] = None,
+                            stopped: Set[str] = frozenset(), source: Optional[str] = None) -> bool:
+        """Remediate a batch of instances, escalating the ones that stay unhealthy to the next step.
         
-        self.logger.info(f"Found {len(instances)} web server instance(s) to restart")
+        Args:
+            instance_ids: The EC2 instance IDs to remediate
+            failure_kind: How the endpoint failed, which picks the first step (default: unknown, a full stop/start)
+            stopped: Instances that are stopped and can only be started
+            source: Monitored endpoint the instances serve (default: the monitor's own)
         
-        restart_count = 0
-        for instance in instances:
-            instance_id = instance['instance_id']
-            instance_state = instance['state']
-            
-            self.logger.info(f"Instance {instance_id} current state: {instance_state}")
-            
-            if instance_state in ['running', 'stopped']:
-                if self.restart_instance(instance_id):
-                    restart_count += 1
-            else:
-                self.logger.warning(f"Skipping instance {instance_id} in state: {instance_state}")
+        Returns:
+            True if every instance recovered, False otherwise
+        """
+        ladder = self.remediation_ladder
+        pending = ladder.first_steps(instance_ids, failure_kind, stopped)
+        recovered = True
+        for step in ladder.steps:
+            batch = [instance_id for instance_id in instance_ids if pending[instance_id] == step]
+            if not batch:
+                continue
+            failed = self._run_step(step, batch, source)
+            ladder.record(batch, step)
+            next_step = ladder.next_step(step)
+            if failed and next_step is None:
+                recovered = False
+            elif failed:
+                self.logger.warning(f"Instance(s) {', '.join(failed)} still unhealthy after {step} - escalating to {next_step}",
+                                    extra={'instance_ids': failed})
+                for instance_id in failed:
+                    pending[instance_id] = next_step
+        return recovered
+    
+    def _run_step(self, step: str, instance_ids: List[str], source: Optional[str] = None) -> List[str]:
+        """Run one remediation step on a batch and return the instances still unhealthy after it."""
+        batch = ', '.join(instance_ids)
+        self.logger.info(f"Remediation step {step} for instance(s): {batch}", extra={'instance_ids': instance_ids})
+        started = time.monotonic()
+        if step == 'replace':
+            # A replacement is only kept once it passed its checks, so there is no recovery to wait for
+            failed = self.replace_instances(instance_ids, source)
+        else:
+            try:
+                if step == 'stop-start':
+                    failed = [] if self.restart_instances(instance_ids) else list(instance_ids)
+                elif step == 'reboot':
+                    for location, ids in self._group_by_location(instance_ids).items():
+                        self._aws_client('ec2', location).reboot_instances(InstanceIds=ids)
+                    failed = []
+                else:
+                    failed = self._run_ssm_step(step, instance_ids)
+            except Exception as e:
+                self.logger.error(f"✗ Remediation step {step} failed for instance(s) {batch}: {str(e)}")
+                failed = list(instance_ids)
+            failed += self._await_recovery(
+                [instance_id for instance_id in instance_ids if instance_id not in failed], source, step, started
+            )
         
-        self.logger.info(f"Restart operation completed. Successfully restarted {restart_count} instances")
+        duration = time.monotonic() - started
+        recovered = len(instance_ids) - len(failed)
+        self.metrics.observe_remediation_step(step, duration, recovered, len(failed))
+        self.logger.info(f"Remediation step {step} finished after {duration:.1f} seconds: "
+                         f"{recovered} of {len(instance_ids)} instance(s) recovered")
+        return failed
     
-    def run(self):
-        """Main monitoring loop."""
-        self.logger.info("Starting health monitoring...")
+    def replace_instances(self, instance_ids: List[str], source: Optional[str] = None) -> List[str]:
+        """Replace instances with new ones launched from their configuration, all at once.
         
-        while self.running:
+        Each failed instance stays registered until its replacement passes a
+        direct probe and the target group's health check; see InstanceReplacer.
+        
+        Args:
+            instance_ids: The EC2 instance IDs to replace
+            source: Monitored endpoint the instances serve, whose check the replacements must pass
+        
+        Returns:
+            The instances that were not replaced
+        """
+        records = {instance['instance_id']: instance for instance in self.get_web_server_instances(source=source)}
+        ladder = self.remediation_ladder
+        
+        def replace(instance_id: str) -> ReplacementResult:
+            instance = records.get(instance_id)
+            if instance is None:
+                self.logger.error(f"✗ Cannot replace {instance_id}: it is not in the inventory",
+                                  extra={'instance_ids': [instance_id]})
+                return ReplacementResult(instance_id, error='not in the inventory')
+            replacer = InstanceReplacer(
+                self._aws_client('ec2', self._instance_locations.get(instance_id)), self.elbv2_client,
+                self.target_group_arn, probe=lambda record: self._probe_replacement(record, source),
+                timeout=ladder.step_timeout, poll_interval=ladder.poll_interval
+            )
+            return replacer.replace(instance)
+        
+        with ThreadPoolExecutor(max_workers=len(instance_ids), thread_name_prefix='replace') as executor:
+            results = list(executor.map(replace, instance_ids))
+        # Replacements have new IDs and addresses
+        self._inventory_for(source).invalidate()
+        for result in results:
+            self.metrics.count_replacement(result.replaced)
+        return [result.instance_id for result in results if not result.replaced]
+    
+    def _probe_replacement(self, record: Dict, source: Optional[str] = None) -> bool:
+        """Return whether a replacement passed a direct probe; one that cannot be probed yet has not."""
+        result = self.probe_instances([record], source).get(record['instance_id'])
+        return result is not None and result['healthy']
+    
+    def _run_ssm_step(self, step: str, instance_ids: List[str]) -> List[str]:
+        """Run an SSM command step and return the instances where the command did not succeed."""
+        ladder = self.remediation_ladder
+        if step == 'restart-nginx':
+            document, parameters = 'AWS-RunShellScript', {'commands': NGINX_RESTART_COMMANDS}
+        else:
+            document, parameters = ladder.ssm_document, SSM_DOCUMENT_PARAMETERS
+        # One command per region and account, as SSM only reaches instances in its own
+        commands = []
+        command_ids = {}
+        for location, ids in self._group_by_location(instance_ids).items():
+            ssm_client = self._aws_client('ssm', location)
+            response = ssm_client.send_command(
+                InstanceIds=ids,
+                DocumentName=document,
+                Parameters=parameters,
+                TimeoutSeconds=max(30, int(ladder.step_timeout)),
+                Comment=f'Health monitor remediation ({step})'
+            )
+            command_id = response['Command']['CommandId']
+            commands.append((ssm_client, command_id))
+            command_ids.update(dict.fromkeys(ids, command_id))
+            self.logger.info(f"SSM command {command_id} ({document}) sent to instance(s): {', '.join(ids)}")
+        
+        deadline = time.monotonic() + ladder.step_timeout
+        statuses = {}
+        while True:
+            for ssm_client, command_id in commands:
+                paginator = ssm_client.get_paginator('list_command_invocations')
+                for page in paginator.paginate(CommandId=command_id):
+                    for invocation in page['CommandInvocations']:
+                        statuses[invocation['InstanceId']] = invocation['Status']
+            if all(statuses.get(instance_id) in SSM_FINAL_STATES for instance_id in instance_ids):
+                break
+            if time.monotonic() >= deadline:
+                break
+            time.sleep(ladder.poll_interval)
+        
+        failed = [instance_id for instance_id in instance_ids if statuses.get(instance_id) != 'Success']
+        for instance_id in failed:
+            self.logger.warning(f"SSM command {command_ids[instance_id]} on {instance_id}: {statuses.get(instance_id, 'no response')}")
+        return failed
+    
+    def _await_recovery(self, instance_ids: List[str], source: Optional[str] = None, step: Optional[str] = None,
+                        started: Optional[float] = None) -> List[str]:
+        """Poll instances until they serve the expected content again, or the step timeout expires.
+        
+        Each instance is probed directly on its own address and recovers the
+        moment it passes the endpoint's check. Instances without an address
+        are followed through the target group instead, when there is one, and
+        otherwise count as recovered; if they are not, the next remediation
+        starts them one step higher. Polls start READINESS_FIRST_DELAY seconds
+        apart and back off to the ladder's poll interval.
+        
+        Args:
+            instance_ids: Instances the step was run on
+            source: Monitored endpoint the instances serve (default: the monitor's own)
+            step: The remediation step, for logging and the time-to-healthy metric
+            started: monotonic() value when the step started, from which time to healthy is measured (default: now)
+        
+        Returns:
+            The instances still failing
+        """
+        if not instance_ids:
+            return []
+        ladder = self.remediation_ladder
+        started = started if started is not None else time.monotonic()
+        # Probed as running whatever the cached state, since the address is all a probe needs
+        reachable = {
+            instance['instance_id']: dict(instance, state='running')
+            for instance in self.get_web_server_instances(source=source)
+            if instance['instance_id'] in instance_ids and (instance.get('private_ip') or instance.get('public_ip'))
+        }
+        pending = [
+            instance_id for instance_id in instance_ids if instance_id in reachable or self.target_group_arn
+        ]
+        deadline = time.monotonic() + ladder.step_timeout
+        # A reboot returns before the server goes down, so it gets a full interval not to be counted as recovered
+        delay = ladder.poll_interval if step == 'reboot' else min(READINESS_FIRST_DELAY, ladder.poll_interval)
+        while pending:
+            time.sleep(delay)
+            delay = min(delay * READINESS_BACKOFF, ladder.poll_interval)
+            probed = [reachable[instance_id] for instance_id in pending if instance_id in reachable]
+            ready = set()
+            if probed:
+                failing = self._probe_instances_directly(probed, source)
+                ready.update(instance['instance_id'] for instance in probed if instance['instance_id'] not in failing)
+            followed = [instance_id for instance_id in pending if instance_id not in reachable]
+            if followed:
+                states = self._target_states(followed)
+                ready.update(instance_id for instance_id in followed if states.get(instance_id) == 'healthy')
+            for instance_id in pending:
+                if instance_id in ready:
+                    self._record_time_to_healthy(instance_id, step, time.monotonic() - started)
+            pending = [instance_id for instance_id in pending if instance_id not in ready]
+            if time.monotonic() >= deadline:
+                break
+        return pending
+    
+    def _target_states(self, instance_ids: List[str]) -> Dict[str, str]:
+        """Return the target group's state for each of the instances registered in it."""
+        try:
+            response = self.elbv2_client.describe_target_health(
+                TargetGroupArn=self.target_group_arn, Targets=[{'Id': instance_id} for instance_id in instance_ids]
+            )
+        except Exception as e:
+            self.logger.warning(f"Failed to describe target health: {str(e)}")
+            return {}
+        return {
+            description['Target']['Id']: description['TargetHealth']['State']
+            for description in response['TargetHealthDescriptions']
+        }
+    
+    def _record_time_to_healthy(self, instance_id: str, step: Optional[str], seconds: float):
+        """Log and record how long an instance took to serve the expected content again."""
+        self.logger.info(f"✓ Instance {instance_id} healthy {seconds:.1f} seconds after {step or 'remediation'} started",
+                         extra={'instance_ids': [instance_id]})
+        self.metrics.observe_time_to_healthy(step or 'unknown', seconds)
+    
+    def _wait_for_instances(self, waiter_name: str, instance_ids: List[str], location: Optional[Location] = None):
+        """Run an EC2 waiter over a batch of instances in one location and record how long it took."""
+        waiter = self._aws_client('ec2', location).get_waiter(waiter_name)
+        delay = WAITER_DELAYS.get(waiter_name, 15)
+        started = time.monotonic()
+        try:
+            waiter.wait(
+                InstanceIds=instance_ids,
+                WaiterConfig={'Delay': delay, 'MaxAttempts': WAITER_TIMEOUT // delay}
+            )
+        finally:
+            duration = time.monotonic() - started
+            self.metrics.observe_waiter(waiter_name, duration)
+            self.logger.info(f"Waiter {waiter_name} finished after {duration:.1f} seconds")
+    
+    def _rolling_batch_size(self, instance_count: int) -> int:
+        """Return the restart batch size for a fleet of the given size.
+        
+        Defaults to half the fleet (rounded up), and never restarts every
+        instance at once when there is more than one, so some capacity stays
+        behind the ALB throughout the restart.
+        """
+        batch_size = self.restart_batch_size or (instance_count + 1) // 2
+        return max(1, min(batch_size, instance_count - 1))
+    
+    def restart_web_servers(self, job: Optional[RemediationJob] = None):
+        """Restart all web server instances in rolling batches.
+        
+        Each instance starts at the cheapest remediation step for the way the
+        endpoint failed, and escalates while it stays unhealthy.
+        
+        Args:
+            job: The remediation job this restart runs for, if any. Its instances are
+                claimed in the job queue, and it stops early when the job is cancelled
+        """
+        source = job.source if job is not None else self.endpoint
+        instances = self.get_web_server_instances(refresh_states=True, source=source)
+        
+        if not instances:
+            inventory = self._inventory_for(source)
+            self.logger.warning(f"No web server instances found with {inventory.tag_key}={inventory.tag_value} tag")
+            return
+        
+        self.logger.info(f"Found {len(instances)} web server instance(s) to restart")
+        
+        eligible = []
+        for instance in instances:
+            instance_id = instance['instance_id']
+            instance_state = instance['state']
+            
+            self.logger.info(f"Instance {instance_id} current state: {instance_state}")
+            
+            if instance_state in ['running', 'stopped']:
+                eligible.append(instance)
+            else:
+                self.logger.warning(f"Skipping instance {instance_id} in state: {instance_state}")
+        
+        # Batches are sized against the whole fleet, which is what keeps serving
+        fleet_size = len(eligible)
+        if eligible and self.remediation_scope == 'targets':
+            eligible = self.get_unhealthy_instances(eligible, source)
+            self.logger.info(f"{len(eligible)} of {fleet_size} web server instance(s) are unhealthy")
+        
+        if not eligible:
+            self.logger.info("Restart operation completed. Successfully restarted 0 instances")
+            return
+        
+        # Stopped instances serve no traffic, so restart them first while the running ones keep serving
+        eligible.sort(key=lambda instance: instance['state'] != 'stopped')
+        instance_ids = [instance['instance_id'] for instance in eligible]
+        if job is not None:
+            claimed = self.remediation.claim(job, instance_ids)
+            for instance_id in instance_ids:
+                if instance_id not in claimed:
+                    self.logger.info(f"Skipping instance {instance_id}: already queued for restart by another job")
+            instance_ids = claimed
+            if not instance_ids:
+                self.logger.info("Restart operation completed. Successfully restarted 0 instances")
+                return
+        failure_kind = self.last_failure.get(source)
+        if failure_kind:
+            self.logger.info(f"Endpoint {source} failure: {failure_kind}")
+        stopped = {instance['instance_id'] for instance in eligible if instance['state'] == 'stopped'}
+        batch_size = min(self._rolling_batch_size(fleet_size), len(instance_ids))
+        batches = [instance_ids[i:i + batch_size] for i in range(0, len(instance_ids), batch_size)]
+        self.logger.info(f"Restarting {len(instance_ids)} instance(s) in {len(batches)} batch(es) of up to {batch_size}")
+        
+        restart_count = 0
+        for index, batch in enumerate(batches):
+            if job is not None and job.cancel_requested.is_set():
+                remaining = sum(len(pending) for pending in batches[index:])
+                self.logger.info(f"Endpoint {job.source} recovered - skipping {remaining} remaining instance(s)")
+                break
+            restart_count += self._restart_batch(batch, fleet_size, job, failure_kind, stopped, source)
+        
+        self.restart_guard.record_remediation_finished()
+        self.logger.info(f"Restart operation completed. Successfully restarted {restart_count} instances")
+    
+    def _restart_batch(self, batch: List[str], fleet_size: int, job: Optional[RemediationJob] = None,
+                       failure_kind: Optional[str] = None, stopped: Set[str] = frozenset(),
+                       source: Optional[str] = None) -> int:
+        """Restart one rolling batch, honouring cluster leases, restart limits and the job queue's restart limit.
+        
+        Returns:
+            Number of instances restarted
+        """
+        claimed = batch
+        if self.cluster is not None:
+            # Never restart an instance another node is already restarting
+            claimed = self.cluster.claim_instances(batch)
+            for instance_id in batch:
+                if instance_id not in claimed:
+                    self.logger.warning(f"Skipping instance {instance_id}: leased by another monitor node")
+        
+        admitted = []
+        success = False
+        try:
+            if not claimed:
+                return 0
+            admitted, refused = self.restart_guard.admit(claimed)
+            for instance_id, reason in refused.items():
+                self.logger.warning(f"Skipping instance {instance_id}: {reason}")
+            if refused:
+                self.metrics.count_suppressed('instance', len(refused))
+            if not admitted:
+                return 0
+            # Concurrent jobs together never take the whole fleet out of service
+            if job is not None and not self.remediation.acquire_restart_slots(job, len(admitted), max(1, fleet_size - 1)):
+                self.restart_guard.cancel(admitted)
+                admitted = []
+                return 0
             try:
-                # Check endpoint health
-                is_healthy = self.check_endpoint_health()
+                success = self.remediate_instances(admitted, failure_kind, stopped, source)
+            finally:
+                if job is not None:
+                    self.remediation.release_restart_slots(len(admitted))
+                self.restart_guard.record_restart(admitted, success)
+                self.metrics.set_breaker_open(self.restart_guard.breaker.state == CircuitBreaker.OPEN)
+        finally:
+            if self.cluster is not None:
+                self.cluster.release_instances(claimed)
+        
+        if job is not None:
+            if success:
+                job.restarted += len(admitted)
+            else:
+                job.failed += len(admitted)
+        return len(admitted) if success else 0
+    
+    def start_remediation(self, source: Optional[str] = None) -> bool:
+        """Queue a web server restart on the remediation pool so probing can continue.
+        
+        Args:
+            source: Failing endpoint the restart is for (default: the monitor's own endpoint)
+        
+        Returns:
+            True if a job was queued, False if the endpoint already has one queued or running
+        """
+        return self.remediation.submit(source or self.endpoint) is not None
+    
+    def _remediate(self, job: RemediationJob):
+        """Run a remediation job, holding the cluster remediation lease when clustered."""
+        if self.cluster is None:
+            self.restart_web_servers(job)
+            return
+        
+        # The lease belongs to the node, so it is held while any local job runs
+        with self._cluster_lease_guard:
+            if self._cluster_lease_users == 0:
+                try:
+                    acquired = self.cluster.acquire_remediation()
+                except Exception as e:
+                    self.logger.error(f"Failed to acquire the cluster remediation lease: {str(e)}")
+                    raise
+                if not acquired:
+                    self.logger.warning("Another monitor node is already remediating - skipping restart")
+                    return
+            self._cluster_lease_users += 1
+        try:
+            self.restart_web_servers(job)
+        finally:
+            with self._cluster_lease_guard:
+                self._cluster_lease_users -= 1
+                if self._cluster_lease_users == 0:
+                    self.cluster.release_remediation()
+    
+    def _remediation_job_changed(self, job: RemediationJob):
+        """Export remediation job states as metrics."""
+        active = self.remediation.active()
+        for state in ACTIVE_JOB_STATES:
+            self.metrics.set_remediation_jobs(state, sum(1 for pending in active if pending.state == state))
+        if not job.active:
+            self.metrics.count_finished_remediation_job(job.state)
+    
+    def remediation_in_progress(self) -> bool:
+        """Return True while a remediation job is queued or running."""
+        return bool(self.remediation.active())
+    
+    def wait_for_remediation(self):
+        """Block until every queued and running remediation job has finished."""
+        if self.remediation_in_progress():
+            self.logger.info("Waiting for in-progress remediation to finish...")
+            self.remediation.join()
+    
+    def _cancel_remediation(self, source: str):
+        """Cancel remediation for an endpoint that recovered on its own."""
+        for job in self.remediation.cancel(source):
+            if job.state == 'running':
+                self.logger.info(f"Endpoint {source} recovered - remediation job {job.job_id} stops after its current batch")
+            else:
+                self.logger.info(f"Endpoint {source} recovered - queued remediation job {job.job_id} cancelled")
+    
+    def _shutdown(self):
+        """Release everything the monitoring loop held."""
+        if self.remediation_in_progress():
+            self.logger.info("Cancelling remediation and waiting for running jobs to stop...")
+        self.remediation.shutdown()
+        if self._instance_probe_pool is not None:
+            self._instance_probe_pool.shutdown(wait=False)
+        for prober in self._path_probers.values():
+            prober.close()
+        self.probe_session.close()
+        if self.metrics_server is not None:
+            self.metrics_server.stop()
+        if self.history is not None:
+            self.history.close()
+        if self.cluster is not None:
+            self.cluster.stop()
+        self.logger.info("Health monitoring stopped")
+        self.log_pipeline.stop()
+    
+    def _trigger_remediation(self, source: str, reason: str = '2 consecutive failures'):
+        """Start remediation for a failing endpoint unless a restart is already running or restarts are held back.
+        
+        Args:
+            source: The failing endpoint
+            reason: Why its health evaluator called for remediation
+        """
+        blocked = self.restart_guard.remediation_blocked()
+        fields = {'endpoint': source, 'reason': reason}
+        if blocked:
+            self.logger.warning(f"Endpoint {source} unhealthy ({reason}) - remediation suppressed: {blocked}", extra=fields)
+            self.metrics.count_suppressed('remediation')
+            self.metrics.set_breaker_open(self.restart_guard.breaker.state == CircuitBreaker.OPEN)
+        elif self.start_remediation(source):
+            self.logger.error(f"Endpoint {source} unhealthy ({reason}) - triggering auto-remediation", extra=fields)
+        else:
+            self.logger.warning(f"Endpoint {source} unhealthy ({reason}) - remediation already in progress", extra=fields)
+        if self.history is not None:
+            # The caller resets its failure count; record that so a restarted monitor does too
+            self.history.mark_remediation(source)
+    
+    def check_once(self) -> bool:
+        """Probe the endpoint once, without remediating, for cron jobs and liveness hooks.
+        
+        Returns:
+            bool: True if the endpoint is healthy
+        """
+        try:
+            return self._round_probe()()
+        finally:
+            self._shutdown()
+    
+    def run(self):
+        """Main monitoring loop."""
+        self.logger.info("Starting health monitoring...")
+        
+        scheduler = self._create_scheduler(self.check_interval)
+        if self.cluster is not None:
+            self.cluster.start()
+        
+        while self.running:
+            probe_started = time.monotonic()
+            try:
+                if not self._owns_endpoint(self.endpoint):
+                    # Another node probes the endpoint; check again in case it leaves the cluster
+                    self.consecutive_failures = 0
+                    self.evaluator.reset()
+                    time.sleep(self.check_interval)
+                    continue
+                
+                # Check endpoint health, or that of every instance behind it
+                is_healthy = self._round_probe()()
+                verdict = self.evaluator.observe(is_healthy, self.last_latency.get(self.endpoint))
                 
                 if is_healthy:
                     # Reset failure counter on successful check
                     if self.consecutive_failures > 0:
                         self.logger.info(f"Endpoint recovered after {self.consecutive_failures} consecutive failures")
+                    if verdict is None and self.remediation_in_progress():
+                        self._cancel_remediation(self.endpoint)
                     self.consecutive_failures = 0
+                    self.metrics.set_consecutive_failures(self.endpoint, 0)
                 else:
                     # Increment failure counter
                     self.consecutive_failures += 1
-                    self.logger.warning(f"Consecutive failures: {self.consecutive_failures}")
-                    
-                    # Trigger remediation after 2 consecutive failures
-                    if self.consecutive_failures >= 2:
-                        self.logger.error("Two consecutive failures detected - triggering auto-remediation")
-                        self.restart_web_servers()
-                        # Reset counter after remediation attempt
-                        self.consecutive_failures = 0
+                    self.metrics.set_consecutive_failures(self.endpoint, self.consecutive_failures)
+                    self.logger.warning("Consecutive failures: %d", self.consecutive_failures,
+                                        extra={'endpoint': self.endpoint})
+                
+                # Remediate once the health policy calls for it; it runs in the background
+                if verdict is not None:
+                    self._trigger_remediation(self.endpoint, verdict)
+                    # Start counting afresh after the remediation attempt
+                    self.consecutive_failures = 0
+                    self.evaluator.reset()
+                    self.metrics.set_consecutive_failures(self.endpoint, 0)
                 
-                # Wait for next check
+                # Wait for next check: soon after a failure, longer while stable
                 if self.running:
-                    time.sleep(self.check_interval)
+                    time.sleep(scheduler.next_delay(is_healthy, probe_started))
                     
             except KeyboardInterrupt:
                 self.logger.info("Monitoring interrupted by user")
@@ -247,7 +1749,301 @@ class HealthMonitor:
                 self.logger.error(f"Unexpected error in monitoring loop: {str(e)}")
                 time.sleep(self.check_interval)
         
-        self.logger.info("Health monitoring stopped")
+        self._shutdown()
+
+
+class MultiEndpointMonitor(HealthMonitor):
+    """Probe many endpoints concurrently from one process on an asyncio event loop.
+    
+    Each endpoint runs its own probe loop with its own interval, timeout and
+    health evaluator. Probes are executed on a bounded thread pool
+    so a hung endpoint only stalls its own loop, and at most ``max_in_flight``
+    probes are outstanding at any time. All endpoints share a single EC2 client.
+    """
+    
+    def __init__(self, endpoints: List[Endpoint], max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+                 config_loader: Optional[Callable[[], List[Endpoint]]] = None, **kwargs):
+        """Initialize the multi-endpoint monitor.
+        
+        Args:
+            endpoints: Endpoints to monitor
+            max_in_flight: Maximum number of concurrently running probes (default: 20)
+            config_loader: Re-reads the endpoints from the config file on SIGHUP
+            **kwargs: Remediation options passed through to HealthMonitor
+        """
+        if not endpoints:
+            raise ValueError("At least one endpoint is required")
+        if max_in_flight < 1:
+            raise ValueError("max_in_flight must be at least 1")
+        
+        self.endpoints = list(endpoints)
+        self.max_in_flight = max_in_flight
+        self.config_loader = config_loader
+        self._endpoints_by_url = {endpoint.url: endpoint for endpoint in self.endpoints}
+        self._inventories: Dict[tuple, InstanceInventory] = {}
+        self._stop_event: Optional[asyncio.Event] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._tasks: Set[asyncio.Task] = set()
+        
+        first = self.endpoints[0]
+        super().__init__(first.url, first.interval, first.timeout, **kwargs)
+    
+    def _log_checks(self):
+        """Log each endpoint's own settings."""
+        self.logger.info(f"Multi-endpoint health monitor initialized for {len(self.endpoints)} endpoint(s)")
+        for endpoint in self.endpoints:
+            self._log_endpoint(endpoint)
+        self.logger.info(f"Max in-flight probes: {self.max_in_flight}")
+    
+    def _log_endpoint(self, endpoint: Endpoint):
+        """Log the settings of one endpoint."""
+        details = f"interval: {endpoint.interval}s, timeout: {endpoint.timeout}s"
+        if endpoint.failure_threshold is not None:
+            details += f", failure threshold: {endpoint.failure_threshold}"
+        if endpoint.content_matcher is not None:
+            details += f", expected content: {endpoint.content_matcher.describe()}"
+        if endpoint.tag_key:
+            details += f", instances: {endpoint.tag_key}={endpoint.tag_value}"
+        name = f"{endpoint.name}: " if endpoint.name and endpoint.name != endpoint.url else ''
+        self.logger.info(f"  {name}{endpoint.url} ({details})")
+    
+    def _restore_failure_state(self, endpoints: Optional[List[Endpoint]] = None):
+        """Resume each endpoint's consecutive failure count recorded before the last restart."""
+        if self.history is None:
+            return
+        for endpoint in endpoints if endpoints is not None else self.endpoints:
+            endpoint.consecutive_failures = self.history.consecutive_failures(endpoint.url)
+            self.metrics.set_consecutive_failures(endpoint.url, endpoint.consecutive_failures)
+            if endpoint.consecutive_failures:
+                self.logger.warning(f"Restored {endpoint.consecutive_failures} consecutive failure(s) for {endpoint.url} from probe history")
+    
+    def _create_evaluator(self, endpoint: Endpoint) -> HealthEvaluator:
+        """Create an endpoint's health evaluator, resuming its restored failure count."""
+        evaluator = self.health_policy.create(endpoint.failure_threshold)
+        evaluator.restore(endpoint.consecutive_failures)
+        return evaluator
+    
+    def _create_probe_session(self) -> ProbeSession:
+        """Create a probe session sized for concurrent probes of every endpoint."""
+        pools = len(self.endpoints) + (DIRECT_PROBE_POOL_CONNECTIONS if self._probes_directly else 0)
+        return ProbeSession(pool_connections=pools, pool_maxsize=self.max_in_flight, dns_cache=self.dns_cache)
+    
+    def _content_matcher_for(self, endpoint: Optional[str]) -> ContentMatcher:
+        """Return the expected content of a monitored endpoint."""
+        configured = self._endpoints_by_url.get(endpoint)
+        if configured is not None and configured.content_matcher is not None:
+            return configured.content_matcher
+        return self.content_matcher
+    
+    def _inventory_for(self, source: Optional[str]) -> InstanceInventory:
+        """Return the inventory of the instances serving a monitored endpoint.
+        
+        Endpoints with their own tag selector get their own inventory, sharing the EC2 clients.
+        """
+        configured = self._endpoints_by_url.get(source)
+        if configured is None or not configured.tag_key:
+            return self.inventory
+        selector = (configured.tag_key, configured.tag_value)
+        if selector == (self.inventory.tag_key, self.inventory.tag_value):
+            return self.inventory
+        if selector not in self._inventories:
+            self._inventories[selector] = self._create_inventory(
+                configured.tag_key, configured.tag_value, self.inventory.ttl, self.inventory.events_file
+            )
+        return self._inventories[selector]
+    
+    def reload_config(self) -> bool:
+        """Re-read the endpoints from the config file and apply the changes.
+        
+        Probes already in flight finish normally. Removed endpoints are not
+        probed again, changed ones keep their failure counts and pick up
+        the new settings on their next probe, and added ones start probing.
+        
+        Returns:
+            True if the new configuration was applied, False if it was rejected
+        """
+        if self.config_loader is None:
+            self.logger.warning("No config file to reload")
+            return False
+        try:
+            endpoints = self.config_loader()
+        except Exception as e:
+            self.logger.error(f"Config reload failed, keeping the current checks: {str(e)}")
+            return False
+        
+        current = {endpoint.key: endpoint for endpoint in self.endpoints}
+        kept, added, changed = [], [], []
+        for endpoint in endpoints:
+            existing = current.pop(endpoint.key, None)
+            if existing is None or existing.url != endpoint.url:
+                if existing is not None:
+                    # A new URL is a new endpoint with its own failure state
+                    existing.active = False
+                added.append(endpoint)
+                kept.append(endpoint)
+                continue
+            if existing.settings() != endpoint.settings():
+                existing.interval = endpoint.interval
+                existing.timeout = endpoint.timeout
+                existing.failure_threshold = endpoint.failure_threshold
+                existing.content_matcher = endpoint.content_matcher
+                existing.tag_key = endpoint.tag_key
+                existing.tag_value = endpoint.tag_value
+                changed.append(existing)
+            kept.append(existing)
+        for removed in current.values():
+            removed.active = False
+        
+        self.endpoints = kept
+        self._endpoints_by_url = {endpoint.url: endpoint for endpoint in self.endpoints}
+        self._restore_failure_state(added)
+        if self._semaphore is not None:
+            for endpoint in added:
+                self._tasks.add(asyncio.ensure_future(self._probe_loop(endpoint, self._semaphore)))
+        
+        self.logger.info(f"Config reloaded: {len(added)} added, {len(current)} removed, {len(changed)} changed, "
+                         f"{len(self.endpoints)} endpoint(s) in total")
+        for endpoint in added + changed:
+            self._log_endpoint(endpoint)
+        return True
+    
+    def _request_stop(self):
+        """Stop all probe loops."""
+        self.running = False
+        if self._stop_event is not None:
+            self._stop_event.set()
+    
+    async def _sleep(self, seconds: float):
+        """Sleep for the given number of seconds, waking early on shutdown."""
+        try:
+            await asyncio.wait_for(self._stop_event.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
+    
+    async def _probe_loop(self, endpoint: Endpoint, semaphore: 'asyncio.Semaphore'):
+        """Probe a single endpoint until shutdown."""
+        loop = asyncio.get_running_loop()
+        scheduler = self._create_scheduler(endpoint.interval)
+        evaluator, failure_threshold = self._create_evaluator(endpoint), endpoint.failure_threshold
+        
+        # Spread the first probes so endpoints don't stay in lockstep
+        await self._sleep(scheduler.initial_delay())
+        
+        while self.running and endpoint.active:
+            probe_started = time.monotonic()
+            is_healthy = False
+            if scheduler.interval != endpoint.interval:
+                scheduler = self._create_scheduler(endpoint.interval)
+            if failure_threshold != endpoint.failure_threshold:
+                evaluator, failure_threshold = self._create_evaluator(endpoint), endpoint.failure_threshold
+            if not self._owns_endpoint(endpoint.url):
+                # Another node probes the endpoint; check again in case it leaves the cluster
+                endpoint.consecutive_failures = 0
+                evaluator.reset()
+                await self._sleep(endpoint.interval)
+                continue
+            
+            try:
+                probe = self._round_probe()
+                async with semaphore:
+                    is_healthy = await loop.run_in_executor(None, probe, endpoint.url, endpoint.timeout)
+                verdict = evaluator.observe(is_healthy, self.last_latency.get(endpoint.url))
+                
+                if is_healthy:
+                    if endpoint.consecutive_failures > 0:
+                        self.logger.info(f"Endpoint {endpoint.url} recovered after {endpoint.consecutive_failures} consecutive failures")
+                    if verdict is None and self.remediation_in_progress():
+                        self._cancel_remediation(endpoint.url)
+                    endpoint.consecutive_failures = 0
+                else:
+                    endpoint.consecutive_failures += 1
+                    self.logger.warning("Consecutive failures for %s: %d", endpoint.url, endpoint.consecutive_failures,
+                                        extra={'endpoint': endpoint.url})
+                
+                if verdict is not None:
+                    self._trigger_remediation(endpoint.url, verdict)
+                    endpoint.consecutive_failures = 0
+                    evaluator.reset()
+                
+                self.metrics.set_consecutive_failures(endpoint.url, endpoint.consecutive_failures)
+                
+            except Exception as e:
+                self.logger.error(f"Unexpected error probing {endpoint.url}: {str(e)}")
+            
+            if self.running and endpoint.active:
+                await self._sleep(scheduler.next_delay(is_healthy, probe_started))
+        
+        if not endpoint.active:
+            self.logger.info(f"Stopped probing {endpoint.url}")
+    
+    async def _run_async(self):
+        """Run one probe loop per endpoint until shutdown."""
+        loop = asyncio.get_running_loop()
+        self._stop_event = asyncio.Event()
+        
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(signum, self._request_stop)
+            except (NotImplementedError, RuntimeError):
+                pass  # Fall back to the handlers installed in __init__
+        if self.config_loader is not None and hasattr(signal, 'SIGHUP'):
+            try:
+                loop.add_signal_handler(signal.SIGHUP, self.reload_config)
+            except (NotImplementedError, RuntimeError):
+                self.logger.warning("SIGHUP config reload is not available on this platform")
+        
+        executor = ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix='probe')
+        loop.set_default_executor(executor)
+        self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        self._tasks = {
+            asyncio.ensure_future(self._probe_loop(endpoint, self._semaphore)) for endpoint in self.endpoints
+        }
+        
+        try:
+            # A reload can add probe loops while we wait
+            while True:
+                pending = [task for task in self._tasks if not task.done()]
+                if not pending:
+                    break
+                await asyncio.wait(pending)
+            for task in self._tasks:
+                task.result()
+        finally:
+            self._semaphore = None
+            executor.shutdown(wait=False)
+    
+    def check_once(self) -> bool:
+        """Probe every endpoint once, concurrently and without remediating.
+        
+        Returns:
+            bool: True if all endpoints are healthy
+        """
+        endpoints = [endpoint for endpoint in self.endpoints if endpoint.active]
+        probe = self._round_probe()
+        try:
+            with ThreadPoolExecutor(max_workers=min(len(endpoints), self.max_in_flight),
+                                    thread_name_prefix='probe') as executor:
+                results = list(executor.map(lambda endpoint: probe(endpoint.url, endpoint.timeout), endpoints))
+        finally:
+            self._shutdown()
+        
+        unhealthy = [endpoint.url for endpoint, healthy in zip(endpoints, results) if not healthy]
+        if unhealthy:
+            self.logger.warning(f"{len(unhealthy)} of {len(endpoints)} endpoint(s) unhealthy: {', '.join(unhealthy)}")
+        return not unhealthy
+    
+    def run(self):
+        """Main monitoring loop."""
+        self.logger.info(f"Starting health monitoring of {len(self.endpoints)} endpoint(s)...")
+        if self.cluster is not None:
+            self.cluster.start()
+        
+        try:
+            asyncio.run(self._run_async())
+        except KeyboardInterrupt:
+            self.logger.info("Monitoring interrupted by user")
+        
+        self._shutdown()
 
 
 def main():
@@ -260,12 +2056,32 @@ Examples:
     python monitor.py https://example.com/health
     python monitor.py http://load-balancer.amazonaws.com:8080/status
     python monitor.py https://demo-lb-123456789.us-east-2.elb.amazonaws.com
+    python monitor.py https://alb-1.example.com https://alb-2.example.com --max-in-flight 50
+    python monitor.py --config checks.yaml
+    python monitor.py --once https://example.com/health && echo healthy
         """
     )
     
     parser.add_argument(
-        'endpoint',
-        help='The endpoint URL to monitor (e.g., https://example.com/health)'
+        'endpoints',
+        nargs='*',
+        metavar='endpoint',
+        help='The endpoint URL(s) to monitor (e.g., https://example.com/health)'
+    )
+    
+    parser.add_argument(
+        '--config',
+        metavar='FILE',
+        default=None,
+        help='Load checks from a YAML, TOML or Python config file instead of endpoint arguments. '
+             'Its monitor section sets defaults for the other options. Send SIGHUP to reload the checks'
+    )
+    
+    parser.add_argument(
+        '--once',
+        action='store_true',
+        help='Probe each endpoint once and exit with status 0 if all are healthy, 1 otherwise. '
+             'Nothing is remediated, so AWS is not contacted, except by --deep-probe to list the instances'
     )
     
     parser.add_argument(
@@ -275,15 +2091,544 @@ Examples:
         help='Check interval in seconds (default: 10)'
     )
     
+    parser.add_argument(
+        '--recheck-interval',
+        type=float,
+        default=None,
+        help='Seconds before re-checking after a failed probe (default: a quarter of the interval, at least 1)'
+    )
+    
+    parser.add_argument(
+        '--max-interval',
+        type=float,
+        default=None,
+        help='Back off to at most this check interval while the endpoint is stable (default: the interval, '
+             'so probes never slow down)'
+    )
+    
+    parser.add_argument(
+        '--jitter',
+        type=float,
+        default=DEFAULT_JITTER,
+        help=f'Random spread applied to every interval, as a fraction of it (default: {DEFAULT_JITTER})'
+    )
+    
+    parser.add_argument(
+        '--timeout',
+        type=float,
+        default=DEFAULT_TIMEOUT,
+        help=f'HTTP request timeout in seconds (default: {DEFAULT_TIMEOUT})'
+    )
+    
+    parser.add_argument(
+        '--failure-threshold',
+        type=int,
+        default=DEFAULT_FAILURE_THRESHOLD,
+        help=f'Consecutive failed probes that trigger remediation (default: {DEFAULT_FAILURE_THRESHOLD})'
+    )
+    
+    parser.add_argument(
+        '--failure-ratio',
+        type=float,
+        default=None,
+        help='Trigger remediation once this fraction of the probes in the window failed, instead of '
+             'counting consecutive failures; catches flapping endpoints (e.g. 0.3)'
+    )
+    
+    parser.add_argument(
+        '--window',
+        type=int,
+        default=DEFAULT_WINDOW,
+        help=f'Recent probes considered by --failure-ratio and --latency-slo (default: {DEFAULT_WINDOW})'
+    )
+    
+    parser.add_argument(
+        '--latency-slo',
+        type=float,
+        default=None,
+        help='Trigger remediation when the --latency-percentile of probe latency over the window '
+             'exceeds this many seconds (default: disabled)'
+    )
+    
+    parser.add_argument(
+        '--latency-percentile',
+        type=float,
+        default=DEFAULT_LATENCY_PERCENTILE,
+        help=f'Latency percentile held to --latency-slo (default: {DEFAULT_LATENCY_PERCENTILE})'
+    )
+    
+    parser.add_argument(
+        '--ewma-threshold',
+        type=float,
+        default=None,
+        help='Trigger remediation when the moving average probe latency exceeds this many seconds '
+             '(default: disabled)'
+    )
+    
+    parser.add_argument(
+        '--ewma-alpha',
+        type=float,
+        default=DEFAULT_EWMA_ALPHA,
+        help=f'Weight of the newest probe in the moving average latency (default: {DEFAULT_EWMA_ALPHA})'
+    )
+    
+    parser.add_argument(
+        '--max-in-flight',
+        type=int,
+        default=DEFAULT_MAX_IN_FLIGHT,
+        help=f'Maximum concurrent probes when monitoring multiple endpoints (default: {DEFAULT_MAX_IN_FLIGHT})'
+    )
+    
+    parser.add_argument(
+        '--restart-batch-size',
+        type=int,
+        default=None,
+        help='Web servers restarted together per rolling batch (default: half the fleet, never all of it)'
+    )
+    
+    parser.add_argument(
+        '--inventory-ttl',
+        type=float,
+        default=DEFAULT_INVENTORY_TTL,
+        help=f'Seconds the web server inventory is cached between full describes (default: {DEFAULT_INVENTORY_TTL})'
+    )
+    
+    parser.add_argument(
+        '--instance-events',
+        metavar='FILE',
+        default=None,
+        help='JSON-lines file of EventBridge EC2 state-change events used to keep the inventory current'
+    )
+    
+    parser.add_argument(
+        '--regions',
+        default=None,
+        help='Comma-separated regions to discover and remediate web servers in, all searched concurrently '
+             '(default: AWS_REGION)'
+    )
+    
+    parser.add_argument(
+        '--assume-role',
+        metavar='ROLE_ARN',
+        action='append',
+        default=None,
+        help='IAM role to assume to reach web servers in another account; repeat for more accounts. '
+             'Every region is searched in every account (default: the monitor\'s own credentials)'
+    )
+    
+    parser.add_argument(
+        '--deep-probe',
+        action='store_true',
+        help='Probe every web server directly on its own IP each round, with the endpoint\'s host name in '
+             'SNI and the Host header, instead of one probe through the load balancer'
+    )
+    
+    parser.add_argument(
+        '--deep-probe-concurrency',
+        type=int,
+        default=DEFAULT_MAX_IN_FLIGHT,
+        help=f'Web servers, or ALB nodes, probed directly at once (default: {DEFAULT_MAX_IN_FLIGHT})'
+    )
+    
+    parser.add_argument(
+        '--node-probe',
+        action='store_true',
+        help='Probe every address the endpoint\'s name resolves to (each ALB node) each round, with the '
+             'endpoint\'s host name in SNI and the Host header, instead of whichever one DNS returns'
+    )
+    
+    parser.add_argument(
+        '--path',
+        action='append',
+        dest='paths',
+        metavar='PATH[=EXPECTED]',
+        help='Path of the endpoint\'s host to check each round, with the text its page must contain (a 200 '
+             'status is enough without one). A query string keeps the first = of each parameter, so '
+             '/search?q=x=results expects "results" from /search?q=x. Repeat it to check several paths at once as concurrent streams of '
+             'one HTTP/2 connection; needs pip install \'httpx[http2]\''
+    )
+    
+    parser.add_argument(
+        '--dns-cache-ttl',
+        type=float,
+        default=DEFAULT_DNS_TTL,
+        help='Seconds resolved addresses are cached when the resolver gives no record TTL; record TTLs are '
+             f'honored when dnspython is installed. 0 resolves on every new connection (default: {DEFAULT_DNS_TTL:g})'
+    )
+    
+    parser.add_argument(
+        '--remediation-scope',
+        choices=REMEDIATION_SCOPES,
+        default='fleet',
+        help="Restart every web server ('fleet', default) or only unhealthy ones ('targets')"
+    )
+    
+    parser.add_argument(
+        '--target-group-arn',
+        default=None,
+        help="ALB target group whose health selects the instances to restart in 'targets' scope "
+             "(default: probe each instance's private IP directly)"
+    )
+    
+    parser.add_argument(
+        '--expect',
+        action='append',
+        metavar='TEXT',
+        help='Text the page must contain; repeat for several (default: "Deployed via SSM Document")'
+    )
+    
+    parser.add_argument(
+        '--expect-regex',
+        action='append',
+        default=[],
+        metavar='PATTERN',
+        help='Regular expression the page must match; repeat for several'
+    )
+    
+    parser.add_argument(
+        '--max-body-bytes',
+        type=int,
+        default=DEFAULT_MAX_BODY_BYTES,
+        help=f'Fail a probe if the expected content is not found within this many bytes (default: {DEFAULT_MAX_BODY_BYTES})'
+    )
+    
+    parser.add_argument(
+        '--log-file',
+        metavar='FILE',
+        default=DEFAULT_LOG_FILE,
+        help=f'Log file, written by a background thread; an empty value logs to the console only (default: {DEFAULT_LOG_FILE})'
+    )
+    
+    parser.add_argument(
+        '--log-format',
+        choices=LOG_FORMATS,
+        default='text',
+        help="Plain 'text' lines (default) or 'json' lines carrying endpoint, status, latency and instance fields"
+    )
+    
+    parser.add_argument(
+        '--log-max-bytes',
+        type=int,
+        default=DEFAULT_MAX_BYTES,
+        help=f'Rotate the log file once it reaches this size; 0 never rotates (default: {DEFAULT_MAX_BYTES})'
+    )
+    
+    parser.add_argument(
+        '--log-rotate-when',
+        metavar='WHEN',
+        default=None,
+        help="Rotate the log file on a schedule instead of by size: 'midnight', 'H' (hourly), 'D' (daily) or 'W0'-'W6'"
+    )
+    
+    parser.add_argument(
+        '--log-backups',
+        type=int,
+        default=DEFAULT_BACKUP_COUNT,
+        help=f'Rotated log files kept (default: {DEFAULT_BACKUP_COUNT})'
+    )
+    
+    parser.add_argument(
+        '--log-sample',
+        type=int,
+        default=1,
+        metavar='N',
+        help='Log only every Nth healthy probe of each endpoint; failures are always logged (default: 1, every probe)'
+    )
+    
+    parser.add_argument(
+        '--metrics-port',
+        type=int,
+        default=None,
+        help='Serve Prometheus metrics on this port at /metrics (default: disabled)'
+    )
+    
+    parser.add_argument(
+        '--history-file',
+        metavar='FILE',
+        default=None,
+        help='Record every probe outcome in this file and resume failure counts from it on restart'
+    )
+    
+    parser.add_argument(
+        '--history-size',
+        type=int,
+        default=DEFAULT_HISTORY_CAPACITY,
+        help=f'Probe outcomes kept in the history file before the oldest are overwritten (default: {DEFAULT_HISTORY_CAPACITY})'
+    )
+    
+    parser.add_argument(
+        '--remediation-workers',
+        type=int,
+        default=DEFAULT_REMEDIATION_WORKERS,
+        help=f'Remediation jobs that may run at once (default: {DEFAULT_REMEDIATION_WORKERS})'
+    )
+    
+    parser.add_argument(
+        '--max-restart-attempts',
+        type=int,
+        default=DEFAULT_MAX_RESTART_ATTEMPTS,
+        help=f'Restarts allowed per instance per hour (default: {DEFAULT_MAX_RESTART_ATTEMPTS})'
+    )
+    
+    parser.add_argument(
+        '--restart-cooldown',
+        type=float,
+        default=DEFAULT_RESTART_COOLDOWN,
+        help=f'Seconds after a remediation, or an instance restart, before another may start (default: {DEFAULT_RESTART_COOLDOWN:g})'
+    )
+    
+    parser.add_argument(
+        '--max-restarts-per-hour',
+        type=int,
+        default=DEFAULT_MAX_RESTARTS_PER_HOUR,
+        help=f'Instance restarts allowed per hour across the fleet (default: {DEFAULT_MAX_RESTARTS_PER_HOUR})'
+    )
+    
+    parser.add_argument(
+        '--breaker-threshold',
+        type=int,
+        default=DEFAULT_BREAKER_THRESHOLD,
+        help=f'Consecutive failed restarts that pause remediation (default: {DEFAULT_BREAKER_THRESHOLD})'
+    )
+    
+    parser.add_argument(
+        '--breaker-reset',
+        type=float,
+        default=DEFAULT_BREAKER_RESET,
+        help=f'Seconds remediation stays paused before a single trial restart (default: {DEFAULT_BREAKER_RESET:g})'
+    )
+    
+    parser.add_argument(
+        '--remediation-steps',
+        default=','.join(DEFAULT_REMEDIATION_STEPS),
+        help='Comma-separated remediation steps, tried from cheapest to most thorough '
+             f'(default: {",".join(DEFAULT_REMEDIATION_STEPS)}; "stop-start" alone always does a full restart; '
+             '"replace" needs --target-group-arn)'
+    )
+    
+    parser.add_argument(
+        '--ssm-document',
+        default=DEFAULT_SSM_DOCUMENT,
+        help=f'SSM document re-run by the rerun-document step (default: {DEFAULT_SSM_DOCUMENT})'
+    )
+    
+    parser.add_argument(
+        '--step-timeout',
+        type=float,
+        default=DEFAULT_STEP_TIMEOUT,
+        help=f'Seconds to wait for a remediation step to fix an instance before escalating (default: {DEFAULT_STEP_TIMEOUT:g})'
+    )
+    
+    parser.add_argument(
+        '--escalation-window',
+        type=float,
+        default=DEFAULT_ESCALATION_WINDOW,
+        help=f'Seconds during which an instance remediated again starts one step higher (default: {DEFAULT_ESCALATION_WINDOW:g})'
+    )
+    
+    parser.add_argument(
+        '--cluster-backend',
+        metavar='URL',
+        default=None,
+        help='Share endpoints and remediation with other monitor nodes through leases at '
+             'file:///dir, sqlite:///file.db or s3://bucket/prefix (default: run standalone)'
+    )
+    
+    parser.add_argument(
+        '--node-id',
+        default=None,
+        help='Unique name of this node in the cluster (default: <hostname>-<pid>)'
+    )
+    
+    parser.add_argument(
+        '--lease-ttl',
+        type=float,
+        default=DEFAULT_LEASE_TTL,
+        help=f'Seconds before a silent node is dropped from the cluster (default: {DEFAULT_LEASE_TTL:g})'
+    )
+    
     args = parser.parse_args()
     
-    # Validate endpoint URL
-    if not args.endpoint.startswith(('http://', 'https://')):
-        print("Error: Endpoint must start with http:// or https://")
+    config = None
+    # Check settings given on the command line, which apply to every check of a config file
+    check_overrides = {
+        key: getattr(args, key) for key in CHECK_OPTIONS if getattr(args, key) != parser.get_default(key)
+    }
+    if args.config:
+        if args.endpoints:
+            print("Error: Give endpoint URLs or --config, not both")
+            sys.exit(1)
+        try:
+            config = load_config(args.config, check_overrides)
+        except ConfigError as e:
+            print(f"Error: Invalid config: {e}")
+            sys.exit(1)
+        allowed = set(vars(args)) - {'endpoints', 'config', 'once'}
+        unknown = sorted(set(config.options) - allowed)
+        if unknown:
+            print(f"Error: Invalid config: unknown monitor option(s) {', '.join(unknown)}")
+            sys.exit(1)
+        # Options given on the command line still win over the config file
+        parser.set_defaults(**config.options)
+        args = parser.parse_args()
+    elif not args.endpoints:
+        parser.error("at least one endpoint URL or --config is required")
+    
+    # Validate endpoint URLs
+    for endpoint in args.endpoints:
+        if not endpoint.startswith(('http://', 'https://')):
+            print(f"Error: Endpoint must start with http:// or https:// ({endpoint})")
+            sys.exit(1)
+    
+    # The default marker only applies when no expected content is given at all
+    markers = args.expect or ([] if args.expect_regex else [DEFAULT_MARKER])
+    try:
+        content_matcher = ContentMatcher(markers, patterns=args.expect_regex, max_bytes=args.max_body_bytes)
+    except (ValueError, re.error) as e:
+        print(f"Error: Invalid expected content: {e}")
+        sys.exit(1)
+    
+    cluster = None
+    if args.cluster_backend and not args.once:
+        region = os.environ.get('AWS_REGION', os.environ.get('AWS_DEFAULT_REGION', 'us-east-1'))
+        try:
+            backend = create_lease_backend(args.cluster_backend, region=region)
+        except ValueError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        cluster = ClusterCoordinator(backend, node_id=args.node_id, lease_ttl=args.lease_ttl)
+    
+    try:
+        restart_guard = RestartGuard(
+            max_restart_attempts=args.max_restart_attempts,
+            restart_cooldown=args.restart_cooldown,
+            max_restarts_per_hour=args.max_restarts_per_hour,
+            breaker_threshold=args.breaker_threshold,
+            breaker_reset=args.breaker_reset,
+        )
+    except ValueError as e:
+        print(f"Error: Invalid restart limits: {e}")
+        sys.exit(1)
+    
+    try:
+        remediation_ladder = RemediationLadder(
+            steps=parse_steps(args.remediation_steps),
+            ssm_document=args.ssm_document,
+            step_timeout=args.step_timeout,
+            escalation_window=args.escalation_window,
+        )
+        if 'replace' in remediation_ladder.steps and not args.target_group_arn:
+            raise ValueError("replace needs --target-group-arn")
+    except ValueError as e:
+        print(f"Error: Invalid remediation steps: {e}")
+        sys.exit(1)
+    
+    try:
+        health_policy = HealthPolicy(
+            failure_threshold=args.failure_threshold,
+            failure_ratio=args.failure_ratio,
+            window=args.window,
+            latency_slo=args.latency_slo,
+            latency_percentile=args.latency_percentile,
+            ewma_threshold=args.ewma_threshold,
+            ewma_alpha=args.ewma_alpha,
+        )
+    except ValueError as e:
+        print(f"Error: Invalid health policy: {e}")
+        sys.exit(1)
+    
+    try:
+        log_config = LogConfig(
+            path=args.log_file or None,
+            format=args.log_format,
+            max_bytes=args.log_max_bytes,
+            backup_count=args.log_backups,
+            rotate_when=args.log_rotate_when,
+            sample_rate=args.log_sample,
+        )
+    except ValueError as e:
+        print(f"Error: Invalid logging options: {e}")
         sys.exit(1)
     
+    paths = None
+    if args.paths:
+        try:
+            paths = [PathCheck.parse(spec, max_bytes=args.max_body_bytes) for spec in args.paths]
+            require_httpx()
+        except (ValueError, ImportError) as e:
+            print(f"Error: Invalid paths: {e}")
+            sys.exit(1)
+    
+    locations = None
+    if args.regions or args.assume_role:
+        region = os.environ.get('AWS_REGION', os.environ.get('AWS_DEFAULT_REGION', 'us-east-1'))
+        try:
+            locations = parse_locations((args.regions or region).split(','), args.assume_role or ())
+        except ValueError as e:
+            print(f"Error: Invalid regions or roles: {e}")
+            sys.exit(1)
+    
+    monitor_options = {
+        'restart_batch_size': args.restart_batch_size,
+        'inventory_ttl': args.inventory_ttl,
+        'instance_events_file': args.instance_events,
+        'remediation_scope': args.remediation_scope,
+        'target_group_arn': args.target_group_arn,
+        'content_matcher': content_matcher,
+        'recheck_interval': args.recheck_interval,
+        'max_interval': args.max_interval,
+        'jitter': args.jitter,
+        'history_file': args.history_file,
+        'history_size': args.history_size,
+        'cluster': cluster,
+        'remediation_workers': args.remediation_workers,
+        'restart_guard': restart_guard,
+        'remediation_ladder': remediation_ladder,
+        'locations': locations,
+        'health_policy': health_policy,
+        'log_config': log_config,
+        'deep_probe': args.deep_probe,
+        'deep_probe_concurrency': args.deep_probe_concurrency,
+        'node_probe': args.node_probe,
+        'dns_cache_ttl': args.dns_cache_ttl,
+        'paths': paths,
+    }
+    
     # Create and run monitor
-    monitor = HealthMonitor(args.endpoint, args.interval)
+    if config is not None:
+        loaded_options = config.options
+        
+        def reload_endpoints() -> List[Endpoint]:
+            nonlocal loaded_options
+            reloaded = load_config(config.path, check_overrides)
+            if reloaded.options != loaded_options:
+                monitor.logger.warning("Monitor options in the config file changed; they take effect after a restart")
+                loaded_options = reloaded.options
+            return [Endpoint.from_check(check) for check in reloaded.checks]
+        
+        monitor = MultiEndpointMonitor(
+            [Endpoint.from_check(check) for check in config.checks],
+            max_in_flight=args.max_in_flight,
+            config_loader=reload_endpoints,
+            **monitor_options
+        )
+    elif len(args.endpoints) == 1:
+        monitor = HealthMonitor(args.endpoints[0], args.interval, timeout=args.timeout, **monitor_options)
+    else:
+        # As in a config file, endpoints without an explicit threshold follow the health policy
+        monitor = MultiEndpointMonitor(
+            [Endpoint(url, interval=args.interval, timeout=args.timeout,
+                      failure_threshold=check_overrides.get('failure_threshold'))
+             for url in args.endpoints],
+            max_in_flight=args.max_in_flight,
+            **monitor_options
+        )
+    
+    if args.once:
+        sys.exit(0 if monitor.check_once() else 1)
+    
+    if args.metrics_port is not None:
+        monitor.start_metrics_server(args.metrics_port)
     
     try:
         monitor.run()
@@ -0,0 +1,187 @@
+"""
+HTTP/2 multi-path probing for the monitoring script.
+
+A ``PathProber`` checks several paths of one host in each round, for example
+the page, a static asset and an API route, each with its own expected
+content. The requests of a round are sent at once as concurrent streams of a
+single HTTP/2 connection, which is kept open between rounds, so a round
+costs one connection and one TLS handshake at most however many paths it
+checks. If the server does not negotiate HTTP/2, the requests queue on the
+one HTTP/1.1 connection instead.
+
+HTTP/2 needs httpx with its http2 extra (``pip install 'httpx[http2]'``),
+imported when the first prober is created.
+"""
+
+import logging
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence
+from urllib.parse import urlsplit, urlunsplit
+
+from content import DEFAULT_MAX_BODY_BYTES, ContentMatcher
+
+
+DEFAULT_PATH_TIMEOUT = 30.0
+
+# httpcore trace events marking a new connection and its TLS handshake
+_CONNECT_EVENT = 'connection.connect_tcp.complete'
+_TLS_EVENT = 'connection.start_tls.complete'
+
+# PATH[?QUERY][=EXPECTED]: the first '=' of each query parameter belongs to the query
+_PATH_SPEC = re.compile(r'([^=?]*(?:\?[^=&]*(?:=[^=&]*)?(?:&[^=&]*(?:=[^=&]*)?)*)?)(?:=(.*))?', re.DOTALL)
+
+
+def require_httpx():
+    """Import httpx, raising ImportError with install instructions if HTTP/2 support is missing."""
+    try:
+        import httpx
+        import h2  # noqa: F401  httpx only needs it once HTTP/2 is enabled
+    except ImportError:
+        raise ImportError("HTTP/2 path probing needs httpx with HTTP/2 support (pip install 'httpx[http2]')")
+    # httpx logs every request at INFO; the monitor logs the outcome of each path itself
+    logging.getLogger('httpx').setLevel(logging.WARNING)
+    return httpx
+
+
+@dataclass
+class PathCheck:
+    """A path probed on the endpoint's host, and what its response must contain."""
+    path: str
+    # Only a 200 status is required when there is no matcher
+    content_matcher: Optional[ContentMatcher] = None
+
+    def __post_init__(self):
+        if not self.path.startswith('/'):
+            raise ValueError(f"path must start with '/': {self.path!r}")
+
+    @classmethod
+    def parse(cls, spec: str, max_bytes: int = DEFAULT_MAX_BODY_BYTES) -> 'PathCheck':
+        """Parse ``PATH`` or ``PATH=EXPECTED``, as given to --path.
+
+        The path may carry a query string; the expected text starts at the
+        first '=' that is not the first of a query parameter, so
+        ``/search?q=x=results`` checks ``/search?q=x`` for ``results``.
+        """
+        path, expected = _PATH_SPEC.fullmatch(spec).groups()
+        return cls(path, ContentMatcher([expected], max_bytes=max_bytes) if expected else None)
+
+
+@dataclass
+class PathResult:
+    """Outcome of probing one path."""
+    path: str
+    healthy: bool
+    status: int = 0
+    latency: float = 0.0
+    http_version: Optional[str] = None
+    missing: List[str] = field(default_factory=list)
+    # How the probe failed, one of strategy.FAILURE_KINDS
+    failure: Optional[str] = None
+    error: Optional[str] = None
+
+
+@dataclass
+class PathRound:
+    """Outcome of one round of path probes."""
+    results: Dict[str, PathResult]
+    duration: float
+    new_connections: int = 0
+    tls_handshakes: int = 0
+
+    @property
+    def healthy(self) -> bool:
+        return all(result.healthy for result in self.results.values())
+
+
+class PathProber:
+    """Probe several paths of one host concurrently over a single kept-alive HTTP/2 connection."""
+
+    def __init__(self, url: str, paths: Sequence[PathCheck], timeout: float = DEFAULT_PATH_TIMEOUT,
+                 host: Optional[str] = None):
+        """Initialize the prober.
+
+        Args:
+            url: Endpoint whose scheme, host and port are probed; its path is ignored
+            paths: Paths to probe each round
+            timeout: Per-request timeout in seconds (default: 30)
+            host: Host header and TLS server name, when the URL names an address (default: the URL's host)
+        """
+        if not paths:
+            raise ValueError("at least one path is required")
+        httpx = require_httpx()
+        self._httpx = httpx
+        parts = urlsplit(url)
+        self.base_url = urlunsplit((parts.scheme, parts.netloc, '', '', ''))
+        self.paths = list(paths)
+        self.timeout = timeout
+        headers = {'Host': host} if host else None
+        extensions = {'sni_hostname': urlsplit(f"//{host}").hostname} if host and parts.scheme == 'https' else {}
+        self._extensions = extensions
+        # One connection, with HTTP/2 every request of a round is a stream on it
+        self.client = httpx.Client(
+            base_url=self.base_url, http2=True, verify=False, headers=headers, timeout=timeout,
+            limits=httpx.Limits(max_connections=1, max_keepalive_connections=1)
+        )
+        self._executor = ThreadPoolExecutor(max_workers=len(self.paths), thread_name_prefix='path-probe')
+        self._lock = threading.Lock()
+        self._events: Dict[str, int] = {}
+
+    def _trace(self, event: str, info: Dict):
+        if event in (_CONNECT_EVENT, _TLS_EVENT):
+            with self._lock:
+                self._events[event] = self._events.get(event, 0) + 1
+
+    def probe(self) -> PathRound:
+        """Probe every path at once and return their results."""
+        with self._lock:
+            self._events = {}
+        started = time.perf_counter()
+        futures = [self._executor.submit(self._probe_path, check) for check in self.paths]
+        results = {check.path: future.result() for check, future in zip(self.paths, futures)}
+        with self._lock:
+            events = dict(self._events)
+        return PathRound(
+            results=results,
+            duration=time.perf_counter() - started,
+            new_connections=events.get(_CONNECT_EVENT, 0),
+            tls_handshakes=events.get(_TLS_EVENT, 0),
+        )
+
+    def _probe_path(self, check: PathCheck) -> PathResult:
+        httpx = self._httpx
+        started = time.perf_counter()
+        result = PathResult(check.path, healthy=False)
+        try:
+            extensions = {'trace': self._trace, **self._extensions}
+            with self.client.stream('GET', check.path, extensions=extensions) as response:
+                result.status = response.status_code
+                result.http_version = response.http_version
+                if response.status_code != 200:
+                    result.failure = 'status'
+                elif check.content_matcher is None:
+                    result.healthy = True
+                else:
+                    matcher = check.content_matcher
+                    match = matcher.match_stream(response.iter_bytes(chunk_size=matcher.chunk_size))
+                    result.healthy = match.matched
+                    result.missing = match.missing
+                    if not match.matched:
+                        result.failure = 'content'
+        except httpx.TimeoutException as e:
+            result.failure, result.error = 'timeout', str(e) or type(e).__name__
+        except httpx.HTTPError as e:
+            message = str(e) or type(e).__name__
+            refused = isinstance(e, httpx.ConnectError) and (
+                'refused' in message.lower() or 'reset by peer' in message.lower())
+            result.failure, result.error = ('refused' if refused else 'unreachable'), message
+        result.latency = time.perf_counter() - started
+        return result
+
+    def close(self):
+        """Close the connection and the probe threads."""
+        self._executor.shutdown(wait=False)
+        self.client.close()
@@ -0,0 +1,243 @@
+"""
+Restart rate limiting for the monitoring script.
+
+Restarting web servers that do not come back healthy only burns capacity and
+EC2 API quota, so every restart goes through a RestartGuard that combines:
+
+- a cooldown after each remediation before the next one may start
+- a per-instance cooldown and token bucket (``max_restart_attempts`` per hour)
+- a global token bucket limiting instance restarts per hour across the fleet
+- a circuit breaker that stops remediation after repeated failed restarts and
+  lets a single trial restart through once it has been open for a while
+"""
+
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+DEFAULT_MAX_RESTART_ATTEMPTS = 3
+DEFAULT_RESTART_COOLDOWN = 300.0
+DEFAULT_MAX_RESTARTS_PER_HOUR = 20
+DEFAULT_BREAKER_THRESHOLD = 3
+DEFAULT_BREAKER_RESET = 1800.0
+
+HOUR = 3600.0
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """A bucket of ``capacity`` tokens refilled at one token every ``refill_interval`` seconds."""
+
+    def __init__(self, capacity: float, refill_interval: float, clock: Callable[[], float] = time.monotonic):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        if refill_interval <= 0:
+            raise ValueError("refill_interval must be positive")
+        self.capacity = capacity
+        self.refill_interval = refill_interval
+        self.clock = clock
+        self._tokens = float(capacity)
+        self._updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) / self.refill_interval)
+        self._updated = now
+
+    def available(self) -> float:
+        self._refill()
+        return self._tokens
+
+    def try_take(self, tokens: float = 1) -> bool:
+        """Take tokens if enough are available."""
+        self._refill()
+        if self._tokens < tokens:
+            return False
+        self._tokens -= tokens
+        return True
+
+    def give_back(self, tokens: float = 1):
+        """Return tokens taken for work that did not happen."""
+        self._tokens = min(self.capacity, self._tokens + tokens)
+
+
+class CircuitBreaker:
+    """Open after ``threshold`` consecutive failures; allow one trial after ``reset_timeout`` seconds."""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(self, threshold: int, reset_timeout: float, clock: Callable[[], float] = time.monotonic):
+        if threshold < 1:
+            raise ValueError("threshold must be at least 1")
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._trial_running = False
+
+    @property
+    def state(self) -> str:
+        if self._state == self.OPEN and self.clock() - self._opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+        return self._state
+
+    def allow(self) -> bool:
+        """Return True if an attempt may proceed; in half-open state only one trial at a time."""
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN and not self._trial_running:
+            self._trial_running = True
+            return True
+        return False
+
+    def cancel_trial(self):
+        """Give up a trial allowed in half-open state without recording an outcome."""
+        self._trial_running = False
+
+    def record_success(self):
+        self.failures = 0
+        self._state = self.CLOSED
+        self._trial_running = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._trial_running = False
+        if self._state == self.HALF_OPEN or self.failures >= self.threshold:
+            self._state = self.OPEN
+            self._opened_at = self.clock()
+
+    def retry_in(self) -> float:
+        """Seconds until an open breaker lets a trial through."""
+        if self.state != self.OPEN:
+            return 0.0
+        return max(0.0, self.reset_timeout - (self.clock() - self._opened_at))
+
+
+class RestartGuard:
+    """Decide which restarts may go ahead, and learn from how they went."""
+
+    def __init__(self, max_restart_attempts: int = DEFAULT_MAX_RESTART_ATTEMPTS,
+                 restart_cooldown: float = DEFAULT_RESTART_COOLDOWN,
+                 max_restarts_per_hour: int = DEFAULT_MAX_RESTARTS_PER_HOUR,
+                 breaker_threshold: int = DEFAULT_BREAKER_THRESHOLD,
+                 breaker_reset: float = DEFAULT_BREAKER_RESET,
+                 clock: Callable[[], float] = time.monotonic):
+        """Initialize the guard.
+
+        Args:
+            max_restart_attempts: Restarts allowed per instance per hour (default: 3)
+            restart_cooldown: Seconds after a remediation, or an instance's restart,
+                before another may start (default: 300)
+            max_restarts_per_hour: Instance restarts allowed per hour across the fleet (default: 20)
+            breaker_threshold: Consecutive failed restarts that open the circuit breaker (default: 3)
+            breaker_reset: Seconds the breaker stays open before a trial restart (default: 1800)
+            clock: Time source, for tests
+        """
+        if max_restart_attempts < 1 or max_restarts_per_hour < 1:
+            raise ValueError("restart limits must allow at least one restart per hour")
+        if restart_cooldown < 0:
+            raise ValueError("restart_cooldown must not be negative")
+        self.max_restart_attempts = max_restart_attempts
+        self.restart_cooldown = restart_cooldown
+        self.max_restarts_per_hour = max_restarts_per_hour
+        self.clock = clock
+        self.breaker = CircuitBreaker(breaker_threshold, breaker_reset, clock)
+        self._fleet_bucket = TokenBucket(max_restarts_per_hour, HOUR / max_restarts_per_hour, clock)
+        self._instance_buckets: Dict[str, TokenBucket] = {}
+        self._instance_restarted: Dict[str, float] = {}
+        self._remediation_finished: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def describe(self) -> str:
+        """Return a one-line summary of the limits for logging."""
+        return (f"{self.max_restart_attempts} per instance per hour, {self.max_restarts_per_hour} per hour in total, "
+                f"{self.restart_cooldown:.0f}s cooldown, circuit breaker after {self.breaker.threshold} failure(s) "
+                f"for {self.breaker.reset_timeout:.0f}s")
+
+    def cooldown_remaining(self) -> float:
+        """Seconds until a new remediation may start."""
+        with self._lock:
+            if self._remediation_finished is None:
+                return 0.0
+            return max(0.0, self.restart_cooldown - (self.clock() - self._remediation_finished))
+
+    def remediation_blocked(self) -> Optional[str]:
+        """Return why a new remediation may not start now, or None if it may."""
+        remaining = self.cooldown_remaining()
+        if remaining > 0:
+            return f"cooldown ({remaining:.0f}s left)"
+        with self._lock:
+            if self.breaker.state == CircuitBreaker.OPEN:
+                return f"circuit breaker open after {self.breaker.failures} failed restart(s) (trial in {self.breaker.retry_in():.0f}s)"
+        return None
+
+    def admit(self, instance_ids: List[str]) -> Tuple[List[str], Dict[str, str]]:
+        """Take permission to restart instances.
+
+        Returns:
+            The instances that may restart now, and the reason for each one that may not
+        """
+        allowed = []
+        refused = {}
+        with self._lock:
+            if not self.breaker.allow():
+                return [], {instance_id: 'circuit breaker open' for instance_id in instance_ids}
+            trial = self.breaker.state == CircuitBreaker.HALF_OPEN
+            now = self.clock()
+            for instance_id in instance_ids:
+                if trial and allowed:
+                    refused[instance_id] = 'circuit breaker trial limited to one instance'
+                    continue
+                last = self._instance_restarted.get(instance_id)
+                if last is not None and now - last < self.restart_cooldown:
+                    refused[instance_id] = f"restarted {now - last:.0f}s ago (cooldown {self.restart_cooldown:.0f}s)"
+                    continue
+                bucket = self._instance_buckets.setdefault(
+                    instance_id, TokenBucket(self.max_restart_attempts, HOUR / self.max_restart_attempts, self.clock)
+                )
+                if not bucket.try_take():
+                    refused[instance_id] = f"{self.max_restart_attempts} restart attempts per hour used"
+                    continue
+                if not self._fleet_bucket.try_take():
+                    bucket.give_back()
+                    refused[instance_id] = f"fleet limit of {self.max_restarts_per_hour} restarts per hour reached"
+                    continue
+                allowed.append(instance_id)
+            if trial and not allowed:
+                self.breaker.cancel_trial()
+        return allowed, refused
+
+    def cancel(self, instance_ids: List[str]):
+        """Hand back the permission taken for admitted instances that were not restarted after all."""
+        with self._lock:
+            for instance_id in instance_ids:
+                self._instance_buckets[instance_id].give_back()
+                self._fleet_bucket.give_back()
+            self.breaker.cancel_trial()
+
+    def record_restart(self, instance_ids: List[str], success: bool):
+        """Record the outcome of restarting instances that were admitted."""
+        with self._lock:
+            now = self.clock()
+            for instance_id in instance_ids:
+                self._instance_restarted[instance_id] = now
+            if success:
+                self.breaker.record_success()
+            else:
+                self.breaker.record_failure()
+                if self.breaker.state == CircuitBreaker.OPEN:
+                    logger.error(f"Circuit breaker opened after {self.breaker.failures} failed restart(s); "
+                                 f"remediation paused for {self.breaker.reset_timeout:.0f}s")
+
+    def record_remediation_finished(self):
+        """Start the cooldown before the next remediation."""
+        with self._lock:
+            self._remediation_finished = self.clock()
@@ -0,0 +1,287 @@
+"""
+Remediation job queue for the monitoring script.
+
+Restarting web servers can take many minutes of EC2 waiters, so it never runs
+on the probe loop. Each failing endpoint submits a job to a bounded pool of
+worker threads instead. The pool also:
+
+- refuses a second job for an endpoint that already has one queued or running
+- lets each instance be claimed by only one job at a time
+- limits how many instances are restarting at once across all jobs
+- cancels jobs when their endpoint recovers
+- keeps the status of active and recent jobs
+"""
+
+import itertools
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional
+
+
+DEFAULT_REMEDIATION_WORKERS = 2
+
+# Finished jobs kept for status reporting
+DEFAULT_JOB_HISTORY = 50
+
+# Longest wait for running jobs at shutdown, inside the 30 second Kubernetes and 90 second systemd stop timeouts
+DEFAULT_SHUTDOWN_TIMEOUT = 20.0
+
+JOB_STATES = ('queued', 'running', 'succeeded', 'failed', 'cancelled')
+ACTIVE_JOB_STATES = ('queued', 'running')
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RemediationJob:
+    """One remediation of the web servers on behalf of a failing endpoint."""
+    job_id: int
+    source: str
+    state: str = 'queued'
+    created: float = field(default_factory=time.time)
+    started: Optional[float] = None
+    finished: Optional[float] = None
+    instance_ids: List[str] = field(default_factory=list)
+    restarted: int = 0
+    failed: int = 0
+    error: Optional[str] = None
+    cancel_requested: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    @property
+    def active(self) -> bool:
+        return self.state in ACTIVE_JOB_STATES
+
+    def to_dict(self) -> Dict:
+        """Return the job status as a JSON-serializable dict."""
+        return {
+            'job_id': self.job_id,
+            'source': self.source,
+            'state': self.state,
+            'created': self.created,
+            'started': self.started,
+            'finished': self.finished,
+            'instance_ids': list(self.instance_ids),
+            'restarted': self.restarted,
+            'failed': self.failed,
+            'error': self.error,
+            'cancel_requested': self.cancel_requested.is_set(),
+        }
+
+
+class RemediationPool:
+    """Run remediation jobs on a bounded pool of worker threads."""
+
+    def __init__(self, handler: Callable[[RemediationJob], None], workers: int = DEFAULT_REMEDIATION_WORKERS,
+                 listener: Optional[Callable[[RemediationJob], None]] = None,
+                 history: int = DEFAULT_JOB_HISTORY):
+        """Initialize the pool. Worker threads start with the first job.
+
+        Args:
+            handler: Performs a job; it records restarted and failed instances on the job
+            workers: Maximum number of jobs running at once (default: 2)
+            listener: Called after every job state change
+            history: Finished jobs kept for status reporting (default: 50)
+        """
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+
+        self.handler = handler
+        self.workers = workers
+        self.listener = listener
+        self._queue: 'queue.Queue[Optional[RemediationJob]]' = queue.Queue()
+        self._condition = threading.Condition()
+        self._active: Dict[int, RemediationJob] = {}
+        self._finished = deque(maxlen=history)
+        self._claimed: Dict[str, int] = {}
+        self._restarting = 0
+        self._job_ids = itertools.count(1)
+        self._threads: List[threading.Thread] = []
+
+    def _start_workers(self):
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(
+                target=self._work, name=f'remediation-{len(self._threads) + 1}', daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def _notify(self, job: RemediationJob):
+        if self.listener is not None:
+            try:
+                self.listener(job)
+            except Exception as e:
+                logger.error(f"Remediation job listener failed: {str(e)}")
+
+    def submit(self, source: str) -> Optional[RemediationJob]:
+        """Queue a job for a failing endpoint.
+
+        Returns:
+            The new job, or None if the endpoint already has a job queued or running
+        """
+        with self._condition:
+            if any(job.source == source for job in self._active.values()):
+                return None
+            job = RemediationJob(job_id=next(self._job_ids), source=source)
+            self._active[job.job_id] = job
+            self._start_workers()
+        self._queue.put(job)
+        logger.info(f"Remediation job {job.job_id} queued for {source}")
+        self._notify(job)
+        return job
+
+    def cancel(self, source: str) -> List[RemediationJob]:
+        """Cancel the active jobs of an endpoint.
+
+        Queued jobs never start. Running jobs stop before their next batch;
+        instances already being restarted finish their stop/start cycle.
+
+        Returns:
+            The jobs that were asked to cancel
+        """
+        cancelled = []
+        with self._condition:
+            for job in list(self._active.values()):
+                if job.source != source or job.cancel_requested.is_set():
+                    continue
+                job.cancel_requested.set()
+                cancelled.append(job)
+                if job.state == 'queued':
+                    self._finish(job, 'cancelled')
+            # Wake running jobs waiting for restart slots
+            self._condition.notify_all()
+        for job in cancelled:
+            logger.info(f"Remediation job {job.job_id} for {source} cancelled")
+            self._notify(job)
+        return cancelled
+
+    def claim(self, job: RemediationJob, instance_ids: Iterable[str]) -> List[str]:
+        """Claim instances for a job, leaving out those another active job holds.
+
+        Returns:
+            The instances the job may restart
+        """
+        with self._condition:
+            claimed = [
+                instance_id for instance_id in instance_ids
+                if self._claimed.setdefault(instance_id, job.job_id) == job.job_id
+            ]
+            job.instance_ids.extend(instance_id for instance_id in claimed if instance_id not in job.instance_ids)
+        return claimed
+
+    def acquire_restart_slots(self, job: RemediationJob, count: int, limit: int) -> bool:
+        """Wait until ``count`` more instances can restart without exceeding ``limit`` across all jobs.
+
+        A batch is always allowed when nothing else is restarting, so a batch
+        larger than the limit cannot wait forever.
+
+        Returns:
+            True once the slots are taken, False if the job was cancelled while waiting
+        """
+        with self._condition:
+            self._condition.wait_for(
+                lambda: job.cancel_requested.is_set() or self._restarting == 0 or self._restarting + count <= limit
+            )
+            if job.cancel_requested.is_set():
+                return False
+            self._restarting += count
+            return True
+
+    def release_restart_slots(self, count: int):
+        with self._condition:
+            self._restarting -= count
+            self._condition.notify_all()
+
+    def active(self) -> List[RemediationJob]:
+        """Return the queued and running jobs."""
+        with self._condition:
+            return list(self._active.values())
+
+    def status(self) -> Dict:
+        """Return the active and recently finished jobs as JSON-serializable dicts."""
+        with self._condition:
+            return {
+                'active': [job.to_dict() for job in self._active.values()],
+                'finished': [job.to_dict() for job in reversed(self._finished)],
+            }
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """Wait until no job is queued or running.
+
+        Returns:
+            True if the pool is idle, False if the timeout expired first
+        """
+        with self._condition:
+            return self._condition.wait_for(lambda: not self._active, timeout=timeout)
+
+    def shutdown(self, timeout: Optional[float] = DEFAULT_SHUTDOWN_TIMEOUT) -> List[RemediationJob]:
+        """Cancel every job, wait a bounded time for running ones to stop, and stop the workers.
+
+        Running jobs stop before their next batch. Those still running when
+        the timeout expires are logged and left to the daemon worker threads.
+
+        Args:
+            timeout: Longest wait for running jobs in seconds, or None to wait for them (default: 20)
+
+        Returns:
+            The jobs still running
+        """
+        for source in {job.source for job in self.active()}:
+            self.cancel(source)
+        idle = self.join(timeout)
+        for _ in self._threads:
+            self._queue.put(None)
+        if idle:
+            for thread in self._threads:
+                thread.join()
+        self._threads = []
+        running = self.active()
+        for job in running:
+            logger.warning(f"Remediation job {job.job_id} for {job.source} still running at shutdown; "
+                           f"instances {', '.join(job.instance_ids) or 'none'} may be left mid-restart",
+                           extra={'instance_ids': list(job.instance_ids)})
+        return running
+
+    def _finish(self, job: RemediationJob, state: str):
+        """Move a job to a final state. Must be called holding the condition."""
+        job.state = state
+        job.finished = time.time()
+        self._active.pop(job.job_id, None)
+        self._finished.append(job)
+        for instance_id in job.instance_ids:
+            if self._claimed.get(instance_id) == job.job_id:
+                del self._claimed[instance_id]
+        self._condition.notify_all()
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            with self._condition:
+                if job.state != 'queued':
+                    continue  # Cancelled while queued
+                job.state = 'running'
+                job.started = time.time()
+            self._notify(job)
+
+            state = 'succeeded'
+            try:
+                self.handler(job)
+                if job.cancel_requested.is_set():
+                    state = 'cancelled'
+                elif job.failed:
+                    state = 'failed'
+            except Exception as e:
+                job.error = str(e)
+                state = 'failed'
+                logger.error(f"Remediation job {job.job_id} failed: {str(e)}")
+
+            with self._condition:
+                self._finish(job, state)
+            logger.info(f"Remediation job {job.job_id} for {job.source} {state}: "
+                        f"{job.restarted} restarted, {job.failed} failed")
+            self._notify(job)
@@ -0,0 +1,221 @@
+"""
+Surge replacement of failed web servers.
+
+A stop/start takes an instance out of service for minutes. Replacing it
+instead keeps its capacity serving throughout: a new instance is launched
+from the failed one's configuration (AMI, instance type, subnet, security
+groups, instance profile and tags, as recorded by the inventory), and only
+once it passes its own health check and the ALB target group reports it
+healthy is the failed instance deregistered, drained and terminated.
+
+If anything fails before the failed instance is drained, the replacement is
+deregistered and terminated again and the failed instance is left as it was.
+"""
+
+import logging
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional
+
+from strategy import DEFAULT_POLL_INTERVAL, DEFAULT_STEP_TIMEOUT
+
+
+# Tag set on a replacement, naming the instance it replaced
+REPLACEMENT_TAG = 'ReplacementFor'
+
+# Longest wait for connections to drain from a deregistered target (the target group default delay)
+DEFAULT_DRAIN_TIMEOUT = 300.0
+
+# Stages of a replacement, in order
+REPLACEMENT_STAGES = ('launch', 'running', 'healthy', 'register', 'drain', 'terminate')
+
+logger = logging.getLogger(__name__)
+
+
+def launch_parameters(instance: Dict) -> Dict:
+    """Build RunInstances parameters reproducing an instance's launch configuration.
+
+    Args:
+        instance: Inventory record of the instance, whose ID is recorded in the REPLACEMENT_TAG tag
+
+    Raises:
+        ValueError: If the record lacks the AMI, instance type or subnet
+    """
+    missing = [key for key in ('image_id', 'instance_type', 'subnet_id') if not instance.get(key)]
+    if missing:
+        raise ValueError(f"instance {instance['instance_id']} has no {', '.join(missing)} to launch a replacement from")
+    # Tags with the aws: prefix are reserved and cannot be set
+    tags = [{'Key': key, 'Value': value} for key, value in instance.get('tags', {}).items()
+            if not key.startswith('aws:') and key != REPLACEMENT_TAG]
+    tags.append({'Key': REPLACEMENT_TAG, 'Value': instance['instance_id']})
+    parameters = {
+        'ImageId': instance['image_id'],
+        'InstanceType': instance['instance_type'],
+        'SubnetId': instance['subnet_id'],
+        'MinCount': 1,
+        'MaxCount': 1,
+        'TagSpecifications': [{'ResourceType': 'instance', 'Tags': tags}],
+    }
+    if instance.get('security_group_ids'):
+        parameters['SecurityGroupIds'] = list(instance['security_group_ids'])
+    if instance.get('iam_instance_profile'):
+        parameters['IamInstanceProfile'] = {'Arn': instance['iam_instance_profile']}
+    if instance.get('key_name'):
+        parameters['KeyName'] = instance['key_name']
+    return parameters
+
+
+@dataclass
+class ReplacementResult:
+    """Outcome of replacing one instance."""
+    instance_id: str
+    replacement_id: Optional[str] = None
+    replaced: bool = False
+    # Last stage reached, one of REPLACEMENT_STAGES
+    stage: str = 'launch'
+    error: Optional[str] = None
+    duration: float = 0.0
+
+
+class InstanceReplacer:
+    """Replace failed instances behind an ALB target group, launching before terminating."""
+
+    def __init__(self, ec2_client, elbv2_client, target_group_arn: str, probe: Callable[[Dict], bool],
+                 timeout: float = DEFAULT_STEP_TIMEOUT, drain_timeout: float = DEFAULT_DRAIN_TIMEOUT,
+                 poll_interval: float = DEFAULT_POLL_INTERVAL, clock: Callable[[], float] = time.monotonic):
+        """Initialize the replacer.
+
+        Args:
+            ec2_client: EC2 client of the region and account the failed instances live in
+            elbv2_client: ELBv2 client of the target group's region
+            target_group_arn: ALB target group the instances are registered in
+            probe: Return whether an instance record, with its address, passes the health check
+            timeout: Seconds a replacement gets to start running, and again to pass its checks (default: 180)
+            drain_timeout: Longest wait for the failed instance to drain (default: 300)
+            poll_interval: Seconds between polls (default: 5)
+            clock: Monotonic clock, replaceable in tests
+        """
+        self.ec2_client = ec2_client
+        self.elbv2_client = elbv2_client
+        self.target_group_arn = target_group_arn
+        self.probe = probe
+        self.timeout = timeout
+        self.drain_timeout = drain_timeout
+        self.poll_interval = poll_interval
+        self.clock = clock
+
+    def replace(self, instance: Dict) -> ReplacementResult:
+        """Replace one instance, cleaning up the replacement if it never takes over.
+
+        Args:
+            instance: Inventory record of the failed instance
+        """
+        started = self.clock()
+        result = ReplacementResult(instance['instance_id'])
+        registered = False
+        try:
+            response = self.ec2_client.run_instances(**launch_parameters(instance))
+            result.replacement_id = response['Instances'][0]['InstanceId']
+            logger.info(f"Launched {result.replacement_id} to replace {result.instance_id}",
+                        extra={'instance_ids': [result.instance_id, result.replacement_id]})
+
+            result.stage = 'running'
+            replacement = self._wait_running(result.replacement_id)
+
+            result.stage = 'healthy'
+            self._wait_until(lambda: self.probe(replacement), self.timeout,
+                             f"{result.replacement_id} did not pass its health check")
+
+            result.stage = 'register'
+            self.elbv2_client.register_targets(
+                TargetGroupArn=self.target_group_arn, Targets=[{'Id': result.replacement_id}]
+            )
+            registered = True
+            self._wait_until(lambda: self._target_state(result.replacement_id) == 'healthy', self.timeout,
+                             f"{result.replacement_id} did not become healthy in the target group")
+        except Exception as e:
+            result.error = str(e)
+            logger.error(f"✗ Replacing {result.instance_id} failed at {result.stage}: {e}",
+                         extra={'instance_ids': [result.instance_id]})
+            self._discard(result.replacement_id, registered)
+            result.duration = self.clock() - started
+            return result
+
+        # The replacement serves traffic; from here on the failed instance goes whatever happens
+        try:
+            result.stage = 'drain'
+            self.elbv2_client.deregister_targets(
+                TargetGroupArn=self.target_group_arn, Targets=[{'Id': result.instance_id}]
+            )
+            try:
+                self._wait_until(lambda: self._target_state(result.instance_id) in (None, 'unused'),
+                                 self.drain_timeout, f"{result.instance_id} did not finish draining")
+            except TimeoutError as e:
+                logger.warning(f"{e} - terminating it anyway")
+
+            result.stage = 'terminate'
+            self.ec2_client.terminate_instances(InstanceIds=[result.instance_id])
+            result.replaced = True
+            logger.info(f"✓ Replaced {result.instance_id} with {result.replacement_id}",
+                        extra={'instance_ids': [result.instance_id, result.replacement_id]})
+        except Exception as e:
+            result.error = str(e)
+            logger.error(f"✗ Retiring {result.instance_id} after launching {result.replacement_id} failed "
+                         f"at {result.stage}: {e}", extra={'instance_ids': [result.instance_id]})
+        result.duration = self.clock() - started
+        return result
+
+    def _wait_running(self, instance_id: str) -> Dict:
+        """Wait for a launched instance to run and return its record, with its addresses."""
+        described = {}
+
+        def running() -> bool:
+            response = self.ec2_client.describe_instances(InstanceIds=[instance_id])
+            for reservation in response['Reservations']:
+                for entry in reservation['Instances']:
+                    described.update(entry)
+            return described.get('State', {}).get('Name') == 'running'
+
+        self._wait_until(running, self.timeout, f"{instance_id} did not start running")
+        return {
+            'instance_id': instance_id,
+            'state': 'running',
+            'private_ip': described.get('PrivateIpAddress'),
+            'public_ip': described.get('PublicIpAddress'),
+        }
+
+    def _target_state(self, instance_id: str) -> Optional[str]:
+        """Return the target group's state for an instance, or None if it is not registered."""
+        response = self.elbv2_client.describe_target_health(
+            TargetGroupArn=self.target_group_arn, Targets=[{'Id': instance_id}]
+        )
+        for description in response['TargetHealthDescriptions']:
+            if description['Target']['Id'] == instance_id:
+                return description['TargetHealth']['State']
+        return None
+
+    def _wait_until(self, condition: Callable[[], bool], timeout: float, message: str):
+        """Poll a condition until it holds.
+
+        Raises:
+            TimeoutError: If it still does not hold after ``timeout`` seconds
+        """
+        deadline = self.clock() + timeout
+        while not condition():
+            if self.clock() >= deadline:
+                raise TimeoutError(message)
+            time.sleep(self.poll_interval)
+
+    def _discard(self, replacement_id: Optional[str], registered: bool):
+        """Deregister and terminate a replacement that did not take over."""
+        if replacement_id is None:
+            return
+        try:
+            if registered:
+                self.elbv2_client.deregister_targets(
+                    TargetGroupArn=self.target_group_arn, Targets=[{'Id': replacement_id}]
+                )
+            self.ec2_client.terminate_instances(InstanceIds=[replacement_id])
+            logger.info(f"Terminated unused replacement {replacement_id}")
+        except Exception as e:
+            logger.error(f"Failed to clean up replacement {replacement_id}: {e}")
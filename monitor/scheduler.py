@@ -0,0 +1,92 @@
+"""
+Adaptive probe scheduling for the monitoring script.
+
+Decides how long to wait before the next probe of an endpoint: re-check
+quickly after a failure so it is confirmed (or cleared) well before a full
+interval has passed, back off while the endpoint is stable if allowed to, add jitter so
+monitors started together drift apart, and subtract the time the probe itself
+took so the schedule does not drift.
+"""
+
+import random
+import time
+from typing import Optional
+
+
+DEFAULT_JITTER = 0.1
+DEFAULT_BACKOFF_FACTOR = 1.5
+DEFAULT_STABLE_AFTER = 10
+
+# Never re-check faster than this, however short the interval
+MIN_RECHECK_INTERVAL = 1.0
+
+
+class ProbeScheduler:
+    """Compute drift-corrected, jittered delays between probes of one endpoint."""
+
+    def __init__(self, interval: float, recheck_interval: Optional[float] = None,
+                 max_interval: Optional[float] = None, jitter: float = DEFAULT_JITTER,
+                 backoff_factor: float = DEFAULT_BACKOFF_FACTOR, stable_after: int = DEFAULT_STABLE_AFTER,
+                 rng: Optional[random.Random] = None):
+        """Initialize the scheduler.
+
+        Args:
+            interval: Base seconds between probes
+            recheck_interval: Seconds before re-checking after a failure (default: a quarter of the interval)
+            max_interval: Longest delay once the endpoint is stable (default: the interval, so no back-off)
+            jitter: Random spread applied to every delay, as a fraction of it (default: 0.1)
+            backoff_factor: Growth of the delay per stable probe (default: 1.5)
+            stable_after: Consecutive successes before backing off (default: 10)
+            rng: Random number generator, for deterministic tests
+        """
+        if interval <= 0:
+            raise ValueError("interval must be positive")
+        if not 0 <= jitter < 1:
+            raise ValueError("jitter must be between 0 and 1")
+
+        self.interval = interval
+        self.recheck_interval = recheck_interval if recheck_interval is not None else \
+            min(interval, max(MIN_RECHECK_INTERVAL, interval / 4))
+        self.max_interval = max(interval, max_interval if max_interval is not None else interval)
+        self.jitter = jitter
+        self.backoff_factor = backoff_factor
+        self.stable_after = stable_after
+        self.rng = rng or random.Random()
+
+        self.current_interval = interval
+        self.consecutive_successes = 0
+
+    def initial_delay(self) -> float:
+        """Return a random offset for the first probe, so endpoints started together spread out."""
+        return self.rng.uniform(0, self.interval) if self.jitter else 0.0
+
+    def record(self, healthy: bool) -> float:
+        """Record a probe outcome and return the un-jittered delay before the next probe."""
+        if healthy:
+            self.consecutive_successes += 1
+            if self.consecutive_successes > self.stable_after:
+                self.current_interval = min(self.current_interval * self.backoff_factor, self.max_interval)
+            return self.current_interval
+
+        # Confirm or clear a failure quickly, and drop any back-off
+        self.consecutive_successes = 0
+        self.current_interval = self.interval
+        return self.recheck_interval
+
+    def next_delay(self, healthy: bool, probe_started: float, now: Optional[float] = None) -> float:
+        """Record a probe outcome and return how long to sleep before the next probe.
+
+        Args:
+            healthy: Whether the probe succeeded
+            probe_started: time.monotonic() when the probe started
+            now: time.monotonic() now (default: read the clock)
+
+        Returns:
+            Seconds to sleep, with jitter applied and the probe's own duration subtracted
+        """
+        delay = self.record(healthy)
+        if self.jitter:
+            delay *= self.rng.uniform(1 - self.jitter, 1 + self.jitter)
+        if now is None:
+            now = time.monotonic()
+        return max(0.0, probe_started + delay - now)
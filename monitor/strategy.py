@@ -0,0 +1,164 @@
+"""
+Remediation strategy selection for the monitoring script.
+
+A full stop/start takes minutes, while most failures are fixed by something
+much cheaper. Remediation therefore climbs a ladder of steps, cheapest first:
+
+- ``restart-nginx``: restart nginx through SSM Run Command
+- ``rerun-document``: re-run the SSM document that configured the server
+- ``reboot``: reboot the instance in place
+- ``stop-start``: stop and start the instance, moving it to new hardware
+- ``replace``: launch a new instance from the failed one's configuration and
+  terminate the failed one once the new one serves traffic (see
+  replacement.py). It is only used when listed explicitly, since it
+  terminates instances
+
+The first step depends on how the endpoint failed: a page without the expected
+content needs its configuration re-applied, a refused connection or an error
+status needs nginx restarted, and a timeout suggests the host itself is stuck.
+An instance that is still unhealthy after a step moves on to the next one, and
+an instance remediated again soon after starts one step further up.
+"""
+
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+import requests
+
+
+REMEDIATION_STEPS = ('restart-nginx', 'rerun-document', 'reboot', 'stop-start', 'replace')
+
+# Steps used unless others are configured; replacing terminates instances, so it is opt-in
+DEFAULT_REMEDIATION_STEPS = REMEDIATION_STEPS[:4]
+
+# How an endpoint failed
+FAILURE_KINDS = ('content', 'status', 'refused', 'timeout', 'unreachable')
+
+# Cheapest step likely to fix each kind of failure; an unknown failure gets a full stop/start
+FIRST_STEP = {
+    'content': 'rerun-document',
+    'status': 'restart-nginx',
+    'refused': 'restart-nginx',
+    'timeout': 'reboot',
+    'unreachable': 'reboot',
+}
+
+# SSM document created by tf-deploy/ssm.tf; FIPS setup is skipped because it reboots the server
+DEFAULT_SSM_DOCUMENT = 'ServerConfiguration'
+SSM_DOCUMENT_PARAMETERS = {'skipFIPS': ['true']}
+NGINX_RESTART_COMMANDS = ['sudo systemctl restart nginx', 'sudo systemctl is-active nginx']
+
+# Command invocation states after which SSM does nothing more
+SSM_FINAL_STATES = ('Success', 'Cancelled', 'TimedOut', 'Failed')
+
+DEFAULT_STEP_TIMEOUT = 180.0
+DEFAULT_ESCALATION_WINDOW = 3600.0
+DEFAULT_POLL_INTERVAL = 5.0
+
+# Readiness polls after a step start this far apart and back off by this factor, up to the poll interval
+READINESS_FIRST_DELAY = 0.5
+READINESS_BACKOFF = 2.0
+
+
+def classify_failure(status: int = 0, error: Optional[Exception] = None) -> str:
+    """Return the kind of failure for a failed probe.
+
+    Args:
+        status: HTTP status of the response, or 0 if there was none
+        error: The exception the probe raised, if any
+    """
+    if error is None:
+        return 'content' if status == 200 else 'status'
+    if isinstance(error, requests.exceptions.Timeout):
+        return 'timeout'
+    if isinstance(error, requests.exceptions.ConnectionError) and (
+            'refused' in str(error).lower() or 'reset by peer' in str(error).lower()):
+        return 'refused'
+    return 'unreachable'
+
+
+def parse_steps(value: str) -> List[str]:
+    """Parse a comma-separated list of remediation steps."""
+    return [step.strip() for step in value.split(',') if step.strip()]
+
+
+class RemediationLadder:
+    """Pick the remediation step for each instance and remember what was tried."""
+
+    def __init__(self, steps: Sequence[str] = DEFAULT_REMEDIATION_STEPS, ssm_document: str = DEFAULT_SSM_DOCUMENT,
+                 step_timeout: float = DEFAULT_STEP_TIMEOUT, escalation_window: float = DEFAULT_ESCALATION_WINDOW,
+                 poll_interval: float = DEFAULT_POLL_INTERVAL, clock: Callable[[], float] = time.monotonic):
+        """Initialize the ladder.
+
+        Args:
+            steps: Steps that may be used, cheapest first (default: all but replace)
+            ssm_document: SSM document re-run by the rerun-document step (default: ServerConfiguration)
+            step_timeout: Seconds to wait for a step's command and for the instance to recover (default: 180)
+            escalation_window: Seconds during which an instance remediated again starts one step higher (default: 3600)
+            poll_interval: Seconds between checks while waiting on a step (default: 5)
+            clock: Time source, for tests
+        """
+        if not steps:
+            raise ValueError("at least one remediation step is required")
+        unknown = [step for step in steps if step not in REMEDIATION_STEPS]
+        if unknown:
+            raise ValueError(f"unknown remediation step(s) {', '.join(unknown)}; choose from {', '.join(REMEDIATION_STEPS)}")
+
+        # Always climb in cost order, whatever order the steps were given in
+        self.steps = [step for step in REMEDIATION_STEPS if step in steps]
+        self.ssm_document = ssm_document
+        self.step_timeout = step_timeout
+        self.escalation_window = escalation_window
+        self.poll_interval = poll_interval
+        self.clock = clock
+        self._last_step: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    def describe(self) -> str:
+        """Return a one-line summary of the ladder for logging."""
+        return f"{' -> '.join(self.steps)} (step timeout: {self.step_timeout:g}s)"
+
+    def _available(self, step: str) -> str:
+        """Return the first usable step at or above ``step``, or the most thorough one if none is."""
+        rank = REMEDIATION_STEPS.index(step)
+        for candidate in self.steps:
+            if REMEDIATION_STEPS.index(candidate) >= rank:
+                return candidate
+        return self.steps[-1]
+
+    def next_step(self, step: str) -> Optional[str]:
+        """Return the step to escalate to after ``step``, or None if it is the last one."""
+        index = self.steps.index(step)
+        return self.steps[index + 1] if index + 1 < len(self.steps) else None
+
+    def first_steps(self, instance_ids: Iterable[str], failure_kind: Optional[str],
+                    stopped: Iterable[str] = ()) -> Dict[str, str]:
+        """Return the step each instance starts from.
+
+        Args:
+            instance_ids: Instances to remediate
+            failure_kind: How the endpoint failed, one of FAILURE_KINDS, or None if unknown
+            stopped: Instances that are stopped; only a start brings them back
+        """
+        stopped = set(stopped)
+        preferred = FIRST_STEP.get(failure_kind, 'stop-start')
+        now = self.clock()
+        plan = {}
+        with self._lock:
+            for instance_id in instance_ids:
+                step = self._available('stop-start' if instance_id in stopped else preferred)
+                last = self._last_step.get(instance_id)
+                if last is not None and now - last[1] < self.escalation_window:
+                    escalated = self.next_step(last[0]) or last[0]
+                    if self.steps.index(escalated) > self.steps.index(step):
+                        step = escalated
+                plan[instance_id] = step
+        return plan
+
+    def record(self, instance_ids: Iterable[str], step: str):
+        """Remember the step last tried on instances."""
+        now = self.clock()
+        with self._lock:
+            for instance_id in instance_ids:
+                self._last_step[instance_id] = (step, now)
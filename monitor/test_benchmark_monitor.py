@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Tests for the benchmark harness.
+"""
+
+import os
+import sys
+import unittest
+
+# Add the monitor directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from benchmark_monitor import (
+    benchmark_discovery, benchmark_logging, benchmark_remediation, benchmark_startup, compare_results
+)
+from local_standins import StandInServer
+
+
+def _report(probes_per_sec, remediation_sec):
+    return {'results': [
+        {'scenario': 'throughput', 'params': {'endpoints': 10, 'mode': 'healthy'},
+         'metrics': {'probes': 100, 'probes_per_sec': probes_per_sec}},
+        {'scenario': 'remediation', 'params': {'instances': 2},
+         'metrics': {'remediation_sec': remediation_sec}},
+    ]}
+
+
+class TestBenchmark(unittest.TestCase):
+    """Test cases for the benchmark harness."""
+
+    def test_compare_within_tolerance(self):
+        """Test that small changes in either direction are not regressions."""
+        self.assertEqual(compare_results(_report(100, 1.0), _report(90, 1.1), tolerance=0.2), [])
+
+    def test_compare_detects_regressions_by_direction(self):
+        """Test that fewer probes per second and slower remediation are both regressions."""
+        regressions = compare_results(_report(100, 1.0), _report(50, 2.0), tolerance=0.2)
+
+        self.assertEqual(len(regressions), 2)
+        self.assertIn('probes_per_sec', regressions[0])
+        self.assertIn('remediation_sec', regressions[1])
+
+    def test_compare_ignores_new_scenarios(self):
+        baseline = {'results': []}
+        self.assertEqual(compare_results(baseline, _report(1, 100), tolerance=0.2), [])
+
+    def test_remediation_benchmark(self):
+        """Test that the remediation scenario restarts the whole fake fleet and waits for it to serve again."""
+        server = StandInServer(tls=False)
+        self.addCleanup(server.stop)
+        result = benchmark_remediation(server, 3, transition_delay=0.01, api_latency=0)
+
+        self.assertGreater(result['remediation_sec'], 0)
+        self.assertGreater(result['rss_mb'], 0)
+        # Two rolling batches, each one stop, one start and two waiters, plus one describe
+        self.assertEqual(result['api_calls'], 9)
+        # Every instance was probed on its address before its batch counted as recovered
+        self.assertGreaterEqual(server.requests, 3)
+
+    def test_discovery_benchmark(self):
+        """Test that regions are discovered together rather than one after another."""
+        result = benchmark_discovery(3, 5, api_latency=0.05)
+
+        self.assertEqual(result['instances'], 15)
+        self.assertLess(result['discovery_sec'], result['sequential_sec'])
+
+    def test_startup_benchmark(self):
+        """Test that the startup scenario times successful one-shot checks."""
+        server = StandInServer(tls=False)
+        try:
+            result = benchmark_startup(server, trials=1)
+        finally:
+            server.stop()
+
+        self.assertGreater(result['once_sec'], 0)
+        self.assertGreater(result['eager_once_sec'], 0)
+
+    def test_logging_benchmark(self):
+        """Test that a slow console holds up synchronous logging but not the log pipeline."""
+        result = benchmark_logging(50, write_delay=0.002)
+
+        self.assertEqual(result['lines'], 50)
+        self.assertGreater(result['sync_log_line_us'], 2000)
+        self.assertLess(result['log_line_us'], result['sync_log_line_us'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Tests for the multi-region, multi-account AWS client pool.
+"""
+
+import os
+import sys
+import unittest
+from unittest.mock import MagicMock
+
+# Add the monitor directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from clients import ClientPool, Location, parse_locations
+
+
+ROLE_A = 'arn:aws:iam::111111111111:role/monitor'
+ROLE_B = 'arn:aws:iam::222222222222:role/monitor'
+
+
+class FakeClock:
+    """Clock that only moves when told to."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+class FakeFactory:
+    """Stand-in for boto3.client that records every client it creates."""
+
+    def __init__(self, clock, duration=3600):
+        self.clock = clock
+        self.duration = duration
+        self.created = []
+        self.assumed = []
+
+    def __call__(self, service, region_name=None, **credentials):
+        client = MagicMock(name=f'{service}-{region_name}')
+        client.service, client.region, client.credentials = service, region_name, credentials
+        if service == 'sts':
+            client.assume_role.side_effect = self._assume_role
+        self.created.append(client)
+        return client
+
+    def _assume_role(self, RoleArn, RoleSessionName, DurationSeconds):
+        self.assumed.append(RoleArn)
+        return {'Credentials': {
+            'AccessKeyId': f'AKIA{len(self.assumed)}',
+            'SecretAccessKey': 'secret',
+            'SessionToken': 'token',
+            'Expiration': self.clock() + self.duration,
+        }}
+
+
+class TestLocations(unittest.TestCase):
+    """Test cases for Location and parse_locations."""
+
+    def test_every_region_in_every_account(self):
+        locations = parse_locations(['us-east-1', 'eu-west-1', 'us-east-1'], [ROLE_A, ROLE_B])
+
+        self.assertEqual(len(locations), 4)
+        self.assertEqual(locations[0], Location('us-east-1', ROLE_A))
+        self.assertEqual(str(locations[3]), '222222222222/eu-west-1')
+
+    def test_own_account_without_roles(self):
+        self.assertEqual(parse_locations(['us-east-2']), [Location('us-east-2')])
+        self.assertIsNone(Location('us-east-2').account)
+        self.assertEqual(str(Location('us-east-2')), 'us-east-2')
+
+    def test_invalid_locations(self):
+        with self.assertRaises(ValueError):
+            parse_locations([' '])
+        with self.assertRaises(ValueError):
+            parse_locations(['us-east-1'], ['monitor-role'])
+
+
+class TestClientPool(unittest.TestCase):
+    """Test cases for ClientPool."""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.factory = FakeFactory(self.clock)
+        self.pool = ClientPool(self.factory, clock=self.clock)
+
+    def test_clients_cached_per_location_and_service(self):
+        """Test that each service in each location gets one client, created with the default credentials."""
+        east = Location('us-east-1')
+        ec2 = self.pool.client('ec2', east)
+
+        self.assertIs(self.pool.client('ec2', east), ec2)
+        self.assertIsNot(self.pool.client('ssm', east), ec2)
+        self.assertIsNot(self.pool.client('ec2', Location('eu-west-1')), ec2)
+        self.assertEqual((ec2.service, ec2.region, ec2.credentials), ('ec2', 'us-east-1', {}))
+        self.assertEqual(self.factory.assumed, [])
+
+    def test_role_assumed_once_for_all_regions(self):
+        """Test that a role's credentials are shared by its clients in every region."""
+        east = self.pool.client('ec2', Location('us-east-1', ROLE_A))
+        west = self.pool.client('ec2', Location('us-west-2', ROLE_A))
+
+        self.assertEqual(self.factory.assumed, [ROLE_A])
+        self.assertEqual(east.credentials['aws_access_key_id'], 'AKIA1')
+        self.assertEqual(west.credentials, east.credentials)
+
+        self.pool.client('ec2', Location('us-east-1', ROLE_B))
+        self.assertEqual(self.factory.assumed, [ROLE_A, ROLE_B])
+
+    def test_credentials_renewed_before_expiry(self):
+        """Test that a role is assumed again, and its clients rebuilt, once its credentials near expiry."""
+        location = Location('us-east-1', ROLE_A)
+        first = self.pool.client('ec2', location)
+
+        self.clock.advance(3600 - 301)
+        self.assertIs(self.pool.client('ec2', location), first)
+
+        self.clock.advance(2)
+        renewed = self.pool.client('ec2', location)
+        self.assertIsNot(renewed, first)
+        self.assertEqual(renewed.credentials['aws_access_key_id'], 'AKIA2')
+        self.assertEqual(self.factory.assumed, [ROLE_A, ROLE_A])
+
+    def test_failed_assume_role_raises(self):
+        """Test that a role that cannot be assumed fails the lookup and is tried again next time."""
+        failing = MagicMock()
+        failing.assume_role.side_effect = Exception("AccessDenied")
+        factory = MagicMock(side_effect=lambda service, **kwargs: failing if service == 'sts' else MagicMock())
+        pool = ClientPool(factory, clock=self.clock)
+
+        for _ in range(2):
+            with self.assertRaises(Exception):
+                pool.client('ec2', Location('us-east-1', ROLE_A))
+        self.assertEqual(failing.assume_role.call_count, 2)
+
+    def test_put_client(self):
+        client = MagicMock()
+        self.pool.put('ec2', Location('us-east-1'), client)
+        self.assertIs(self.pool.client('ec2', Location('us-east-1')), client)
+
+    def test_refresh_margin_must_fit_session(self):
+        with self.assertRaises(ValueError):
+            ClientPool(self.factory, session_duration=900, refresh_margin=900)
+
+
+if __name__ == '__main__':
+    unittest.main()
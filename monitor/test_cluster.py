@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Tests for clustered monitoring: consistent hashing and leases.
+"""
+
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import types
+import unittest
+
+from botocore.exceptions import ClientError
+
+# Add the monitor directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from cluster import (
+    ClusterCoordinator, FileLeaseBackend, HashRing, S3LeaseBackend, SQLiteLeaseBackend, create_lease_backend
+)
+
+ENDPOINTS = [f'https://alb-{index}.example.com' for index in range(200)]
+
+
+class TestHashRing(unittest.TestCase):
+    """Test cases for HashRing."""
+
+    def test_spreads_keys_across_nodes(self):
+        ring = HashRing(['node-a', 'node-b', 'node-c'])
+        counts = {}
+        for endpoint in ENDPOINTS:
+            node = ring.node_for(endpoint)
+            counts[node] = counts.get(node, 0) + 1
+
+        self.assertEqual(set(counts), {'node-a', 'node-b', 'node-c'})
+        self.assertGreater(min(counts.values()), len(ENDPOINTS) / 6)
+
+    def test_node_leaving_only_moves_its_keys(self):
+        """Test that removing a node leaves every other assignment in place."""
+        before = HashRing(['node-a', 'node-b', 'node-c'])
+        after = HashRing(['node-a', 'node-b'])
+
+        for endpoint in ENDPOINTS:
+            if before.node_for(endpoint) != 'node-c':
+                self.assertEqual(after.node_for(endpoint), before.node_for(endpoint))
+
+    def test_empty_ring(self):
+        self.assertIsNone(HashRing().node_for('https://example.com'))
+
+
+class LeaseBackendTests:
+    """Behaviour every lease backend must provide."""
+
+    def create_backend(self):
+        raise NotImplementedError
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.backend = self.create_backend()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_lease_is_exclusive_until_released(self):
+        self.assertTrue(self.backend.acquire('instances/i-1', 'node-a', 60))
+        self.assertFalse(self.backend.acquire('instances/i-1', 'node-b', 60))
+        # The holder can renew
+        self.assertTrue(self.backend.acquire('instances/i-1', 'node-a', 60))
+
+        # Only the holder can release
+        self.backend.release('instances/i-1', 'node-b')
+        self.assertFalse(self.backend.acquire('instances/i-1', 'node-b', 60))
+        self.backend.release('instances/i-1', 'node-a')
+        self.assertTrue(self.backend.acquire('instances/i-1', 'node-b', 60))
+
+    def test_expired_lease_can_be_taken_over(self):
+        self.assertTrue(self.backend.acquire('remediation', 'node-a', 0.05))
+        time.sleep(0.1)
+        self.assertTrue(self.backend.acquire('remediation', 'node-b', 60))
+
+    def test_holders_lists_unexpired_leases_by_prefix(self):
+        self.backend.acquire('members/node-a', 'node-a', 60)
+        self.backend.acquire('members/node-b', 'node-b', 0.05)
+        self.backend.acquire('instances/i-1', 'node-a', 60)
+        time.sleep(0.1)
+
+        self.assertEqual(self.backend.holders('members/'), {'members/node-a': 'node-a'})
+
+
+class TestFileLeaseBackend(LeaseBackendTests, unittest.TestCase):
+    def create_backend(self):
+        return FileLeaseBackend(os.path.join(self.directory.name, 'leases'))
+
+
+class TestSQLiteLeaseBackend(LeaseBackendTests, unittest.TestCase):
+    def create_backend(self):
+        return SQLiteLeaseBackend(os.path.join(self.directory.name, 'leases.db'))
+
+
+class _FakeS3Client:
+    """Just enough of S3 to exercise conditional writes."""
+
+    class NoSuchKey(Exception):
+        pass
+
+    exceptions = types.SimpleNamespace(NoSuchKey=NoSuchKey, ClientError=ClientError)
+
+    def __init__(self):
+        self.objects = {}
+        self.version = 0
+
+    def _precondition_failed(self, operation):
+        return ClientError({'Error': {'Code': 'PreconditionFailed', 'Message': 'At least one of the pre-conditions you specified did not hold'}}, operation)
+
+    def get_object(self, Bucket, Key):
+        if Key not in self.objects:
+            raise self.NoSuchKey(Key)
+        body, etag = self.objects[Key]
+        return {'Body': io.BytesIO(body), 'ETag': etag}
+
+    def put_object(self, Bucket, Key, Body, IfNoneMatch=None, IfMatch=None, **kwargs):
+        current = self.objects.get(Key)
+        if IfNoneMatch == '*' and current is not None:
+            raise self._precondition_failed('PutObject')
+        if IfMatch is not None and (current is None or current[1] != IfMatch):
+            raise self._precondition_failed('PutObject')
+        self.version += 1
+        self.objects[Key] = (Body, f'"{self.version}"')
+
+    def delete_object(self, Bucket, Key, IfMatch=None):
+        current = self.objects.get(Key)
+        if IfMatch is not None and current is not None and current[1] != IfMatch:
+            raise self._precondition_failed('DeleteObject')
+        self.objects.pop(Key, None)
+
+    def get_paginator(self, name):
+        objects = self.objects
+        return types.SimpleNamespace(paginate=lambda Bucket, Prefix: [
+            {'Contents': [{'Key': key} for key in sorted(objects) if key.startswith(Prefix)]}
+        ])
+
+
+class TestS3LeaseBackend(LeaseBackendTests, unittest.TestCase):
+    def create_backend(self):
+        self.s3_client = _FakeS3Client()
+        return S3LeaseBackend(self.s3_client, 'demo-bucket')
+
+    def test_losing_a_race_fails_cleanly(self):
+        """Test that a conditional write rejected by S3 means the lease was not acquired."""
+        self.backend.acquire('remediation', 'node-a', 0.05)
+        time.sleep(0.1)
+        current, etag = self.backend._get('remediation')
+
+        # Another node takes over the expired lease between our read and our write
+        self.s3_client.put_object(Bucket='demo-bucket', Key='monitor-leases/remediation',
+                                  Body=json.dumps({'owner': 'node-c', 'expires': time.time() + 60}).encode())
+        self.backend._get = lambda name: (current, etag)
+
+        self.assertFalse(self.backend.acquire('remediation', 'node-b', 60))
+
+
+class TestClusterCoordinator(unittest.TestCase):
+    """Test cases for ClusterCoordinator."""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        backend = create_lease_backend(f"sqlite://{self.directory.name}/leases.db")
+        self.node_a = ClusterCoordinator(backend, node_id='node-a')
+        self.node_b = ClusterCoordinator(backend, node_id='node-b')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_endpoints_sharded_without_overlap(self):
+        self.node_a.heartbeat()
+        self.node_b.heartbeat()
+        self.node_a.heartbeat()
+
+        self.assertEqual(self.node_a.members, ['node-a', 'node-b'])
+        for endpoint in ENDPOINTS:
+            self.assertNotEqual(self.node_a.owns(endpoint), self.node_b.owns(endpoint))
+
+    def test_leaving_node_hands_over_its_endpoints(self):
+        self.node_a.start()
+        self.node_b.start()
+        self.node_a.heartbeat()
+
+        self.node_b.stop()
+        self.node_a.heartbeat()
+        self.node_a.stop()
+
+        self.assertTrue(all(self.node_a.owns(endpoint) for endpoint in ENDPOINTS))
+
+    def test_instance_claims_are_exclusive(self):
+        self.assertEqual(self.node_a.claim_instances(['i-1', 'i-2']), ['i-1', 'i-2'])
+        self.assertEqual(self.node_b.claim_instances(['i-2', 'i-3']), ['i-3'])
+
+        self.node_a.release_instances(['i-1', 'i-2'])
+        self.assertEqual(self.node_b.claim_instances(['i-2']), ['i-2'])
+
+    def test_remediation_lease(self):
+        self.assertTrue(self.node_a.acquire_remediation())
+        self.assertFalse(self.node_b.acquire_remediation())
+        self.node_a.release_remediation()
+        self.assertTrue(self.node_b.acquire_remediation())
+
+    def test_heartbeat_renews_held_leases(self):
+        directory = self.directory.name
+        node_a = ClusterCoordinator(create_lease_backend(f"sqlite://{directory}/leases.db"), node_id='node-a',
+                                    remediation_ttl=0.2)
+        self.assertTrue(node_a.acquire_remediation())
+        self.assertEqual(node_a.claim_instances(['i-1']), ['i-1'])
+
+        # Held well past the TTL while the node keeps heartbeating
+        for _ in range(5):
+            time.sleep(0.1)
+            node_a.heartbeat()
+        self.assertFalse(self.node_b.acquire_remediation())
+        self.assertEqual(self.node_b.claim_instances(['i-1']), [])
+
+        # Released leases are not renewed, and the others expire once the heartbeat stops
+        node_a.release_instances(['i-1'])
+        node_a.heartbeat()
+        self.assertEqual(self.node_b.claim_instances(['i-1']), ['i-1'])
+        time.sleep(0.3)
+        self.assertTrue(self.node_b.acquire_remediation())
+
+    def test_rejects_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            create_lease_backend('redis://localhost')
+
+
+if __name__ == '__main__':
+    unittest.main()
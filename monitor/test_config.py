@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Tests for the config-file loader.
+"""
+
+import os
+import sys
+import tempfile
+import textwrap
+import unittest
+
+# Add the monitor directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config import ConfigError, load_config
+
+YAML_CONFIG = """
+defaults:
+  interval: 5
+  tag: {Role: web-server}
+monitor:
+  remediation_scope: targets
+checks:
+  - url: https://demo-lb.example.com
+  - name: api
+    url: https://api.example.com/health
+    expect_regex: '"status":\\s*"ok"'
+    failure_threshold: 3
+    tag: Role=api-server
+"""
+
+TOML_CONFIG = """
+[defaults]
+timeout = 5
+
+[[checks]]
+name = "demo"
+url = "https://demo-lb.example.com"
+expect = ["Hello from", "Deployed via SSM Document"]
+interval = 20
+"""
+
+PYTHON_CONFIG = """
+CHECKS = ["https://demo-lb.example.com"]
+MONITOR = {"max_in_flight": 5}
+"""
+
+
+class TestLoadConfig(unittest.TestCase):
+    """Test cases for load_config."""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write(self, name, content):
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'w') as f:
+            f.write(textwrap.dedent(content))
+        return path
+
+    def test_yaml(self):
+        config = load_config(self.write('checks.yaml', YAML_CONFIG))
+
+        self.assertEqual(config.options, {'remediation_scope': 'targets'})
+        demo, api = config.checks
+        self.assertEqual((demo.name, demo.interval, demo.timeout, demo.failure_threshold), ('https://demo-lb.example.com', 5, 30, None))
+        self.assertEqual(demo.content_matcher.markers, [b'Deployed via SSM Document'])
+        self.assertEqual((api.name, api.interval, api.failure_threshold), ('api', 5, 3))
+        self.assertEqual((api.tag_key, api.tag_value), ('Role', 'api-server'))
+        self.assertEqual(api.content_matcher.markers, [])
+        self.assertTrue(api.content_matcher.match_stream([b'{"status": "ok"}']).matched)
+
+    def test_monitor_options_and_overrides_set_check_defaults(self):
+        """Test that check settings among the monitor options, then the overrides, apply over the defaults."""
+        path = self.write('checks.yaml', """
+            defaults:
+              interval: 5
+              timeout: 5
+            monitor:
+              interval: 60
+              max_body_bytes: 4096
+            checks:
+              - https://demo-lb.example.com
+              - url: https://api.example.com/health
+                timeout: 2
+        """)
+        config = load_config(path, {'timeout': 9, 'expect': ['Hello']})
+
+        demo, api = config.checks
+        self.assertEqual((demo.interval, demo.timeout), (60, 9))
+        self.assertEqual((api.interval, api.timeout), (60, 2))
+        self.assertEqual(demo.content_matcher.max_bytes, 4096)
+        self.assertEqual(demo.content_matcher.markers, [b'Hello'])
+
+    def test_toml(self):
+        config = load_config(self.write('checks.toml', TOML_CONFIG))
+
+        check, = config.checks
+        self.assertEqual((check.name, check.interval, check.timeout), ('demo', 20, 5))
+        self.assertEqual(check.content_matcher.markers, [b'Hello from', b'Deployed via SSM Document'])
+
+    def test_python_module(self):
+        path = self.write('checks.py', PYTHON_CONFIG)
+        config = load_config(path)
+        self.assertEqual(config.options, {'max_in_flight': 5})
+        self.assertEqual([check.url for check in config.checks], ['https://demo-lb.example.com'])
+
+        # Reloading reads the edited module
+        self.write('checks.py', PYTHON_CONFIG.replace('demo-lb', 'other-lb'))
+        self.assertEqual(load_config(path).checks[0].url, 'https://other-lb.example.com')
+
+    def test_invalid_configs(self):
+        invalid = {
+            'unknown_key.yaml': 'checks:\n  - url: https://a.example.com\n    retries: 3\n',
+            'bad_url.yaml': 'checks:\n  - url: a.example.com\n',
+            'duplicate.yaml': 'checks:\n  - https://a.example.com\n  - https://a.example.com\n',
+            'duplicate_url.yaml': ('checks:\n  - {name: a, url: "https://a.example.com"}\n'
+                                   '  - {name: b, url: "https://a.example.com", expect: ok}\n'),
+            'no_checks.yaml': 'checks: []\n',
+            'bad_tag.yaml': 'checks:\n  - url: https://a.example.com\n    tag: web-server\n',
+            'bad_interval.toml': '[[checks]]\nurl = "https://a.example.com"\ninterval = 0\n',
+            'no_checks.py': 'MONITOR = {}\n',
+            'checks.json': '{}',
+        }
+        for name, content in invalid.items():
+            with self.subTest(name=name):
+                with self.assertRaises(ConfigError):
+                    load_config(self.write(name, content))
+
+    def test_missing_file(self):
+        with self.assertRaises(ConfigError):
+            load_config(os.path.join(self.directory.name, 'missing.yaml'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Tests for streaming content validation.
+"""
+
+import os
+import re
+import sys
+import unittest
+
+# Add the monitor directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from content import ContentMatcher
+
+
+class TestContentMatcher(unittest.TestCase):
+    """Test cases for ContentMatcher."""
+
+    def test_default_marker(self):
+        """Test the default SSM deployment marker."""
+        matcher = ContentMatcher()
+
+        self.assertTrue(matcher.match_text("Welcome to nginx! Deployed via SSM Document").matched)
+        result = matcher.match_text("Welcome to nginx!")
+        self.assertFalse(result.matched)
+        self.assertEqual(result.missing, ['Deployed via SSM Document'])
+
+    def test_marker_across_chunk_boundary(self):
+        """Test that a marker split over several chunks is found."""
+        matcher = ContentMatcher()
+        chunks = [b"<p>Deploy", b"ed v", b"ia SSM Docu", b"ment</p>"]
+
+        self.assertTrue(matcher.match_stream(chunks).matched)
+
+    def test_stops_at_match(self):
+        """Test that no chunks are consumed after everything is found."""
+        matcher = ContentMatcher(markers=['ready'])
+        consumed = []
+
+        def chunks():
+            for chunk in [b"not yet", b"ready", b"trailing"]:
+                consumed.append(chunk)
+                yield chunk
+
+        result = matcher.match_stream(chunks())
+        self.assertTrue(result.matched)
+        self.assertEqual(consumed, [b"not yet", b"ready"])
+        self.assertEqual(result.bytes_read, 12)
+
+    def test_byte_limit(self):
+        """Test that matching gives up at the byte limit, even if the marker follows."""
+        matcher = ContentMatcher(markers=['marker'], max_bytes=10)
+
+        result = matcher.match_stream([b"0123456789", b"marker"])
+        self.assertFalse(result.matched)
+        self.assertTrue(result.truncated)
+        self.assertEqual(result.bytes_read, 10)
+
+    def test_marker_straddling_byte_limit(self):
+        """Test that data past the limit is never matched."""
+        matcher = ContentMatcher(markers=['marker'], max_bytes=7)
+
+        self.assertFalse(matcher.match_stream([b"12mar", b"ker"]).matched)
+        self.assertTrue(ContentMatcher(markers=['marker'], max_bytes=8).match_stream([b"12mar", b"ker"]).matched)
+
+    def test_multiple_markers_and_patterns(self):
+        """Test that every marker and pattern must match, in any order."""
+        matcher = ContentMatcher(
+            markers=['Deployed via SSM Document', '</html>'],
+            patterns=[r'build-\d+', re.compile(rb'(?i)NGINX')]
+        )
+
+        self.assertTrue(matcher.match_stream([b"<html>nginx build-", b"42 Deployed via SSM Document</html>"]).matched)
+        result = matcher.match_stream([b"<html>nginx Deployed via SSM Document</html>"])
+        self.assertFalse(result.matched)
+        self.assertEqual(result.missing, [r'build-\d+'])
+
+    def test_regex_across_chunk_boundary(self):
+        """Test that a regex match split over chunks is found within the window."""
+        matcher = ContentMatcher(markers=[], patterns=[r'version: \d+\.\d+'], regex_window=64)
+
+        self.assertTrue(matcher.match_stream([b"x" * 1000 + b"version: 1", b".25"]).matched)
+
+    def test_requires_something_to_match(self):
+        """Test that an empty matcher is rejected."""
+        with self.assertRaises(ValueError):
+            ContentMatcher(markers=[], patterns=[])
+
+    def test_rejects_text_compiled_patterns(self):
+        """Test that compiled patterns must be bytes patterns."""
+        with self.assertRaises(ValueError):
+            ContentMatcher(patterns=[re.compile('text')])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Tests for the DNS resolution cache.
+"""
+
+import importlib.util
+import os
+import socket
+import sys
+import threading
+import time
+import unittest
+from unittest.mock import Mock, patch
+
+# Add the monitor directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from dnscache import DNSCache, is_ip_address
+
+
+def addrinfo(*addresses):
+    return [(socket.AF_INET, socket.SOCK_STREAM, 6, '', (address, 0)) for address in addresses]
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestDNSCache(unittest.TestCase):
+    """Test cases for DNSCache with the system resolver."""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = DNSCache(default_ttl=60, use_dnspython=False, clock=self.clock)
+        patcher = patch('dnscache.socket.getaddrinfo', return_value=addrinfo('10.0.1.5', '10.0.2.5', '10.0.1.5'))
+        self.getaddrinfo = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_addresses_kept_until_ttl(self):
+        """Test that every distinct address is returned and the name is only resolved again once expired."""
+        self.assertEqual(self.cache.resolve('demo-lb.example.com'), ['10.0.1.5', '10.0.2.5'])
+        self.clock.now += 59
+        self.cache.resolve('Demo-LB.example.com')
+        self.assertEqual(self.getaddrinfo.call_count, 1)
+        self.assertEqual(self.cache.stats, {'hits': 1, 'misses': 1})
+
+        self.clock.now += 2
+        self.cache.resolve('demo-lb.example.com')
+        self.assertEqual(self.getaddrinfo.call_count, 2)
+
+    def test_ip_literals_not_resolved(self):
+        self.assertEqual(self.cache.resolve('10.0.1.7'), ['10.0.1.7'])
+        self.assertEqual(self.cache.resolve('[::1]'), ['::1'])
+        self.getaddrinfo.assert_not_called()
+        self.assertTrue(is_ip_address('fe80::1'))
+        self.assertFalse(is_ip_address('example.com'))
+
+    def test_rotate_starts_from_the_next_address(self):
+        """Test that each rotation starts one address further, from the cached addresses."""
+        self.getaddrinfo.return_value = addrinfo('10.0.1.5', '10.0.2.5', '10.0.3.5')
+        rotations = [self.cache.rotate('demo-lb.example.com') for _ in range(4)]
+        self.assertEqual([rotation[0] for rotation in rotations], ['10.0.1.5', '10.0.2.5', '10.0.3.5', '10.0.1.5'])
+        self.assertEqual(rotations[1], ['10.0.2.5', '10.0.3.5', '10.0.1.5'])
+        self.assertEqual(self.getaddrinfo.call_count, 1)
+        self.assertEqual(self.cache.rotate('10.0.1.7'), ['10.0.1.7'])
+
+    def test_invalidate(self):
+        self.cache.resolve('demo-lb.example.com')
+        self.cache.invalidate('demo-lb.example.com')
+        self.cache.resolve('demo-lb.example.com')
+        self.assertEqual(self.getaddrinfo.call_count, 2)
+
+    def test_failures_not_cached(self):
+        self.getaddrinfo.side_effect = [socket.gaierror('Name or service not known'), addrinfo('10.0.1.5')]
+        with self.assertRaises(socket.gaierror):
+            self.cache.resolve('demo-lb.example.com')
+        self.assertEqual(self.cache.resolve('demo-lb.example.com'), ['10.0.1.5'])
+
+    def test_concurrent_lookups_share_one_query(self):
+        """Test that threads missing the same name at once wait for a single resolution."""
+        release = threading.Event()
+
+        def slow_getaddrinfo(*args):
+            release.wait(5)
+            return addrinfo('10.0.1.5')
+
+        self.getaddrinfo.side_effect = slow_getaddrinfo
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(self.cache.resolve('demo-lb.example.com')))
+                   for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.05)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, [['10.0.1.5']] * 5)
+        self.assertEqual(self.getaddrinfo.call_count, 1)
+
+    def test_invalid_ttl(self):
+        with self.assertRaises(ValueError):
+            DNSCache(default_ttl=0)
+
+
+@unittest.skipUnless(importlib.util.find_spec('dns'), "dnspython is not installed")
+class TestDNSCacheRecordTTL(unittest.TestCase):
+    """Test cases for DNSCache honoring record TTLs through dnspython."""
+
+    def test_record_ttl_honored(self):
+        import dns.resolver
+
+        clock = FakeClock()
+        cache = DNSCache(default_ttl=60, max_ttl=20, clock=clock)
+        answers = {
+            'A': Mock(rrset=Mock(ttl=5), __iter__=lambda self: iter([Mock(address='10.0.1.5')])),
+            'AAAA': dns.resolver.NoAnswer(),
+        }
+
+        def resolve(host, record_type, search=True):
+            answer = answers[record_type]
+            if isinstance(answer, Exception):
+                raise answer
+            return answer
+
+        cache._resolver = Mock(resolve=Mock(side_effect=resolve))
+        self.assertEqual(cache.resolve('demo-lb.example.com'), ['10.0.1.5'])
+        clock.now += 6
+        cache.resolve('demo-lb.example.com')
+        self.assertEqual(cache._resolver.resolve.call_count, 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
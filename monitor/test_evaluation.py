@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Tests for the rolling-window health evaluators.
+"""
+
+import os
+import sys
+import unittest
+
+# Add the monitor directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from evaluation import (
+    CompositeEvaluator, ConsecutiveFailures, EWMALatency, FailureRatio, HealthPolicy, LatencySLO, RingWindow
+)
+
+
+def feed(evaluator, outcomes):
+    """Observe (healthy, latency) outcomes and return the verdict after each one."""
+    return [evaluator.observe(healthy, latency) for healthy, latency in outcomes]
+
+
+class TestRingWindow(unittest.TestCase):
+    """Test cases for RingWindow."""
+
+    def test_oldest_value_evicted(self):
+        window = RingWindow(3)
+        self.assertEqual([window.push(value) for value in 'abcde'], [None, None, None, 'a', 'b'])
+        self.assertEqual(window.values(), ['c', 'd', 'e'])
+        self.assertEqual(window.count, 3)
+
+        window.clear()
+        self.assertEqual(window.values(), [])
+        self.assertIsNone(window.push('f'))
+
+    def test_invalid_size(self):
+        with self.assertRaises(ValueError):
+            RingWindow(0)
+
+
+class TestConsecutiveFailures(unittest.TestCase):
+    """Test cases for ConsecutiveFailures."""
+
+    def test_threshold(self):
+        evaluator = ConsecutiveFailures(3)
+        verdicts = feed(evaluator, [(False, None), (False, None), (True, None), (False, None), (False, None), (False, None)])
+        self.assertEqual(verdicts, [None] * 5 + ['3 consecutive failures'])
+
+    def test_restore(self):
+        """Test that failures restored from history count towards the threshold."""
+        evaluator = ConsecutiveFailures(2)
+        evaluator.restore(1)
+        self.assertEqual(evaluator.observe(False), '2 consecutive failures')
+
+
+class TestFailureRatio(unittest.TestCase):
+    """Test cases for FailureRatio."""
+
+    def test_flapping_endpoint(self):
+        """Test that alternating outcomes, never two failures in a row, still reach the ratio."""
+        evaluator = FailureRatio(0.5, window=10)
+        verdicts = feed(evaluator, [(healthy, None) for healthy in [True, False] * 3])
+        self.assertEqual(verdicts, [None] * 5 + ['3 of the last 6 probes failed'])
+
+    def test_old_failures_leave_the_window(self):
+        """Test that the failure count follows the window as it slides."""
+        evaluator = FailureRatio(0.5, window=4, min_samples=4)
+        feed(evaluator, [(False, None), (True, None), (True, None), (True, None)])
+        self.assertEqual(evaluator.failures, 1)
+        evaluator.observe(True)
+        self.assertEqual(evaluator.failures, 0)
+        self.assertIsNone(evaluator.observe(False))
+        self.assertEqual(evaluator.observe(False), '2 of the last 4 probes failed')
+
+    def test_waits_for_min_samples(self):
+        evaluator = FailureRatio(0.5, window=20)
+        self.assertEqual(feed(evaluator, [(False, None)] * 10), [None] * 9 + ['10 of the last 10 probes failed'])
+
+    def test_invalid_ratio(self):
+        with self.assertRaises(ValueError):
+            FailureRatio(1.5)
+
+
+class TestLatencySLO(unittest.TestCase):
+    """Test cases for LatencySLO."""
+
+    def test_percentile_breach(self):
+        """Test that the SLO is breached once more than 5% of the window is slow."""
+        evaluator = LatencySLO(1.0, percentile=0.95, window=20, min_samples=20)
+        verdicts = feed(evaluator, [(True, 0.1)] * 19 + [(True, 2.0)])
+        # One slow probe in 20 is the p100, not the p95
+        self.assertEqual(verdicts, [None] * 20)
+
+        self.assertEqual(evaluator.observe(True, 3.0),
+                         'p95 latency 2.000s over the last 20 probes exceeds the 1s SLO')
+
+    def test_matches_sorted_percentile(self):
+        """Test that the incremental count agrees with sorting the window."""
+        latencies = [0.05 * ((i * 7) % 23) for i in range(200)]
+        evaluator = LatencySLO(0.8, percentile=0.9, window=25, min_samples=1)
+        for i, latency in enumerate(latencies):
+            window = sorted(latencies[max(0, i - 24):i + 1])
+            expected = window[-(-len(window) * 9 // 10) - 1] > 0.8
+            self.assertEqual(evaluator.observe(True, latency) is not None, expected, i)
+
+    def test_probes_without_latency_ignored(self):
+        evaluator = LatencySLO(1.0, min_samples=1)
+        self.assertIsNone(evaluator.observe(False, None))
+        self.assertEqual(evaluator._window.count, 0)
+
+
+class TestEWMALatency(unittest.TestCase):
+    """Test cases for EWMALatency."""
+
+    def test_average_follows_latency(self):
+        evaluator = EWMALatency(1.0, alpha=0.5, min_samples=1)
+        self.assertIsNone(evaluator.observe(True, 0.5))
+        self.assertIsNone(evaluator.observe(True, 1.5))
+        self.assertAlmostEqual(evaluator.average, 1.0)
+        self.assertEqual(evaluator.observe(True, 2.0), 'average latency 1.500s exceeds 1s')
+
+    def test_single_spike_tolerated(self):
+        evaluator = EWMALatency(1.0, alpha=0.2)
+        self.assertEqual(feed(evaluator, [(True, 0.2)] * 5 + [(True, 3.0)]), [None] * 6)
+
+
+class TestHealthPolicy(unittest.TestCase):
+    """Test cases for HealthPolicy."""
+
+    def test_default_is_two_consecutive_failures(self):
+        evaluator = HealthPolicy().create()
+        self.assertIsInstance(evaluator, ConsecutiveFailures)
+        self.assertEqual(evaluator.threshold, 2)
+        self.assertEqual(HealthPolicy().create(failure_threshold=5).threshold, 5)
+
+    def test_combined_rules(self):
+        """Test that every rule sees every probe and any of them can call for remediation."""
+        policy = HealthPolicy(failure_ratio=0.5, window=4, latency_slo=1.0, ewma_threshold=1.0)
+        evaluator = policy.create()
+        self.assertIsInstance(evaluator, CompositeEvaluator)
+        self.assertEqual(len(evaluator.evaluators), 3)
+        self.assertEqual(policy.describe(), '50% of the last 4 probes failed or p95 latency over the last 4 '
+                                            'probes above 1s or average latency (alpha 0.2) above 1s')
+
+        self.assertIsNone(evaluator.observe(True, 0.1))
+        self.assertIn('latency', evaluator.observe(True, 5.0))
+        evaluator.reset()
+        self.assertEqual(evaluator.evaluators[2].samples, 0)
+
+    def test_invalid_settings_rejected(self):
+        with self.assertRaises(ValueError):
+            HealthPolicy(latency_slo=-1)
+        with self.assertRaises(ValueError):
+            HealthPolicy(window=0, failure_ratio=0.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Tests for the on-disk probe history.
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+
+# Add the monitor directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from history import HEADER_SIZE, RECORD, ProbeHistory
+
+ENDPOINT = 'https://test.example.com'
+
+
+class TestProbeHistory(unittest.TestCase):
+    """Test cases for ProbeHistory."""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'probes.history')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_records_survive_reopen(self):
+        """Test that records are read back in order after reopening the file."""
+        history = ProbeHistory(self.path, capacity=10)
+        history.append(ENDPOINT, 200, 0.05, healthy=True, matched=True, timestamp=100.0)
+        history.append(ENDPOINT, 503, 0.5, healthy=False, matched=False, timestamp=110.0)
+        history.close()
+
+        history = ProbeHistory(self.path, capacity=10)
+        records = history.records(ENDPOINT)
+        history.close()
+
+        self.assertEqual([(r.timestamp, r.status, r.healthy) for r in records],
+                         [(100.0, 200, True), (110.0, 503, False)])
+        self.assertAlmostEqual(records[1].latency, 0.5)
+
+    def test_ring_buffer_is_bounded(self):
+        """Test that the file size is fixed and the oldest records are overwritten."""
+        history = ProbeHistory(self.path, capacity=3)
+        for i in range(5):
+            history.append(ENDPOINT, 200, 0.01, healthy=True, matched=True, timestamp=float(i))
+
+        self.assertEqual(os.path.getsize(self.path), HEADER_SIZE + 3 * RECORD.size)
+        self.assertEqual(len(history), 3)
+        self.assertEqual([r.timestamp for r in history.records()], [2.0, 3.0, 4.0])
+        history.close()
+
+    def test_existing_file_keeps_its_capacity(self):
+        """Test that reopening with a different capacity does not resize the file."""
+        ProbeHistory(self.path, capacity=3).close()
+
+        history = ProbeHistory(self.path, capacity=50)
+        self.assertEqual(history.capacity, 3)
+        history.close()
+
+    def test_rejects_foreign_file(self):
+        """Test that a file that is not a probe history is refused."""
+        with open(self.path, 'wb') as f:
+            f.write(b'not a history file'.ljust(HEADER_SIZE, b'\0'))
+
+        with self.assertRaises(ValueError):
+            ProbeHistory(self.path)
+
+    def test_consecutive_failures_per_endpoint(self):
+        """Test that failures are counted back to the last success or remediation marker."""
+        history = ProbeHistory(self.path, capacity=20)
+        history.append(ENDPOINT, 200, 0.01, healthy=True, matched=True)
+        history.append(ENDPOINT, 500, 0.01, healthy=False, matched=False)
+        history.append('https://other.example.com', 200, 0.01, healthy=True, matched=True)
+        history.append(ENDPOINT, 0, 0.01, healthy=False, matched=False)
+
+        self.assertEqual(history.consecutive_failures(ENDPOINT), 2)
+        self.assertEqual(history.consecutive_failures('https://other.example.com'), 0)
+
+        history.mark_remediation(ENDPOINT)
+        history.append(ENDPOINT, 500, 0.01, healthy=False, matched=False)
+        self.assertEqual(history.consecutive_failures(ENDPOINT), 1)
+        history.close()
+
+    def test_windowed_percentiles(self):
+        """Test latency percentiles and failure counts per window."""
+        history = ProbeHistory(self.path, capacity=200)
+        # First window: latencies 1..100 ms; second window: one failed 2 s probe
+        for i in range(100):
+            history.append(ENDPOINT, 200, (i + 1) / 1000, healthy=True, matched=True, timestamp=1000.0 + i)
+        history.append(ENDPOINT, 0, 2.0, healthy=False, matched=False, timestamp=1150.0)
+        history.mark_remediation(ENDPOINT, timestamp=1151.0)
+
+        first, second = history.query(ENDPOINT, window=100, periods=2, now=1200.0)
+        history.close()
+
+        self.assertEqual((first.start, first.end), (1000.0, 1100.0))
+        self.assertEqual((first.count, first.failures), (100, 0))
+        self.assertAlmostEqual(first.percentiles[50], 0.050, places=6)
+        self.assertAlmostEqual(first.percentiles[99], 0.099, places=6)
+        self.assertEqual((second.count, second.failures), (1, 1))
+        self.assertAlmostEqual(second.percentiles[95], 2.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Tests for the cached EC2 instance inventory.
+"""
+
+import json
+import os
+import sys
+import tempfile
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+# Add the monitor directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from clients import Location
+from inventory import FleetInventory, InstanceInventory
+
+
+def _instance(instance_id, state='running'):
+    """Build a DescribeInstances entry."""
+    return {
+        'InstanceId': instance_id,
+        'State': {'Name': state},
+        'PrivateIpAddress': '10.0.1.100',
+        'Tags': [{'Key': 'Role', 'Value': 'web-server'}]
+    }
+
+
+def _event(instance_id, state, time='2024-01-01T00:00:00Z'):
+    """Build an EventBridge EC2 state-change event."""
+    return {
+        'detail-type': 'EC2 Instance State-change Notification',
+        'source': 'aws.ec2',
+        'time': time,
+        'detail': {'instance-id': instance_id, 'state': state}
+    }
+
+
+class TestInstanceInventory(unittest.TestCase):
+    """Test cases for InstanceInventory."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.ec2_client = MagicMock()
+        self.ec2_client.describe_instances.side_effect = [
+            {'Reservations': [{'Instances': [_instance('i-1'), _instance('i-2')]}], 'NextToken': 'page-2'},
+            {'Reservations': [{'Instances': [_instance('i-3', 'stopped')]}]},
+        ]
+        self.inventory = InstanceInventory(self.ec2_client, ttl=300)
+
+    def test_paginates_full_describe(self):
+        """Test that every page of DescribeInstances is collected."""
+        instances = self.inventory.instances()
+
+        self.assertEqual([i['instance_id'] for i in instances], ['i-1', 'i-2', 'i-3'])
+        self.assertEqual(self.ec2_client.describe_instances.call_count, 2)
+        self.assertEqual(self.ec2_client.describe_instances.call_args.kwargs['NextToken'], 'page-2')
+        self.assertEqual(instances[0]['tags'], {'Role': 'web-server'})
+
+    def test_records_launch_configuration(self):
+        """Test that records carry what a replacement is launched from."""
+        entry = _instance('i-1')
+        entry.update({
+            'ImageId': 'ami-1', 'InstanceType': 't3.micro', 'SubnetId': 'subnet-1',
+            'SecurityGroups': [{'GroupId': 'sg-1', 'GroupName': 'web'}],
+            'IamInstanceProfile': {'Arn': 'arn:aws:iam::1:instance-profile/web', 'Id': 'AIPA1'},
+        })
+        self.ec2_client.describe_instances.side_effect = [{'Reservations': [{'Instances': [entry]}]}]
+
+        instance = self.inventory.instances()[0]
+
+        self.assertEqual(instance['image_id'], 'ami-1')
+        self.assertEqual(instance['subnet_id'], 'subnet-1')
+        self.assertEqual(instance['security_group_ids'], ['sg-1'])
+        self.assertEqual(instance['iam_instance_profile'], 'arn:aws:iam::1:instance-profile/web')
+        self.assertIsNone(instance['key_name'])
+
+    def test_cached_within_ttl(self):
+        """Test that lookups within the TTL do not describe again."""
+        self.inventory.instances()
+        self.inventory.instances()
+
+        self.assertEqual(self.ec2_client.describe_instances.call_count, 2)
+
+    def test_full_describe_after_ttl(self):
+        """Test that an expired cache triggers a new full describe."""
+        with patch('inventory.time.monotonic', return_value=1000.0):
+            self.inventory.instances()
+        self.ec2_client.describe_instances.side_effect = None
+        self.ec2_client.describe_instances.return_value = {'Reservations': []}
+
+        with patch('inventory.time.monotonic', return_value=1301.0):
+            self.assertEqual(self.inventory.instances(), [])
+
+    def test_serves_stale_cache_on_refresh_failure(self):
+        """Test that a failed refresh falls back to the cached instances."""
+        self.inventory.instances()
+        self.inventory.invalidate()
+        self.ec2_client.describe_instances.side_effect = Exception("Throttled")
+
+        self.assertEqual(len(self.inventory.instances()), 3)
+
+    def test_refresh_states_incremental(self):
+        """Test that a warm cache refreshes states with DescribeInstanceStatus."""
+        self.inventory.instances()
+        self.ec2_client.describe_instance_status.return_value = {
+            'InstanceStatuses': [
+                {'InstanceId': 'i-1', 'InstanceState': {'Name': 'stopping'}},
+                {'InstanceId': 'i-3', 'InstanceState': {'Name': 'stopped'}},
+            ]
+        }
+
+        instances = {i['instance_id']: i for i in self.inventory.instances(refresh_states=True)}
+
+        self.assertEqual(self.ec2_client.describe_instances.call_count, 2)
+        self.assertEqual(instances['i-1']['state'], 'stopping')
+        # i-2 was not reported, so it no longer exists
+        self.assertNotIn('i-2', instances)
+
+    def test_apply_events(self):
+        """Test that state-change events update and evict records."""
+        self.inventory.instances()
+
+        changed = self.inventory.apply_events([
+            _event('i-1', 'stopped'),
+            _event('i-2', 'terminated'),
+            _event('i-unknown', 'running'),
+            {'detail-type': 'AWS API Call via CloudTrail', 'detail': {}},
+        ])
+
+        instances = {i['instance_id']: i for i in self.inventory.instances()}
+        self.assertEqual(changed, 2)
+        self.assertEqual(instances['i-1']['state'], 'stopped')
+        self.assertNotIn('i-2', instances)
+
+    def test_out_of_order_events_ignored(self):
+        """Test that an older event does not overwrite a newer state."""
+        self.inventory.instances()
+        self.inventory.apply_event(_event('i-1', 'running', '2024-01-01T00:05:00Z'))
+        self.inventory.apply_event(_event('i-1', 'stopping', '2024-01-01T00:10:00Z'))
+        self.inventory.apply_event(_event('i-1', 'pending', '2024-01-01T00:01:00Z'))
+
+        instances = {i['instance_id']: i for i in self.inventory.instances()}
+        self.assertEqual(instances['i-1']['state'], 'stopping')
+
+    def test_replay_events_file(self):
+        """Test that events appended to the events file are replayed once."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'events.jsonl')
+            with open(path, 'w') as f:
+                f.write(json.dumps(_event('i-1', 'stopped')) + '\n')
+            self.inventory.events_file = path
+
+            # Events already in the file predate the describe
+            self.inventory.instances()
+            with open(path, 'a') as f:
+                f.write(json.dumps(_event('i-2', 'stopped')) + '\n')
+                f.write('not json\n')
+                f.write(json.dumps(_event('i-3', 'running')))  # Incomplete line
+
+            instances = {i['instance_id']: i for i in self.inventory.instances()}
+            self.assertEqual(instances['i-1']['state'], 'running')
+            self.assertEqual(instances['i-2']['state'], 'stopped')
+            self.assertEqual(instances['i-3']['state'], 'stopped')
+
+            with open(path, 'a') as f:
+                f.write('\n')
+            self.assertEqual(self.inventory.replay_events(), 1)
+
+    def test_events_during_describe_are_replayed(self):
+        """Test that events written while the describe runs are applied, not skipped."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'events.jsonl')
+            self.inventory.events_file = path
+            pages = list(self.ec2_client.describe_instances.side_effect)
+
+            def describe(**kwargs):
+                page = pages.pop(0)
+                if not pages:
+                    with open(path, 'a') as f:
+                        f.write(json.dumps(_event('i-1', 'stopping')) + '\n')
+                return page
+            self.ec2_client.describe_instances.side_effect = describe
+
+            instances = {i['instance_id']: i for i in self.inventory.instances()}
+            self.assertEqual(instances['i-1']['state'], 'stopping')
+            self.assertEqual(self.inventory.replay_events(), 0)
+
+
+class TestFleetInventory(unittest.TestCase):
+    """Test cases for FleetInventory."""
+
+    def _regional(self, region, instance_ids, delay=0.0):
+        """Build the inventory of one region whose describe takes ``delay`` seconds."""
+        client = MagicMock()
+
+        def describe_instances(**kwargs):
+            time.sleep(delay)
+            return {'Reservations': [{'Instances': [_instance(instance_id) for instance_id in instance_ids]}]}
+
+        client.describe_instances.side_effect = describe_instances
+        return InstanceInventory(client, location=Location(region))
+
+    def test_regions_discovered_concurrently_and_merged(self):
+        """Test that discovery takes about as long as the slowest region and records where instances live."""
+        fleet = FleetInventory([
+            self._regional('us-east-1', ['i-1', 'i-2'], delay=0.2),
+            self._regional('eu-west-1', ['i-3'], delay=0.2),
+            self._regional('ap-south-1', ['i-4'], delay=0.2),
+        ])
+
+        started = time.monotonic()
+        instances = fleet.instances()
+        elapsed = time.monotonic() - started
+
+        self.assertLess(elapsed, 0.4)
+        self.assertEqual(sorted(i['instance_id'] for i in instances), ['i-1', 'i-2', 'i-3', 'i-4'])
+        locations = {i['instance_id']: i['location'].region for i in instances}
+        self.assertEqual(locations['i-3'], 'eu-west-1')
+
+    def test_unreachable_region_left_out(self):
+        """Test that one failing region does not hide the others, but all failing raises."""
+        broken = self._regional('eu-west-1', [])
+        broken.ec2_client.describe_instances.side_effect = Exception("AuthFailure")
+        fleet = FleetInventory([self._regional('us-east-1', ['i-1']), broken])
+
+        self.assertEqual([i['instance_id'] for i in fleet.instances()], ['i-1'])
+
+        fleet = FleetInventory([broken])
+        with self.assertRaises(Exception):
+            fleet.instances()
+
+    def test_event_applied_to_owning_region(self):
+        fleet = FleetInventory([self._regional('us-east-1', ['i-1']), self._regional('eu-west-1', ['i-2'])])
+        fleet.instances()
+
+        self.assertTrue(fleet.apply_event(_event('i-2', 'stopped')))
+        self.assertFalse(fleet.apply_event(_event('i-9', 'stopped')))
+        states = {i['instance_id']: i['state'] for i in fleet.instances()}
+        self.assertEqual(states, {'i-1': 'running', 'i-2': 'stopped'})
+
+
+if __name__ == '__main__':
+    unittest.main()
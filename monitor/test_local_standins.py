@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Tests for the local stand-ins used by the benchmarks.
+"""
+
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+import requests
+
+# Add the monitor directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from clients import ClientPool, Location
+from local_standins import FakeEC2Client, FakeELBv2Client, StandInServer
+from monitor import HealthMonitor
+from strategy import RemediationLadder
+
+
+class TestStandInServer(unittest.TestCase):
+    """Test cases for StandInServer."""
+
+    def setUp(self):
+        self.server = StandInServer(tls=False, body_size=2048, drip_bytes=512, drip_delay=0.01, seed=1)
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_modes(self):
+        """Test that each mode serves what the monitor should see."""
+        response = requests.get(self.server.url, timeout=5)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("Deployed via SSM Document", response.text)
+        self.assertGreaterEqual(len(response.content), 2048)
+
+        self.server.mode = 'wrong-content'
+        self.assertNotIn("Deployed via SSM Document", requests.get(self.server.url, timeout=5).text)
+
+        self.server.mode = 'down'
+        self.assertEqual(requests.get(self.server.url, timeout=5).status_code, 503)
+
+        self.server.mode = 'slow'
+        self.assertIn("Deployed via SSM Document", requests.get(self.server.url, timeout=5).text)
+
+        self.assertEqual(self.server.requests, 4)
+
+    def test_flaky_mode_fails_some_requests(self):
+        """Test that flaky mode mixes successes and failures."""
+        self.server.mode = 'flaky'
+        statuses = {requests.get(self.server.url, timeout=5).status_code for _ in range(20)}
+        self.assertEqual(statuses, {200, 503})
+
+    def test_rejects_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            self.server.mode = 'sideways'
+
+
+class TestFakeEC2Client(unittest.TestCase):
+    """Test cases for FakeEC2Client."""
+
+    def _web_server(self) -> StandInServer:
+        """Start a stand-in answering the direct probes of fake instances with the address 127.0.0.1."""
+        server = StandInServer(tls=False)
+        self.addCleanup(server.stop)
+        return server
+
+    def test_describe_instances_paginates(self):
+        """Test that large fleets are returned over several pages."""
+        ec2_client = FakeEC2Client(1500)
+        first = ec2_client.describe_instances(Filters=[])
+        second = ec2_client.describe_instances(Filters=[], NextToken=first['NextToken'])
+
+        self.assertEqual(len(first['Reservations']) + len(second['Reservations']), 1500)
+        self.assertNotIn('NextToken', second)
+
+    def test_monitor_restarts_fake_fleet(self):
+        """Test a full rolling restart of the fake fleet by HealthMonitor."""
+        server = self._web_server()
+        ec2_client = FakeEC2Client(4, transition_delay=0.02, private_ip='127.0.0.1')
+        ec2_client.set_state('i-00000000000000003', 'stopped')
+        with patch('monitor.boto3.client', return_value=ec2_client):
+            monitor = HealthMonitor(server.url, 5)
+            monitor.restart_web_servers()
+
+        self.assertEqual(monitor.metrics.restarts.value(result='success'), 4)
+        # Each batch only finished once its instances answered their readiness probes
+        self.assertEqual(monitor.metrics.time_to_healthy.count(step='stop-start'), 4)
+        self.assertGreaterEqual(server.requests, 4)
+        self.assertEqual(ec2_client.calls.count('stop_instances'), 2)
+        for index in range(4):
+            self.assertEqual(ec2_client.state_of(f'i-{index:017x}'), 'running')
+
+    def test_monitor_restarts_fleet_across_regions(self):
+        """Test that discovery merges every region and each restart call goes to the instance's own region."""
+        server = self._web_server()
+        fleets = {'us-east-1': FakeEC2Client(2, transition_delay=0.02, private_ip='127.0.0.1'),
+                  'eu-west-1': FakeEC2Client(2, transition_delay=0.02, id_offset=100, private_ip='127.0.0.1')}
+        pool = ClientPool(lambda service, region_name=None, **credentials: fleets[region_name])
+        monitor = HealthMonitor(server.url, 5, client_pool=pool,
+                                locations=[Location('us-east-1'), Location('eu-west-1')])
+
+        self.assertEqual(len(monitor.get_web_server_instances()), 4)
+        monitor.restart_web_servers()
+
+        self.assertEqual(monitor.metrics.restarts.value(result='success'), 4)
+        # Two rolling batches of two; a fake fleet fails any call naming another region's instance
+        for fleet in fleets.values():
+            self.assertEqual(fleet.calls.count('stop_instances'), 1)
+        self.assertEqual(fleets['eu-west-1'].state_of(f'i-{101:017x}'), 'running')
+
+    def test_monitor_replaces_fake_instances(self):
+        """Test that the replace step swaps failed instances for healthy new ones behind the target group."""
+        server = self._web_server()
+        ec2_client = FakeEC2Client(3, transition_delay=0.02, private_ip='127.0.0.1')
+        elbv2_client = FakeELBv2Client([f'i-{index:017x}' for index in range(3)])
+        pool = ClientPool(lambda service, **kwargs: {'ec2': ec2_client, 'elbv2': elbv2_client}[service])
+        monitor = HealthMonitor(server.url, 5, client_pool=pool, target_group_arn='arn:tg',
+                                remediation_ladder=RemediationLadder(steps=['replace'], step_timeout=1,
+                                                                     poll_interval=0.01))
+        failed = [f'i-{index:017x}' for index in range(2)]
+
+        self.assertTrue(monitor.remediate_instances(failed, 'content'))
+
+        self.assertEqual(monitor.metrics.replacements.value(result='success'), 2)
+        self.assertEqual(ec2_client.calls.count('run_instances'), 2)
+        running = [instance['instance_id'] for instance in monitor.get_web_server_instances()
+                   if instance['state'] == 'running']
+        self.assertEqual(len(running), 3)
+        self.assertNotIn(failed[0], running)
+        self.assertIn(f'i-{2:017x}', running)
+
+
+if __name__ == '__main__':
+    unittest.main()
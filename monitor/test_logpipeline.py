@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Tests for the queue-based logging pipeline.
+"""
+
+import io
+import json
+import logging
+import os
+import sys
+import tempfile
+import unittest
+
+# Add the monitor directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from logpipeline import JSONFormatter, LogConfig, LogPipeline, SamplingFilter
+
+
+def make_record(msg='probe', args=(), **extra):
+    record = logging.LogRecord('monitor', logging.INFO, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+class TestJSONFormatter(unittest.TestCase):
+    """Test cases for JSONFormatter."""
+
+    def test_structured_fields(self):
+        record = make_record('✓ Endpoint healthy (%s)', ('https://a.example.com',),
+                             endpoint='https://a.example.com', status=200, latency=0.012, sample='ignored')
+        entry = json.loads(JSONFormatter().format(record))
+
+        self.assertEqual(entry['message'], '✓ Endpoint healthy (https://a.example.com)')
+        self.assertEqual((entry['level'], entry['logger']), ('INFO', 'monitor'))
+        self.assertEqual((entry['endpoint'], entry['status'], entry['latency']), ('https://a.example.com', 200, 0.012))
+        self.assertNotIn('sample', entry)
+        self.assertTrue(entry['time'].endswith('+00:00'))
+
+    def test_instance_ids_and_exception(self):
+        try:
+            raise RuntimeError('stop failed')
+        except RuntimeError:
+            record = make_record(instance_ids=['i-1', 'i-2'])
+            record.exc_info = sys.exc_info()
+        entry = json.loads(JSONFormatter().format(record))
+        self.assertEqual(entry['instance_ids'], ['i-1', 'i-2'])
+        self.assertIn('RuntimeError: stop failed', entry['exception'])
+
+
+class TestSamplingFilter(unittest.TestCase):
+    """Test cases for SamplingFilter."""
+
+    def test_one_in_rate_per_series(self):
+        sampler = SamplingFilter(5)
+        passed = [sampler.filter(make_record(sample='healthy:a')) for _ in range(11)]
+        self.assertEqual([index for index, kept in enumerate(passed) if kept], [0, 5, 10])
+        # Each series is counted on its own, and records outside a series are never dropped
+        self.assertTrue(sampler.filter(make_record(sample='healthy:b')))
+        self.assertTrue(all(sampler.filter(make_record()) for _ in range(3)))
+
+    def test_kept_record_carries_rate(self):
+        record = make_record(sample='healthy:a')
+        SamplingFilter(10).filter(record)
+        self.assertEqual(record.sampled, 10)
+
+    def test_invalid_rate(self):
+        with self.assertRaises(ValueError):
+            SamplingFilter(0)
+
+
+class TestLogPipeline(unittest.TestCase):
+    """Test cases for LogPipeline."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'monitor.log')
+        self.logger = logging.getLogger(f'test-pipeline-{self.id()}')
+        self.logger.propagate = False
+
+    def _start(self, **config):
+        self.stream = io.StringIO()
+        pipeline = LogPipeline(LogConfig(path=self.path, **config), stream=self.stream)
+        self.assertTrue(pipeline.start(self.logger))
+        self.addCleanup(pipeline.stop)
+        return pipeline
+
+    def test_records_written_in_background(self):
+        """Test that records reach the console and the file once the pipeline stops."""
+        pipeline = self._start()
+        self.logger.info('Endpoint %s healthy', 'https://a.example.com')
+        pipeline.stop()
+
+        self.assertFalse(pipeline.active)
+        self.assertFalse(self.logger.handlers)
+        with open(self.path) as f:
+            self.assertIn(' - INFO - Endpoint https://a.example.com healthy', f.read())
+        self.assertIn('Endpoint https://a.example.com healthy', self.stream.getvalue())
+
+    def test_json_lines_with_sampling(self):
+        pipeline = self._start(format='json', sample_rate=3)
+        for index in range(6):
+            self.logger.info('healthy %d', index, extra={'endpoint': 'https://a.example.com', 'sample': 'healthy:a'})
+        self.logger.warning('failed', extra={'endpoint': 'https://a.example.com', 'status': 503})
+        pipeline.stop()
+
+        with open(self.path) as f:
+            entries = [json.loads(line) for line in f]
+        self.assertEqual([entry['message'] for entry in entries], ['healthy 0', 'healthy 3', 'failed'])
+        self.assertEqual(entries[0]['sampled'], 3)
+        self.assertEqual(entries[2]['status'], 503)
+
+    def test_mutable_arguments_formatted_when_logged(self):
+        """Test that an argument changed after the log call is written as it was."""
+        pipeline = self._start()
+        instances = ['i-1']
+        self.logger.info('Restarting %s', instances)
+        instances.append('i-2')
+        pipeline.stop()
+
+        with open(self.path) as f:
+            self.assertIn("Restarting ['i-1']\n", f.read())
+
+    def test_size_rotation(self):
+        pipeline = self._start(max_bytes=200, backup_count=2)
+        for index in range(20):
+            self.logger.info('probe line %02d padded to take some room', index)
+        pipeline.stop()
+
+        self.assertTrue(os.path.exists(self.path + '.1'))
+        self.assertTrue(os.path.exists(self.path + '.2'))
+        self.assertFalse(os.path.exists(self.path + '.3'))
+
+    def test_configured_logger_left_alone(self):
+        """Test that a logger the application already configured is not taken over."""
+        handler = logging.NullHandler()
+        self.logger.addHandler(handler)
+        self.addCleanup(self.logger.removeHandler, handler)
+
+        pipeline = LogPipeline(LogConfig(path=self.path))
+        self.assertFalse(pipeline.start(self.logger))
+        pipeline.stop()
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_invalid_config(self):
+        for options in ({'format': 'xml'}, {'sample_rate': 0}, {'rotate_when': 'fortnightly'}, {'backup_count': -1}):
+            with self.subTest(options=options), self.assertRaises(ValueError):
+                LogConfig(**options)
+        self.assertEqual(LogConfig(rotate_when='midnight').rotate_when, 'midnight')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Tests for the Prometheus metrics exporter.
+"""
+
+import json
+import os
+import sys
+import unittest
+import urllib.request
+import urllib.error
+
+# Add the monitor directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from metrics import Counter, Gauge, Histogram, MetricsServer, MonitorMetrics
+
+
+class TestMetrics(unittest.TestCase):
+    """Test cases for metric types and rendering."""
+
+    def test_counter(self):
+        """Test counter increments and rendering."""
+        counter = Counter('probes', 'Probes.', labels=('result',))
+        counter.inc(result='success')
+        counter.inc(2, result='success')
+
+        self.assertEqual(counter.value(result='success'), 3.0)
+        self.assertIn('probes_total{result="success"} 3.0', counter.render())
+        self.assertIn('# TYPE probes counter', counter.render())
+
+    def test_gauge_label_escaping(self):
+        """Test gauge rendering escapes label values."""
+        gauge = Gauge('failures', 'Failures.', labels=('endpoint',))
+        gauge.set(2, endpoint='https://a.example.com/"x"')
+
+        self.assertIn('failures{endpoint="https://a.example.com/\\"x\\""} 2.0', gauge.render())
+
+    def test_labels_must_match(self):
+        """Test that observations must carry exactly the declared labels."""
+        gauge = Gauge('failures', 'Failures.', labels=('endpoint',))
+        with self.assertRaises(ValueError):
+            gauge.set(1, host='a')
+
+    def test_histogram_buckets_cumulative(self):
+        """Test histogram buckets, sum and count."""
+        histogram = Histogram('latency', 'Latency.', buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 0.7, 5.0):
+            histogram.observe(value)
+
+        output = histogram.render()
+        self.assertIn('latency_bucket{le="0.1"} 1', output)
+        self.assertIn('latency_bucket{le="1.0"} 3', output)
+        self.assertIn('latency_bucket{le="+Inf"} 4', output)
+        self.assertIn('latency_sum 6.25', output)
+        self.assertIn('latency_count 4', output)
+        self.assertEqual(histogram.count(), 4)
+
+    def test_monitor_metrics_observe_probe(self):
+        """Test that probe phases are recorded per endpoint."""
+        metrics = MonitorMetrics()
+        metrics.observe_probe('https://a.example.com', False, 0.2, {'dns': 0.01, 'ttfb': 0.1})
+
+        self.assertEqual(metrics.probes.value(endpoint='https://a.example.com', result='failure'), 1.0)
+        self.assertEqual(metrics.probe_phase_seconds.count(endpoint='https://a.example.com', phase='dns'), 1)
+        self.assertEqual(metrics.probe_phase_seconds.count(endpoint='https://a.example.com', phase='tls'), 0)
+
+    def test_instance_health_drops_stale_instances(self):
+        """Test that instances missing from the latest round stop being exported."""
+        metrics = MonitorMetrics()
+        metrics.set_instance_health('https://a.example.com', {'i-1': True, 'i-2': False})
+        metrics.set_instance_health('https://a.example.com', {'i-1': False})
+
+        output = metrics.instance_healthy.render()
+        self.assertIn('monitor_instance_healthy{endpoint="https://a.example.com",instance="i-1"} 0', output)
+        self.assertNotIn('i-2', output)
+
+        metrics.set_node_health('https://a.example.com', {'10.0.1.5': True})
+        self.assertIn('node="10.0.1.5"} 1', metrics.alb_node_healthy.render())
+        self.assertIn('instance="i-1"} 0', metrics.instance_healthy.render())
+
+
+class TestMetricsServer(unittest.TestCase):
+    """Test cases for the /metrics HTTP endpoint."""
+
+    def setUp(self):
+        """Start a metrics server on a free port."""
+        self.metrics = MonitorMetrics()
+        self.server = MetricsServer(self.metrics.registry, 0, '127.0.0.1',
+                                    pages={'/remediation': lambda: {'active': []}})
+
+    def tearDown(self):
+        """Stop the metrics server."""
+        self.server.stop()
+
+    def test_scrape(self):
+        """Test that the registry is served on /metrics."""
+        self.metrics.set_consecutive_failures('https://a.example.com', 1)
+
+        with urllib.request.urlopen(f'http://127.0.0.1:{self.server.port}/metrics') as response:
+            body = response.read().decode('utf-8')
+            content_type = response.headers['Content-Type']
+
+        self.assertTrue(content_type.startswith('text/plain'))
+        self.assertIn('monitor_consecutive_failures{endpoint="https://a.example.com"} 1.0', body)
+
+    def test_json_page(self):
+        """Test that extra pages are served as JSON."""
+        with urllib.request.urlopen(f'http://127.0.0.1:{self.server.port}/remediation') as response:
+            self.assertEqual(response.headers['Content-Type'], 'application/json')
+            self.assertEqual(json.loads(response.read()), {'active': []})
+
+    def test_unknown_path(self):
+        """Test that other paths return 404."""
+        with self.assertRaises(urllib.error.HTTPError) as cm:
+            urllib.request.urlopen(f'http://127.0.0.1:{self.server.port}/')
+        self.assertEqual(cm.exception.code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,16 +5,35 @@ Test script for the AWS Infrastructure Monitoring Script
 This script validates the monitoring functionality without making actual AWS changes.
 """
 
+import asyncio
+import http.server
+import socket
+import ssl
+import subprocess
+import tempfile
+import threading
+import time
 import unittest
-from unittest.mock import Mock, patch, MagicMock
+import warnings
+from unittest.mock import ANY, Mock, patch, MagicMock
 import sys
 import os
 import requests
+import urllib3
 
 # Add the monitor directory to the path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from monitor import HealthMonitor
+from cluster import ClusterCoordinator, SQLiteLeaseBackend
+from content import ContentMatcher
+from dnscache import DNSCache
+from evaluation import HealthPolicy
+from local_standins import generate_self_signed_cert
+from logpipeline import LogConfig
+from monitor import Endpoint, HealthMonitor, MultiEndpointMonitor, ProbeSession
+from pathprobe import PathCheck, PathResult, PathRound
+from ratelimit import RestartGuard
+from strategy import RemediationLadder
 
 
 class TestHealthMonitor(unittest.TestCase):
@@ -22,34 +41,37 @@ class TestHealthMonitor(unittest.TestCase):
     
     def setUp(self):
         """Set up test fixtures."""
-        with patch('monitor.boto3.client'):
-            self.monitor = HealthMonitor('https://test.example.com', 5)
+        # AWS clients are created on first use, so the patch has to last the whole test
+        patcher = patch('monitor.boto3.client')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.monitor = HealthMonitor('https://test.example.com', 5)
     
-    @patch('monitor.requests.get')
+    @patch('monitor.requests.Session.get')
     def test_endpoint_health_success(self, mock_get):
         """Test successful endpoint health check with expected content."""
         mock_response = Mock()
         mock_response.status_code = 200
-        mock_response.text = "Welcome to nginx! Deployed via SSM Document"
+        mock_response.iter_content.return_value = [b"Welcome to nginx! Deployed via SSM Document"]
         mock_get.return_value = mock_response
         
         result = self.monitor.check_endpoint_health()
         self.assertTrue(result)
         mock_get.assert_called_once()
     
-    @patch('monitor.requests.get')
+    @patch('monitor.requests.Session.get')
     def test_endpoint_health_success_missing_content(self, mock_get):
         """Test endpoint health check with 200 status but missing expected content."""
         mock_response = Mock()
         mock_response.status_code = 200
-        mock_response.text = "Welcome to nginx! This is a basic installation."
+        mock_response.iter_content.return_value = [b"Welcome to nginx! This is a basic installation."]
         mock_get.return_value = mock_response
         
         result = self.monitor.check_endpoint_health()
         self.assertFalse(result)
         mock_get.assert_called_once()
     
-    @patch('monitor.requests.get')
+    @patch('monitor.requests.Session.get')
     def test_endpoint_health_failure_status(self, mock_get):
         """Test endpoint health check with bad status code."""
         mock_response = Mock()
@@ -59,7 +81,7 @@ class TestHealthMonitor(unittest.TestCase):
         result = self.monitor.check_endpoint_health()
         self.assertFalse(result)
     
-    @patch('monitor.requests.get')
+    @patch('monitor.requests.Session.get')
     def test_endpoint_health_failure_exception(self, mock_get):
         """Test endpoint health check with request exception."""
         mock_get.side_effect = requests.exceptions.ConnectionError("Connection failed")
@@ -67,6 +89,52 @@ class TestHealthMonitor(unittest.TestCase):
         result = self.monitor.check_endpoint_health()
         self.assertFalse(result)
     
+    @patch('monitor.requests.Session.get')
+    def test_endpoint_health_stops_reading_at_marker(self, mock_get):
+        """Test that the body is no longer read once the expected content is found."""
+        chunks_read = []
+        
+        def chunks(chunk_size):
+            for chunk in [b"<html>Deployed via ", b"SSM Document", b"</html>" * 100]:
+                chunks_read.append(chunk)
+                yield chunk
+        
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.iter_content.side_effect = chunks
+        mock_response.raw.length_remaining = 700
+        mock_get.return_value = mock_response
+        
+        self.assertTrue(self.monitor.check_endpoint_health())
+        self.assertEqual(len(chunks_read), 2)
+        # The small remainder is drained so the connection can be reused
+        mock_response.raw.drain_conn.assert_called_once()
+    
+    @patch('monitor.requests.Session.get')
+    def test_endpoint_health_fails_past_byte_limit(self, mock_get):
+        """Test that a probe fails once the byte limit is read without a match."""
+        self.monitor.content_matcher.max_bytes = 1000
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.iter_content.return_value = iter([b"x" * 600] * 10)
+        mock_response.raw.length_remaining = 10 * 1024 * 1024
+        mock_get.return_value = mock_response
+        
+        self.assertFalse(self.monitor.check_endpoint_health())
+        mock_response.raw.drain_conn.assert_not_called()
+        mock_response.close.assert_called()
+    
+    @patch('monitor.requests.Session.get')
+    def test_endpoint_health_failure_status_discards_connection(self, mock_get):
+        """Test that a failed probe closes its connection instead of returning it to the pool."""
+        mock_response = Mock()
+        mock_response.status_code = 502
+        mock_get.return_value = mock_response
+        
+        self.assertFalse(self.monitor.check_endpoint_health())
+        mock_response.raw.connection.close.assert_called_once()
+        self.assertEqual(self.monitor.probe_session.stats['discarded_connections'], 1)
+    
     def test_get_web_server_instances(self):
         """Test getting web server instances."""
         # Mock EC2 response
@@ -115,6 +183,73 @@ class TestHealthMonitor(unittest.TestCase):
             InstanceIds=['i-1234567890abcdef0']
         )
     
+    @patch('monitor.requests.Session.get')
+    def test_endpoint_health_records_metrics(self, mock_get):
+        """Test that each probe is recorded in the metrics."""
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.iter_content.return_value = [b"Deployed via SSM Document"]
+        mock_get.return_value = mock_response
+        
+        self.monitor.check_endpoint_health()
+        
+        metrics = self.monitor.metrics
+        self.assertEqual(metrics.probes.value(endpoint='https://test.example.com', result='success'), 1.0)
+        self.assertEqual(metrics.probe_duration_seconds.count(endpoint='https://test.example.com'), 1)
+        self.assertEqual(metrics.probe_phase_seconds.count(endpoint='https://test.example.com', phase='body'), 1)
+    
+    @patch('monitor.requests.Session.get')
+    def test_probe_log_lines_carry_structured_fields(self, mock_get):
+        """Test that probe lines are logged with lazy arguments and fields for JSON logs and sampling."""
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.iter_content.return_value = [b"Deployed via SSM Document"]
+        mock_get.return_value = mock_response
+        
+        with self.assertLogs('monitor', level='INFO') as logs:
+            self.monitor.check_endpoint_health()
+        
+        record = next(record for record in logs.records if record.msg.startswith('✓ Endpoint healthy'))
+        self.assertEqual(record.args[:2], ('https://test.example.com', 200))
+        self.assertEqual((record.endpoint, record.status, record.sample), ('https://test.example.com', 200, 'healthy:https://test.example.com'))
+        self.assertGreaterEqual(record.latency, 0)
+    
+    @patch('monitor.requests.Session.get')
+    def test_failure_state_restored_from_history(self, mock_get):
+        """Test that probes are recorded and a restarted monitor resumes its failure count."""
+        mock_response = Mock()
+        mock_response.status_code = 503
+        mock_get.return_value = mock_response
+        
+        with tempfile.TemporaryDirectory() as directory:
+            history_file = os.path.join(directory, 'probes.history')
+            with patch('monitor.boto3.client'):
+                monitor = HealthMonitor('https://test.example.com', 5, history_file=history_file)
+            monitor.check_endpoint_health()
+            monitor.history.close()
+            
+            with patch('monitor.boto3.client'):
+                restarted = HealthMonitor('https://test.example.com', 5, history_file=history_file)
+            self.assertEqual(restarted.consecutive_failures, 1)
+            self.assertEqual(restarted.history.records()[0].status, 503)
+            
+            # A remediation marker resets the count, as the running monitor does
+            with patch.object(restarted, 'start_remediation', return_value=True):
+                restarted._trigger_remediation('https://test.example.com')
+            self.assertEqual(restarted.history.consecutive_failures('https://test.example.com'), 0)
+            restarted.history.close()
+    
+    def test_restart_instance_records_waiter_durations(self):
+        """Test that stop and start waiter durations are recorded."""
+        self.monitor.ec2_client.get_waiter.return_value = Mock()
+        
+        self.monitor.restart_instance('i-1234567890abcdef0')
+        
+        metrics = self.monitor.metrics
+        self.assertEqual(metrics.restart_waiter_seconds.count(waiter='instance_stopped'), 1)
+        self.assertEqual(metrics.restart_waiter_seconds.count(waiter='instance_running'), 1)
+        self.assertEqual(metrics.restarts.value(result='success'), 1.0)
+    
     def test_restart_instance_failure(self):
         """Test instance restart failure."""
         # Mock exception during stop
@@ -122,7 +257,849 @@ class TestHealthMonitor(unittest.TestCase):
         
         result = self.monitor.restart_instance('i-1234567890abcdef0')
         self.assertFalse(result)
+    
+    def _fleet(self, count, state='running'):
+        """Build instance records for a fleet of the given size."""
+        return [{'instance_id': f'i-{n}', 'state': state} for n in range(count)]
+    
+    def test_restart_web_servers_rolling_batches(self):
+        """Test that web servers are restarted in batched stop/start calls."""
+        self.monitor.restart_batch_size = 2
+        self.monitor.get_web_server_instances = Mock(return_value=self._fleet(4))
+        self.monitor.ec2_client.get_waiter.return_value = Mock()
+        
+        self.monitor.restart_web_servers()
+        
+        stop_calls = [call.kwargs['InstanceIds'] for call in self.monitor.ec2_client.stop_instances.call_args_list]
+        self.assertEqual(stop_calls, [['i-0', 'i-1'], ['i-2', 'i-3']])
+        waited = self.monitor.ec2_client.get_waiter.return_value.wait.call_args_list[0].kwargs['InstanceIds']
+        self.assertEqual(waited, ['i-0', 'i-1'])
+    
+    def test_restart_web_servers_skips_instances_leased_by_other_nodes(self):
+        """Test that a clustered monitor never restarts an instance another node holds."""
+        with tempfile.TemporaryDirectory() as directory:
+            backend = SQLiteLeaseBackend(os.path.join(directory, 'leases.db'))
+            other_node = ClusterCoordinator(backend, node_id='node-b')
+            other_node.claim_instances(['i-1'])
+            self.monitor.cluster = ClusterCoordinator(backend, node_id='node-a')
+            self.monitor.restart_batch_size = 2
+            self.monitor.get_web_server_instances = Mock(return_value=self._fleet(4))
+            self.monitor.ec2_client.get_waiter.return_value = Mock()
+            
+            self.monitor.restart_web_servers()
+            
+            stop_calls = [call.kwargs['InstanceIds'] for call in self.monitor.ec2_client.stop_instances.call_args_list]
+            self.assertEqual(stop_calls, [['i-0'], ['i-2', 'i-3']])
+            # Our own leases are released once the restart is done
+            self.assertEqual(other_node.claim_instances(['i-0', 'i-2', 'i-3']), ['i-0', 'i-2', 'i-3'])
+    
+    def test_rolling_batch_size_keeps_capacity(self):
+        """Test that a batch never covers the whole fleet."""
+        self.assertEqual(self.monitor._rolling_batch_size(1), 1)
+        self.assertEqual(self.monitor._rolling_batch_size(3), 2)
+        self.monitor.restart_batch_size = 10
+        self.assertEqual(self.monitor._rolling_batch_size(4), 3)
+    
+    def test_restart_web_servers_stopped_first(self):
+        """Test that stopped instances are restarted before running ones."""
+        self.monitor.restart_batch_size = 1
+        fleet = self._fleet(2) + [{'instance_id': 'i-stopped', 'state': 'stopped'}]
+        self.monitor.get_web_server_instances = Mock(return_value=fleet)
+        self.monitor.ec2_client.get_waiter.return_value = Mock()
+        
+        self.monitor.restart_web_servers()
+        
+        first_batch = self.monitor.ec2_client.stop_instances.call_args_list[0].kwargs['InstanceIds']
+        self.assertEqual(first_batch, ['i-stopped'])
+    
+    def test_restart_web_servers_targets_scope_uses_target_health(self):
+        """Test that target scope restarts only targets the ALB reports unhealthy."""
+        self.monitor.remediation_scope = 'targets'
+        self.monitor.target_group_arn = 'arn:aws:elasticloadbalancing:us-east-2:123:targetgroup/demo/abc'
+        self.monitor.elbv2_client = Mock()
+        self.monitor.elbv2_client.describe_target_health.return_value = {
+            'TargetHealthDescriptions': [
+                {'Target': {'Id': 'i-0'}, 'TargetHealth': {'State': 'healthy'}},
+                {'Target': {'Id': 'i-1'}, 'TargetHealth': {'State': 'unhealthy', 'Reason': 'Target.Timeout'}},
+                {'Target': {'Id': 'i-2'}, 'TargetHealth': {'State': 'healthy'}},
+            ]
+        }
+        self.monitor.get_web_server_instances = Mock(return_value=self._fleet(3))
+        self.monitor.ec2_client.get_waiter.return_value = Mock()
+        # i-1 has no address, so readiness follows its target health, which the mock keeps unhealthy
+        self.monitor.remediation_ladder = RemediationLadder(step_timeout=0, poll_interval=0)
+        
+        self.monitor.restart_web_servers()
+        
+        self.monitor.ec2_client.stop_instances.assert_called_once_with(InstanceIds=['i-1'])
+    
+    def test_replacement_probe_fails_closed(self):
+        """Test that a replacement still pending or without an address never counts as healthy."""
+        self.monitor.check_endpoint_health = Mock(return_value=True)
+        
+        self.assertFalse(self.monitor._probe_replacement({'instance_id': 'i-new', 'state': 'pending',
+                                                          'private_ip': '10.0.1.20'}))
+        self.assertFalse(self.monitor._probe_replacement({'instance_id': 'i-new', 'state': 'running',
+                                                          'private_ip': None, 'public_ip': None}))
+        self.monitor.check_endpoint_health.assert_not_called()
+        self.assertTrue(self.monitor._probe_replacement({'instance_id': 'i-new', 'state': 'running',
+                                                         'private_ip': '10.0.1.20'}))
+    
+    def test_get_unhealthy_instances_probes_directly(self):
+        """Test that without a target group each instance is probed on its own address."""
+        fleet = [
+            {'instance_id': 'i-good', 'state': 'running', 'private_ip': '10.0.1.10'},
+            {'instance_id': 'i-bad', 'state': 'running', 'private_ip': '10.0.1.11'},
+            {'instance_id': 'i-off', 'state': 'stopped', 'private_ip': '10.0.1.12'},
+        ]
+        self.monitor.check_endpoint_health = Mock(side_effect=lambda url, **kwargs: '10.0.1.10' in url)
+        
+        unhealthy = self.monitor.get_unhealthy_instances(fleet)
+        
+        self.assertEqual([i['instance_id'] for i in unhealthy], ['i-bad', 'i-off'])
+        probed = sorted(call.args[0] for call in self.monitor.check_endpoint_health.call_args_list)
+        self.assertEqual(probed, ['https://10.0.1.10', 'https://10.0.1.11'])
+    
+    def test_deep_check_probes_every_instance(self):
+        """Test that a deep check probes each instance with the endpoint's host name and records the matrix."""
+        fleet = [
+            {'instance_id': 'i-good', 'state': 'running', 'private_ip': '10.0.1.10'},
+            {'instance_id': 'i-bad', 'state': 'running', 'private_ip': '10.0.1.11'},
+        ]
+        self.monitor.get_web_server_instances = Mock(return_value=fleet)
+        self.monitor.check_endpoint_health = Mock(side_effect=lambda url, **kwargs: '10.0.1.10' in url)
+        self.monitor.last_failure['https://10.0.1.11'] = 'status'
+        
+        self.assertFalse(self.monitor.deep_check())
+        
+        self.assertEqual(self.monitor.instance_health['https://test.example.com'], {'i-good': True, 'i-bad': False})
+        self.assertEqual(self.monitor.last_failure['https://test.example.com'], 'status')
+        hosts = {call.kwargs['host'] for call in self.monitor.check_endpoint_health.call_args_list}
+        self.assertEqual(hosts, {'test.example.com'})
+        self.assertEqual(
+            self.monitor.metrics.instance_healthy.value(endpoint='https://test.example.com', instance='i-bad'), 0
+        )
+    
+    @patch('monitor.requests.Session.get')
+    def test_deep_check_records_under_the_endpoint(self, mock_get):
+        """Test that direct probes leave no state, metrics or history under the instance URLs."""
+        def respond(url, **kwargs):
+            response = Mock()
+            response.status_code = 200 if '10.0.1.10' in url else 503
+            response.iter_content.return_value = [b"Deployed via SSM Document"]
+            return response
+        mock_get.side_effect = respond
+        self.monitor.get_web_server_instances = Mock(return_value=[
+            {'instance_id': 'i-good', 'state': 'running', 'private_ip': '10.0.1.10'},
+            {'instance_id': 'i-bad', 'state': 'running', 'private_ip': '10.0.1.11'},
+        ])
+        self.monitor.history = Mock()
+        
+        self.assertFalse(self.monitor.deep_check())
+        
+        self.assertEqual(set(self.monitor.last_failure), {'https://test.example.com'})
+        self.assertEqual(set(self.monitor.last_latency), {'https://test.example.com'})
+        self.assertEqual(self.monitor.last_failure['https://test.example.com'], 'status')
+        self.assertEqual(self.monitor.metrics.probes.value(endpoint='https://test.example.com', result='failure'), 1)
+        self.assertEqual(self.monitor.metrics.probes.value(endpoint='https://10.0.1.11', result='failure'), 0)
+        self.assertEqual([call.args[0] for call in self.monitor.history.append.call_args_list],
+                         ['https://test.example.com'])
+    
+    def test_deep_check_falls_back_to_endpoint(self):
+        """Test that the endpoint itself is probed when no instance has an address."""
+        self.monitor.get_web_server_instances = Mock(return_value=[])
+        self.monitor.check_endpoint_health = Mock(return_value=True)
+        
+        self.assertTrue(self.monitor.deep_check())
+        self.monitor.check_endpoint_health.assert_called_once_with('https://test.example.com', None)
+    
+    def test_node_check_probes_every_alb_node(self):
+        """Test that every address the ALB name resolves to is probed, with the endpoint's host name."""
+        self.monitor.dns_cache.resolve = Mock(return_value=['10.0.1.5', '10.0.2.5', '10.0.3.5'])
+        self.monitor.check_endpoint_health = Mock(side_effect=lambda url, **kwargs: '10.0.2.5' not in url)
+        
+        self.assertFalse(self.monitor.node_check())
+        
+        self.monitor.dns_cache.resolve.assert_called_once_with('test.example.com')
+        self.assertEqual(self.monitor.node_health['https://test.example.com'],
+                         {'10.0.1.5': True, '10.0.2.5': False, '10.0.3.5': True})
+        hosts = {call.kwargs['host'] for call in self.monitor.check_endpoint_health.call_args_list}
+        self.assertEqual(hosts, {'test.example.com'})
+        self.assertEqual(
+            self.monitor.metrics.alb_node_healthy.value(endpoint='https://test.example.com', node='10.0.2.5'), 0
+        )
+    
+    def test_node_check_unresolved_name_probes_endpoint(self):
+        """Test that a name that does not resolve is reported through a normal probe."""
+        self.monitor.dns_cache.resolve = Mock(side_effect=socket.gaierror('Name or service not known'))
+        self.monitor.check_endpoint_health = Mock(return_value=False)
+        
+        self.assertFalse(self.monitor.node_check())
+        self.monitor.check_endpoint_health.assert_called_once_with('https://test.example.com', None)
+    
+    def test_path_check_records_every_path(self):
+        """Test that a round of path probes counts as one probe, failing with the first unhealthy path."""
+        self.monitor.paths = [PathCheck('/'), PathCheck('/api/health')]
+        results = {
+            '/': PathResult('/', healthy=True, status=200, latency=0.05, http_version='HTTP/2'),
+            '/api/health': PathResult('/api/health', healthy=False, status=503, latency=0.2,
+                                      http_version='HTTP/2', failure='status'),
+        }
+        prober = Mock()
+        prober.probe.return_value = PathRound(results, duration=0.2, new_connections=1, tls_handshakes=1)
+        self.monitor._path_probers['https://test.example.com'] = prober
+        
+        with self.assertLogs('monitor', level='WARNING') as logs:
+            self.assertFalse(self.monitor._round_probe()())
+        
+        self.assertIn('Path unhealthy (https://test.example.com/api/health) - Status: 503 (HTTP/2)', logs.output[0])
+        self.assertEqual(self.monitor.path_results['https://test.example.com'], results)
+        self.assertEqual(self.monitor.last_failure['https://test.example.com'], 'status')
+        self.assertEqual(self.monitor.last_latency['https://test.example.com'], 0.2)
+        self.assertEqual(
+            self.monitor.metrics.path_healthy.value(endpoint='https://test.example.com', path='/api/health'), 0
+        )
+    
+    def test_deep_and_node_probe_exclusive(self):
+        with self.assertRaises(ValueError):
+            HealthMonitor('https://test.example.com', deep_probe=True, node_probe=True)
+    
+    def test_instance_url_keeps_port_and_path(self):
+        """Test that instance URLs keep the endpoint's scheme, port and path."""
+        self.monitor.endpoint = 'https://demo-lb.example.com:8443/health?full=1'
+        self.assertEqual(self.monitor._instance_url('10.0.1.5'), 'https://10.0.1.5:8443/health?full=1')
+        self.assertEqual(self.monitor._instance_url('fd00::5'), 'https://[fd00::5]:8443/health?full=1')
+    
+    def test_replace_step_needs_target_group(self):
+        """Test that replacing instances requires the target group they are registered in."""
+        with self.assertRaises(ValueError):
+            HealthMonitor('https://test.example.com', remediation_ladder=RemediationLadder(steps=['replace']))
+    
+    def test_invalid_remediation_scope(self):
+        """Test that an unknown remediation scope is rejected."""
+        with patch('monitor.boto3.client'):
+            with self.assertRaises(ValueError):
+                HealthMonitor('https://test.example.com', remediation_scope='everything')
+    
+    def test_aws_clients_created_on_first_use(self):
+        """Test that AWS clients are only created when first needed, and once."""
+        with patch('monitor.boto3.client') as mock_client:
+            monitor = HealthMonitor('https://test.example.com', 5)
+            mock_client.assert_not_called()
+            
+            self.assertIs(monitor.ec2_client, monitor.ec2_client)
+            mock_client.assert_called_once_with('ec2', region_name=monitor.region)
+        
+        # The inventory follows the monitor's client, even when it is replaced
+        monitor.ec2_client = Mock()
+        monitor.ec2_client.describe_instances.return_value = {'Reservations': []}
+        self.assertEqual(monitor.inventory.instances(), [])
+        monitor.ec2_client.describe_instances.assert_called_once()
+    
+    @patch('monitor.requests.Session.get')
+    def test_check_once(self, mock_get):
+        """Test that a one-shot check reports health without remediating or touching AWS."""
+        mock_response = Mock()
+        mock_response.status_code = 503
+        mock_get.return_value = mock_response
+        self.monitor.start_remediation = Mock()
+        
+        with patch('monitor.boto3.client') as mock_client:
+            self.assertFalse(self.monitor.check_once())
+        
+        self.monitor.start_remediation.assert_not_called()
+        mock_client.assert_not_called()
+    
+    def test_start_remediation_runs_in_background(self):
+        """Test that remediation does not block the caller and is not started twice."""
+        release = threading.Event()
+        self.monitor.restart_web_servers = Mock(side_effect=lambda job=None: release.wait(5))
+        
+        self.assertTrue(self.monitor.start_remediation())
+        self.assertTrue(self.monitor.remediation_in_progress())
+        self.assertFalse(self.monitor.start_remediation())
+        
+        release.set()
+        self.monitor.wait_for_remediation()
+        self.assertFalse(self.monitor.remediation_in_progress())
+        self.monitor.restart_web_servers.assert_called_once()
+        self.assertEqual(self.monitor.remediation.status()['finished'][0]['state'], 'succeeded')
+    
+    def test_recovery_cancels_remaining_batches(self):
+        """Test that a job stops between batches once its endpoint recovers."""
+        self.monitor.get_web_server_instances = Mock(return_value=self._fleet(4))
+        self.monitor.restart_batch_size = 1
+        first_batch_started = threading.Event()
+        release = threading.Event()
+        
+        def restart_instances(instance_ids):
+            first_batch_started.set()
+            release.wait(5)
+            return True
+        
+        self.monitor.restart_instances = Mock(side_effect=restart_instances)
+        self.assertTrue(self.monitor.start_remediation())
+        self.assertTrue(first_batch_started.wait(5))
+        
+        self.monitor._cancel_remediation('https://test.example.com')
+        release.set()
+        self.monitor.wait_for_remediation()
+        
+        self.monitor.restart_instances.assert_called_once_with(['i-0'])
+        job = self.monitor.remediation.status()['finished'][0]
+        self.assertEqual((job['state'], job['restarted']), ('cancelled', 1))
+        self.assertEqual(self.monitor.metrics.remediation_jobs_finished.value(state='cancelled'), 1)
+
+    
+    def test_remediation_suppressed_during_cooldown(self):
+        """Test that a failing endpoint does not restart the fleet again straight after a remediation."""
+        self.monitor.get_web_server_instances = Mock(return_value=self._fleet(2))
+        self.monitor.restart_instances = Mock(return_value=True)
+        
+        self.monitor._trigger_remediation('https://test.example.com')
+        self.monitor.wait_for_remediation()
+        self.monitor._trigger_remediation('https://test.example.com')
+        
+        self.assertFalse(self.monitor.remediation_in_progress())
+        self.assertEqual(self.monitor.restart_instances.call_count, 2)
+        self.assertEqual(self.monitor.metrics.restarts_suppressed.value(scope='remediation'), 1)
+    
+    def test_failed_restarts_open_circuit_breaker(self):
+        """Test that repeated failed restarts stop further restarts."""
+        self.monitor.restart_guard = RestartGuard(restart_cooldown=0, breaker_threshold=2)
+        self.monitor.restart_batch_size = 1
+        self.monitor.get_web_server_instances = Mock(return_value=self._fleet(4))
+        self.monitor.restart_instances = Mock(return_value=False)
+        
+        self.monitor.restart_web_servers()
+        
+        self.assertEqual(self.monitor.restart_instances.call_count, 2)
+        self.assertEqual(self.monitor.metrics.restarts_suppressed.value(scope='instance'), 2)
+        self.assertEqual(self.monitor.metrics.restart_breaker_open.value(), 1)
+        self.assertIn('circuit breaker', self.monitor.restart_guard.remediation_blocked())
+    
+    def _tiered_fleet(self):
+        """Set up a two-instance fleet with a fast remediation ladder and a fake SSM client."""
+        self.monitor.remediation_ladder = RemediationLadder(step_timeout=0, poll_interval=0)
+        fleet = [{'instance_id': f'i-{n}', 'state': 'running', 'private_ip': f'10.0.1.{n}'} for n in range(2)]
+        self.monitor.get_web_server_instances = Mock(return_value=fleet)
+        self.monitor.ssm_client = Mock()
+        self.monitor.ssm_client.send_command.return_value = {'Command': {'CommandId': 'cmd-1'}}
+        self.monitor.restart_instances = Mock(return_value=False)
+    
+    def _ssm_results(self, **statuses):
+        pages = [{'CommandInvocations': [{'InstanceId': i.replace('_', '-'), 'Status': s} for i, s in statuses.items()]}]
+        self.monitor.ssm_client.get_paginator.return_value.paginate.return_value = pages
+    
+    def test_content_failure_reruns_ssm_document(self):
+        """Test that missing content re-applies the SSM document instead of restarting instances."""
+        self._tiered_fleet()
+        self._ssm_results(i_0='Success', i_1='Success')
+        self.monitor._probe_instances_directly = Mock(return_value=set())
+        self.monitor.last_failure['https://test.example.com'] = 'content'
+        
+        self.monitor.restart_web_servers()
+        
+        kwargs = self.monitor.ssm_client.send_command.call_args.kwargs
+        self.assertEqual((kwargs['DocumentName'], kwargs['Parameters']), ('ServerConfiguration', {'skipFIPS': ['true']}))
+        self.monitor.restart_instances.assert_not_called()
+        self.assertEqual(self.monitor.metrics.remediation_steps.value(step='rerun-document', result='recovered'), 2)
+    
+    def test_failed_step_escalates(self):
+        """Test that instances still failing after a step move up the ladder one at a time."""
+        self._tiered_fleet()
+        self._ssm_results(i_0='Success', i_1='Failed')
+        self.monitor.ec2_client = Mock()
+        # i-0 only recovers once rebooted, i-1 never does
+        rebooted = self.monitor.ec2_client.reboot_instances
+        self.monitor._probe_instances_directly = Mock(side_effect=lambda instances, source=None: {
+            instance['instance_id'] for instance in instances if instance['instance_id'] == 'i-1' or not rebooted.called
+        })
+        
+        self.assertFalse(self.monitor.remediate_instances(['i-0', 'i-1'], 'refused'))
+        
+        documents = [call.kwargs['DocumentName'] for call in self.monitor.ssm_client.send_command.call_args_list]
+        self.assertEqual(documents, ['AWS-RunShellScript', 'ServerConfiguration'])
+        self.monitor.ec2_client.reboot_instances.assert_called_once_with(InstanceIds=['i-0', 'i-1'])
+        self.monitor.restart_instances.assert_called_once_with(['i-1'])
+    
+    def _await_recovery(self, fleet, step='restart-nginx', step_timeout=60):
+        """Run the readiness phase after a step without sleeping, returning the instances still failing and the delays."""
+        self.monitor.remediation_ladder = RemediationLadder(step_timeout=step_timeout, poll_interval=5)
+        self.monitor.get_web_server_instances = Mock(return_value=fleet)
+        with patch('monitor.time.sleep') as sleep:
+            failing = self.monitor._await_recovery([instance['instance_id'] for instance in fleet], step=step)
+        return failing, [call.args[0] for call in sleep.call_args_list]
+    
+    def test_readiness_polls_back_off(self):
+        """Test that readiness polls start fast, back off to the poll interval and stop once content is served."""
+        probes = iter([{'i-0'}] * 4 + [set()])
+        self.monitor._probe_instances_directly = Mock(side_effect=lambda instances, source=None: next(probes))
+        
+        failing, delays = self._await_recovery([{'instance_id': 'i-0', 'state': 'stopped', 'private_ip': '10.0.1.5'}])
+        
+        self.assertEqual(failing, [])
+        self.assertEqual(delays, [0.5, 1.0, 2.0, 4.0, 5])
+        # Probed whatever state the cached inventory still has
+        self.assertEqual(self.monitor._probe_instances_directly.call_args.args[0][0]['state'], 'running')
+        self.assertEqual(self.monitor.metrics.time_to_healthy.count(step='restart-nginx'), 1)
+    
+    def test_readiness_after_reboot_waits_a_full_interval(self):
+        """Test that the first poll after a reboot waits the poll interval, before the server goes down."""
+        self.monitor._probe_instances_directly = Mock(return_value=set())
+        
+        failing, delays = self._await_recovery([{'instance_id': 'i-0', 'state': 'running', 'private_ip': '10.0.1.5'}],
+                                               step='reboot')
+        
+        self.assertEqual(failing, [])
+        self.assertEqual(delays, [5])
+        self.assertEqual(self.monitor.metrics.time_to_healthy.count(step='reboot'), 1)
+    
+    def test_readiness_follows_target_health_without_address(self):
+        """Test that instances without an address recover once the target group reports them healthy."""
+        self.monitor.target_group_arn = 'arn:aws:elasticloadbalancing:us-east-2:123:targetgroup/demo/abc'
+        self.monitor.elbv2_client = Mock()
+        self.monitor.elbv2_client.describe_target_health.side_effect = [
+            {'TargetHealthDescriptions': [{'Target': {'Id': 'i-0'}, 'TargetHealth': {'State': state}}]}
+            for state in ('initial', 'initial', 'healthy')
+        ]
+        self.monitor._probe_instances_directly = Mock()
+        
+        failing, delays = self._await_recovery(self._fleet(1))
+        
+        self.assertEqual(failing, [])
+        self.assertEqual(len(delays), 3)
+        self.monitor._probe_instances_directly.assert_not_called()
+        self.assertEqual(self.monitor.elbv2_client.describe_target_health.call_args.kwargs['Targets'], [{'Id': 'i-0'}])
+        self.assertEqual(self.monitor.metrics.time_to_healthy.count(step='restart-nginx'), 1)
+    
+    def test_readiness_gives_up_at_step_timeout(self):
+        """Test that an instance the target group keeps unhealthy is still failing once the step times out."""
+        self.monitor.target_group_arn = 'arn:aws:elasticloadbalancing:us-east-2:123:targetgroup/demo/abc'
+        self.monitor.elbv2_client = Mock()
+        self.monitor.elbv2_client.describe_target_health.return_value = {
+            'TargetHealthDescriptions': [{'Target': {'Id': 'i-0'}, 'TargetHealth': {'State': 'unhealthy'}}]
+        }
+        
+        failing, delays = self._await_recovery(self._fleet(1), step_timeout=0)
+        
+        self.assertEqual(failing, ['i-0'])
+        self.assertEqual(len(delays), 1)
+        self.assertEqual(self.monitor.metrics.time_to_healthy.count(step='restart-nginx'), 0)
+    
+    def test_readiness_without_address_or_target_group(self):
+        """Test that instances that cannot be checked count as recovered without polling."""
+        failing, delays = self._await_recovery(self._fleet(2))
+        
+        self.assertEqual((failing, delays), ([], []))
+    
+    @patch('monitor.requests.Session.get')
+    def test_failure_kind_recorded(self, mock_get):
+        """Test that a failed probe records how it failed."""
+        mock_get.side_effect = requests.exceptions.ConnectTimeout('timed out')
+        self.monitor.check_endpoint_health()
+        self.assertEqual(self.monitor.last_failure['https://test.example.com'], 'timeout')
+    
+    def _run_loop(self, outcomes):
+        """Run the monitoring loop over scripted (healthy, latency) probe outcomes."""
+        remaining = list(outcomes)
+        
+        def probe():
+            healthy, latency = remaining.pop(0)
+            self.monitor.last_latency[self.monitor.endpoint] = latency
+            self.monitor.running = bool(remaining)
+            return healthy
+        
+        self.monitor.check_endpoint_health = probe
+        with patch('monitor.time.sleep'):
+            self.monitor.run()
+    
+    def test_flapping_endpoint_remediated_by_failure_ratio(self):
+        """Test that an endpoint failing every other probe is remediated once the window's failure ratio is reached."""
+        self.monitor.health_policy = HealthPolicy(failure_ratio=0.5, window=6)
+        self.monitor.evaluator = self.monitor.health_policy.create()
+        outcomes = [(healthy, 0.01) for healthy in [True, False] * 4]
+        self.monitor._trigger_remediation = Mock()
+        
+        self._run_loop(outcomes)
+        
+        # The window starts afresh after each remediation
+        self.assertEqual(self.monitor._trigger_remediation.call_count, 2)
+        self.assertEqual(self.monitor._trigger_remediation.call_args.args[1], '2 of the last 4 probes failed')
+    
+    def test_flapping_endpoint_ignored_by_default(self):
+        """Test that the default policy only remediates consecutive failures."""
+        self.monitor._trigger_remediation = Mock()
+        
+        self._run_loop([(healthy, 0.01) for healthy in [True, False] * 4])
+        
+        self.monitor._trigger_remediation.assert_not_called()
+    
+    def test_slow_endpoint_remediated_by_latency_slo(self):
+        """Test that healthy but slow probes breach the latency SLO, without cancelling the remediation."""
+        self.monitor.health_policy = HealthPolicy(latency_slo=0.5, window=4)
+        self.monitor.evaluator = self.monitor.health_policy.create()
+        self.monitor._trigger_remediation = Mock()
+        self.monitor._cancel_remediation = Mock()
+        self.monitor.remediation_in_progress = Mock(return_value=True)
+        
+        self._run_loop([(True, 0.1), (True, 0.9), (True, 0.2)])
+        
+        self.monitor._trigger_remediation.assert_called_once_with(
+            'https://test.example.com', 'p95 latency 0.900s over the last 2 probes exceeds the 0.5s SLO'
+        )
+        self.assertEqual(self.monitor._cancel_remediation.call_count, 2)
+
+class _KeepAliveHandler(http.server.BaseHTTPRequestHandler):
+    """Minimal keep-alive HTTP handler for connection pooling tests."""
+    protocol_version = 'HTTP/1.1'
+    
+    def do_GET(self):
+        body = b"Deployed via SSM Document"
+        self.send_response(500 if self.path == '/error' else 200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, format, *args):
+        pass
+
+
+class TestProbeSession(unittest.TestCase):
+    """Test cases for the pooled keep-alive probe session."""
+    
+    def setUp(self):
+        """Start a local keep-alive server."""
+        self.server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), _KeepAliveHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f'http://127.0.0.1:{self.server.server_port}'
+        self.session = ProbeSession()
+    
+    def tearDown(self):
+        """Stop the local server."""
+        self.session.close()
+        self.server.shutdown()
+        self.server.server_close()
+    
+    def _probe(self, path='/'):
+        response = self.session.get(self.url + path, 5)
+        stats = self.session.last_probe_stats()
+        if response.status_code == 200:
+            response.content
+        else:
+            self.session.discard(response)
+        response.close()
+        return stats
+    
+    def test_connection_reused_between_probes(self):
+        """Test that consecutive probes reuse the kept-alive connection."""
+        self.assertFalse(self._probe()['connection_reused'])
+        self.assertTrue(self._probe()['connection_reused'])
+        self.assertEqual(self.session.stats['new_connections'], 1)
+        self.assertEqual(self.session.stats['reused_connections'], 1)
+    
+    def test_failed_probe_connection_not_reused(self):
+        """Test that the connection behind a failed probe is dropped from the pool."""
+        self._probe()
+        self._probe('/error')
+        
+        self.assertFalse(self._probe()['connection_reused'])
+        self.assertEqual(self.session.stats['discarded_connections'], 1)
+    
+    def test_phase_timings_on_new_connection(self):
+        """Test that DNS, connect and TTFB are timed on a new connection but not on reuse."""
+        first = self._probe()['phases']
+        second = self._probe()['phases']
+        
+        self.assertTrue({'dns', 'connect', 'ttfb'} <= set(first))
+        self.assertNotIn('tls', first)
+        self.assertEqual(set(second), {'ttfb'})
+    
+    def test_new_connections_resolve_through_dns_cache(self):
+        """Test that a host name is resolved once for several new connections while its addresses are fresh."""
+        self.session.close()
+        self.session = ProbeSession(dns_cache=DNSCache())
+        url = f'http://localhost:{self.server.server_port}'
+        for path in ('/error', '/', '/'):
+            response = self.session.get(url + path, 5)
+            if response.status_code == 200:
+                self.session.release(response)
+            else:
+                self.session.discard(response)
+        
+        self.assertEqual(self.session.stats['new_connections'], 2)
+        self.assertEqual(self.session.dns_cache.stats, {'hits': 1, 'misses': 1})
+    
+    def _serve_recording(self, address, port=0):
+        """Start a server on an address, returning it and the list of local addresses it served requests on."""
+        served = []
+        
+        class Handler(_KeepAliveHandler):
+            def do_GET(self):
+                served.append(self.connection.getsockname()[0])
+                super().do_GET()
+        
+        server = http.server.ThreadingHTTPServer((address, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server, served
+    
+    def _resolving_session(self, addresses):
+        """Replace the session with one whose DNS cache resolves every name to the given addresses."""
+        self.session.close()
+        dns_cache = DNSCache()
+        dns_cache.resolve = Mock(return_value=addresses)
+        self.session = ProbeSession(dns_cache=dns_cache)
+    
+    def test_new_connections_rotate_through_addresses(self):
+        """Test that new connections take turns over every address of the name."""
+        server, served = self._serve_recording('0.0.0.0')
+        self._resolving_session(['127.0.0.1', '127.0.0.2'])
+        for _ in range(3):
+            response = self.session.get(f'http://alb.example.com:{server.server_port}/', 5)
+            # A discarded connection makes the next probe open a new one
+            self.session.discard(response)
+        
+        self.assertEqual(served, ['127.0.0.1', '127.0.0.2', '127.0.0.1'])
+    
+    def test_new_connection_fails_over_to_next_address(self):
+        """Test that an address refusing connections is skipped for the next one."""
+        self.server.shutdown()
+        self.server.server_close()
+        # The second address listens on the port the first now refuses
+        server, served = self._serve_recording('127.0.0.2', self.server.server_port)
+        self._resolving_session(['127.0.0.1', '127.0.0.2'])
+        
+        response = self.session.get(f'http://alb.example.com:{server.server_port}/', 5)
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(served, ['127.0.0.2'])
+        self.session.discard(response)
+    
+    def test_describe(self):
+        """Test formatting of per-probe connection stats."""
+        self.assertEqual(
+            ProbeSession.describe({'connection_reused': False, 'tls_resumed': True}),
+            'new connection, TLS resumed'
+        )
+        self.assertEqual(
+            ProbeSession.describe({'connection_reused': True, 'tls_resumed': None}),
+            'connection reused'
+        )
+
+
+class _EchoHostHandler(http.server.BaseHTTPRequestHandler):
+    """Answer with the Host header the request carried."""
+    protocol_version = 'HTTP/1.1'
+    
+    def do_GET(self):
+        body = self.headers['Host'].encode()
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, format, *args):
+        pass
+
+
+class TestDirectInstanceProbe(unittest.TestCase):
+    """Test probing an instance address with the endpoint's host name."""
+    
+    def setUp(self):
+        """Start a local TLS server that records the SNI names it is offered."""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        try:
+            cert_file, key_file = generate_self_signed_cert(directory.name)
+        except RuntimeError as e:
+            self.skipTest(str(e))
+        self.server_names = []
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(cert_file, key_file)
+        context.sni_callback = lambda sock, name, ctx: self.server_names.append(name)
+        
+        self.server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), _EchoHostHandler)
+        self.server.socket = context.wrap_socket(self.server.socket, server_side=True)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.session = ProbeSession()
+        self.addCleanup(self.session.close)
+    
+    def _get(self, host=None):
+        with warnings.catch_warnings():
+            # The probe session never verifies certificates
+            warnings.simplefilter('ignore', urllib3.exceptions.InsecureRequestWarning)
+            response = self.session.get(f'https://127.0.0.1:{self.server.server_port}/', 5, host=host)
+        try:
+            return response.text
+        finally:
+            response.close()
+    
+    def test_host_header_and_sni(self):
+        """Test that the host name is sent in both the Host header and SNI."""
+        self.assertEqual(self._get(host='www.example.com'), 'www.example.com')
+        self.assertEqual(self.server_names, ['www.example.com'])
+    
+    def test_connections_kept_apart_by_host_name(self):
+        """Test that a connection opened for one host name is not reused for another."""
+        self._get(host='a.example.com')
+        self._get(host='b.example.com')
+        self._get(host='a.example.com')
+        
+        self.assertEqual(self.server_names, ['a.example.com', 'b.example.com'])
+        self.assertEqual(self.session.stats['reused_connections'], 1)
+
+
+class TestMultiEndpointMonitor(unittest.TestCase):
+    """Test cases for the asyncio multi-endpoint probe engine."""
+    
+    def setUp(self):
+        """Set up test fixtures."""
+        self.endpoints = [
+            Endpoint('https://healthy.example.com', interval=0.01, timeout=1),
+            Endpoint('https://failing.example.com', interval=0.01, timeout=1),
+        ]
+        patcher = patch('monitor.boto3.client')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.monitor = MultiEndpointMonitor(self.endpoints, max_in_flight=2)
+    
+    def _run_for(self, seconds):
+        """Run the event loop for a bounded amount of time."""
+        async def runner():
+            task = asyncio.ensure_future(self.monitor._run_async())
+            await asyncio.sleep(seconds)
+            self.monitor._request_stop()
+            await task
+        asyncio.run(runner())
+    
+    def test_logs_each_endpoint_and_shared_settings_once(self):
+        """Test that the startup log lists every endpoint and the shared settings once."""
+        with self.assertLogs('monitor', level='INFO') as logs:
+            MultiEndpointMonitor(self.endpoints, max_in_flight=2)
+        
+        output = '\n'.join(logs.output)
+        self.assertIn('initialized for 2 endpoint(s)', output)
+        self.assertIn('https://failing.example.com (interval: 0.01s, timeout: 1s)', output)
+        self.assertEqual(output.count('AWS Region:'), 1)
+        self.assertNotIn('Check interval:', output)
+    
+    def test_requires_endpoints(self):
+        """Test that at least one endpoint must be given."""
+        with self.assertRaises(ValueError):
+            MultiEndpointMonitor([])
+    
+    def test_endpoint_without_threshold_uses_policy(self):
+        """Test that only endpoints with their own failure threshold override the health policy's."""
+        self.monitor.health_policy = HealthPolicy(failure_threshold=4)
+        
+        self.assertEqual(self.monitor._create_evaluator(Endpoint('https://a.example.com')).describe(),
+                         '4 consecutive failures')
+        self.assertEqual(self.monitor._create_evaluator(Endpoint('https://b.example.com', failure_threshold=3)).describe(),
+                         '3 consecutive failures')
+    
+    def test_per_endpoint_failure_state(self):
+        """Test that each endpoint keeps its own failure counter and triggers remediation."""
+        self.monitor.check_endpoint_health = Mock(side_effect=lambda url, timeout: 'healthy' in url)
+        self.monitor.restart_web_servers = Mock()
+        
+        self._run_for(0.2)
+        self.monitor.wait_for_remediation()
+        
+        self.assertEqual(self.endpoints[0].consecutive_failures, 0)
+        self.assertTrue(self.monitor.restart_web_servers.called)
+        probed = {call.args[0] for call in self.monitor.check_endpoint_health.call_args_list}
+        self.assertEqual(probed, {'https://healthy.example.com', 'https://failing.example.com'})
+    
+    def test_max_in_flight_limit(self):
+        """Test that no more than max_in_flight probes run at once."""
+        self.monitor.endpoints = [Endpoint(f'https://host{i}.example.com', interval=0.01) for i in range(6)]
+        lock = threading.Lock()
+        state = {'current': 0, 'peak': 0}
+        
+        def slow_probe(url, timeout):
+            with lock:
+                state['current'] += 1
+                state['peak'] = max(state['peak'], state['current'])
+            time.sleep(0.02)
+            with lock:
+                state['current'] -= 1
+            return True
+        
+        self.monitor.check_endpoint_health = slow_probe
+        self._run_for(0.2)
+        
+        self.assertEqual(state['peak'], 2)
+    
+    @patch('monitor.requests.Session.get')
+    def test_check_endpoint_health_uses_given_url_and_timeout(self, mock_get):
+        """Test that probes use the endpoint's own URL and timeout."""
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.iter_content.return_value = [b"Deployed via SSM Document"]
+        mock_get.return_value = mock_response
+        
+        self.assertTrue(self.monitor.check_endpoint_health('https://other.example.com', 3))
+        mock_get.assert_called_once_with('https://other.example.com', timeout=3, verify=False, stream=True)
 
+    
+    def test_endpoint_settings_used_for_probes(self):
+        """Test that each endpoint's own expected content and failure threshold apply."""
+        self.endpoints[1].failure_threshold = 3
+        self.endpoints[1].content_matcher = ContentMatcher(['api ok'])
+        self.assertIs(self.monitor._content_matcher_for('https://failing.example.com'), self.endpoints[1].content_matcher)
+        self.assertIs(self.monitor._content_matcher_for('https://healthy.example.com'), self.monitor.content_matcher)
+        
+        self.monitor.check_endpoint_health = Mock(return_value=False)
+        self.monitor._trigger_remediation = Mock()
+        self._run_for(0.1)
+        
+        triggered = [call.args[0] for call in self.monitor._trigger_remediation.call_args_list]
+        self.assertLess(triggered.count('https://failing.example.com'), triggered.count('https://healthy.example.com'))
+    
+    def test_reload_config_applies_changes_while_running(self):
+        """Test that a reload adds, removes and updates endpoints without stopping the others."""
+        self.endpoints[0].consecutive_failures = 1
+        self.monitor.check_endpoint_health = Mock(side_effect=lambda url, timeout: 'failing' not in url)
+        self.monitor.config_loader = lambda: [
+            Endpoint('https://healthy.example.com', interval=0.02, timeout=2),
+            Endpoint('https://added.example.com', interval=0.01, timeout=1),
+        ]
+        
+        async def runner():
+            task = asyncio.ensure_future(self.monitor._run_async())
+            await asyncio.sleep(0.05)
+            self.assertTrue(self.monitor.reload_config())
+            self.monitor.check_endpoint_health.reset_mock()
+            await asyncio.sleep(0.1)
+            self.monitor._request_stop()
+            await task
+        asyncio.run(runner())
+        
+        probed = {call.args[0] for call in self.monitor.check_endpoint_health.call_args_list}
+        self.assertEqual(probed, {'https://healthy.example.com', 'https://added.example.com'})
+        self.assertFalse(self.endpoints[1].active)
+        # The kept endpoint is updated in place
+        self.assertIs(self.monitor.endpoints[0], self.endpoints[0])
+        self.assertEqual((self.endpoints[0].interval, self.endpoints[0].timeout), (0.02, 2))
+    
+    def test_failed_reload_keeps_current_endpoints(self):
+        """Test that an invalid config file leaves the running checks alone."""
+        self.monitor.config_loader = Mock(side_effect=ValueError('bad config'))
+        self.assertFalse(self.monitor.reload_config())
+        self.assertEqual(self.monitor.endpoints, self.endpoints)
+    
+    def test_check_once_probes_every_endpoint(self):
+        """Test that a one-shot check probes each endpoint once and fails if any is unhealthy."""
+        self.monitor.check_endpoint_health = Mock(side_effect=lambda url, timeout: 'healthy' in url)
+        
+        self.assertFalse(self.monitor.check_once())
+        
+        probed = sorted(call.args[0] for call in self.monitor.check_endpoint_health.call_args_list)
+        self.assertEqual(probed, ['https://failing.example.com', 'https://healthy.example.com'])
 
 class TestMonitorScript(unittest.TestCase):
     """Test the monitor script functionality."""
@@ -142,9 +1119,177 @@ class TestMonitorScript(unittest.TestCase):
         except SystemExit:
             pass  # main() calls sys.exit() on completion
         
-        mock_monitor_class.assert_called_once_with('https://test.example.com', 10)
+        mock_monitor_class.assert_called_once_with(
+            'https://test.example.com', 10, timeout=30,
+            restart_batch_size=None, inventory_ttl=300, instance_events_file=None,
+            remediation_scope='fleet', target_group_arn=None, content_matcher=ANY,
+            recheck_interval=None, max_interval=None, jitter=0.1,
+            history_file=None, history_size=100000, cluster=None,
+            remediation_workers=2, restart_guard=ANY, remediation_ladder=ANY, locations=None,
+            health_policy=HealthPolicy(), log_config=LogConfig(), deep_probe=False, deep_probe_concurrency=20,
+            node_probe=False, dns_cache_ttl=60, paths=None
+        )
+        content_matcher = mock_monitor_class.call_args.kwargs['content_matcher']
+        self.assertEqual(content_matcher.markers, [b'Deployed via SSM Document'])
         mock_monitor.run.assert_called_once()
     
+    @patch('monitor.MultiEndpointMonitor')
+    def test_main_with_config_file(self, mock_monitor_class):
+        """Test that --config builds one monitor for every check, with options from the file."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'checks.yaml')
+            with open(path, 'w') as f:
+                f.write("monitor:\n  max_in_flight: 7\n  remediation_scope: targets\n"
+                        "checks:\n  - https://a.example.com\n  - url: https://b.example.com\n    interval: 30\n")
+            
+            from monitor import main
+            with patch('sys.argv', ['monitor.py', '--config', path, '--remediation-scope', 'fleet']):
+                main()
+        
+        endpoints = mock_monitor_class.call_args.args[0]
+        self.assertEqual([(e.url, e.interval) for e in endpoints], [('https://a.example.com', 10), ('https://b.example.com', 30)])
+        kwargs = mock_monitor_class.call_args.kwargs
+        self.assertEqual(kwargs['max_in_flight'], 7)
+        # The command line wins over the config file
+        self.assertEqual(kwargs['remediation_scope'], 'fleet')
+        self.assertIsNotNone(kwargs['config_loader'])
+        mock_monitor_class.return_value.run.assert_called_once()
+    
+    @patch('monitor.MultiEndpointMonitor')
+    def test_main_config_reload_warns_once_per_options_change(self, mock_monitor_class):
+        """Test that a reload only warns about monitor options that changed since the last load."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'checks.yaml')
+            with open(path, 'w') as f:
+                f.write("monitor:\n  max_in_flight: 7\nchecks:\n  - https://a.example.com\n")
+            
+            from monitor import main
+            with patch('sys.argv', ['monitor.py', '--config', path]):
+                main()
+            reload_endpoints = mock_monitor_class.call_args.kwargs['config_loader']
+            warning = mock_monitor_class.return_value.logger.warning
+            
+            reload_endpoints()
+            self.assertEqual(warning.call_count, 0)
+            with open(path, 'w') as f:
+                f.write("monitor:\n  max_in_flight: 9\nchecks:\n  - https://a.example.com\n")
+            reload_endpoints()
+            reload_endpoints()
+            self.assertEqual(warning.call_count, 1)
+    
+    @patch('monitor.MultiEndpointMonitor')
+    def test_main_config_file_check_options(self, mock_monitor_class):
+        """Test that check settings among the monitor options and flags apply to every check that does not set its own."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'checks.yaml')
+            with open(path, 'w') as f:
+                f.write("defaults:\n  interval: 20\n  timeout: 15\n"
+                        "monitor:\n  failure_threshold: 4\n  interval: 60\n"
+                        "checks:\n  - https://a.example.com\n  - url: https://b.example.com\n    interval: 30\n")
+            
+            from monitor import main
+            with patch('sys.argv', ['monitor.py', '--config', path, '--timeout', '5', '--expect', 'Hello']):
+                main()
+        
+        endpoints = mock_monitor_class.call_args.args[0]
+        self.assertEqual([(e.interval, e.timeout, e.failure_threshold) for e in endpoints], [(60, 5, 4), (30, 5, 4)])
+        self.assertEqual(endpoints[0].content_matcher.markers, [b'Hello'])
+        self.assertEqual(mock_monitor_class.call_args.kwargs['health_policy'].failure_threshold, 4)
+    
+    @patch('monitor.HealthMonitor')
+    @patch('sys.argv', ['monitor.py', '--once', 'https://test.example.com'])
+    def test_main_once_exits_with_health_status(self, mock_monitor_class):
+        """Test that --once exits 0 when healthy and 1 when not, without running the loop."""
+        from monitor import main
+        for healthy, status in ((True, 0), (False, 1)):
+            mock_monitor_class.return_value.check_once.return_value = healthy
+            with self.assertRaises(SystemExit) as raised:
+                main()
+            self.assertEqual(raised.exception.code, status)
+        mock_monitor_class.return_value.run.assert_not_called()
+    
+    def test_import_does_not_load_boto3(self):
+        """Test that importing the monitor leaves boto3 to be imported on first use."""
+        result = subprocess.run(
+            [sys.executable, '-c', "import sys, monitor; sys.exit('boto3' in sys.modules)"],
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        )
+        self.assertEqual(result.returncode, 0)
+    
+    def test_validate_content_check_script(self):
+        """Test that the content check validation script still runs against the current probe session."""
+        directory = os.path.dirname(os.path.abspath(__file__))
+        # A subprocess, since the script replaces boto3 and ProbeSession.get for the whole interpreter
+        result = subprocess.run(
+            [sys.executable, os.path.join(directory, 'validate_content_check.py')],
+            cwd=directory, capture_output=True, text=True
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+    
+    @patch('monitor.HealthMonitor')
+    @patch('sys.argv', ['monitor.py', 'https://test.example.com', '--regions', 'us-east-1,eu-west-1',
+                        '--assume-role', 'arn:aws:iam::111111111111:role/monitor'])
+    def test_main_with_regions_and_roles(self, mock_monitor_class):
+        """Test that --regions and --assume-role give the monitor every region in every account."""
+        from monitor import main
+        main()
+        
+        locations = mock_monitor_class.call_args.kwargs['locations']
+        self.assertEqual([str(location) for location in locations], ['111111111111/us-east-1', '111111111111/eu-west-1'])
+    
+    @patch('monitor.HealthMonitor')
+    @patch('sys.argv', ['monitor.py', 'https://test.example.com', '--failure-ratio', '0.3', '--window', '30',
+                        '--latency-slo', '0.8', '--ewma-threshold', '0.5'])
+    def test_main_with_health_policy(self, mock_monitor_class):
+        """Test that the health scoring options build the monitor's health policy."""
+        from monitor import main
+        main()
+        
+        policy = mock_monitor_class.call_args.kwargs['health_policy']
+        self.assertEqual(policy, HealthPolicy(failure_ratio=0.3, window=30, latency_slo=0.8, ewma_threshold=0.5))
+    
+    @patch('monitor.HealthMonitor')
+    @patch('sys.argv', ['monitor.py', 'https://test.example.com', '--log-format', 'json', '--log-file', '',
+                        '--log-rotate-when', 'midnight', '--log-sample', '10'])
+    def test_main_with_logging_options(self, mock_monitor_class):
+        """Test that the logging options build the monitor's log configuration."""
+        from monitor import main
+        main()
+        
+        log_config = mock_monitor_class.call_args.kwargs['log_config']
+        self.assertEqual(log_config, LogConfig(path=None, format='json', rotate_when='midnight', sample_rate=10))
+    
+    @patch('sys.argv', ['monitor.py', 'https://test.example.com', '--failure-ratio', '1.5'])
+    def test_main_with_invalid_health_policy(self):
+        """Test that an impossible failure ratio is rejected at startup."""
+        from monitor import main
+        with self.assertRaises(SystemExit) as cm:
+            main()
+        self.assertEqual(cm.exception.code, 1)
+    
+    @patch('sys.argv', ['monitor.py', 'https://test.example.com', '--remediation-steps', 'stop-start,replace'])
+    def test_main_replace_without_target_group(self):
+        """Test that the replace step is rejected at startup without a target group."""
+        from monitor import main
+        with self.assertRaises(SystemExit) as cm:
+            main()
+        self.assertEqual(cm.exception.code, 1)
+    
+    @patch('sys.argv', ['monitor.py', 'https://test.example.com', '--path', 'static/app.css'])
+    def test_main_with_invalid_path(self):
+        """Test that a path that is not absolute is rejected at startup."""
+        from monitor import main
+        with self.assertRaises(SystemExit) as cm:
+            main()
+        self.assertEqual(cm.exception.code, 1)
+    
+    def test_main_requires_endpoint_or_config(self):
+        """Test that main exits without any endpoint or config file."""
+        from monitor import main
+        with patch('sys.argv', ['monitor.py']):
+            with self.assertRaises(SystemExit):
+                main()
+    
     @patch('sys.argv', ['monitor.py', 'invalid-url'])
     def test_main_with_invalid_endpoint(self):
         """Test main function with invalid endpoint."""
@@ -154,6 +1299,45 @@ class TestMonitorScript(unittest.TestCase):
             main()
         
         self.assertEqual(cm.exception.code, 1)
+    
+    @patch('monitor.HealthMonitor')
+    @patch('sys.argv', ['monitor.py', 'https://test.example.com', '--expect-regex', 'build-[0-9]+', '--max-body-bytes', '4096'])
+    def test_main_with_expected_regex(self, mock_monitor_class):
+        """Test that a regex on its own replaces the default marker."""
+        from monitor import main
+        
+        main()
+        
+        content_matcher = mock_monitor_class.call_args.kwargs['content_matcher']
+        self.assertEqual(content_matcher.markers, [])
+        self.assertEqual(content_matcher.patterns[0].pattern, b'build-[0-9]+')
+        self.assertEqual(content_matcher.max_bytes, 4096)
+    
+    @patch('monitor.MultiEndpointMonitor')
+    @patch('sys.argv', ['monitor.py', 'https://a.example.com', 'https://b.example.com', '--max-in-flight', '5'])
+    def test_main_with_multiple_endpoints(self, mock_monitor_class):
+        """Test main function with multiple endpoints uses the multi-endpoint engine."""
+        from monitor import main
+        
+        main()
+        
+        endpoints = mock_monitor_class.call_args.args[0]
+        self.assertEqual([endpoint.url for endpoint in endpoints], ['https://a.example.com', 'https://b.example.com'])
+        self.assertEqual(mock_monitor_class.call_args.kwargs['max_in_flight'], 5)
+        # The health policy's threshold applies unless one is given
+        self.assertEqual([endpoint.failure_threshold for endpoint in endpoints], [None, None])
+        mock_monitor_class.return_value.run.assert_called_once()
+    
+    @patch('monitor.MultiEndpointMonitor')
+    @patch('sys.argv', ['monitor.py', 'https://a.example.com', 'https://b.example.com', '--failure-threshold', '4'])
+    def test_main_with_multiple_endpoints_and_threshold(self, mock_monitor_class):
+        """Test that an explicit --failure-threshold is given to every endpoint."""
+        from monitor import main
+        
+        main()
+        
+        endpoints = mock_monitor_class.call_args.args[0]
+        self.assertEqual([endpoint.failure_threshold for endpoint in endpoints], [4, 4])
 
 
 def run_integration_test():
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Tests for HTTP/2 multi-path probing.
+"""
+
+import importlib.util
+import os
+import sys
+import unittest
+
+# Add the monitor directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from local_standins import HEALTHY_PAGE
+from pathprobe import PathCheck, PathProber, PathResult, PathRound
+
+HAS_HTTP2 = importlib.util.find_spec('httpx') is not None and importlib.util.find_spec('h2') is not None
+
+
+class TestPathCheck(unittest.TestCase):
+    """Test cases for PathCheck."""
+
+    def test_parse(self):
+        check = PathCheck.parse('/api/health="ok"')
+        self.assertEqual(check.path, '/api/health')
+        self.assertEqual(check.content_matcher.markers, [b'"ok"'])
+        self.assertIsNone(PathCheck.parse('/static/app.css').content_matcher)
+
+    def test_parse_query_string(self):
+        check = PathCheck.parse('/search?q=x')
+        self.assertEqual(check.path, '/search?q=x')
+        self.assertIsNone(check.content_matcher)
+
+        check = PathCheck.parse('/search?q=x&debug&page=2=a=b&c')
+        self.assertEqual(check.path, '/search?q=x&debug&page=2')
+        self.assertEqual(check.content_matcher.markers, [b'a=b&c'])
+
+    def test_path_must_be_absolute(self):
+        with self.assertRaises(ValueError):
+            PathCheck.parse('static/app.css')
+
+    def test_round_healthy_only_if_every_path_is(self):
+        results = {'/': PathResult('/', healthy=True), '/api': PathResult('/api', healthy=False)}
+        self.assertFalse(PathRound(results, duration=0.1).healthy)
+        self.assertTrue(PathRound({'/': results['/']}, duration=0.1).healthy)
+
+
+@unittest.skipUnless(HAS_HTTP2, "httpx and h2 are not installed")
+class TestPathProber(unittest.TestCase):
+    """Test cases for PathProber against a local HTTP/2 server."""
+
+    def setUp(self):
+        from local_standins import H2StandInServer
+
+        pages = {
+            '/': (200, HEALTHY_PAGE.encode()),
+            '/static/app.css': (200, b'body { margin: 0 }'),
+            '/api/health': (503, b'{"status": "down"}'),
+        }
+        try:
+            self.server = H2StandInServer(pages, delay=0.2)
+        except RuntimeError as e:
+            self.skipTest(str(e))
+        self.addCleanup(self.server.stop)
+        checks = [PathCheck.parse(spec) for spec in ('/=Deployed via SSM Document', '/static/app.css=margin',
+                                                      '/api/health', '/missing-asset.js')]
+        self.prober = PathProber(self.server.url, checks, timeout=5, host='www.example.com')
+        self.addCleanup(self.prober.close)
+
+    def test_paths_multiplexed_over_one_connection(self):
+        """Test that every path of every round shares one connection, with all streams in flight at once."""
+        first = self.prober.probe()
+        second = self.prober.probe()
+
+        self.assertEqual((first.new_connections, first.tls_handshakes), (1, 1))
+        self.assertEqual((second.new_connections, second.tls_handshakes), (0, 0))
+        self.assertEqual(self.server.connections, 1)
+        self.assertEqual(self.server.max_concurrent_streams, 4)
+        # Four 0.2s responses in parallel, not one after another
+        self.assertLess(second.duration, 0.6)
+
+    def test_per_path_results(self):
+        results = self.prober.probe().results
+
+        self.assertTrue(results['/'].healthy)
+        self.assertTrue(results['/static/app.css'].healthy)
+        self.assertEqual((results['/api/health'].status, results['/api/health'].failure), (503, 'status'))
+        self.assertEqual(results['/missing-asset.js'].status, 404)
+        self.assertEqual({result.http_version for result in results.values()}, {'HTTP/2'})
+        self.assertTrue(all(result.latency >= 0.2 for result in results.values()))
+        self.assertEqual(set(self.server.authorities), {'www.example.com'})
+
+    def test_unreachable_host(self):
+        self.server.stop()
+        prober = PathProber(self.server.url, [PathCheck('/')], timeout=1)
+        self.addCleanup(prober.close)
+        result = prober.probe().results['/']
+        self.assertFalse(result.healthy)
+        self.assertIn(result.failure, ('refused', 'unreachable'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Tests for restart rate limiting.
+"""
+
+import os
+import sys
+import unittest
+
+# Add the monitor directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from ratelimit import CircuitBreaker, RestartGuard, TokenBucket
+
+
+class FakeClock:
+    """Clock that only moves when told to."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+class TestTokenBucket(unittest.TestCase):
+    """Test cases for TokenBucket."""
+
+    def test_refills_over_time(self):
+        clock = FakeClock()
+        bucket = TokenBucket(2, refill_interval=60, clock=clock)
+
+        self.assertTrue(bucket.try_take())
+        self.assertTrue(bucket.try_take())
+        self.assertFalse(bucket.try_take())
+
+        clock.advance(60)
+        self.assertTrue(bucket.try_take())
+        self.assertFalse(bucket.try_take())
+
+        # Never refills beyond capacity
+        clock.advance(3600)
+        self.assertEqual(bucket.available(), 2)
+
+    def test_rejects_empty_bucket(self):
+        with self.assertRaises(ValueError):
+            TokenBucket(0, refill_interval=60)
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    """Test cases for CircuitBreaker."""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker(threshold=2, reset_timeout=100, clock=self.clock)
+
+    def test_opens_after_threshold_and_allows_one_trial(self):
+        self.breaker.record_failure()
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(self.breaker.allow())
+        self.assertEqual(self.breaker.retry_in(), 100)
+
+        self.clock.advance(100)
+        self.assertEqual(self.breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertTrue(self.breaker.allow())
+        self.assertFalse(self.breaker.allow())
+
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_failed_trial_reopens(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.clock.advance(100)
+        self.assertTrue(self.breaker.allow())
+
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.assertEqual(self.breaker.retry_in(), 100)
+
+
+class TestRestartGuard(unittest.TestCase):
+    """Test cases for RestartGuard."""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.guard = RestartGuard(max_restart_attempts=2, restart_cooldown=60, max_restarts_per_hour=3,
+                                  breaker_threshold=2, breaker_reset=600, clock=self.clock)
+
+    def test_remediation_cooldown(self):
+        self.assertIsNone(self.guard.remediation_blocked())
+        self.guard.record_remediation_finished()
+        self.assertIn('cooldown', self.guard.remediation_blocked())
+
+        self.clock.advance(60)
+        self.assertIsNone(self.guard.remediation_blocked())
+
+    def test_instance_cooldown_and_attempt_limit(self):
+        self.assertEqual(self.guard.admit(['i-1'])[0], ['i-1'])
+        self.guard.record_restart(['i-1'], success=True)
+
+        allowed, refused = self.guard.admit(['i-1'])
+        self.assertEqual(allowed, [])
+        self.assertIn('cooldown', refused['i-1'])
+
+        self.clock.advance(60)
+        self.assertEqual(self.guard.admit(['i-1'])[0], ['i-1'])
+        self.guard.record_restart(['i-1'], success=True)
+
+        # Two attempts per hour are used up, even after the cooldown
+        self.clock.advance(60)
+        allowed, refused = self.guard.admit(['i-1'])
+        self.assertEqual(allowed, [])
+        self.assertIn('attempts per hour', refused['i-1'])
+
+    def test_fleet_limit(self):
+        allowed, refused = self.guard.admit(['i-1', 'i-2', 'i-3', 'i-4'])
+
+        self.assertEqual(allowed, ['i-1', 'i-2', 'i-3'])
+        self.assertIn('fleet limit', refused['i-4'])
+
+    def test_cancelled_restart_returns_its_tokens(self):
+        allowed, _ = self.guard.admit(['i-1', 'i-2', 'i-3'])
+        self.guard.cancel(allowed)
+
+        self.assertEqual(self.guard.admit(['i-4', 'i-5', 'i-6'])[0], ['i-4', 'i-5', 'i-6'])
+
+    def test_breaker_stops_restarts_then_lets_one_trial_through(self):
+        self.guard.record_restart(['i-1'], success=False)
+        self.guard.record_restart(['i-2'], success=False)
+
+        self.assertIn('circuit breaker', self.guard.remediation_blocked())
+        allowed, refused = self.guard.admit(['i-3'])
+        self.assertEqual((allowed, refused), ([], {'i-3': 'circuit breaker open'}))
+
+        self.clock.advance(600)
+        self.assertIsNone(self.guard.remediation_blocked())
+        allowed, refused = self.guard.admit(['i-3', 'i-4'])
+        self.assertEqual(allowed, ['i-3'])
+        self.assertIn('trial', refused['i-4'])
+
+        self.guard.record_restart(allowed, success=True)
+        self.assertEqual(self.guard.admit(['i-4'])[0], ['i-4'])
+
+
+if __name__ == '__main__':
+    unittest.main()
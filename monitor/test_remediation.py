@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Tests for the remediation job queue.
+"""
+
+import os
+import sys
+import threading
+import unittest
+
+# Add the monitor directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from remediation import RemediationPool
+
+
+class TestRemediationPool(unittest.TestCase):
+    """Test cases for RemediationPool."""
+
+    def setUp(self):
+        self.release = threading.Event()
+        self.started = []
+        self.changes = []
+
+        def handler(job):
+            self.started.append(job.source)
+            self.release.wait(5)
+            job.restarted = 1
+
+        self.pool = RemediationPool(handler, workers=1, listener=lambda job: self.changes.append((job.job_id, job.state)))
+
+    def tearDown(self):
+        self.release.set()
+        self.pool.shutdown()
+
+    def test_one_active_job_per_endpoint(self):
+        first = self.pool.submit('https://a.example.com')
+        self.assertIsNone(self.pool.submit('https://a.example.com'))
+        self.assertIsNotNone(self.pool.submit('https://b.example.com'))
+
+        self.release.set()
+        self.assertTrue(self.pool.join(timeout=5))
+        self.assertEqual(first.state, 'succeeded')
+        self.assertEqual(self.started, ['https://a.example.com', 'https://b.example.com'])
+        # A new job can be queued once the previous one finished
+        self.assertIsNotNone(self.pool.submit('https://a.example.com'))
+
+    def test_cancelled_queued_job_never_runs(self):
+        self.pool.submit('https://a.example.com')
+        queued = self.pool.submit('https://b.example.com')
+
+        self.assertEqual(self.pool.cancel('https://b.example.com'), [queued])
+        self.release.set()
+        self.pool.join(timeout=5)
+
+        self.assertEqual(queued.state, 'cancelled')
+        self.assertEqual(self.started, ['https://a.example.com'])
+        self.assertIn((queued.job_id, 'cancelled'), self.changes)
+
+    def test_cancelled_running_job_is_reported_cancelled(self):
+        running = self.pool.submit('https://a.example.com')
+        while running.state != 'running':
+            threading.Event().wait(0.01)
+
+        self.pool.cancel('https://a.example.com')
+        self.assertTrue(running.cancel_requested.is_set())
+        self.release.set()
+        self.pool.join(timeout=5)
+
+        self.assertEqual(running.state, 'cancelled')
+        self.assertEqual(self.pool.status()['finished'][0]['restarted'], 1)
+
+    def test_shutdown_does_not_wait_beyond_timeout(self):
+        running = self.pool.submit('https://a.example.com')
+        queued = self.pool.submit('https://b.example.com')
+        while running.state != 'running':
+            threading.Event().wait(0.01)
+
+        with self.assertLogs('remediation', level='WARNING') as logs:
+            self.assertEqual(self.pool.shutdown(timeout=0.05), [running])
+
+        self.assertTrue(running.cancel_requested.is_set())
+        self.assertEqual(queued.state, 'cancelled')
+        self.assertIn('still running at shutdown', logs.output[0])
+        self.release.set()
+        self.assertTrue(self.pool.join(timeout=5))
+        self.assertEqual(running.state, 'cancelled')
+
+    def test_instance_claims_are_exclusive_until_job_finishes(self):
+        first = self.pool.submit('https://a.example.com')
+        second = self.pool.submit('https://b.example.com')
+
+        self.assertEqual(self.pool.claim(first, ['i-1', 'i-2']), ['i-1', 'i-2'])
+        self.assertEqual(self.pool.claim(second, ['i-2', 'i-3']), ['i-3'])
+
+        self.pool.cancel('https://b.example.com')
+        self.release.set()
+        self.pool.join(timeout=5)
+        third = self.pool.submit('https://c.example.com')
+        self.assertEqual(self.pool.claim(third, ['i-1', 'i-2', 'i-3']), ['i-1', 'i-2', 'i-3'])
+
+    def test_restart_slots_limit_concurrent_restarts(self):
+        first = self.pool.submit('https://a.example.com')
+        second = self.pool.submit('https://b.example.com')
+        self.assertTrue(self.pool.acquire_restart_slots(first, 2, limit=3))
+
+        acquired = []
+        waiter = threading.Thread(target=lambda: acquired.append(self.pool.acquire_restart_slots(second, 2, limit=3)))
+        waiter.start()
+        waiter.join(timeout=0.1)
+        self.assertEqual(acquired, [])
+
+        self.pool.release_restart_slots(2)
+        waiter.join(timeout=5)
+        self.assertEqual(acquired, [True])
+
+    def test_cancel_wakes_job_waiting_for_slots(self):
+        first = self.pool.submit('https://a.example.com')
+        second = self.pool.submit('https://b.example.com')
+        self.pool.acquire_restart_slots(first, 1, limit=1)
+
+        acquired = []
+        waiter = threading.Thread(target=lambda: acquired.append(self.pool.acquire_restart_slots(second, 1, limit=1)))
+        waiter.start()
+        self.pool.cancel('https://b.example.com')
+        waiter.join(timeout=5)
+
+        self.assertEqual(acquired, [False])
+        self.pool.release_restart_slots(1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Tests for surge replacement of failed instances.
+"""
+
+import os
+import sys
+import unittest
+
+# Add the monitor directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from inventory import InstanceInventory
+from local_standins import FakeEC2Client, FakeELBv2Client
+from replacement import REPLACEMENT_TAG, InstanceReplacer, launch_parameters
+
+TARGET_GROUP_ARN = 'arn:aws:elasticloadbalancing:us-east-1:123456789012:targetgroup/web/0123456789abcdef'
+
+
+class TestLaunchParameters(unittest.TestCase):
+    """Test cases for launch_parameters."""
+
+    def setUp(self):
+        self.instance = {
+            'instance_id': 'i-1', 'image_id': 'ami-1', 'instance_type': 't3.micro', 'subnet_id': 'subnet-1',
+            'security_group_ids': ['sg-1', 'sg-2'], 'iam_instance_profile': 'arn:aws:iam::1:instance-profile/web',
+            'key_name': None, 'tags': {'Role': 'web-server', 'aws:autoscaling:groupName': 'web'},
+        }
+
+    def test_reproduces_launch_configuration(self):
+        """Test that the replacement gets the instance's AMI, network, profile and tags."""
+        parameters = launch_parameters(self.instance)
+
+        self.assertEqual(parameters['ImageId'], 'ami-1')
+        self.assertEqual(parameters['SubnetId'], 'subnet-1')
+        self.assertEqual(parameters['SecurityGroupIds'], ['sg-1', 'sg-2'])
+        self.assertEqual(parameters['IamInstanceProfile'], {'Arn': 'arn:aws:iam::1:instance-profile/web'})
+        self.assertNotIn('KeyName', parameters)
+        self.assertEqual((parameters['MinCount'], parameters['MaxCount']), (1, 1))
+        # Reserved aws: tags cannot be set
+        tags = parameters['TagSpecifications'][0]['Tags']
+        self.assertEqual(tags, [{'Key': 'Role', 'Value': 'web-server'}, {'Key': REPLACEMENT_TAG, 'Value': 'i-1'}])
+
+    def test_missing_launch_configuration(self):
+        """Test that an instance without an AMI cannot be replaced."""
+        self.instance['image_id'] = None
+        with self.assertRaises(ValueError):
+            launch_parameters(self.instance)
+
+
+class TestInstanceReplacer(unittest.TestCase):
+    """Test cases for InstanceReplacer against the fake EC2 fleet and target group."""
+
+    def setUp(self):
+        self.ec2_client = FakeEC2Client(2, transition_delay=0.02)
+        self.elbv2_client = FakeELBv2Client(['i-00000000000000000', 'i-00000000000000001'])
+        self.instances = {
+            instance['instance_id']: instance
+            for instance in InstanceInventory(self.ec2_client).instances()
+        }
+        self.probed = []
+
+    def _replacer(self, probe=None, **kwargs) -> InstanceReplacer:
+        def record_probe(instance):
+            self.probed.append(instance)
+            return probe(instance) if probe else True
+        return InstanceReplacer(self.ec2_client, self.elbv2_client, TARGET_GROUP_ARN, record_probe,
+                                timeout=1.0, poll_interval=0.01, **kwargs)
+
+    def test_replace_launches_before_terminating(self):
+        """Test that the failed instance is only retired once its replacement serves traffic."""
+        result = self._replacer().replace(self.instances['i-00000000000000000'])
+
+        self.assertTrue(result.replaced, result.error)
+        self.assertEqual(result.stage, 'terminate')
+        new_id = result.replacement_id
+        self.assertEqual(self.ec2_client.state_of(new_id), 'running')
+        self.assertLess(self.ec2_client.calls.index('run_instances'), self.ec2_client.calls.index('terminate_instances'))
+        self.assertLess(self.elbv2_client.calls.index('register_targets'),
+                        self.elbv2_client.calls.index('deregister_targets'))
+        # Probed on its own address before registration
+        self.assertEqual(self.probed[0]['instance_id'], new_id)
+        self.assertTrue(self.probed[0]['private_ip'])
+        self.assertEqual(self.elbv2_client._state(new_id), 'healthy')
+        self.assertEqual(self.elbv2_client._state('i-00000000000000000'), 'unused')
+        self.assertIn(self.ec2_client.state_of('i-00000000000000000'), ('shutting-down', 'terminated'))
+        self.assertEqual(self.ec2_client.launches[0]['ImageId'], 'ami-0123456789abcdef0')
+
+    def test_unhealthy_replacement_is_discarded(self):
+        """Test that a replacement failing its probe is terminated and the failed instance kept."""
+        result = self._replacer(probe=lambda instance: False).replace(self.instances['i-00000000000000000'])
+
+        self.assertFalse(result.replaced)
+        self.assertEqual(result.stage, 'healthy')
+        self.assertIn('health check', result.error)
+        self.assertIn(self.ec2_client.state_of(result.replacement_id), ('shutting-down', 'terminated'))
+        self.assertEqual(self.ec2_client.state_of('i-00000000000000000'), 'running')
+        self.assertNotIn('register_targets', self.elbv2_client.calls)
+
+    def test_replacement_failing_target_health_is_deregistered(self):
+        """Test that a replacement the target group never finds healthy is deregistered and terminated."""
+        def fail_in_target_group(instance):
+            self.elbv2_client.failing.add(instance['instance_id'])
+            return True
+        result = self._replacer(probe=fail_in_target_group).replace(self.instances['i-00000000000000000'])
+
+        self.assertFalse(result.replaced)
+        self.assertEqual(result.stage, 'register')
+        self.assertEqual(self.elbv2_client.calls.count('deregister_targets'), 1)
+        self.assertEqual(self.elbv2_client._state('i-00000000000000000'), 'healthy')
+        self.assertIn(self.ec2_client.state_of(result.replacement_id), ('shutting-down', 'terminated'))
+
+    def test_drain_timeout_terminates_anyway(self):
+        """Test that a failed instance still draining at the drain timeout is terminated."""
+        self.elbv2_client.drain_delay = 60.0
+        result = self._replacer(drain_timeout=0.05).replace(self.instances['i-00000000000000001'])
+
+        self.assertTrue(result.replaced)
+        self.assertIn('terminate_instances', self.ec2_client.calls)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Tests for adaptive probe scheduling.
+"""
+
+import os
+import random
+import sys
+import unittest
+
+# Add the monitor directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from scheduler import ProbeScheduler
+
+
+class TestProbeScheduler(unittest.TestCase):
+    """Test cases for ProbeScheduler."""
+
+    def test_fast_recheck_after_failure(self):
+        """Test that a failure is re-checked well before a full interval."""
+        scheduler = ProbeScheduler(20, jitter=0)
+
+        self.assertEqual(scheduler.next_delay(False, probe_started=100.0, now=100.0), 5.0)
+
+    def test_recheck_never_exceeds_interval(self):
+        """Test that short intervals are not slowed down by the minimum re-check."""
+        self.assertEqual(ProbeScheduler(0.5, jitter=0).recheck_interval, 0.5)
+        self.assertEqual(ProbeScheduler(2, jitter=0).recheck_interval, 1.0)
+
+    def test_backs_off_when_stable_and_resets_on_failure(self):
+        """Test that the delay grows while stable, is capped, and resets after a failure."""
+        scheduler = ProbeScheduler(10, max_interval=20, stable_after=2, backoff_factor=2, jitter=0)
+
+        delays = [scheduler.record(True) for _ in range(5)]
+        self.assertEqual(delays, [10, 10, 20, 20, 20])
+
+        self.assertEqual(scheduler.record(False), scheduler.recheck_interval)
+        self.assertEqual(scheduler.record(True), 10)
+
+    def test_no_backoff_by_default(self):
+        """Test that a stable endpoint keeps its interval unless a longer one is allowed."""
+        scheduler = ProbeScheduler(10, stable_after=2, jitter=0)
+
+        self.assertEqual([scheduler.record(True) for _ in range(5)], [10] * 5)
+
+    def test_drift_correction(self):
+        """Test that the probe's own duration is subtracted from the delay."""
+        scheduler = ProbeScheduler(10, jitter=0)
+
+        self.assertEqual(scheduler.next_delay(True, probe_started=100.0, now=103.0), 7.0)
+        # A probe slower than the interval is followed immediately by the next one
+        self.assertEqual(scheduler.next_delay(True, probe_started=100.0, now=115.0), 0.0)
+
+    def test_jitter_bounds(self):
+        """Test that jittered delays stay within the configured spread."""
+        scheduler = ProbeScheduler(10, jitter=0.2, rng=random.Random(42))
+
+        delays = [scheduler.next_delay(True, probe_started=0.0, now=0.0) for _ in range(5)]
+        for delay in delays:
+            self.assertGreaterEqual(delay, 8.0)
+            self.assertLessEqual(delay, 12.0)
+        self.assertGreater(len(set(delays)), 1)
+
+    def test_initial_delay(self):
+        """Test that the first probe is offset within one interval, or not at all without jitter."""
+        self.assertEqual(ProbeScheduler(10, jitter=0).initial_delay(), 0.0)
+        delay = ProbeScheduler(10, rng=random.Random(1)).initial_delay()
+        self.assertTrue(0 <= delay < 10)
+
+    def test_invalid_arguments(self):
+        """Test that invalid intervals and jitter are rejected."""
+        with self.assertRaises(ValueError):
+            ProbeScheduler(0)
+        with self.assertRaises(ValueError):
+            ProbeScheduler(10, jitter=1.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Tests for remediation strategy selection.
+"""
+
+import os
+import sys
+import unittest
+
+import requests
+
+# Add the monitor directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from strategy import RemediationLadder, classify_failure, parse_steps
+
+
+class TestClassifyFailure(unittest.TestCase):
+    """Test cases for classify_failure."""
+
+    def test_responses(self):
+        self.assertEqual(classify_failure(200), 'content')
+        self.assertEqual(classify_failure(502), 'status')
+
+    def test_errors(self):
+        refused = requests.exceptions.ConnectionError(
+            "HTTPSConnectionPool(host='10.0.1.5', port=443): Max retries exceeded "
+            "(Caused by NewConnectionError('[Errno 111] Connection refused'))"
+        )
+        self.assertEqual(classify_failure(error=refused), 'refused')
+        self.assertEqual(classify_failure(error=requests.exceptions.ConnectTimeout('timed out')), 'timeout')
+        self.assertEqual(classify_failure(error=requests.exceptions.ReadTimeout('timed out')), 'timeout')
+        self.assertEqual(classify_failure(error=requests.exceptions.ConnectionError('Name or service not known')), 'unreachable')
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestRemediationLadder(unittest.TestCase):
+    """Test cases for RemediationLadder."""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.ladder = RemediationLadder(escalation_window=600, clock=self.clock)
+
+    def test_first_step_follows_failure_kind(self):
+        self.assertEqual(self.ladder.first_steps(['i-1'], 'content'), {'i-1': 'rerun-document'})
+        self.assertEqual(self.ladder.first_steps(['i-1'], 'refused'), {'i-1': 'restart-nginx'})
+        self.assertEqual(self.ladder.first_steps(['i-1'], 'timeout'), {'i-1': 'reboot'})
+        self.assertEqual(self.ladder.first_steps(['i-1'], None), {'i-1': 'stop-start'})
+        self.assertEqual(self.ladder.first_steps(['i-1', 'i-2'], 'status', stopped=['i-2']),
+                         {'i-1': 'restart-nginx', 'i-2': 'stop-start'})
+
+    def test_instance_remediated_again_starts_higher(self):
+        self.ladder.record(['i-1'], 'restart-nginx')
+        self.assertEqual(self.ladder.first_steps(['i-1', 'i-2'], 'refused'),
+                         {'i-1': 'rerun-document', 'i-2': 'restart-nginx'})
+
+        # Never below the step the failure calls for
+        self.assertEqual(self.ladder.first_steps(['i-1'], 'timeout'), {'i-1': 'reboot'})
+
+        self.clock.now += 600
+        self.assertEqual(self.ladder.first_steps(['i-1'], 'refused'), {'i-1': 'restart-nginx'})
+
+    def test_configured_steps(self):
+        ladder = RemediationLadder(steps=parse_steps('stop-start, restart-nginx'))
+
+        self.assertEqual(ladder.steps, ['restart-nginx', 'stop-start'])
+        self.assertEqual(ladder.first_steps(['i-1'], 'content'), {'i-1': 'stop-start'})
+        self.assertEqual(ladder.next_step('restart-nginx'), 'stop-start')
+        self.assertIsNone(ladder.next_step('stop-start'))
+
+    def test_replace_is_opt_in(self):
+        self.assertNotIn('replace', self.ladder.steps)
+        self.assertIsNone(self.ladder.next_step('stop-start'))
+
+        ladder = RemediationLadder(steps=parse_steps('reboot,stop-start,replace'))
+        self.assertEqual(ladder.next_step('stop-start'), 'replace')
+        self.assertEqual(ladder.first_steps(['i-1', 'i-2'], 'timeout', stopped=['i-2']),
+                         {'i-1': 'reboot', 'i-2': 'stop-start'})
+
+    def test_rejects_unknown_steps(self):
+        with self.assertRaises(ValueError):
+            RemediationLadder(steps=parse_steps('restart-nginx,terminate'))
+        with self.assertRaises(ValueError):
+            RemediationLadder(steps=[])
+
+
+if __name__ == '__main__':
+    unittest.main()
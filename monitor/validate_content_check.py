@@ -5,6 +5,7 @@ Simple validation test for the content checking feature
 
 import sys
 import os
+import requests
 
 # Add the monitor directory to the path  
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
@@ -14,21 +15,24 @@ class MockResponse:
     def __init__(self, status_code, text):
         self.status_code = status_code
         self.text = text
+        self.raw = None
 
-def mock_requests_get(url, timeout=None, verify=None):
+    def iter_content(self, chunk_size=None):
+        yield self.text.encode('utf-8')
+
+    def close(self):
+        pass
+
+def mock_session_get(self, url, timeout=None, host=None):
     if "success" in url:
         return MockResponse(200, "Welcome to nginx! Deployed via SSM Document")
     elif "missing-content" in url:
         return MockResponse(200, "Welcome to nginx! Standard installation")
     else:
-        raise Exception("Connection failed")
+        raise requests.exceptions.ConnectionError("Connection failed")
 
-# Mock boto3 and requests
+# Mock boto3; requests is real but probes never leave the process
 sys.modules['boto3'] = type(sys)('mock_boto3')
-sys.modules['requests'] = type(sys)('mock_requests')
-sys.modules['requests'].get = mock_requests_get
-sys.modules['requests'].exceptions = type(sys)('mock_exceptions')
-sys.modules['requests'].exceptions.RequestException = Exception
 
 # Mock boto3 client
 class MockEC2Client:
@@ -41,7 +45,8 @@ def mock_boto3_client(service, region_name=None):
 sys.modules['boto3'].client = mock_boto3_client
 
 # Now import and test the monitor
-from monitor import HealthMonitor
+from monitor import HealthMonitor, ProbeSession
+ProbeSession.get = mock_session_get
 
 def test_content_validation():
     """Test the content validation functionality"""
@@ -1,4 +1,12 @@
 output "alb_address" {
   description = "The address of the ALB"
   value       = "https://${module.alb.dns_name}"
-}
\ No newline at end of file
+}
+output "web_server_target_group_arn" {
+  description = "The ARN of the web server target group, used by the monitor for target-level remediation"
+  value       = aws_lb_target_group.web_server_target_group.arn
+}
+output "web_server_bucket_name" {
+  description = "The name of the web server bucket, also used by clustered monitors to store leases"
+  value       = module.s3_web_server.s3_bucket_id
+}